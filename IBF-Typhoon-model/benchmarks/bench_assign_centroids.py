@@ -0,0 +1,94 @@
+"""
+Benchmark of the nearest centroid assignment of exposures on the Philippines 0.05 degree grid.
+
+The exposures are the grid points of the municipalities, jittered and repeated to the given
+number. Compares the former implementations of `climada.util.interpolation` (a loop over the
+exposures computing the approximate distance to all centroids, a Ball tree built for every
+call and queried with a dual tree) with the cached index of `Centroids.get_nn_index`. The
+former approximate loop is only run on the first exposures and extrapolated. Run from the
+IBF-Typhoon-model folder:
+
+    python benchmarks/bench_assign_centroids.py [--exposures 200000 --old-exposures 2000]
+"""
+import time
+
+import click
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+import climada.util.coordinates as u_coord
+import climada.util.interpolation as u_interp
+from climada.util.constants import EARTH_RADIUS_KM, ONE_LAT_KM
+
+import forecast_fixtures
+
+THRESHOLD = 100
+
+
+def former_approx(centroids, coordinates, threshold=THRESHOLD):
+    """Former `index_nn_aprox`, without its warning"""
+    _, idx, inv = np.unique(coordinates, axis=0, return_index=True, return_inverse=True)
+    centr_cos_lat = np.cos(np.radians(centroids[:, 0]))
+    assigned = np.zeros(coordinates.shape[0], int)
+    for icoord, iidx in enumerate(idx):
+        dist = u_interp.dist_sqr_approx(centroids[:, 0], centroids[:, 1], centr_cos_lat,
+                                        coordinates[iidx, 0], coordinates[iidx, 1])
+        min_idx = dist.argmin()
+        if np.sqrt(dist.min()) * ONE_LAT_KM > threshold:
+            min_idx = -1
+        assigned[inv == icoord] = min_idx
+    return assigned
+
+
+def former_haversine(centroids, coordinates, threshold=THRESHOLD):
+    """Former `index_nn_haversine`, without its warning"""
+    tree = BallTree(np.radians(centroids), metric='haversine')
+    _, idx, inv = np.unique(coordinates, axis=0, return_index=True, return_inverse=True)
+    dist, assigned = tree.query(np.radians(coordinates[idx]), k=1, return_distance=True,
+                                dualtree=True, breadth_first=False)
+    assigned[dist * EARTH_RADIUS_KM > threshold] = -1
+    return np.squeeze(assigned[inv])
+
+
+def timed(func, *args, **kwargs):
+    """Result and run time of func"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@click.command()
+@click.option('--exposures', default=200000, help='number of exposure points')
+@click.option('--old-exposures', default=2000,
+              help='number of exposures to run the former approximate loop on')
+def main(exposures, old_exposures):
+    cent = forecast_fixtures.philippines_centroids()
+    grid = pd.read_csv(forecast_fixtures.GRID_POINTS_ADMIN3)
+    rng = np.random.default_rng(0)
+    coords = grid[['glat', 'glon']].values[rng.integers(len(grid), size=exposures)]
+    coords = coords + rng.uniform(-0.02, 0.02, coords.shape)
+    print(f'{exposures} exposures, {cent.size} centroids')
+
+    for distance in u_interp.DIST_DEF:
+        if distance == 'approx':
+            old, t_old = timed(former_approx, cent.coord, coords[:old_exposures])
+            t_old *= exposures / old_exposures
+        else:
+            old, t_old = timed(former_haversine, cent.coord, coords)
+        # build the index with the first call, then reuse it for other exposures
+        new, t_build = timed(u_coord.assign_coordinates, coords, cent.coord, distance=distance,
+                             nn_index=cent.get_nn_index(distance))
+        new, t_query = timed(u_coord.assign_coordinates, coords, cent.coord, distance=distance,
+                             nn_index=cent.get_nn_index(distance))
+        print(f'{distance:9s}: former {t_old:8.2f} s, cached index {t_build:6.2f} s first call, '
+              f'{t_query:6.2f} s reused, identical {np.array_equal(new[:old.size], old)}')
+
+    # check of assign_centroids to skip the same assignment
+    _, t_hash = timed(u_interp.coords_hash, coords[:, 0], coords[:, 1], cent.lat, cent.lon,
+                      THRESHOLD)
+    print(f'hash of exposures and centroids: {t_hash:6.3f} s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark of the ECMWF BUFR track reader.
+
+Compares the former reader parsing the text rendering of every message
+(`TCForecast.read_one_bufr_tc_text`) with the columnar `TCForecast.read_one_bufr_tc`
+on a set of stored ECMWF `*tropical_cyclone*` files, and checks that both return the
+same tracks. Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_bufr_reader.py --path "forecast/Input/bufr/*tropical_cyclone*"
+"""
+import time
+
+import click
+import xarray as xr
+
+from climada.hazard.tc_tracks_forecast import TCForecast
+from climada.util.files_handler import get_file_names
+
+
+def read_all(files, read):
+    """Read all files with the given TCForecast method name"""
+    fcast = TCForecast()
+    start = time.perf_counter()
+    for i, file in enumerate(files, 1):
+        getattr(fcast, read)(file, id_no=i)
+    return fcast.data, time.perf_counter() - start
+
+
+@click.command()
+@click.option('--path', required=True, help='BUFR file, folder or globbing pattern')
+def main(path):
+    files = get_file_names(path)
+    text, t_text = read_all(files, 'read_one_bufr_tc_text')
+    columnar, t_columnar = read_all(files, 'read_one_bufr_tc')
+    print(f'{len(files)} files, {len(columnar)} tracks')
+    print(f'text:     {t_text:8.2f} s')
+    print(f'columnar: {t_columnar:8.2f} s')
+    print(f'speedup:  {t_text / t_columnar:8.1f} x')
+
+    assert len(text) == len(columnar), 'different number of tracks'
+    for old, new in zip(text, columnar):
+        # the text reader takes the storm name from the rendered bytes representation,
+        # e.g. "b'MALAKAS   '", which the columnar reader decodes properly
+        xr.testing.assert_identical(old.assign_attrs(name=new.name), new)
+    print('identical tracks')
+
+
+if __name__ == "__main__":
+    main()
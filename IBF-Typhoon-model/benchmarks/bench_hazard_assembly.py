@@ -0,0 +1,84 @@
+"""
+Benchmark of the assembly of the TropCyclone hazard from the hazards of single tracks.
+
+Compares appending the hazard of every track to the growing hazard, as formerly done
+by `TropCyclone.set_from_tracks`, with stacking all of them at once. The windfields of
+the synthetic ensemble are computed once and repeated up to the number of tracks, so
+only the assembly is timed. Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_hazard_assembly.py [--tracks 50 --tracks 500 --tracks 5000]
+"""
+import copy
+import time
+
+import click
+import numpy as np
+
+from climada.hazard import TropCyclone
+
+import forecast_fixtures
+
+
+def ensemble_hazards(cent, store_windfields):
+    """Hazards of the single tracks of the synthetic ensemble"""
+    coastal_idx = np.arange(cent.size)
+    return [TropCyclone()._tc_from_track(track, cent, coastal_idx,
+                                         store_windfields=store_windfields)
+            for track in forecast_fixtures.synthetic_ensemble()]
+
+
+def track_hazards(n_tracks, tc_haz):
+    """Hazards of n_tracks single tracks, repeating those in tc_haz"""
+    repeated = []
+    for i_track in range(n_tracks):
+        haz = copy.copy(tc_haz[i_track % len(tc_haz)])
+        # events with the same name and date are not allowed
+        haz.event_name = [f'SYNTH_{i_track}']
+        repeated.append(haz)
+    return repeated
+
+
+def append_all(tc_haz):
+    """Former serial assembly in set_from_tracks"""
+    haz = TropCyclone()
+    for new_haz in tc_haz:
+        haz.append(new_haz)
+    return haz
+
+
+def stack_all(tc_haz, cent):
+    """Assembly in set_from_tracks"""
+    haz = TropCyclone()
+    haz._set_events_from_track_hazards(tc_haz, cent)
+    return haz
+
+
+@click.command()
+@click.option('--tracks', multiple=True, type=int, default=[50, 500, 5000],
+              help='number of tracks, can be repeated')
+@click.option('--max-append', default=500,
+              help='largest number of tracks to append one by one, 5000 take more than an hour')
+@click.option('--store-windfields', is_flag=True, help='also assemble the windfields')
+def main(tracks, max_append, store_windfields):
+    cent = forecast_fixtures.philippines_centroids()
+    ens_haz = ensemble_hazards(cent, store_windfields)
+    print(f'{cent.size} centroids')
+    for n_tracks in tracks:
+        tc_haz = track_hazards(n_tracks, ens_haz)
+        start = time.perf_counter()
+        new = stack_all(tc_haz, cent)
+        t_stack = time.perf_counter() - start
+        line = f'{n_tracks:6d} tracks: stacked {t_stack:8.3f} s'
+        if n_tracks <= max_append:
+            start = time.perf_counter()
+            old = append_all(tc_haz)
+            t_append = time.perf_counter() - start
+            same = ((old.intensity != new.intensity).nnz == 0
+                    and np.array_equal(old.event_id, new.event_id)
+                    and old.event_name == new.event_name)
+            line += f', appended {t_append:8.3f} s, same intensity and events: {same}'
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark of the hdf5 storage of a synthetic event set over the Philippines.
+
+The event set consists of the maximum wind fields of the synthetic ensemble, shifted by
+random offsets on the 0.05 degree grid. Compares the former files (contiguous, uncompressed
+datasets that are read as a whole before selecting events) with the compressed chunks of
+`Hazard.write_hdf5`, reading only the rows of the selected events with `Hazard.read_hdf5`,
+and appending events in place with `Hazard.append_hdf5`. Run from the IBF-Typhoon-model
+folder:
+
+    python benchmarks/bench_hazard_hdf5.py [--events 5000 --selected 50 --out-dir /tmp]
+"""
+import time
+from pathlib import Path
+
+import click
+import h5py
+import numpy as np
+from scipy import sparse
+
+from climada.hazard import Hazard
+import climada.util.hdf5_handler as u_hdf5
+
+import forecast_fixtures
+
+
+def former_write_hdf5(haz, file_name):
+    """Former `Hazard.write_hdf5`, with contiguous datasets"""
+    with h5py.File(file_name, 'w') as hf_data:
+        str_dt = h5py.special_dtype(vlen=str)
+        for (var_name, var_val) in haz.__dict__.items():
+            if var_name == 'centroids':
+                haz.centroids.write_hdf5(hf_data.create_group(var_name))
+            elif var_name == 'tag':
+                for tag_name in ['haz_type', 'file_name', 'description']:
+                    hf_str = hf_data.create_dataset(tag_name, (1,), dtype=str_dt)
+                    hf_str[0] = str(getattr(var_val, tag_name))
+            elif isinstance(var_val, sparse.csr_matrix):
+                hf_csr = hf_data.create_group(var_name)
+                hf_csr.create_dataset('data', data=var_val.data)
+                hf_csr.create_dataset('indices', data=var_val.indices)
+                hf_csr.create_dataset('indptr', data=var_val.indptr)
+                hf_csr.attrs['shape'] = var_val.shape
+            elif isinstance(var_val, str):
+                hf_str = hf_data.create_dataset(var_name, (1,), dtype=str_dt)
+                hf_str[0] = var_val
+            elif isinstance(var_val, list) and var_val and isinstance(var_val[0], str):
+                hf_data.create_dataset(var_name, data=var_val, dtype=str_dt)
+            elif var_val is not None and var_name != 'pool':
+                hf_data.create_dataset(var_name, data=var_val)
+
+
+def former_read_select(file_name, event_names):
+    """Former way to get some events of a file: read all of them, then select"""
+    haz = Hazard('TC')
+    with h5py.File(file_name, 'r') as hf_data:
+        haz.centroids.read_hdf5(hf_data.get('centroids'))
+        haz.tag.haz_type = u_hdf5.to_string(hf_data.get('haz_type')[0])
+        for var_name in ['event_id', 'frequency', 'date', 'orig']:
+            setattr(haz, var_name, np.array(hf_data.get(var_name)))
+        haz.event_name = list(map(u_hdf5.to_string, np.array(hf_data.get('event_name')).tolist()))
+        for var_name in ['intensity', 'fraction']:
+            hf_csr = hf_data.get(var_name)
+            setattr(haz, var_name, sparse.csr_matrix(
+                (hf_csr['data'][:], hf_csr['indices'][:], hf_csr['indptr'][:]),
+                hf_csr.attrs['shape']))
+    return haz.select(event_names=event_names)
+
+
+def timed(func, *args, **kwargs):
+    """Result and run time of func"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@click.command()
+@click.option('--events', default=5000, help='number of synthetic events')
+@click.option('--selected', default=50, help='number of events to read')
+@click.option('--out-dir', default='/tmp', help='folder of the hdf5 files')
+def main(events, selected, out_dir):
+    cent = forecast_fixtures.philippines_centroids()
+    haz = forecast_fixtures.synthetic_event_set(cent, events, 20.)
+    haz.orig = np.zeros(events, bool)
+    print(f'{haz.size} events, {cent.size} centroids, {haz.intensity.nnz} nonzero intensities')
+    old_file = Path(out_dir, 'bench_hazard_former.h5')
+    new_file = Path(out_dir, 'bench_hazard_chunked.h5')
+    rng = np.random.default_rng(0)
+    event_names = [haz.event_name[idx] for idx in rng.choice(events, selected, replace=False)]
+
+    _, t_old = timed(former_write_hdf5, haz, old_file)
+    _, t_new = timed(haz.write_hdf5, new_file)
+    print(f'write:  former {t_old:6.2f} s, {old_file.stat().st_size / 1e6:8.1f} MB, '
+          f'chunked {t_new:6.2f} s, {new_file.stat().st_size / 1e6:8.1f} MB')
+
+    old, t_old = timed(former_read_select, old_file, event_names)
+    haz_read = Hazard('TC')
+    _, t_new = timed(haz_read.read_hdf5, new_file, event_names=event_names)
+    print(f'read {selected} events: former {t_old:6.2f} s, subset {t_new:6.2f} s, identical '
+          f'{abs(old.intensity - haz_read.intensity).max() == 0}')
+
+    # the first half written, the second half appended
+    half = [haz.event_name[idx] for idx in range(events // 2, events)]
+    haz.select(event_names=haz.event_name[:events // 2]).write_hdf5(new_file)
+    _, t_new = timed(haz.select(event_names=half).append_hdf5, new_file)
+    haz_read.read_hdf5(new_file)
+    print(f'append {len(half)} events: {t_new:6.2f} s, identical '
+          f'{abs(haz.intensity - haz_read.intensity).max() == 0}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark of the selection of IBTrACS storms by basin and years.
+
+Compares `TCTracks.read_ibtracs_netcdf`, which opens the whole NetCDF file and filters the
+storms on its full arrays, with `TCTracks.read_ibtracs_cache`, which selects the storms with the
+indexes of the columnar cache written once by `write_ibtracs_cache` and reads only their
+positions. The IBTrACS file is the one given (in the system folder), otherwise a synthetic file
+with the structure of IBTrACS is written to the output folder. Run from the IBF-Typhoon-model
+folder:
+
+    python benchmarks/bench_ibtracs_cache.py [--ibtracs IBTrACS.ALL.v04r00.nc --basin WP]
+"""
+from pathlib import Path
+import time
+
+import click
+
+from climada.hazard import TCTracks
+import climada.hazard.tc_tracks as tc
+
+import forecast_fixtures
+
+
+def timed(func, *args, **kwargs):
+    """Result and run time of func"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def identical(tracks_old, tracks_new):
+    """Whether two lists of tracks are identical, values and attributes"""
+    return (len(tracks_old) == len(tracks_new)
+            and all(old.identical(new) for old, new in zip(tracks_old, tracks_new)))
+
+
+@click.command()
+@click.option('--ibtracs', default=None, help='IBTrACS netcdf file (in the system folder)')
+@click.option('--storms', default=5000, help='number of storms of the synthetic file')
+@click.option('--out-dir', default='/tmp', help='folder of the synthetic file')
+@click.option('--basin', default='WP', help='basin of the storms to read')
+@click.option('--years', default=(2000, 2005), type=(int, int), help='year range to read')
+def main(ibtracs, storms, out_dir, basin, years):
+    if ibtracs is None:
+        ibtracs = str(Path(out_dir, 'bench_ibtracs_synth.nc'))
+        ibtracs_ds = forecast_fixtures.synthetic_ibtracs(storms)
+        # compressed like the IBTrACS file
+        ibtracs_ds.to_netcdf(ibtracs, encoding={var: {'zlib': True, 'complevel': 4}
+                                                for var in ibtracs_ds.variables})
+    _, t_cache = timed(tc.write_ibtracs_cache, ibtracs)
+    print(f'write cache: {t_cache:6.2f} s')
+
+    for kwargs in [{'basin': basin, 'year_range': years},
+                   {'basin': basin, 'year_range': (years[0], years[0])}]:
+        old, new = TCTracks(), TCTracks()
+        _, t_old = timed(old.read_ibtracs_netcdf, file_name=ibtracs, **kwargs)
+        _, t_new = timed(new.read_ibtracs_cache, file_name=ibtracs, **kwargs)
+        print(f'{kwargs}: {old.size} tracks, netcdf {t_old:6.2f} s, cache {t_new:6.2f} s, '
+              f'identical {identical(old.data, new.data)}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark of `Impact.calc` for dense exposures over the Philippines.
+
+The exposures are the grid points of the municipalities, jittered and repeated to the given
+number, like LitPop exposures at a finer resolution than the 0.05 degree hazard grid. The
+hazard is the synthetic event set of shifted wind fields. Compares the former computation,
+evaluating the impact function for every exposure and accumulating the impact matrix in
+Python lists, with the products of the mean damage ratio at the centroids and the sparse
+selector of the exposures. Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_impact_calc.py [--events 500 --exposures 200000 --save-mat]
+"""
+import time
+
+import click
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from climada import CONFIG
+from climada.engine import Impact
+from climada.entity import Exposures, ImpactFuncSet, ImpfTropCyclone
+from climada.entity.exposures import INDICATOR_CENTR
+
+import forecast_fixtures
+
+
+def former_calc(exposures, impact_funcs, hazard, save_mat):
+    """Former loop of `Impact.calc` and `Impact._exp_impact`, without insurance"""
+    assign_haz = INDICATOR_CENTR + hazard.tag.haz_type
+    at_event = np.zeros(hazard.size)
+    eai_exp = np.zeros(exposures.gdf.value.size)
+    imp_mat = ([], ([], []))
+    exp_idx = np.where((exposures.gdf.value > 0) & (exposures.gdf[assign_haz] >= 0))[0]
+    impf_haz = exposures.get_impf_column(hazard.tag.haz_type)
+    exp_step = CONFIG.max_matrix_size.int() // hazard.size
+    for imp_fun in impact_funcs.get_func(hazard.tag.haz_type):
+        exp_iimp = np.where(exposures.gdf[impf_haz].values[exp_idx] == imp_fun.id)[0]
+        for chk in range(0, exp_iimp.size, exp_step):
+            exp_chk = exp_idx[exp_iimp[chk:chk + exp_step]]
+            icens = exposures.gdf[assign_haz].values[exp_chk]
+            inten_val = hazard.intensity[:, icens]
+            fract = hazard.fraction[:, icens]
+            inten_val.data = imp_fun.calc_mdr(inten_val.data)
+            impact = fract.multiply(inten_val).multiply(exposures.gdf.value.values[exp_chk])
+            eai_exp[exp_chk] += np.squeeze(np.asarray(np.sum(
+                impact.multiply(hazard.frequency.reshape(-1, 1)), axis=0)))
+            at_event += np.squeeze(np.asarray(np.sum(impact, axis=1)))
+            if save_mat:
+                row_ind, col_ind = impact.nonzero()
+                imp_mat[0].extend(list(impact.data))
+                imp_mat[1][0].extend(list(row_ind))
+                imp_mat[1][1].extend(list(exp_chk[col_ind]))
+    if save_mat:
+        imp_mat = sparse.csr_matrix(imp_mat, shape=(hazard.size, exposures.gdf.value.size))
+    return at_event, eai_exp, imp_mat
+
+
+def dense_exposures(n_exposures, seed=0):
+    """Exposures around the municipality grid points"""
+    grid = pd.read_csv(forecast_fixtures.GRID_POINTS_ADMIN3)
+    rng = np.random.default_rng(seed)
+    coords = grid[['glat', 'glon']].values[rng.integers(len(grid), size=n_exposures)]
+    coords = coords + rng.uniform(-0.05, 0.05, coords.shape)
+    exp = Exposures({'latitude': coords[:, 0], 'longitude': coords[:, 1],
+                     'value': rng.lognormal(10, 1, n_exposures), 'impf_TC': 1})
+    exp.check()
+    return exp
+
+
+@click.command()
+@click.option('--events', default=500, help='number of synthetic events')
+@click.option('--exposures', default=200000, help='number of exposure points')
+@click.option('--save-mat', is_flag=True, help='also compute the impact matrix')
+def main(events, exposures, save_mat):
+    cent = forecast_fixtures.philippines_centroids()
+    haz = forecast_fixtures.synthetic_event_set(cent, events, 20.)
+    exp = dense_exposures(exposures)
+    exp.assign_centroids(haz)
+    impact_funcs = ImpactFuncSet()
+    impf = ImpfTropCyclone()
+    impf.set_emanuel_usa()
+    impact_funcs.append(impf)
+    print(f'{haz.size} events, {cent.size} centroids, {exposures} exposures, '
+          f'{np.unique(exp.gdf[INDICATOR_CENTR + "TC"]).size} centroids with exposures')
+
+    start = time.perf_counter()
+    at_event, eai_exp, imp_mat = former_calc(exp, impact_funcs, haz, save_mat)
+    t_old = time.perf_counter() - start
+    imp = Impact()
+    start = time.perf_counter()
+    imp.calc(exp, impact_funcs, haz, save_mat=save_mat)
+    t_new = time.perf_counter() - start
+
+    def rel_diff(old, new):
+        return np.abs(new - old).max() / max(np.abs(old).max(), 1)
+    print(f'former: {t_old:8.2f} s, sparse products: {t_new:8.2f} s, relative difference '
+          f'at_event {rel_diff(at_event, imp.at_event):.1e}, '
+          f'eai_exp {rel_diff(eai_exp, imp.eai_exp):.1e}'
+          + (f', imp_mat {abs(imp_mat - imp.imp_mat).max():.1e}' if save_mat else ''))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of the point-in-land test `coord_on_land` for the nodes of a set of tracks.
+
+Compares the former `coord_on_land`, which tests every point against the land geometry with
+`shapely.vectorized.contains`, with the lookup in the land mask raster, where only the
+points in cells on the coast are tested against the geometry. The tracks are the synthetic
+ensemble repeated to the given number of forecasts and interpolated to the given time step,
+tested once for all nodes and once for each track. Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_land_mask.py [--forecasts 100 --time-step 0.5 --natural-earth]
+"""
+import time
+
+import click
+import numpy as np
+import shapely.vectorized
+
+from climada.hazard import TCTracks
+import climada.util.coordinates as u_coord
+
+import forecast_fixtures
+
+
+def timed(func, *args, **kwargs):
+    """Result and run time of func"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@click.command()
+@click.option('--forecasts', default=100, help='number of copies of the ensemble forecast')
+@click.option('--time-step', default=1., help='time step of the tracks in hours')
+@click.option('--natural-earth', is_flag=True,
+              help='Natural Earth land geometry instead of the land-sea mask')
+def main(forecasts, time_step, natural_earth):
+    tc_tracks = TCTracks()
+    tc_tracks.data = forecast_fixtures.synthetic_ensemble() * forecasts
+    tc_tracks.equal_timestep(time_step)
+    if natural_earth:
+        land_geom = u_coord.get_land_geometry(tc_tracks.get_extent(), resolution=10)
+    else:
+        land_geom = forecast_fixtures.philippines_land_geometry()
+    lat = np.concatenate([track.lat.values for track in tc_tracks.data])
+    lon = np.concatenate([track.lon.values for track in tc_tracks.data])
+    print(f'{tc_tracks.size} tracks, {lat.size} nodes')
+
+    # the land mask is computed on the first call and kept in memory afterwards
+    _, t_mask = timed(u_coord.get_land_mask, land_geom)
+    print(f'land mask:  computed in {t_mask:6.2f} s')
+
+    old, t_old = timed(shapely.vectorized.contains, land_geom, lon, lat)
+    new, t_new = timed(u_coord.coord_on_land, lat, lon, land_geom)
+    print(f'all nodes:  former {t_old:6.2f} s, land mask {t_new:6.2f} s, '
+          f'same result {np.array_equal(old, new)}')
+
+    _, t_old = timed(lambda: [shapely.vectorized.contains(land_geom, track.lon.values,
+                                                          track.lat.values)
+                              for track in tc_tracks.data])
+    _, t_new = timed(lambda: [u_coord.coord_on_land(track.lat.values, track.lon.values,
+                                                    land_geom)
+                              for track in tc_tracks.data])
+    print(f'per track:  former {t_old:6.2f} s, land mask {t_new:6.2f} s')
+
+
+if __name__ == "__main__":
+    main()
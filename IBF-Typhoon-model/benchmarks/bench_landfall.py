@@ -0,0 +1,111 @@
+"""
+Benchmark of the land parameters (`on_land`, `dist_since_lf`) of a set of tracks.
+
+Compares the former per-track computation of `track_land_params`, where `_dist_since_lf` reads
+the distances between consecutive nodes from the diagonal of full pairwise haversine matrices,
+with `tracks_land_params`, which computes them elementwise for the concatenated nodes of all
+tracks. The tracks are the West Pacific tracks of IBTrACS if the file is given (otherwise the
+synthetic ensemble repeated to the given number of forecasts), interpolated to the given time
+step. Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_landfall.py [--ibtracs IBTrACS.ALL.v04r00.nc --time-step 1]
+"""
+import time
+
+import click
+import numpy as np
+from sklearn.neighbors import DistanceMetric
+
+from climada.hazard import TCTracks
+import climada.hazard.tc_tracks as tc
+from climada.util.constants import EARTH_RADIUS_KM
+import climada.util.coordinates as u_coord
+
+import forecast_fixtures
+
+
+def former_dist_since_lf(track):
+    """Former `_dist_since_lf`, with pairwise distance matrices"""
+    dist_since_lf = np.zeros(track.time.values.shape)
+    sea_land_idx, land_sea_idx = tc._get_landfall_idx(track, True)
+    if not sea_land_idx.size:
+        return (dist_since_lf + 1) * np.nan
+
+    orig_lf = np.empty((sea_land_idx.size, 2))
+    for i_lf, lf_point in enumerate(sea_land_idx):
+        if lf_point > 0:
+            orig_lf[i_lf][0] = track.lat[lf_point - 1] + \
+                (track.lat[lf_point] - track.lat[lf_point - 1]) / 2
+            orig_lf[i_lf][1] = track.lon[lf_point - 1] + \
+                (track.lon[lf_point] - track.lon[lf_point - 1]) / 2
+        else:
+            orig_lf[i_lf][0] = track.lat[lf_point]
+            orig_lf[i_lf][1] = track.lon[lf_point]
+
+    dist = DistanceMetric.get_metric('haversine')
+    nodes1 = np.radians(np.array([track.lat.values[1:], track.lon.values[1:]]).transpose())
+    nodes0 = np.radians(np.array([track.lat.values[:-1], track.lon.values[:-1]]).transpose())
+    dist_since_lf[1:] = dist.pairwise(nodes1, nodes0).diagonal()
+    dist_since_lf[~track.on_land.values] = 0.0
+    nodes1 = np.array([track.lat.values[sea_land_idx],
+                       track.lon.values[sea_land_idx]]).transpose() / 180 * np.pi
+    dist_since_lf[sea_land_idx] = dist.pairwise(nodes1, orig_lf / 180 * np.pi).diagonal()
+    for sea_land, land_sea in zip(sea_land_idx, land_sea_idx):
+        dist_since_lf[sea_land:land_sea] = np.cumsum(dist_since_lf[sea_land:land_sea])
+
+    dist_since_lf *= EARTH_RADIUS_KM
+    dist_since_lf[~track.on_land.values] = np.nan
+    return dist_since_lf
+
+
+def former_track_land_params(track, land_geom):
+    """Former `track_land_params`"""
+    track['on_land'] = ('time',
+                        u_coord.coord_on_land(track.lat.values, track.lon.values, land_geom))
+    track['dist_since_lf'] = ('time', former_dist_since_lf(track))
+
+
+def load_tracks(ibtracs, forecasts, time_step):
+    """Tracks of the benchmark, interpolated to time_step hours"""
+    tc_tracks = TCTracks()
+    if ibtracs:
+        tc_tracks.read_ibtracs_netcdf(file_name=ibtracs, basin='WP')
+    else:
+        tc_tracks.data = forecast_fixtures.synthetic_ensemble() * forecasts
+    tc_tracks.equal_timestep(time_step)
+    return tc_tracks
+
+
+@click.command()
+@click.option('--ibtracs', default=None, help='IBTrACS netcdf file (in the system folder)')
+@click.option('--forecasts', default=100, help='copies of the ensemble without IBTrACS')
+@click.option('--time-step', default=1., help='time step of the tracks in hours')
+@click.option('--natural-earth', is_flag=True,
+              help='Natural Earth land geometry instead of the land-sea mask')
+def main(ibtracs, forecasts, time_step, natural_earth):
+    tc_tracks = load_tracks(ibtracs, forecasts, time_step)
+    if natural_earth:
+        land_geom = u_coord.get_land_geometry(tc_tracks.get_extent(), resolution=10)
+    else:
+        land_geom = forecast_fixtures.philippines_land_geometry()
+    print(f'{tc_tracks.size} tracks, {sum(track.time.size for track in tc_tracks.data)} nodes')
+
+    start = time.perf_counter()
+    for track in tc_tracks.data:
+        former_track_land_params(track, land_geom)
+    t_old = time.perf_counter() - start
+    old = [track.dist_since_lf.values for track in tc_tracks.data]
+
+    start = time.perf_counter()
+    tc.tracks_land_params(tc_tracks.data, land_geom)
+    t_new = time.perf_counter() - start
+    new = [track.dist_since_lf.values for track in tc_tracks.data]
+
+    old, new = np.concatenate(old), np.concatenate(new)
+    print(f'former {t_old:8.2f} s, concatenated {t_new:8.2f} s, same nodes on land '
+          f'{np.array_equal(np.isnan(old), np.isnan(new))}, max difference '
+          f'{np.nanmax(np.abs(old - new), initial=0):.1e} km')
+
+
+if __name__ == "__main__":
+    main()
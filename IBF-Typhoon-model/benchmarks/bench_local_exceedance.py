@@ -0,0 +1,79 @@
+"""
+Benchmark of the local exceedance intensity of a synthetic event set over the Philippines.
+
+The event set consists of the maximum wind fields of the synthetic ensemble, shifted by
+random offsets on the 0.05 degree grid. Compares the former implementation of
+`Hazard.local_exceedance_inten`, sorting the dense intensity and fitting every centroid
+with np.polyfit, with the closed-form fit on the sparse intensity. The former one is only
+run on the first centroids and extrapolated to the whole grid. Run from the
+IBF-Typhoon-model folder:
+
+    python benchmarks/bench_local_exceedance.py [--events 5000 --old-centroids 2000 --cpus 4]
+"""
+import time
+import warnings
+
+import click
+import numpy as np
+from pathos.pools import ProcessPool as Pool
+
+import forecast_fixtures
+
+RETURN_PERIODS = np.array([10, 25, 50, 100, 250])
+
+
+def former_local_exceedance(intensity, frequency, intensity_thres, return_periods):
+    """Former loop over the centroids of `Hazard.local_exceedance_inten`"""
+    inten = intensity.toarray()
+    n_centroids = inten.shape[1]
+    sort_pos = np.argsort(inten, axis=0)[::-1, :]
+    columns = np.ones(inten.shape, int)
+    columns *= np.arange(columns.shape[1])
+    inten_sort = inten[sort_pos, columns]
+    freq_sort = frequency[sort_pos]
+    np.cumsum(freq_sort, axis=0, out=freq_sort)
+    exc_inten = np.zeros((return_periods.size, n_centroids))
+    for cen_idx in range(n_centroids):
+        above = inten_sort[:, cen_idx] > intensity_thres
+        inten_cen, freq_cen = inten_sort[above, cen_idx], freq_sort[above, cen_idx]
+        if not inten_cen.size:
+            continue
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            pol_coef = np.polyfit(np.log(freq_cen), inten_cen, deg=1)
+        exc_inten[:, cen_idx] = np.polyval(pol_coef, np.log(1 / return_periods))
+    return exc_inten
+
+
+@click.command()
+@click.option('--events', default=5000, help='number of synthetic events')
+@click.option('--events-per-year', default=20., help='total frequency of the events')
+@click.option('--old-centroids', default=2000,
+              help='number of centroids to run the former implementation on')
+@click.option('--cpus', default=1, help='number of processes for the chunks of centroids')
+def main(events, events_per_year, old_centroids, cpus):
+    cent = forecast_fixtures.philippines_centroids()
+    haz = forecast_fixtures.synthetic_event_set(cent, events, events_per_year)
+    print(f'{haz.size} events, {cent.size} centroids, {haz.intensity.nnz} nonzero intensities')
+    if cpus > 1:
+        haz.pool = Pool(nodes=cpus)
+
+    start = time.perf_counter()
+    new = haz.local_exceedance_inten(RETURN_PERIODS)
+    t_new = time.perf_counter() - start
+    print(f'closed-form fit: {t_new:8.2f} s')
+
+    # the former implementation on the centroids of the grid center, where the events are
+    old_idx = np.arange(old_centroids) + (cent.size - old_centroids) // 2
+    start = time.perf_counter()
+    old = former_local_exceedance(haz.intensity[:, old_idx], haz.frequency, haz.intensity_thres,
+                                  RETURN_PERIODS)
+    t_old = time.perf_counter() - start
+    old[old < 0] = 0
+    print(f'former loop:     {t_old:8.2f} s for {old_centroids} centroids, '
+          f'{t_old * cent.size / old_centroids:8.2f} s extrapolated, '
+          f'max difference {np.abs(new[:, old_idx] - old).max():.2e}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Benchmark of the generation of synthetic tracks (random walk and land decay).
+
+Compares the former per-track implementation of `calc_perturbed_trajectories` (`_one_rnd_walk`
+with a Python loop over the nodes of each synthetic track, `_random_uniform_ac` with a Python
+loop over the hourly values and `_apply_decay_coeffs` with xarray item assignments for each
+landfall) with the flat-array implementation (`_rnd_walk_tracks`, `_h_ac_series` and
+`_apply_decay_tracks`). The tracks are the synthetic ensemble repeated to the given number of
+forecasts, interpolated to the given time step, and the land is the land-sea mask of the
+Philippines. Both implementations get the same random numbers. Run from the IBF-Typhoon-model
+folder:
+
+    python benchmarks/bench_synth_tracks.py [--forecasts 10 --members 9 --time-step 1]
+"""
+import time
+
+import click
+import numpy as np
+
+from climada.hazard import TCTracks
+import climada.hazard.tc_tracks as tc
+import climada.hazard.tc_tracks_synth as synth
+import climada.util.coordinates as u_coord
+
+import forecast_fixtures
+
+
+def former_one_rnd_walk(track, nb_synth_tracks, max_shift_ini, max_dspeed_rel, max_ddirection,
+                        rnd_vec):
+    """Former `_one_rnd_walk`, walking each synthetic track in a Python loop (without the
+    cutoff messages)"""
+    ens_track = [track]
+    n_seg = track.time.size - 1
+    xy_ini = max_shift_ini * (2 * rnd_vec[:2 * nb_synth_tracks].reshape((2, nb_synth_tracks)) - 1)
+    [dt] = np.unique(track['time_step'])
+    for i_ens in range(nb_synth_tracks):
+        i_track = track.copy(True)
+        i_start_ang = 2 * nb_synth_tracks + i_ens * n_seg
+        ang_pert = dt * np.degrees(max_ddirection
+                                   * (2 * rnd_vec[i_start_ang:i_start_ang + n_seg] - 1))
+        ang_pert_cum = np.cumsum(ang_pert)
+        i_start_trans = 2 * nb_synth_tracks + nb_synth_tracks * n_seg + i_ens * n_seg
+        trans_pert = 1 + max_dspeed_rel * (2 * rnd_vec[i_start_trans:i_start_trans + n_seg] - 1)
+
+        bearings = synth._get_bearing_angle(i_track.lon.values, i_track.lat.values)
+        angular_dist = u_coord.dist_approx(i_track.lat.values[:-1, None],
+                                           i_track.lon.values[:-1, None],
+                                           i_track.lat.values[1:, None],
+                                           i_track.lon.values[1:, None],
+                                           method="geosphere", units="degree")[:, 0, 0]
+
+        new_lon = np.zeros_like(i_track.lon.values)
+        new_lat = np.zeros_like(i_track.lat.values)
+        new_lon[0] = i_track.lon.values[0] + xy_ini[0, i_ens]
+        new_lat[0] = i_track.lat.values[0] + xy_ini[1, i_ens]
+        last_idx = i_track.time.size
+        for i in range(0, len(new_lon) - 1):
+            new_lon[i + 1], new_lat[i + 1] = \
+                synth._get_destination_points(new_lon[i], new_lat[i],
+                                              bearings[i] + ang_pert_cum[i],
+                                              trans_pert[i] * angular_dist[i])
+            if i + 2 < last_idx and (new_lat[i + 1] > 70 or new_lat[i + 1] < -70):
+                last_idx = i + 2
+                break
+        u_coord.lon_normalize(new_lon, center=0.0)
+
+        i_track.lon.values = new_lon
+        i_track.lat.values = new_lat
+        i_track.attrs['orig_event_flag'] = False
+        i_track.attrs['name'] = i_track.attrs['name'] + '_gen' + str(i_ens + 1)
+        i_track.attrs['sid'] = i_track.attrs['sid'] + '_gen' + str(i_ens + 1)
+        i_track.attrs['id_no'] = i_track.attrs['id_no'] + (i_ens + 1) / 100
+        ens_track.append(i_track.isel(time=slice(None, last_idx)))
+    return ens_track
+
+
+def former_random_uniform_ac(n_ts, autocorr, time_step_h):
+    """Former `_random_uniform_ac`, with a Python loop over the hourly values"""
+    n_ts_hourly_exact = n_ts * time_step_h
+    n_ts_hourly = int(np.ceil(n_ts_hourly_exact))
+    x = np.random.normal(size=n_ts_hourly)
+    theta = np.arccos(autocorr)
+    for i in range(1, len(x)):
+        x[i] = synth._h_ac(x[i - 1], x[i], theta)
+    x = (x + np.sqrt(3)) / (2 * np.sqrt(3))
+    return np.interp(np.arange(start=0, stop=n_ts_hourly_exact, step=time_step_h),
+                     np.arange(n_ts_hourly), x)
+
+
+def former_apply_decay_coeffs(track, v_rel, p_rel, s_rel=True):
+    """Former `_apply_decay_coeffs` of a track with land parameters, assigning the decayed
+    values of each landfall to the xarray variables (without the log messages)"""
+    if track.orig_event_flag:
+        return track
+    sea_land_idx, land_sea_idx = tc._get_landfall_idx(track)
+    for idx, (sea_land, land_sea) in enumerate(zip(sea_land_idx, land_sea_idx)):
+        v_landfall = track.max_sustained_wind[sea_land - 1].values
+        p_landfall = float(track.central_pressure[sea_land - 1].values)
+        ss_scale = tc.set_category(v_landfall, track.max_sustained_wind_unit)
+        if land_sea - sea_land == 1:
+            continue
+        S = synth._calc_decay_ps_value(track, p_landfall, land_sea - 1, s_rel)
+        if S <= 1:
+            track.central_pressure[sea_land:land_sea] = \
+                track.environmental_pressure[sea_land:land_sea]
+        else:
+            p_decay = synth._decay_p_function(S, p_rel[ss_scale][1],
+                                              track.dist_since_lf[sea_land:land_sea].values)
+            if np.any(p_decay < 1):
+                p_decay[p_decay < 1] = (track.central_pressure[sea_land:land_sea][p_decay < 1]
+                                        / p_landfall)
+            track.central_pressure[sea_land:land_sea] = p_landfall * p_decay
+
+        v_decay = synth._decay_v_function(v_rel[ss_scale],
+                                          track.dist_since_lf[sea_land:land_sea].values)
+        if np.any(v_decay > 1):
+            v_decay[v_decay > 1] = (track.max_sustained_wind[sea_land:land_sea][v_decay > 1]
+                                    / v_landfall)
+        track.max_sustained_wind[sea_land:land_sea] = v_landfall * v_decay
+
+        if land_sea < track.time.size:
+            if idx + 1 < sea_land_idx.size:
+                end_cor = sea_land_idx[idx + 1]
+            else:
+                end_cor = track.time.size
+            rndn = 0.1 * float(np.abs(np.random.normal(size=1) * 5) + 6)
+            r_diff = track.central_pressure[land_sea].values - \
+                track.central_pressure[land_sea - 1].values + rndn
+            track.central_pressure[land_sea:end_cor] += - r_diff
+            rndn = rndn * 10
+            r_diff = track.max_sustained_wind[land_sea].values - \
+                track.max_sustained_wind[land_sea - 1].values - rndn
+            track.max_sustained_wind[land_sea:end_cor] += - r_diff
+
+        cor_p = track.central_pressure.values > track.environmental_pressure.values
+        track.central_pressure[cor_p] = track.environmental_pressure[cor_p]
+        track.max_sustained_wind[track.max_sustained_wind < 0] = 0
+
+    track.attrs['category'] = tc.set_category(track.max_sustained_wind.values,
+                                              track.max_sustained_wind_unit)
+    return track
+
+
+def max_difference(tracks_old, tracks_new, var_names):
+    """Largest difference of the values of the tracks, inf if the time steps differ"""
+    diff = 0
+    for old, new in zip(tracks_old, tracks_new):
+        if old.time.size != new.time.size:
+            return np.inf
+        for var_name in var_names:
+            diff = max(diff, np.max(np.abs(old[var_name].values - new[var_name].values)))
+    return diff
+
+
+def timed(func, *args, **kwargs):
+    """Result and run time of func"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@click.command()
+@click.option('--forecasts', default=10, help='number of copies of the ensemble forecast')
+@click.option('--members', default=9, help='number of synthetic tracks of each track')
+@click.option('--time-step', default=1., help='time step of the tracks in hours')
+@click.option('--seed', default=8, help='seed of the random numbers')
+def main(forecasts, members, time_step, seed):
+    tc_tracks = TCTracks()
+    tc_tracks.data = forecast_fixtures.synthetic_ensemble() * forecasts
+    tc_tracks.equal_timestep(time_step)
+    sizes = [track.time.size for track in tc_tracks.data]
+    print(f'{tc_tracks.size} tracks, {sum(sizes)} nodes, {members} synthetic tracks each')
+
+    np.random.seed(seed)
+    _, t_old = timed(lambda: [former_random_uniform_ac(2 * members * (size - 1), 0.2, time_step)
+                              for size in sizes])
+    np.random.seed(seed)
+    _, t_new = timed(lambda: [synth._random_uniform_ac(2 * members * (size - 1), 0.2, time_step)
+                              for size in sizes])
+    print(f'random vectors: former {t_old:6.2f} s, compiled {t_new:6.2f} s')
+
+    np.random.seed(seed)
+    rnd_vecs = [np.random.uniform(size=2 * members * size) for size in sizes]
+    args = (members, 0.75, 0.3, np.pi / 360)
+    old, t_old = timed(lambda: [synth_track for track, rnd_vec in zip(tc_tracks.data, rnd_vecs)
+                                for synth_track in former_one_rnd_walk(track, *args, rnd_vec)])
+    chunk_size = max(1, synth.MAX_CHUNK_SYNTH // members)
+    new, t_new = timed(lambda: [synth_track for idx in range(0, tc_tracks.size, chunk_size)
+                                for synth_track in synth._rnd_walk_tracks(
+                                    tc_tracks.data[idx:idx + chunk_size], *args,
+                                    rnd_vecs[idx:idx + chunk_size])[0]])
+    print(f'random walk:    former {t_old:6.2f} s, flat {t_new:6.2f} s, '
+          f'max difference {max_difference(old, new, ["lon", "lat"]):.1e}')
+
+    tc.tracks_land_params(new, forecast_fixtures.philippines_land_geometry())
+    old = [track.copy(True) for track in new]
+    np.random.seed(seed)
+    _, t_old = timed(lambda: [former_apply_decay_coeffs(track, synth.LANDFALL_DECAY_V,
+                                                        synth.LANDFALL_DECAY_P) for track in old])
+    np.random.seed(seed)
+
+    def apply_decay():
+        for idx in range(0, len(new), synth.MAX_CHUNK_DECAY):
+            chunk = new[idx:idx + synth.MAX_CHUNK_DECAY]
+            synth._apply_decay_tracks(chunk, synth.LANDFALL_DECAY_V, synth.LANDFALL_DECAY_P,
+                                      True, np.random.normal(size=synth._decay_rnd_size(chunk)))
+    _, t_new = timed(apply_decay)
+    same_cat = all(o_track.category == n_track.category for o_track, n_track in zip(old, new))
+    diff = max_difference(old, new, ["max_sustained_wind", "central_pressure"])
+    print(f'land decay:     former {t_old:6.2f} s, flat {t_new:6.2f} s, '
+          f'max difference {diff:.1e}, same categories {same_cat}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark of the per-municipality minimum track distance (`dis_track_min`).
+
+Compares the former per-centroid `iterrows` loop with the batched
+`track_distance.admin_dist_track_min`. Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_track_distance.py [--members 52]
+"""
+import time
+
+import click
+import numpy as np
+import pandas as pd
+
+from typhoonmodel.utility_fun import track_distance
+
+import forecast_fixtures
+
+
+def iterrows_dist_track_min(tracks, coords, df_admin):
+    """Former implementation in Forecast, one pass over all centroids per member"""
+    df = pd.DataFrame({'lat': coords[:, 0], 'lon': coords[:, 1]})
+    df_admin = df_admin.assign(centroid_id=df_admin.index.values)
+    distan_track = []
+    for tr in tracks:
+        distan_track1 = []
+        for index, row in df.iterrows():
+            dist = np.min(np.sqrt(np.square(tr.lat.values - row['lat'])
+                                  + np.square(tr.lon.values - row['lon'])))
+            distan_track1.append(dist * 111)
+        dist_tr = pd.DataFrame({'centroid_id': df.index.values, 'value': distan_track1})
+        dist_tr['name'] = tr.name
+        dist_tr['ens_id'] = tr.sid + '_' + str(tr.ensemble_number)
+        dist_tr = (pd.merge(dist_tr, df_admin, how='outer', on='centroid_id')
+                   .dropna()
+                   .groupby(['adm3_pcode', 'name', 'ens_id'], as_index=False)
+                   .agg({'value': 'min'}))
+        dist_tr.columns = ['adm3_pcode', 'name', 'storm_id', 'dis_track_min']
+        distan_track.append(dist_tr)
+    return pd.concat(distan_track)
+
+
+@click.command()
+@click.option('--members', default=forecast_fixtures.N_MEMBERS, help='number of ensemble members')
+@click.option('--reference-members', default=None, type=int,
+              help='time the former loop on this many members only and extrapolate')
+@click.option('--typhoonname', default=None, help='hindcast typhoon name')
+@click.option('--remote_directory', default=None, help='hindcast forecast timestamp, YYYYMMDDhhmmss')
+@click.option('--local-directory', default=None, help='directory with hindcast csv files')
+def main(members, reference_members, typhoonname, remote_directory, local_directory):
+    cent = forecast_fixtures.philippines_centroids()
+    admin_idx = forecast_fixtures.pseudo_admin(cent.coord)
+    tracks = forecast_fixtures.forecast_tracks(members, typhoonname, remote_directory,
+                                               local_directory)
+    print(f'{len(tracks)} tracks, {cent.size} centroids, '
+          f'{admin_idx.size} municipalities')
+
+    start = time.perf_counter()
+    new = track_distance.admin_dist_track_min(tracks, cent.coord, admin_idx)
+    t_new = time.perf_counter() - start
+    print(f'batched:  {t_new:8.2f} s')
+
+    ref_tracks = tracks[:reference_members] if reference_members else tracks
+    start = time.perf_counter()
+    old = iterrows_dist_track_min(ref_tracks, cent.coord,
+                                 forecast_fixtures.to_df_admin(admin_idx))
+    t_old = (time.perf_counter() - start) * len(tracks) / len(ref_tracks)
+    print(f'iterrows: {t_old:8.2f} s' + (' (extrapolated)' if reference_members else ''))
+    print(f'speedup:  {t_old / t_new:8.1f} x')
+
+    merged = pd.merge(old, new, on=['adm3_pcode', 'storm_id'], suffixes=('_old', '_new'))
+    diff = (merged.dis_track_min_old - merged.dis_track_min_new).abs()
+    print(f'distance difference: max {diff.max():.2e} km')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark of the interpolation of the tracks of an ensemble forecast.
+
+Compares the former per-track `xr.Dataset.resample(...).interpolate` of `track_data_clean`
+(to 0.5 h) and of `TCTracks.equal_timestep` with the batched NumPy interpolation of
+`interp_tracks`, on the synthetic ensemble (52 members and the high resolution track)
+repeated to the given number of forecasts. Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_track_interp.py [--forecasts 10 --time-step 1 --cpus 4]
+"""
+import time
+
+import click
+import numpy as np
+import pandas as pd
+from pathos.pools import ProcessPool as Pool
+
+from climada.hazard import TCTracks
+from climada.hazard.tc_tracks import set_category
+from typhoonmodel.utility_fun import track_data_clean
+
+import forecast_fixtures
+
+
+def former_track_data_clean(track):
+    """Former `track_data_clean`, resampling the track with xarray"""
+    track = track_data_clean._track_dataset(track).reset_coords(['lat', 'lon'])
+    return track.resample(time="0.5H").interpolate("linear").set_coords(['lat', 'lon'])
+
+
+def former_one_interp_data(track, time_step_h):
+    """Former `TCTracks._one_interp_data`, without land parameters"""
+    method = ['linear', 'quadratic', 'cubic'][min(2, track.time.size - 2)]
+    lon = track.lon.copy()
+    if (lon < -170).any() and (lon > 170).any():
+        lon[lon < 0] += 360
+    time_step = pd.tseries.frequencies.to_offset(pd.Timedelta(hours=time_step_h)).freqstr
+    track_int = track.resample(time=time_step).interpolate('linear')
+    track_int['time_step'][:] = time_step_h
+    lon_int = lon.resample(time=time_step).interpolate(method)
+    lon_int[lon_int > 180] -= 360
+    track_int.coords['lon'] = lon_int
+    track_int.coords['lat'] = track.lat.resample(time=time_step).interpolate(method)
+    track_int.attrs['category'] = set_category(track_int.max_sustained_wind.values,
+                                               track_int.max_sustained_wind_unit)
+    return track_int.sel(time=(track.time[0] <= track_int.time) & (track_int.time <= track.time[-1]))
+
+
+def max_difference(tracks_old, tracks_new):
+    """Largest difference of the values of the tracks, inf if the time steps differ"""
+    diff = 0
+    for old, new in zip(tracks_old, tracks_new):
+        if not np.array_equal(old.time.values, new.time.values):
+            return np.inf
+        for var_name in ['lat', 'lon', 'max_sustained_wind', 'central_pressure']:
+            diff = max(diff, np.nanmax(np.abs(old[var_name].values - new[var_name].values)))
+    return diff
+
+
+def timed(func, *args, **kwargs):
+    """Result and run time of func"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+@click.command()
+@click.option('--forecasts', default=10, help='number of copies of the ensemble forecast')
+@click.option('--time-step', default=1., help='time step of equal_timestep in hours')
+@click.option('--cpus', default=1, help='number of processes of equal_timestep')
+def main(forecasts, time_step, cpus):
+    raw = forecast_fixtures.synthetic_ensemble(clean=False) * forecasts
+    print(f'{len(raw)} tracks of {raw[0].time.size} time steps')
+
+    old, t_old = timed(lambda: [former_track_data_clean(track) for track in raw])
+    new, t_new = timed(track_data_clean.tracks_data_clean, raw)
+    print(f'track_data_clean: former {t_old:6.2f} s, batched {t_new:6.2f} s, '
+          f'max difference {max_difference(old, new):.1e}')
+
+    tracks = [track.set_coords(['lat', 'lon']) for track in raw]
+    old, t_old = timed(lambda: [former_one_interp_data(track, time_step) for track in tracks])
+    tc_tracks = TCTracks(pool=Pool(nodes=cpus) if cpus > 1 else None)
+    tc_tracks.data = tracks
+    _, t_new = timed(tc_tracks.equal_timestep, time_step)
+    print(f'equal_timestep:   former {t_old:6.2f} s, batched {t_new:6.2f} s, '
+          f'max difference {max_difference(old, tc_tracks.data):.1e}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of writing and reading a set of tracks to and from files.
+
+Compares `TCTracks.write_netcdf` and `TCTracks.read_netcdf`, with one NetCDF file per track,
+with `TCTracks.write_hdf5` and `TCTracks.read_hdf5`, with all the tracks in a single hdf5 file,
+for all the tracks and for the tracks of a selection of IDs. The tracks read from the hdf5 file
+are compared with the written ones (`read_netcdf` turns the legacy basin attribute into a
+variable). The tracks are the synthetic
+ensemble repeated to the given number of forecasts and interpolated to the given time step, each
+with its own ID and with the forecast time as string (NetCDF attributes cannot be dates). Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_tracks_hdf5.py [--forecasts 20 --time-step 1 --out-dir /tmp]
+"""
+import logging
+from pathlib import Path
+import shutil
+import time
+
+import click
+
+from climada.hazard import TCTracks
+
+import forecast_fixtures
+
+
+def timed(func, *args, **kwargs):
+    """Result and run time of func"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def identical(tracks_old, tracks_new):
+    """Whether two lists of tracks are identical, values and attributes"""
+    return (len(tracks_old) == len(tracks_new)
+            and all(old.identical(new) for old, new in zip(tracks_old, tracks_new)))
+
+
+def former_read_netcdf_sids(folder_name, sids):
+    """Tracks of given IDs from the files of `TCTracks.write_netcdf`, the former way of reading a
+    selection of tracks"""
+    tc_tracks = TCTracks()
+    tc_tracks.read_netcdf(folder_name)
+    by_sid = {track.sid: track for track in tc_tracks.data}
+    return [by_sid[sid] for sid in sids]
+
+
+@click.command()
+@click.option('--forecasts', default=20, help='number of copies of the ensemble forecast')
+@click.option('--time-step', default=1., help='time step of the tracks in hours')
+@click.option('--out-dir', default='/tmp', help='folder of the files')
+def main(forecasts, time_step, out_dir):
+    # read_netcdf warns about the legacy basin attribute of every track
+    logging.getLogger('climada.hazard.tc_tracks').setLevel(logging.ERROR)
+    tc_tracks = TCTracks()
+    tc_tracks.data = [track.copy(deep=True).assign_attrs(sid=f'{track.sid}_{i_track}',
+                                                         forecast_time=str(track.forecast_time))
+                      for i_track, track in enumerate(forecast_fixtures.synthetic_ensemble()
+                                                      * forecasts)]
+    tc_tracks.equal_timestep(time_step)
+    print(f'{tc_tracks.size} tracks, {sum(track.time.size for track in tc_tracks.data)} nodes')
+    nc_dir = Path(out_dir, 'bench_tracks_nc')
+    shutil.rmtree(nc_dir, ignore_errors=True)
+    nc_dir.mkdir()
+    h5_file = Path(out_dir, 'bench_tracks.h5')
+
+    _, t_old = timed(tc_tracks.write_netcdf, str(nc_dir))
+    _, t_new = timed(tc_tracks.write_hdf5, h5_file)
+    print(f'write:        netcdf {t_old:6.2f} s, hdf5 {t_new:6.2f} s')
+    # write_netcdf writes the flag as int, read_netcdf turns it back to bool
+    for track in tc_tracks.data:
+        track.attrs['orig_event_flag'] = bool(track.orig_event_flag)
+
+    sids = [track.sid for track in tc_tracks.data[::10]]
+    old, new = TCTracks(), TCTracks()
+    _, t_old = timed(old.read_netcdf, str(nc_dir))
+    _, t_new = timed(new.read_hdf5, h5_file)
+    print(f'read all:     netcdf {t_old:6.2f} s, hdf5 {t_new:6.2f} s, '
+          f'identical {identical(tc_tracks.data, new.data)}')
+
+    _, t_old = timed(former_read_netcdf_sids, str(nc_dir), sids)
+    _, t_new = timed(new.read_hdf5, h5_file, sid=sids)
+    print(f'read {len(sids):3} IDs: netcdf {t_old:6.2f} s, hdf5 {t_new:6.2f} s, '
+          f'identical {identical(tc_tracks.data[::10], new.data)}')
+
+
+if __name__ == "__main__":
+    main()
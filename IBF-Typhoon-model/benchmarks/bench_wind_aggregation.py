@@ -0,0 +1,83 @@
+"""
+Benchmark of the per-municipality wind aggregation (`v_max`, `value_count`).
+
+Compares the former dense aggregation (`toarray` of the windfield, merge with the
+centroid to municipality table and groupby on adm3_pcode) with the sparse
+`admin_index.AdminIndex.wind_stats`, in run time and peak memory per member. Run from
+the IBF-Typhoon-model folder:
+
+    python benchmarks/bench_wind_aggregation.py [--members 52]
+"""
+import time
+import tracemalloc
+
+import click
+import numpy as np
+import pandas as pd
+
+from typhoonmodel.utility_fun import ensemble_windfield
+
+import forecast_fixtures
+
+
+def dense_wind_stats(windfield, df_admin, threshold=0):
+    """Former implementation in Forecast"""
+    nsteps = windfield.shape[0]
+    ncents = windfield.shape[1] // 2
+    intensity_3d = windfield.toarray().reshape(nsteps, ncents, 2)
+    intensity = np.linalg.norm(intensity_3d, axis=-1)
+    df = pd.DataFrame({'v': intensity.T.ravel(),
+                       'centroid_id': np.repeat(np.arange(ncents), nsteps)})
+    df = df[df.v > threshold]
+    df = pd.merge(df, df_admin.assign(centroid_id=df_admin.index.values), on='centroid_id')
+    return (df.groupby('adm3_pcode', as_index=False)
+            .agg(value_count=('v', 'count'), v_max=('v', 'max')))
+
+
+def measure(func, *args):
+    """Run time and peak of the memory allocated by func"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+@click.command()
+@click.option('--members', default=forecast_fixtures.N_MEMBERS, help='number of ensemble members')
+@click.option('--typhoonname', default=None, help='hindcast typhoon name')
+@click.option('--remote_directory', default=None, help='hindcast forecast timestamp, YYYYMMDDhhmmss')
+@click.option('--local-directory', default=None, help='directory with hindcast csv files')
+def main(members, typhoonname, remote_directory, local_directory):
+    cent = forecast_fixtures.philippines_centroids()
+    admin_idx = forecast_fixtures.pseudo_admin(cent.coord)
+    df_admin = forecast_fixtures.to_df_admin(admin_idx)
+    tracks = forecast_fixtures.forecast_tracks(members, typhoonname, remote_directory,
+                                               local_directory)
+    print(f'{len(tracks)} tracks, {cent.size} centroids, {admin_idx.size} municipalities')
+
+    t_dense = t_sparse = peak_dense = peak_sparse = max_diff = 0
+    for tr, typhoon in ensemble_windfield.iter_windfields(tracks, cent):
+        windfield = typhoon.windfields[0]
+        old, elapsed, peak = measure(dense_wind_stats, windfield, df_admin)
+        t_dense += elapsed
+        peak_dense = max(peak_dense, peak)
+        new, elapsed, peak = measure(
+            lambda wf: admin_idx.wind_stats(ensemble_windfield.windfield_speed(wf)), windfield)
+        t_sparse += elapsed
+        peak_sparse = max(peak_sparse, peak)
+
+        merged = pd.merge(old, new, on='adm3_pcode', how='outer', suffixes=('_old', '_new'))
+        assert (merged.value_count_old == merged.value_count_new).all()
+        max_diff = max(max_diff, (merged.v_max_old - merged.v_max_new).abs().max())
+
+    print(f'dense:  {t_dense:8.2f} s, peak {peak_dense / 2**20:8.1f} MiB per member')
+    print(f'sparse: {t_sparse:8.2f} s, peak {peak_sparse / 2**20:8.1f} MiB per member')
+    print(f'speedup {t_dense / t_sparse:.1f} x, memory {peak_dense / peak_sparse:.1f} x, '
+          f'max v_max difference {max_diff:.2e} m/s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Parity check of the Python impact model against the output of run_model_V2.R.
+
+Scores the windfield.csv and rain_data.csv of a forecast Input folder with
+`impact_model` and compares the resulting csv files with the ones written by the R
+script for the same forecast. Run from the IBF-Typhoon-model folder:
+
+    python benchmarks/check_impact_model.py --input-folder forecast/Input/<date>/Input/ \
+        --r-output-folder forecast/Output/<date>/Output/
+
+The R script extracts its rainfall from rainfall_24.nc, the maximum over the cells with
+their centre in a municipality, while the cellmax_24h_rain column of rain_data.csv is the
+maximum over all the cells touched by the municipality. The predictions agree exactly for
+the synthetic rainfall of the hindcasts (--use-hindcast), and where the maximum is in a
+cell centred in the municipality otherwise.
+"""
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from typhoonmodel.utility_fun import impact_model
+
+ADMIN_FILE = "data-raw/gis_data/phl_admin3_simpl2.geojson"
+"""Municipalities of the Average_Impact file, as read by run_model_V2.R"""
+
+PATTERNS = ["*_TRIGGER_LEVEL_*.csv", "*_municipality_breakdown_*.csv", "Average_Impact_*.csv"]
+
+
+def compare_csv(r_file, py_file, rtol):
+    """Maximum relative difference per column, raises if the rows or columns differ"""
+    r_df, py_df = pd.read_csv(r_file), pd.read_csv(py_file)
+    if list(r_df.columns) != list(py_df.columns):
+        raise ValueError(f"Columns differ: {list(r_df.columns)} != {list(py_df.columns)}")
+    if len(r_df) != len(py_df):
+        raise ValueError(f"Number of rows differ: {len(r_df)} != {len(py_df)}")
+    failed = []
+    for col in r_df.columns:
+        if r_df[col].dtype.kind in "fi":
+            r_val, py_val = r_df[col].values.astype(float), py_df[col].values.astype(float)
+            if not np.allclose(py_val, r_val, rtol=rtol, atol=0, equal_nan=True):
+                diff = np.nanmax(np.abs(py_val - r_val) / np.fmax(np.abs(r_val), 1e-12))
+                failed.append(f"{col}: max relative difference {diff:.2e}")
+        elif not (r_df[col].fillna("NA") == py_df[col].fillna("NA")).all():
+            failed.append(f"{col}: values differ")
+    return failed
+
+
+@click.command()
+@click.option('--input-folder', required=True, help='forecast Input folder with windfield.csv')
+@click.option('--r-output-folder', required=True, help='Output folder of run_model_V2.R')
+@click.option('--main-path', default='.', help='main directory of the model')
+@click.option('--rtol', default=1e-6, help='relative tolerance of the numeric columns')
+def main(input_folder, r_output_folder, main_path, rtol):
+    windfield = pd.read_csv(os.path.join(input_folder, 'windfield.csv'))
+    rainfall = pd.read_csv(os.path.join(input_folder, 'rainfall/rain_data.csv'))
+    admin = gpd.read_file(os.path.join(main_path, ADMIN_FILE))
+
+    start = time.perf_counter()
+    model = impact_model.ImpactModel.from_files(main_path)
+    t_load = time.perf_counter() - start
+    r_files = sorted(f for pattern in PATTERNS for f in Path(r_output_folder).glob(pattern))
+    # the R file names contain the forecast time and the name of the typhoon
+    forecast_time, typhoon_name = r_files[0].stem.split("_")[-2:]
+
+    with tempfile.TemporaryDirectory() as py_output_folder:
+        start = time.perf_counter()
+        df_impact = model.predict(impact_model.hazard_features(windfield, rainfall))
+        impact_model.write_impact_files(df_impact, admin, py_output_folder, forecast_time,
+                                        typhoon_name)
+        t_score = time.perf_counter() - start
+        print(f'load model: {t_load:6.2f} s, score and write: {t_score:6.2f} s')
+
+        n_failed = 0
+        for r_file in r_files:
+            failed = compare_csv(r_file, Path(py_output_folder) / r_file.name, rtol)
+            print(f"{r_file.name}: {'OK' if not failed else 'DIFFERENT'}")
+            for line in failed:
+                print(f"    {line}")
+            n_failed += bool(failed)
+    if n_failed:
+        raise SystemExit(f"{n_failed} of {len(r_files)} files differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Inputs shared by the benchmark scripts in this directory.
+
+The benchmarks run offline on a synthetic 52-member forecast over the Philippines
+0.05 degree grid by default. Pass a hindcast (the csv files produced by
+analysis/hindcasts) to run them on a real ECMWF forecast instead.
+"""
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+import xarray as xr
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from climada.hazard import Centroids, TCTracks, TropCyclone
+import climada.hazard.tc_tracks as tc
+from typhoonmodel.utility_fun import admin_index, read_in_hindcast, track_data_clean
+
+MAIN_PATH = Path(__file__).parent.parent
+PH_BOUNDS = (118, 6, 127, 19)
+PH_RES = 0.05
+N_MEMBERS = 52
+GRID_POINTS_ADMIN3 = MAIN_PATH / 'data-raw/gis_data/grid_points_admin3_v2.csv'
+LAND_SEA_MASK = MAIN_PATH / 'data-raw/landseamask_ph1.csv'
+LAND_SEA_MASK_RES = 0.1
+MAX_ADMIN_DIST_DEG = 0.15
+ADMIN_POINT_RADIUS_DEG = 0.08
+
+
+def philippines_centroids():
+    """Forecast grid as built in `Forecast.__init__`"""
+    cent = Centroids()
+    cent.set_raster_from_pnt_bounds(PH_BOUNDS, res=PH_RES)
+    cent.check()
+    cent.set_meta_to_lat_lon()
+    # the whole grid lies within `INLAND_MAX_DIST_KM` of the coast, so it is all treated as
+    # coastal anyway; this spares downloading the coastlines when running offline
+    cent.dist_coast = np.zeros(cent.size)
+    return cent
+
+
+def philippines_land_geometry():
+    """
+    Land of the Philippines as the union of the land cells of the 0.1 degree land-sea mask,
+    a stand-in for the Natural Earth land geometry when running offline
+    """
+    mask = pd.read_csv(LAND_SEA_MASK, header=None, names=['lon', 'lat', 'land'])
+    land = mask[mask['land'] == 1]
+    half = LAND_SEA_MASK_RES / 2
+    return shapely.union_all(shapely.box(land['lon'].values - half, land['lat'].values - half,
+                                         land['lon'].values + half, land['lat'].values + half))
+
+
+def pseudo_admin(coords):
+    """
+    Stand-in for the admin index built from phl_admin3_simpl2.geojson: every centroid
+    close to a municipality center point is assigned to the nearest one.
+
+    :return: admin_index.AdminIndex
+    """
+    grid = pd.read_csv(GRID_POINTS_ADMIN3)
+    dist, idx = cKDTree(grid[['glat', 'glon']].values).query(coords)
+    inside = dist < MAX_ADMIN_DIST_DEG
+    # like the spatial join, keep only municipalities containing at least one centroid
+    codes, pcodes = pd.factorize(grid['gridid'].values[idx[inside]], sort=True)
+    centroid_admin = np.full(coords.shape[0], admin_index.NO_ADMIN, dtype=np.int16)
+    centroid_admin[inside] = codes
+    return admin_index.AdminIndex(centroid_admin, pcodes)
+
+
+def pseudo_admin_polygons(radius=ADMIN_POINT_RADIUS_DEG):
+    """
+    Stand-in for the polygons of phl_admin3_simpl2.geojson: the union of the grid points of
+    every municipality, buffered by `radius` degrees.
+
+    :return: GeoDataFrame with column adm3_pcode
+    """
+    grid = pd.read_csv(GRID_POINTS_ADMIN3)
+    # buffered in degrees, the crs is only set afterwards
+    points = gpd.points_from_xy(grid['glon'], grid['glat']).buffer(radius, resolution=4)
+    admin = gpd.GeoDataFrame({'adm3_pcode': grid['gridid']}, geometry=points)
+    return admin.dissolve(by='adm3_pcode', as_index=False).set_crs('EPSG:4326')
+
+
+def to_df_admin(admin_idx):
+    """Centroid to municipality table as formerly returned by the spatial join"""
+    return pd.DataFrame({'adm3_pcode': admin_idx.pcodes[admin_idx.centroid_admin[admin_idx.order]]},
+                        index=admin_idx.order)
+
+
+def synthetic_ensemble(n_members=N_MEMBERS, seed=0, days=5, clean=True):
+    """
+    Ensemble of tracks crossing the Philippines from the east, with the same variables
+    and attributes as the ECMWF tracks after `track_data_clean` (or before if not clean).
+    """
+    rng = np.random.default_rng(seed)
+    time = pd.date_range('2022-04-10', periods=4 * days + 1, freq='6H')
+    base_lat = np.linspace(9.0, 16.0, time.size)
+    base_lon = np.linspace(131.0, 116.0, time.size)
+    tracks = []
+    for member in range(n_members + 1):
+        is_ensemble = member < n_members
+        noise = 0.3 * np.cumsum(rng.normal(size=(2, time.size)), axis=1) if is_ensemble else 0
+        pres = 1000 - 40 * np.sin(np.linspace(0, np.pi, time.size))
+        track = xr.Dataset(
+            data_vars={
+                'max_sustained_wind': ('time', 1.5 * (1010 - pres)),
+                'environmental_pressure': ('time', np.full(time.size, 1010.)),
+                'central_pressure': ('time', pres),
+                'lat': ('time', base_lat + noise[0] if is_ensemble else base_lat),
+                'lon': ('time', base_lon + noise[1] if is_ensemble else base_lon),
+                'radius_max_wind': ('time', np.full(time.size, np.nan)),
+                'time_step': ('time', np.full(time.size, 6.)),
+            },
+            coords={'time': time},
+            attrs={
+                'max_sustained_wind_unit': 'm/s',
+                'central_pressure_unit': 'mb',
+                'name': 'SYNTH',
+                'sid': 'SYNTH',
+                'orig_event_flag': False,
+                'data_provider': 'synthetic',
+                'id_no': 0,
+                'ensemble_number': member if is_ensemble else 'none',
+                'is_ensemble': str(is_ensemble),
+                'forecast_time': time[0],
+                'basin': 'W - North West Pacific',
+                'category': 1,
+            })
+        tracks.append(track)
+    return track_data_clean.tracks_data_clean(tracks) if clean else tracks
+
+
+def synthetic_event_set(cent, n_events, events_per_year, seed=0):
+    """
+    Hazard of n_events shifted copies of the wind fields of the synthetic ensemble, with a
+    total frequency of events_per_year.
+    """
+    tracks = TCTracks()
+    tracks.data = synthetic_ensemble()
+    ens_haz = TropCyclone()
+    ens_haz.set_from_tracks(tracks, cent)
+    shape = cent.meta['height'], cent.meta['width']
+    rng = np.random.default_rng(seed)
+    rows, cols, data = [], [], []
+    for i_event in range(n_events):
+        footprint = ens_haz.intensity[rng.integers(ens_haz.size)]
+        row, col = np.unravel_index(footprint.indices, shape)
+        row, col = row + rng.integers(-40, 41), col + rng.integers(-40, 41)
+        inside = (row >= 0) & (row < shape[0]) & (col >= 0) & (col < shape[1])
+        rows.append(np.full(inside.sum(), i_event))
+        cols.append(np.ravel_multi_index((row[inside], col[inside]), shape))
+        data.append(footprint.data[inside])
+    haz = TropCyclone()
+    haz.centroids = cent
+    haz.intensity = sparse.csr_matrix(
+        (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(n_events, cent.size))
+    haz.fraction = haz.intensity.copy()
+    haz.fraction.data[:] = 1
+    haz.event_id = np.arange(1, n_events + 1)
+    haz.event_name = [f'SYNTH_{i_event}' for i_event in haz.event_id]
+    haz.date = np.full(n_events, pd.Timestamp('2022-04-10').toordinal())
+    haz.frequency = np.full(n_events, events_per_year / n_events)
+    return haz
+
+
+def synthetic_ibtracs(n_storms, seed=0, n_date_time=360):
+    """
+    Dataset with the structure of the IBTrACS NetCDF file (the variables used by
+    `TCTracks.read_ibtracs_netcdf`), with n_storms random storms from 1980 to 2020 in the
+    basins of IBTrACS, some of them moving to a second basin or crossing the antimeridian.
+    """
+    rng = np.random.default_rng(seed)
+    basins = np.array([b'WP', b'EP', b'NA', b'SI', b'SP', b'NI'])
+    wmo_agencies = np.array([b'tokyo', b'hurdat_epa', b'hurdat_atl', b'reunion', b'nadi',
+                             b'newdelhi'])
+    shape = (n_storms, n_date_time)
+    n_pos = rng.integers(1, 120, n_storms)
+    pos_msk = np.arange(n_date_time)[None] < n_pos[:, None]
+    years = rng.integers(1980, 2021, n_storms)
+    start = (pd.to_datetime(years.astype(str)).values
+             + rng.integers(0, 360 * 24, n_storms).astype('timedelta64[h]'))
+    time = start[:, None] + 3 * np.arange(n_date_time).astype('timedelta64[h]')[None]
+    time[~pos_msk] = np.datetime64('NaT')
+
+    i_basin = rng.integers(0, basins.size, n_storms)
+    second_basin = np.where(rng.random(n_storms) < 0.2, (i_basin + 1) % basins.size, i_basin)
+    i_basin = np.where(np.arange(n_date_time)[None] < n_pos[:, None] // 2,
+                       i_basin[:, None], second_basin[:, None])
+    lat = rng.uniform(-30, 30, n_storms)[:, None] + np.cumsum(rng.normal(0, 0.2, shape), axis=1)
+    lon = rng.uniform(100, 200, n_storms)[:, None] + np.cumsum(rng.normal(-0.2, 0.2, shape),
+                                                                axis=1)
+    lon = (lon + 180) % 360 - 180
+    pres = 1005 - np.abs(np.cumsum(rng.normal(0, 3, shape), axis=1))
+    data_vars = {
+        'sid': ('storm', np.array([f'{year}{idx % 366:03d}N{idx % 90:02d}{idx % 1000:03d}'
+                                   for idx, year in enumerate(years)], dtype='S13')),
+        'name': ('storm', np.array([f'STORM{idx}' for idx in range(n_storms)], dtype='S128')),
+        'basin': (('storm', 'date_time'), np.where(pos_msk, basins[i_basin], b'')),
+        'wmo_agency': (('storm', 'date_time'),
+                       np.where(pos_msk & (rng.random(shape) < 0.9), wmo_agencies[i_basin], b'')),
+    }
+    for agency in tc.IBTRACS_AGENCIES:
+        reported = agency in ['usa', 'tokyo', 'cma', 'hko', 'newdelhi', 'reunion', 'nadi']
+        for tc_var in tc.IBTRACS_VARS if reported else ['wind']:
+            values = {
+                'lat': lat, 'lon': lon, 'pres': pres, 'wind': 2 * (1010 - pres),
+                'rmw': 30 + rng.normal(0, 5, shape), 'roci': 200 + rng.normal(0, 20, shape),
+                'poci': 1008 + rng.normal(0, 2, shape),
+            }[tc_var] + (rng.normal(0, 0.1, shape) if tc_var not in ['lat', 'lon'] else 0)
+            missing = ~pos_msk | (rng.random(shape) < (0.2 if reported else 1.))
+            data_vars[f'{agency}_{tc_var}'] = (('storm', 'date_time'),
+                                               np.where(missing, np.nan, values)
+                                               .astype(np.float32))
+    coords = {
+        'time': (('storm', 'date_time'), time),
+        'lat': (('storm', 'date_time'), np.where(pos_msk, lat, np.nan).astype(np.float32)),
+        'lon': (('storm', 'date_time'), np.where(pos_msk, lon, np.nan).astype(np.float32)),
+    }
+    return xr.Dataset(data_vars, coords, attrs={'date_created': '2021-03-01'})
+
+
+def forecast_tracks(n_members=N_MEMBERS, typhoonname=None, remote_dir=None, local_directory=None):
+    """Tracks of a hindcast if given, otherwise of the synthetic ensemble"""
+    if local_directory:
+        tracks = read_in_hindcast.read_in_hindcast(typhoonname, remote_dir, local_directory)
+        return track_data_clean.tracks_data_clean(tracks)
+    return synthetic_ensemble(n_members=n_members)
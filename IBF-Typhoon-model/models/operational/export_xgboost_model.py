@@ -0,0 +1,53 @@
+"""
+Export the operational R xgboost model to the native JSON format of xgboost, which is read
+by `typhoonmodel.utility_fun.impact_model`.
+
+The R object keeps the booster as raw bytes, serialized by xgb.serialize as a JSON document
+with the training configuration ("Config") and the model ("Model"). Only the model is
+exported, with the feature names of the R training matrix. Run from the
+IBF-Typhoon-model folder:
+
+    python models/operational/export_xgboost_model.py [xgboost_regression_v4.RDS]
+"""
+import gzip
+import json
+import struct
+import sys
+from pathlib import Path
+
+import xgboost as xgb
+
+from typhoonmodel.utility_fun import impact_model
+
+RAWSXP = 24
+"""Type of raw vectors in the R serialization format"""
+
+
+def serialized_booster(rds_file):
+    """Raw vector with the serialized booster in a (gzipped, XDR) RDS file"""
+    data = gzip.open(rds_file).read()
+    start = data.find(b'{"Config":')
+    if start < 8:
+        raise ValueError(f"No serialized xgboost model found in {rds_file}")
+    flags, length = struct.unpack(">ii", data[start - 8:start])
+    if flags & 0xff != RAWSXP:
+        raise ValueError(f"No serialized xgboost model found in {rds_file}")
+    return json.loads(data[start:start + length])
+
+
+def main(rds_file):
+    rds_file = Path(rds_file)
+    model = serialized_booster(rds_file)["Model"]
+    json_file = Path(impact_model.MODEL_FILE)
+    # loaded once by xgboost and saved again, to convert it to the current format
+    booster = xgb.Booster(model_file=bytearray(json.dumps(model).encode()))
+    if booster.num_features() != len(impact_model.FEATURES):
+        raise ValueError(f"The model has {booster.num_features()} features, "
+                         f"expected {len(impact_model.FEATURES)}")
+    booster.feature_names = impact_model.FEATURES
+    booster.save_model(json_file)
+    print(f"{rds_file} -> {json_file}, {booster.num_boosted_rounds()} trees")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "models/operational/xgboost_regression_v4.RDS")
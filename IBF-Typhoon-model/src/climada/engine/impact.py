@@ -24,7 +24,6 @@ __all__ = ['ImpactFreqCurve', 'Impact']
 import logging
 import copy
 import csv
-import warnings
 import datetime as dt
 from itertools import zip_longest
 import numpy as np
@@ -44,6 +43,7 @@ from climada import CONFIG
 from climada.util.constants import DEF_CRS, CMAP_IMPACT
 import climada.util.coordinates as u_coord
 import climada.util.dates_times as u_dt
+import climada.util.exceedance as u_exc
 from climada.util.select import get_attributes_with_matching_dimension
 
 LOGGER = logging.getLogger(__name__)
@@ -212,9 +212,8 @@ class Impact():
         and exposures.gdf.cover.max():
             insure_flag = True
 
-        if save_mat:
-            # (data, (row_ind, col_ind))
-            self.imp_mat = ([], ([], []))
+        # impact matrices of the chunks of exposures, and their exposures indexes
+        imp_mat_chk, exp_chk = [sparse.csr_matrix((num_events, 0))], [np.zeros(0, int)]
 
         # 3. Loop over exposures according to their impact function
         tot_exp = 0
@@ -227,21 +226,22 @@ class Impact():
                 raise ValueError('Increase max_matrix_size configuration parameter to > %s'
                                  % str(num_events))
             # separte in chunks
-            chk = -1
-            for chk in range(int(exp_iimp.size / exp_step)):
-                self._exp_impact(
-                    exp_idx[exp_iimp[chk * exp_step:(chk + 1) * exp_step]],
-                    exposures, hazard, imp_fun, insure_flag)
-            self._exp_impact(exp_idx[exp_iimp[(chk + 1) * exp_step:]],
-                             exposures, hazard, imp_fun, insure_flag)
+            for chk in range(0, exp_iimp.size, exp_step):
+                exp_chk.append(exp_idx[exp_iimp[chk:chk + exp_step]])
+                imp_mat_chk.append(self._exp_impact(exp_chk[-1], exposures, hazard, imp_fun,
+                                                    insure_flag, save_mat))
 
         if not tot_exp:
             LOGGER.warning('No impact functions match the exposures.')
         self.aai_agg = sum(self.at_event * hazard.frequency)
 
         if save_mat:
-            shape = (self.date.size, exposures.gdf.value.size)
-            self.imp_mat = sparse.csr_matrix(self.imp_mat, shape=shape)
+            # move the columns of the chunks to their exposures
+            exp_chk = np.concatenate(exp_chk)
+            exp_sel = sparse.csr_matrix(
+                (np.ones(exp_chk.size), (np.arange(exp_chk.size), exp_chk)),
+                shape=(exp_chk.size, exposures.gdf.value.size))
+            self.imp_mat = sparse.csr_matrix(sparse.hstack(imp_mat_chk, format='csr') @ exp_sel)
 
     def calc_risk_transfer(self, attachment, cover):
         """Compute traaditional risk transfer over impact. Returns new impact
@@ -647,13 +647,15 @@ class Impact():
             year_set[year] = sum(self.at_event[orig_year == year])
         return year_set
 
-    def local_exceedance_imp(self, return_periods=(25, 50, 100, 250)):
+    def local_exceedance_imp(self, return_periods=(25, 50, 100, 250), pool=None):
         """Compute exceedance impact map for given return periods.
         Requires attribute imp_mat.
 
         Parameters
         ----------
         return_periods : np.array return periods to consider
+        pool : pathos.pools, optional
+            Pool to process chunks of exposure points in parallel. Default: None
 
         Returns
         -------
@@ -666,22 +668,8 @@ class Impact():
         except AttributeError as err:
             raise ValueError('attribute imp_mat is empty. Recalculate Impact'
                              'instance with parameter save_mat=True') from err
-        num_cen = self.imp_mat.shape[1]
-        imp_stats = np.zeros((len(return_periods), num_cen))
-        cen_step = CONFIG.max_matrix_size.int() // self.imp_mat.shape[0]
-        if not cen_step:
-            raise ValueError('Increase max_matrix_size configuration parameter to > %s'
-                             % str(self.imp_mat.shape[0]))
-        # separte in chunks
-        chk = -1
-        for chk in range(int(num_cen / cen_step)):
-            self._loc_return_imp(np.array(return_periods),
-                                 self.imp_mat[:, chk * cen_step:(chk + 1) * cen_step].toarray(),
-                                 imp_stats[:, chk * cen_step:(chk + 1) * cen_step])
-        self._loc_return_imp(np.array(return_periods),
-                             self.imp_mat[:, (chk + 1) * cen_step:].toarray(),
-                             imp_stats[:, (chk + 1) * cen_step:])
-
+        imp_stats = u_exc.local_exceedance_values(self.imp_mat, self.frequency,
+                                                  np.array(return_periods), 0, pool)
         return imp_stats
 
     def plot_rp_imp(self, return_periods=(25, 50, 100, 250),
@@ -940,36 +928,13 @@ class Impact():
 
         return imp_list
 
-    def _loc_return_imp(self, return_periods, imp, exc_imp):
-        """Compute local exceedence impact for given return period.
-
-        Parameters
-        ----------
-        return_periods : np.array return periods to consider
-        cen_pos (int): centroid position
-
-        Returns
-        -------
-        np.array
-        """
-        # sorted impacts
-        sort_pos = np.argsort(imp, axis=0)[::-1, :]
-        columns = np.ones(imp.shape, int)
-        # pylint: disable=unsubscriptable-object  # pylint/issues/3139
-        columns *= np.arange(columns.shape[1])
-        imp_sort = imp[sort_pos, columns]
-        # cummulative frequency at sorted intensity
-        freq_sort = self.frequency[sort_pos]
-        np.cumsum(freq_sort, axis=0, out=freq_sort)
-
-        for cen_idx in range(imp.shape[1]):
-            exc_imp[:, cen_idx] = self._cen_return_imp(
-                imp_sort[:, cen_idx], freq_sort[:, cen_idx],
-                0, return_periods)
-
-    def _exp_impact(self, exp_iimp, exposures, hazard, imp_fun, insure_flag):
+    def _exp_impact(self, exp_iimp, exposures, hazard, imp_fun, insure_flag, save_mat=False):
         """Compute impact for inpute exposure indexes and impact function.
 
+        The mean damage ratio is computed once at each centroid the exposures are assigned
+        to. The impact is obtained by multiplying the resulting (events x centroids) matrix
+        with a sparse selector of the exposures' centroids, weighted by the exposures' values.
+
         Parameters
         ----------
         exp_iimp : np.array exposures indexes
@@ -979,40 +944,52 @@ class Impact():
             impact function instance
         insure_flag : bool
             consider deductible and cover of exposures
+        save_mat : bool, optional
+            return the impact matrix of the exposures. Default: False
+
+        Returns
+        -------
+        impact : sparse.csr_matrix or None
+            impact matrix events x exposures of exp_iimp, if save_mat
         """
         if not exp_iimp.size:
-            return
+            return None
 
-        # get assigned centroids
+        # get assigned centroids, each one is computed once
         icens = exposures.gdf[INDICATOR_CENTR + hazard.tag.haz_type].values[exp_iimp]
+        cen_uni, cen_inv = np.unique(icens, return_inverse=True)
+        exp_val = exposures.gdf.value.values[exp_iimp]
 
         # get affected intensities
-        inten_val = hazard.intensity[:, icens]
+        inten_val = hazard.intensity[:, cen_uni]
         # get affected fractions
-        fract = hazard.fraction[:, icens]
-        # impact = fraction * mdr * value
+        fract = hazard.fraction[:, cen_uni]
+        # fraction * mdr at each centroid
         inten_val.data = imp_fun.calc_mdr(inten_val.data)
-        impact = fract.multiply(inten_val).multiply(exposures.gdf.value.values[exp_iimp])
-
-        if insure_flag and impact.nonzero()[0].size:
-            inten_val = hazard.intensity[:, icens].toarray()
-            paa = np.interp(inten_val, imp_fun.intensity, imp_fun.paa)
-            impact = impact.toarray()
+        mdr_frac = sparse.csr_matrix(fract.multiply(inten_val))
+        # impact = fraction * mdr * value, as product with the exposures selector
+        exp_sel = sparse.csr_matrix((exp_val, (cen_inv, np.arange(exp_iimp.size))),
+                                    shape=(cen_uni.size, exp_iimp.size))
+
+        impact = None
+        if insure_flag and mdr_frac.count_nonzero():
+            inten_val = hazard.intensity[:, cen_uni].toarray()
+            paa = np.interp(inten_val, imp_fun.intensity, imp_fun.paa)[:, cen_inv]
+            impact = (mdr_frac @ exp_sel).toarray()
             impact -= exposures.gdf.deductible.values[exp_iimp] * paa
             impact = np.clip(impact, 0, exposures.gdf.cover.values[exp_iimp])
             self.eai_exp[exp_iimp] += np.einsum('ji,j->i', impact, hazard.frequency)
-            impact = sparse.coo_matrix(impact)
+            self.at_event += impact.sum(axis=1)
+            impact = sparse.csr_matrix(impact) if save_mat else None
         else:
-            self.eai_exp[exp_iimp] += np.squeeze(np.asarray(np.sum(
-                impact.multiply(hazard.frequency.reshape(-1, 1)), axis=0)))
+            # the impacts at the centroids, without the exposures matrix
+            self.eai_exp[exp_iimp] += mdr_frac.T.dot(hazard.frequency)[cen_inv] * exp_val
+            self.at_event += mdr_frac.dot(np.bincount(cen_inv, exp_val, cen_uni.size))
+            if save_mat:
+                impact = mdr_frac @ exp_sel
 
-        self.at_event += np.squeeze(np.asarray(np.sum(impact, axis=1)))
-        self.tot_value += np.sum(exposures.gdf.value.values[exp_iimp])
-        if isinstance(self.imp_mat, tuple):
-            row_ind, col_ind = impact.nonzero()
-            self.imp_mat[0].extend(list(impact.data))
-            self.imp_mat[1][0].extend(list(row_ind))
-            self.imp_mat[1][1].extend(list(exp_iimp[col_ind]))
+        self.tot_value += np.sum(exp_val)
+        return impact
 
     def _build_exp(self):
         return Exposures(
@@ -1050,44 +1027,6 @@ class Impact():
             meta=None
         )
 
-    @staticmethod
-    def _cen_return_imp(imp, freq, imp_th, return_periods):
-        """From ordered impact and cummulative frequency at centroid, get
-        exceedance impact at input return periods.
-
-        Parameters
-        ----------
-        imp : np.array
-            sorted impact at centroid
-        freq : np.array
-            cummulative frequency at centroid
-        imp_th : float
-            impact threshold
-        return_periods : np.array
-            return periods
-
-        Returns
-        -------
-        np.array
-        """
-        imp_th = np.asarray(imp > imp_th).squeeze()
-        imp_cen = imp[imp_th]
-        freq_cen = freq[imp_th]
-        if not imp_cen.size:
-            return np.zeros((return_periods.size,))
-        try:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                pol_coef = np.polyfit(np.log(freq_cen), imp_cen, deg=1)
-        except ValueError:
-            pol_coef = np.polyfit(np.log(freq_cen), imp_cen, deg=0)
-        imp_fit = np.polyval(pol_coef, np.log(1 / return_periods))
-        wrong_inten = (return_periods > np.max(1 / freq_cen)) & np.isnan(imp_fit)
-        imp_fit[wrong_inten] = 0.
-
-        return imp_fit
-
-
     def select(self,
                event_ids=None, event_names=None, dates=None,
                coord_exp=None):
@@ -26,7 +26,8 @@ from climada import CONFIG
 from climada.entity.tag import Tag
 from climada.hazard.tag import Tag as TagHaz
 from climada.entity.entity_def import Entity
-from climada.hazard.base import Hazard
+from climada.entity.impact_funcs import ImpactFunc, ImpactFuncSet
+from climada.hazard.base import Hazard, Centroids
 from climada.engine.impact import Impact
 from climada.util.constants import ENT_DEMO_TODAY, DEF_CRS
 from climada.entity import Exposures
@@ -278,6 +279,59 @@ class TestCalc(unittest.TestCase):
         self.assertAlmostEqual(6.512201157564421e+09, impact.aai_agg, 5)
         self.assertAlmostEqual(6.512201157564421e+09, impact.aai_agg, 5)
 
+    def test_calc_shared_centroids_pass(self):
+        """Compare with the dense impact of exposures sharing centroids, in chunks"""
+        rng = np.random.default_rng(12)
+        num_ev, num_cen, num_exp = 20, 15, 60
+        hazard = Hazard('TC')
+        hazard.centroids = Centroids()
+        hazard.centroids.set_lat_lon(np.linspace(10, 11, num_cen), np.linspace(120, 121, num_cen))
+        intensity = rng.uniform(0, 80, (num_ev, num_cen))
+        intensity[rng.random(intensity.shape) < 0.6] = 0
+        fraction = np.where(intensity > 0, rng.uniform(0.5, 1, intensity.shape), 0)
+        hazard.intensity = sparse.csr_matrix(intensity)
+        hazard.fraction = sparse.csr_matrix(fraction)
+        hazard.event_id = np.arange(1, num_ev + 1)
+        hazard.event_name = [str(ev_id) for ev_id in hazard.event_id]
+        hazard.date = np.ones(num_ev)
+        hazard.frequency = rng.uniform(0.01, 0.1, num_ev)
+        impact_funcs = ImpactFuncSet()
+        for impf_id in [1, 2]:
+            impf = ImpactFunc()
+            impf.haz_type = 'TC'
+            impf.id = impf_id
+            impf.intensity = np.linspace(0, 100, 11)
+            impf.mdd = np.linspace(0, 1, 11) ** impf_id
+            impf.paa = np.ones(11)
+            impact_funcs.append(impf)
+        exp = Exposures({'latitude': np.zeros(num_exp), 'longitude': np.zeros(num_exp),
+                         'value': rng.uniform(0, 1e3, num_exp),
+                         'impf_TC': rng.integers(1, 4, num_exp),
+                         'centr_TC': rng.integers(-1, num_cen, num_exp)})
+        # former computation, exposure by exposure
+        imp_mat = np.zeros((num_ev, num_exp))
+        for idx, (impf_id, centr, value) in enumerate(zip(exp.gdf.impf_TC, exp.gdf.centr_TC,
+                                                          exp.gdf.value)):
+            if impf_id < 3 and centr >= 0:
+                imp_mat[:, idx] = fraction[:, centr] * value * impact_funcs.get_func(
+                    'TC', impf_id).calc_mdr(intensity[:, centr])
+
+        max_matrix_size = CONFIG.max_matrix_size._val
+        try:
+            for matrix_size in [max_matrix_size, num_ev * 7]:
+                CONFIG.max_matrix_size._val = matrix_size
+                impact = Impact()
+                impact.calc(exp, impact_funcs, hazard, save_mat=True)
+                self.assertIsInstance(impact.imp_mat, sparse.csr_matrix)
+                np.testing.assert_allclose(impact.imp_mat.toarray(), imp_mat)
+                np.testing.assert_allclose(impact.at_event, imp_mat.sum(axis=1))
+                np.testing.assert_allclose(impact.eai_exp, hazard.frequency @ imp_mat)
+                self.assertAlmostEqual(impact.tot_value,
+                                       exp.gdf.value[(exp.gdf.impf_TC < 3)
+                                                     & (exp.gdf.centr_TC >= 0)].sum())
+        finally:
+            CONFIG.max_matrix_size._val = max_matrix_size
+
 class TestImpactYearSet(unittest.TestCase):
     """Test calc_impact_year_set method"""
 
@@ -38,6 +38,7 @@ from climada.entity.tag import Tag
 import climada.util.hdf5_handler as u_hdf5
 from climada.util.constants import ONE_LAT_KM, DEF_CRS, CMAP_RASTER
 import climada.util.coordinates as u_coord
+import climada.util.interpolation as u_interp
 import climada.util.plot as u_plot
 from climada import CONFIG
 
@@ -103,8 +104,11 @@ class Exposures():
         centr_ (pd.Series, optional): e.g. centr_TC. centroids index for hazard
             TC. There might be different hazards defined: centr_TC, centr_FL, ...
             Computed in method assign_centroids().
+        centr_hash (dict): metada - for each hazard type of the centr_ columns, hash of the
+            coordinates and centroids they were assigned with. Set by assign_centroids(), which
+            skips the assignment if it would be the same.
     """
-    _metadata = ['tag', 'ref_year', 'value_unit', 'meta']
+    _metadata = ['tag', 'ref_year', 'value_unit', 'meta', 'centr_hash']
 
     vars_oblig = ['value', 'latitude', 'longitude']
     """Name of the variables needed to compute the impact."""
@@ -128,7 +132,7 @@ class Exposures():
         return self.meta.get('crs')
 
     def __init__(self, *args, meta=None, tag=None, ref_year=DEF_REF_YEAR,
-                 value_unit=DEF_VALUE_UNIT, crs=None, **kwargs):
+                 value_unit=DEF_VALUE_UNIT, crs=None, centr_hash=None, **kwargs):
         """Creates an Exposures object from a GeoDataFrame
 
         Parameters
@@ -148,6 +152,9 @@ class Exposures():
         crs : object, anything accepted by pyproj.CRS.from_user_input
             Coordinate reference system. Defaults to the entry of the same name in `meta`, or to
             the CRS of the GeoDataFrame (if provided) or to 'epsg:4326'.
+        centr_hash : dict, optional
+            Hash of the assigned centroids per hazard type, see `assign_centroids`.
+            Default: {} (empty dictionary)
         """
         # meta data
         self.meta = {} if meta is None else meta
@@ -157,6 +164,7 @@ class Exposures():
         self.ref_year = self.meta.get('ref_year', DEF_REF_YEAR) if ref_year is None else ref_year
         self.value_unit = (self.meta.get('value_unit', DEF_VALUE_UNIT)
                            if value_unit is None else value_unit)
+        self.centr_hash = {} if centr_hash is None else centr_hash
 
         # remaining generic attributes from derived classes
         for mda in type(self)._metadata:
@@ -369,11 +377,31 @@ class Exposures():
         threshold : float
             If the distance to the nearest neighbor exceeds `threshold`, the index `-1` is
             assigned. Set `threshold` to 0, to disable nearest neighbor matching. Default: 100 (km)
+
+        Notes
+        -----
+        The assignment is skipped if the exposures have already been assigned to the same
+        centroids with the same parameters, see attribute `centr_hash`. In case of vector
+        centroids, the nearest neighbor index of the centroids is cached and reused for other
+        exposures, see `Centroids.get_nn_index`.
         """
-        LOGGER.info('Matching %s exposures with %s centroids.',
-                    str(self.gdf.shape[0]), str(hazard.centroids.size))
         if not u_coord.equal_crs(self.crs, hazard.centroids.crs):
             raise ValueError('Set hazard and exposure to same CRS first!')
+        centr_col = INDICATOR_CENTR + hazard.tag.haz_type
+        if hazard.centroids.meta:
+            centr_key = [hazard.centroids.meta['width'], hazard.centroids.meta['height'],
+                         list(hazard.centroids.meta['transform'])]
+        else:
+            centr_key = [hazard.centroids.lat, hazard.centroids.lon, threshold]
+        centr_key = (f'{method}_{distance}_'
+                     + u_interp.coords_hash(self.gdf.latitude.values, self.gdf.longitude.values,
+                                            *centr_key))
+        if centr_col in self.gdf and self.centr_hash.get(hazard.tag.haz_type) == centr_key:
+            LOGGER.info('Exposures already matched with these %s centroids.',
+                        str(hazard.centroids.size))
+            return
+        LOGGER.info('Matching %s exposures with %s centroids.',
+                    str(self.gdf.shape[0]), str(hazard.centroids.size))
         if hazard.centroids.meta:
             assigned = u_coord.assign_grid_points(
                 self.gdf.longitude.values, self.gdf.latitude.values,
@@ -382,8 +410,11 @@ class Exposures():
         else:
             assigned = u_coord.assign_coordinates(
                 np.stack([self.gdf.latitude.values, self.gdf.longitude.values], axis=1),
-                hazard.centroids.coord, method=method, distance=distance, threshold=threshold)
-        self.gdf[INDICATOR_CENTR + hazard.tag.haz_type] = assigned
+                hazard.centroids.coord, method=method, distance=distance, threshold=threshold,
+                nn_index=(hazard.centroids.get_nn_index(distance)
+                          if method == 'NN' and distance in u_interp.DIST_DEF else None))
+        self.gdf[centr_col] = assigned
+        self.centr_hash[hazard.tag.haz_type] = centr_key
 
     def set_geometry_points(self, scheduler=None):
         """Set geometry attribute of GeoDataFrame with Points from latitude and
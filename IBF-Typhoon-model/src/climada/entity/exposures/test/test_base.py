@@ -81,6 +81,31 @@ class TestFuncs(unittest.TestCase):
             self.assertEqual(exp.gdf.shape[0], len(exp.gdf[INDICATOR_CENTR + 'FL']))
             np.testing.assert_array_equal(exp.gdf[INDICATOR_CENTR + 'FL'].values, expected_result)
 
+    def test_assign_same_centroids_pass(self):
+        """Test that the assignment is skipped for the same centroids"""
+        haz = Hazard('FL')
+        haz.centroids = Centroids()
+        haz.centroids.set_lat_lon(np.array([1, 2, 3]), np.array([2, 3, 4]))
+        exp = good_exposures()
+        exp.gdf[INDICATOR_CENTR + 'FL'] = -1
+        exp.assign_centroids(haz)
+        np.testing.assert_array_equal(exp.gdf[INDICATOR_CENTR + 'FL'].values, [0, 1, 2])
+        self.assertIn('FL', exp.centr_hash)
+
+        # the stored hash matches, the column is not recomputed
+        exp.gdf[INDICATOR_CENTR + 'FL'] = 5
+        exp.copy().assign_centroids(haz)
+        exp.assign_centroids(haz)
+        np.testing.assert_array_equal(exp.gdf[INDICATOR_CENTR + 'FL'].values, [5, 5, 5])
+
+        # other parameters or coordinates, the column is recomputed
+        exp.assign_centroids(haz, threshold=50)
+        np.testing.assert_array_equal(exp.gdf[INDICATOR_CENTR + 'FL'].values, [0, 1, 2])
+        exp.gdf[INDICATOR_CENTR + 'FL'] = 5
+        exp.gdf['latitude'] = np.array([3, 2, 1])
+        exp.assign_centroids(haz, threshold=50)
+        np.testing.assert_array_equal(exp.gdf[INDICATOR_CENTR + 'FL'].values, [-1, 1, -1])
+
     def test_read_raster_pass(self):
         """set_from_raster"""
         exp = Exposures()
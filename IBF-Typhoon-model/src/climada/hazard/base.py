@@ -26,7 +26,6 @@ import datetime as dt
 import itertools
 import logging
 import pathlib
-import warnings
 
 import geopandas as gpd
 import h5py
@@ -44,7 +43,7 @@ from climada.hazard.centroids.centr import Centroids
 import climada.util.plot as u_plot
 import climada.util.checker as u_check
 import climada.util.dates_times as u_dt
-from climada import CONFIG
+import climada.util.exceedance as u_exc
 import climada.util.hdf5_handler as u_hdf5
 import climada.util.coordinates as u_coord
 
@@ -90,6 +89,15 @@ DEF_VAR_MAT = {'field_name': 'hazard',
               }
 """MATLAB variable names"""
 
+HDF5_CHUNK_SIZE = 2**16
+"""Number of values per chunk of the sparse matrices in hdf5 files"""
+
+HDF5_CHUNK_EVENTS = 1024
+"""Number of events per chunk of the event attributes in hdf5 files"""
+
+HDF5_COMPRESSION = {'compression': 'lzf', 'shuffle': True}
+"""Compression filters of the sparse matrices in hdf5 files"""
+
 class Hazard():
     """
     Contains events of some hazard type defined at centroids. Loads from
@@ -613,46 +621,18 @@ class Hazard():
             haz = Hazard(self.tag.haz_type)
         else:
             haz = self.__class__()
-        sel_ev = np.ones(self.event_id.size, dtype=bool)
-        sel_cen = np.ones(self.centroids.size, dtype=bool)
-
-        # filter events by date
-        if date is not None:
-            date_ini, date_end = date
-            if isinstance(date_ini, str):
-                date_ini = u_dt.str_to_date(date[0])
-                date_end = u_dt.str_to_date(date[1])
-            sel_ev &= (date_ini <= self.date) & (self.date <= date_end)
-            if not np.any(sel_ev):
-                LOGGER.info('No hazard in date range %s.', date)
-                return None
-
-        # filter events hist/synthetic
-        if isinstance(orig, bool):
-            sel_ev &= (self.orig.astype(bool) == orig)
-            if not np.any(sel_ev):
-                LOGGER.info('No hazard with %s tracks.', str(orig))
-                return None
+        sel_ev = self._select_events(event_names, date, orig)
+        if sel_ev is None:
+            return None
 
         # filter centroids
+        sel_cen = np.ones(self.centroids.size, dtype=bool)
         if reg_id is not None:
             sel_cen &= (self.centroids.region_id == reg_id)
             if not np.any(sel_cen):
                 LOGGER.info('No hazard centroids with region %s.', str(reg_id))
                 return None
 
-        # filter events based on name
-        sel_ev = np.argwhere(sel_ev).reshape(-1)
-        if isinstance(event_names, list):
-            filtered_events = [self.event_name[i] for i in sel_ev]
-            try:
-                new_sel = [filtered_events.index(n) for n in event_names]
-            except ValueError as err:
-                name = str(err).replace(" is not in list", "")
-                LOGGER.info('No hazard with name %s', name)
-                return None
-            sel_ev = sel_ev[new_sel]
-
         sel_cen = sel_cen.nonzero()[0]
         for (var_name, var_val) in self.__dict__.items():
             if isinstance(var_val, np.ndarray) and var_val.ndim == 1 \
@@ -681,9 +661,63 @@ class Hazard():
         haz.sanitize_event_ids()
         return haz
 
+    def _select_events(self, event_names=None, date=None, orig=None):
+        """Indexes of the events matching the criteria of `select`
+
+        Parameters
+        ----------
+        event_names : list of str, optional
+            Names of events.
+        date : array-like of length 2 containing str or int, optional
+            (initial date, final date) in string ISO format ('2011-01-02') or datetime
+            ordinal integer.
+        orig : bool, optional
+            Select only historical (True) or only synthetic (False) events.
+
+        Returns
+        -------
+        sel_ev : np.array or None
+            Indexes of the events, in the order of `event_names` if given. None if no event
+            matches the criteria.
+        """
+        sel_ev = np.ones(self.event_id.size, dtype=bool)
+
+        # filter events by date
+        if date is not None:
+            date_ini, date_end = date
+            if isinstance(date_ini, str):
+                date_ini = u_dt.str_to_date(date[0])
+                date_end = u_dt.str_to_date(date[1])
+            sel_ev &= (date_ini <= self.date) & (self.date <= date_end)
+            if not np.any(sel_ev):
+                LOGGER.info('No hazard in date range %s.', date)
+                return None
+
+        # filter events hist/synthetic
+        if isinstance(orig, bool):
+            sel_ev &= (self.orig.astype(bool) == orig)
+            if not np.any(sel_ev):
+                LOGGER.info('No hazard with %s tracks.', str(orig))
+                return None
+
+        # filter events based on name
+        sel_ev = np.argwhere(sel_ev).reshape(-1)
+        if isinstance(event_names, list):
+            filtered_events = [self.event_name[i] for i in sel_ev]
+            try:
+                new_sel = [filtered_events.index(n) for n in event_names]
+            except ValueError as err:
+                name = str(err).replace(" is not in list", "")
+                LOGGER.info('No hazard with name %s', name)
+                return None
+            sel_ev = sel_ev[new_sel]
+        return sel_ev
+
     def local_exceedance_inten(self, return_periods=(25, 50, 100, 250)):
         """Compute exceedance intensity map for given return periods.
 
+        Chunks of centroids are processed in parallel if the hazard has a pool.
+
         Parameters
         ----------
         return_periods : np.array
@@ -699,23 +733,9 @@ class Hazard():
                 LOGGER.warning('Return period %1.1f exceeds max. event return period.', period)
         LOGGER.info('Computing exceedance intenstiy map for return periods: %s',
                     return_periods)
-        num_cen = self.intensity.shape[1]
-        inten_stats = np.zeros((len(return_periods), num_cen))
-        cen_step = CONFIG.max_matrix_size.int() // self.intensity.shape[0]
-        if not cen_step:
-            raise ValueError('Increase max_matrix_size configuration parameter to > %s'
-                             % str(self.intensity.shape[0]))
-        # separte in chunks
-        chk = -1
-        for chk in range(int(num_cen / cen_step)):
-            self._loc_return_inten(
-                np.array(return_periods),
-                self.intensity[:, chk * cen_step:(chk + 1) * cen_step].toarray(),
-                inten_stats[:, chk * cen_step:(chk + 1) * cen_step])
-        self._loc_return_inten(
-            np.array(return_periods),
-            self.intensity[:, (chk + 1) * cen_step:].toarray(),
-            inten_stats[:, (chk + 1) * cen_step:])
+        inten_stats = u_exc.local_exceedance_values(self.intensity, self.frequency,
+                                                    np.array(return_periods),
+                                                    self.intensity_thres, self.pool)
         # set values below 0 to zero if minimum of hazard.intensity >= 0:
         if self.intensity.min() >= 0 and np.min(inten_stats) < 0:
             LOGGER.warning('Exceedance intenstiy values below 0 are set to 0. \
@@ -1020,10 +1040,16 @@ class Hazard():
     def write_hdf5(self, file_name, todense=False):
         """Write hazard in hdf5 format.
 
+        The sparse matrices are written in compressed chunks, so that the rows of some events
+        can be read without reading the others (see `read_hdf5`). The event attributes and the
+        sparse matrices can be extended with the events of other hazards (see `append_hdf5`).
+
         Parameters
         ----------
         file_name: str
             file name to write, with h5 format
+        todense: bool, optional
+            write the intensity and fraction as dense matrices instead. Default: False
         """
         LOGGER.info('Writing %s', file_name)
         hf_data = h5py.File(file_name, 'w')
@@ -1043,28 +1069,49 @@ class Hazard():
                     hf_data.create_dataset(var_name, data=var_val.toarray())
                 else:
                     hf_csr = hf_data.create_group(var_name)
-                    hf_csr.create_dataset('data', data=var_val.data)
-                    hf_csr.create_dataset('indices', data=var_val.indices)
-                    hf_csr.create_dataset('indptr', data=var_val.indptr)
+                    # the rows of an event are contiguous, indptr indexes the events
+                    for csr_name in ['data', 'indices', 'indptr']:
+                        hf_csr.create_dataset(csr_name, data=getattr(var_val, csr_name),
+                                              maxshape=(None,), chunks=(HDF5_CHUNK_SIZE,),
+                                              **HDF5_COMPRESSION)
                     hf_csr.attrs['shape'] = var_val.shape
             elif isinstance(var_val, str):
                 hf_str = hf_data.create_dataset(var_name, (1,), dtype=str_dt)
                 hf_str[0] = var_val
             elif isinstance(var_val, list) and var_val and isinstance(var_val[0], str):
-                hf_str = hf_data.create_dataset(var_name, (len(var_val),), dtype=str_dt)
-                for i_ev, var_ev in enumerate(var_val):
-                    hf_str[i_ev] = var_ev
+                hf_data.create_dataset(var_name, data=var_val, dtype=str_dt, maxshape=(None,),
+                                       chunks=(HDF5_CHUNK_EVENTS,))
+            elif isinstance(var_val, np.ndarray) and var_val.ndim == 1:
+                hf_data.create_dataset(var_name, data=var_val, maxshape=(None,),
+                                       chunks=(HDF5_CHUNK_EVENTS,))
             elif var_val is not None and var_name != 'pool':
                 hf_data.create_dataset(var_name, data=var_val)
         hf_data.close()
 
-    def read_hdf5(self, file_name):
+    def read_hdf5(self, file_name, event_names=None, date=None, orig=None):
         """Read hazard in hdf5 format.
 
+        The events can be selected with the criteria of `select`. The event attributes are
+        read first, and only the rows of the selected events are read from the intensity and
+        fraction matrices.
+
         Parameters
         ----------
         file_name: str
             file name to read, with h5 format
+        event_names : list of str, optional
+            Names of the events to read.
+        date : array-like of length 2 containing str or int, optional
+            (initial date, final date) of the events to read, in string ISO format
+            ('2011-01-02') or datetime ordinal integer.
+        orig : bool, optional
+            Read only historical (True) or only synthetic (False) events.
+
+        Returns
+        -------
+        Hazard or None
+            This hazard, or None if no event matches the selection, as with `select`. The
+            hazard then has no events.
         """
         LOGGER.info('Reading %s', file_name)
         self.clear()
@@ -1079,14 +1126,7 @@ class Hazard():
             elif isinstance(var_val, np.ndarray) and var_val.ndim == 1:
                 setattr(self, var_name, np.array(hf_data.get(var_name)))
             elif isinstance(var_val, sparse.csr_matrix):
-                hf_csr = hf_data.get(var_name)
-                if isinstance(hf_csr, h5py.Dataset):
-                    setattr(self, var_name, sparse.csr_matrix(hf_csr))
-                else:
-                    setattr(self, var_name, sparse.csr_matrix((hf_csr['data'][:],
-                                                               hf_csr['indices'][:],
-                                                               hf_csr['indptr'][:]),
-                                                              hf_csr.attrs['shape']))
+                continue
             elif isinstance(var_val, str):
                 setattr(self, var_name, u_hdf5.to_string(hf_data.get(var_name)[0]))
             elif isinstance(var_val, list):
@@ -1095,7 +1135,89 @@ class Hazard():
             else:
                 setattr(self, var_name, hf_data.get(var_name))
 
+        sel_ev = None
+        no_match = False
+        if event_names is not None or date is not None or orig is not None:
+            sel_ev = self._select_events(event_names, date, orig)
+            if sel_ev is None:
+                no_match = True
+                sel_ev = np.array([], int)
+            for (var_name, var_val) in self.__dict__.items():
+                if isinstance(var_val, np.ndarray) and var_val.ndim == 1 and var_val.size > 0:
+                    setattr(self, var_name, var_val[sel_ev])
+                elif isinstance(var_val, list) and var_val:
+                    setattr(self, var_name, [var_val[idx] for idx in sel_ev])
+        for (var_name, var_val) in self.__dict__.items():
+            if isinstance(var_val, sparse.csr_matrix):
+                setattr(self, var_name, _read_csr_rows(hf_data.get(var_name), sel_ev))
+
         hf_data.close()
+        return None if no_match else self
+
+    def append_hdf5(self, file_name):
+        """Append the events of this hazard to a file written by `write_hdf5`, in place.
+
+        The hazard must have the type and centroids of the hazard in the file. Only the new
+        rows of the sparse matrices are written. If some event ids are already in the file,
+        the appended events are numbered after the largest one.
+
+        Parameters
+        ----------
+        file_name: str
+            file name to append to, with h5 format
+
+        Raises
+        ------
+        ValueError
+        """
+        LOGGER.info('Appending %s events to %s', self.size, file_name)
+        self._check_events()
+        with h5py.File(file_name, 'a') as hf_data:
+            centroids = Centroids()
+            centroids.read_hdf5(hf_data.get('centroids'))
+            if (u_hdf5.to_string(hf_data.get('haz_type')[0]) != self.tag.haz_type
+                    or not centroids.equal(self.centroids)):
+                raise ValueError(f'The hazard type or centroids differ from the ones in '
+                                 f'{file_name}.')
+            file_event_id = hf_data.get('event_id')[:]
+            num_ev = file_event_id.size
+            event_id = self.event_id
+            if np.isin(event_id, file_event_id).any():
+                LOGGER.info('Renumbering the events appended to %s.', file_name)
+                event_id = file_event_id.max(initial=0) + np.arange(1, self.size + 1)
+
+            # check all the datasets before extending any of them
+            extend = []
+            for (var_name, var_val) in self.__dict__.items():
+                if var_name == 'event_id':
+                    var_val = event_id
+                if isinstance(var_val, sparse.csr_matrix):
+                    hf_csr = hf_data.get(var_name)
+                    if not isinstance(hf_csr, h5py.Group) \
+                            or hf_csr['data'].maxshape != (None,):
+                        raise ValueError(f'{var_name} cannot be appended to {file_name}, write '
+                                         'the file again with write_hdf5.')
+                    extend += [(hf_csr['data'], var_val.data),
+                               (hf_csr['indices'], var_val.indices),
+                               (hf_csr['indptr'], var_val.indptr[1:] + hf_csr['indptr'][-1])]
+                elif (isinstance(var_val, np.ndarray) and var_val.ndim == 1) \
+                        or isinstance(var_val, list):
+                    hf_var = hf_data.get(var_name)
+                    if not len(var_val) and (hf_var is None or not hf_var.size):
+                        continue
+                    if hf_var is None or hf_var.maxshape != (None,) \
+                            or hf_var.shape[0] != num_ev:
+                        raise ValueError(f'{var_name} cannot be appended to {file_name}, write '
+                                         'the file again with write_hdf5.')
+                    extend.append((hf_var, var_val))
+
+            for hf_var, var_val in extend:
+                if len(var_val):
+                    hf_var.resize((hf_var.shape[0] + len(var_val),))
+                    hf_var[-len(var_val):] = var_val
+            for (var_name, var_val) in self.__dict__.items():
+                if isinstance(var_val, sparse.csr_matrix):
+                    hf_data.get(var_name).attrs['shape'] = (num_ev + self.size, var_val.shape[1])
 
     def _set_coords_centroids(self):
         """If centroids are raster, set lat and lon coordinates"""
@@ -1228,35 +1350,6 @@ class Hazard():
         axis.set_xlim([0, len(array_val)])
         return axis
 
-    def _loc_return_inten(self, return_periods, inten, exc_inten):
-        """Compute local exceedence intensity for given return period.
-
-        Parameters
-        ----------
-        return_periods: np.array
-            return periods to consider
-        cen_pos: int
-            centroid position
-
-        Returns
-        -------
-            np.array
-        """
-        # sorted intensity
-        sort_pos = np.argsort(inten, axis=0)[::-1, :]
-        columns = np.ones(inten.shape, int)
-        # pylint: disable=unsubscriptable-object  # pylint/issues/3139
-        columns *= np.arange(columns.shape[1])
-        inten_sort = inten[sort_pos, columns]
-        # cummulative frequency at sorted intensity
-        freq_sort = self.frequency[sort_pos]
-        np.cumsum(freq_sort, axis=0, out=freq_sort)
-
-        for cen_idx in range(inten.shape[1]):
-            exc_inten[:, cen_idx] = self._cen_return_inten(
-                inten_sort[:, cen_idx], freq_sort[:, cen_idx],
-                self.intensity_thres, return_periods)
-
     def _check_events(self):
         """Check that all attributes but centroids contain consistent data.
         Put default date, event_name and orig if not provided. Check not
@@ -1284,43 +1377,6 @@ class Hazard():
         if len(self._events_set()) != num_ev:
             raise ValueError("There are events with same date and name.")
 
-    @staticmethod
-    def _cen_return_inten(inten, freq, inten_th, return_periods):
-        """From ordered intensity and cummulative frequency at centroid, get
-        exceedance intensity at input return periods.
-
-        Parameters
-        ----------
-        inten: np.array
-            sorted intensity at centroid
-        freq: np.array
-            cummulative frequency at centroid
-        inten_th: float
-            intensity threshold
-        return_periods: np.array
-            return periods
-
-        Returns
-        -------
-            np.array
-        """
-        inten_th = np.asarray(inten > inten_th).squeeze()
-        inten_cen = inten[inten_th]
-        freq_cen = freq[inten_th]
-        if not inten_cen.size:
-            return np.zeros((return_periods.size,))
-        try:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                pol_coef = np.polyfit(np.log(freq_cen), inten_cen, deg=1)
-        except ValueError:
-            pol_coef = np.polyfit(np.log(freq_cen), inten_cen, deg=0)
-        inten_fit = np.polyval(pol_coef, np.log(1 / return_periods))
-        wrong_inten = (return_periods > np.max(1 / freq_cen)) & np.isnan(inten_fit)
-        inten_fit[wrong_inten] = 0.
-
-        return inten_fit
-
     def _read_att_mat(self, data, file_name, var_names):
         """Read MATLAB hazard's attributes."""
         self.frequency = np.squeeze(data[var_names['var_name']['freq']])
@@ -1507,13 +1563,13 @@ class Hazard():
             attr_val_list = [getattr(haz, attr_name) for haz in haz_list]
             if isinstance(attr_val_list[0], sparse.csr.csr_matrix):
                 #Map sparse matrix onto centroids.
-                matrix = (
+                matrix = [
                     sparse.csr_matrix(
                         (matrix.data, cent_idx[matrix.indices], matrix.indptr),
                         shape=(matrix.shape[0], centroids.size)
                         )
                     for matrix, cent_idx in zip(attr_val_list, hazcent_in_cent_idx_list)
-                    )
+                    ]
                 setattr(haz_concat, attr_name, sparse.vstack(matrix, format='csr'))
             elif (isinstance(attr_val_list[0], np.ndarray)
                   and attr_val_list[0].ndim == 1):
@@ -1598,4 +1654,44 @@ class Hazard():
             )
         setattr(haz_new_cent, "fraction", new_frac)
 
-        return haz_new_cent
\ No newline at end of file
+        return haz_new_cent
+
+def _read_csr_rows(hf_csr, rows=None):
+    """Read a sparse matrix written by `Hazard.write_hdf5`, or only some of its rows
+
+    Parameters
+    ----------
+    hf_csr : h5py.Group or h5py.Dataset
+        Group with the datasets data, indices and indptr of a CSR matrix, or dense matrix.
+    rows : np.array, optional
+        Indexes of the rows to read, in this order. Default: all the rows.
+
+    Returns
+    -------
+    sparse.csr_matrix
+    """
+    if rows is None:
+        if isinstance(hf_csr, h5py.Dataset):
+            return sparse.csr_matrix(hf_csr)
+        return sparse.csr_matrix((hf_csr['data'][:], hf_csr['indices'][:], hf_csr['indptr'][:]),
+                                 hf_csr.attrs['shape'])
+    rows_uni, rows_inv = np.unique(rows, return_inverse=True)
+    if isinstance(hf_csr, h5py.Dataset):
+        mat = sparse.csr_matrix(hf_csr[rows_uni, :] if rows_uni.size
+                                else np.zeros((0, hf_csr.shape[1]), dtype=hf_csr.dtype))
+    else:
+        indptr = hf_csr['indptr'][:]
+        # read the runs of consecutive rows at once
+        runs = [(indptr[run[0]], indptr[run[-1] + 1])
+                for run in np.split(rows_uni, np.flatnonzero(np.diff(rows_uni) > 1) + 1)
+                if run.size]
+        data = [hf_csr['data'][start:end] for start, end in runs]
+        indices = [hf_csr['indices'][start:end] for start, end in runs]
+        mat = sparse.csr_matrix(
+            (np.concatenate(data + [np.zeros(0, hf_csr['data'].dtype)]),
+             np.concatenate(indices + [np.zeros(0, hf_csr['indices'].dtype)]),
+             np.concatenate([[0], np.cumsum(indptr[rows_uni + 1] - indptr[rows_uni])])),
+            shape=(rows_uni.size, hf_csr.attrs['shape'][1]))
+    if rows_uni.size == len(rows) and np.all(rows_uni == rows):
+        return mat
+    return mat[rows_inv]
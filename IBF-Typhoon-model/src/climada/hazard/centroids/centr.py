@@ -40,6 +40,7 @@ from climada.util.constants import (DEF_CRS,
                                     NATEARTH_CENTROIDS)
 import climada.util.coordinates as u_coord
 import climada.util.hdf5_handler as u_hdf5
+import climada.util.interpolation as u_interp
 import climada.util.plot as u_plot
 
 __all__ = ['Centroids']
@@ -743,19 +744,38 @@ class Centroids():
     def set_dist_coast(self, signed=False, precomputed=False, scheduler=None):
         """Set dist_coast attribute for every pixel or point in meters.
 
+        The distances on a raster in epsg:4326 are read from a raster of the same grid (see
+        `u_coord.dist_to_coast_raster`), which is computed once and cached (if not precomputed).
+
         Parameters
         ----------
         signed : bool
             If True, use signed distances (positive off shore and negative on land). Default: False.
         precomputed : bool
-            If True, use precomputed distances (from NASA). Default: False.
+            If True, use precomputed distances: the cached raster of the grid if there is one,
+            then an approximate raster of the grid (e.g. the one shipped for the forecast grid of
+            the Philippines), otherwise the distances from NASA. If False, the distances are
+            always computed, or read from the cached raster of a previous computation.
+            Default: False.
         scheduler : str
             Used for dask map_partitions. "threads", "synchronous" or "processes"
         """
         if (not self.lat.size or not self.lon.size) and not self.meta:
             LOGGER.warning('No lat/lon, no meta, nothing to do!')
             return
-        if precomputed:
+        path = None
+        if self.meta and u_coord.equal_crs(self.meta['crs'], DEF_CRS):
+            res_x, _, _, _, res_y = self.meta['transform'][:5]
+            if res_x == -res_y > 0:
+                path = u_coord.dist_to_coast_raster(self.total_bounds, res_x,
+                                                    compute=not precomputed, approx=precomputed)
+        if path is not None:
+            if not self.lat.size or not self.lon.size:
+                self.set_meta_to_lat_lon()
+            self.dist_coast = u_coord.read_raster_sample(path, self.lat, self.lon)
+            if not signed:
+                self.dist_coast = np.abs(self.dist_coast)
+        elif precomputed:
             if not self.lat.size or not self.lon.size:
                 self.set_meta_to_lat_lon()
             self.dist_coast = u_coord.dist_to_coast_nasa(
@@ -975,6 +995,10 @@ class Centroids():
                             dtype=float)
         hf_str = data.create_dataset('crs', (1,), dtype=str_dt)
         hf_str[0] = CRS.from_user_input(self.crs).to_wkt()
+        # nearest neighbor indexes built for these centroids, to be reused after reading
+        if self.lat.size:
+            for nn_index in u_interp.cached_nn_indexes(self.coord):
+                nn_index.write_hdf5(data)
 
         if isinstance(file_data, str):
             data.close()
@@ -1009,7 +1033,12 @@ class Centroids():
                 else:
                     self.meta[key] = rasterio.Affine(*value)
         for centr_name in data.keys():
-            if centr_name not in ('crs', 'lat', 'lon', 'meta'):
+            if centr_name.startswith('nn_index_'):
+                nn_index = u_interp.NNIndex.read_hdf5(data, self.coord,
+                                                      centr_name[len('nn_index_'):])
+                if nn_index is not None:
+                    u_interp.cache_nn_index(nn_index)
+            elif centr_name not in ('crs', 'lat', 'lon', 'meta'):
                 setattr(self, centr_name, np.array(data.get(centr_name)))
         if isinstance(file_data, str):
             data.close()
@@ -1058,6 +1087,24 @@ class Centroids():
         """Get [lat, lon] array. Might take some time."""
         return np.stack([self.lat, self.lon], axis=1)
 
+    def get_nn_index(self, distance='haversine'):
+        """Get the index to assign coordinates to their nearest centroid.
+
+        The index is built on the first call and cached (see
+        `climada.util.interpolation.get_nn_index`). The "approx" index is written with the
+        centroids by `write_hdf5` and restored by `read_hdf5`, the "haversine" one is rebuilt.
+
+        Parameters
+        ----------
+        distance : str, optional
+            Distance to use, "approx" or "haversine". Default: "haversine"
+
+        Returns
+        -------
+        nn_index : climada.util.interpolation.NNIndex
+        """
+        return u_interp.get_nn_index(self.coord, distance)
+
     def set_geometry_points(self, scheduler=None):
         """Set `geometry` attribute with Points from `lat`/`lon` attributes.
 
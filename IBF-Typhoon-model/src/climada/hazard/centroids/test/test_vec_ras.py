@@ -22,6 +22,7 @@ import unittest
 
 from cartopy.io import shapereader
 import geopandas as gpd
+import h5py
 import numpy as np
 from pyproj.crs import CRS
 import rasterio
@@ -33,6 +34,7 @@ from climada import CONFIG
 from climada.hazard.centroids.centr import Centroids
 from climada.util.constants import HAZ_DEMO_FL, DEF_CRS
 import climada.util.coordinates as u_coord
+import climada.util.interpolation as u_interp
 
 DATA_DIR = CONFIG.hazard.test_data.dir()
 
@@ -695,6 +697,42 @@ class TestReader(unittest.TestCase):
         self.assertTrue(np.allclose(centr_read.lon, centr.lon))
         self.assertTrue(u_coord.equal_crs(centr_read.crs, centr.crs))
 
+    def test_write_read_nn_index_h5(self):
+        """Write and read the nearest neighbor indexes with the centroids"""
+        file_name = str(DATA_DIR.joinpath('test_centr.h5'))
+
+        centr = Centroids()
+        centr.set_lat_lon(VEC_LAT, VEC_LON)
+        nn_index = centr.get_nn_index('approx')
+        self.assertIs(centr.get_nn_index('approx'), nn_index)
+        nn_index_hav = centr.get_nn_index('haversine')
+        centr.write_hdf5(file_name)
+        # only the sorted order is written, the Ball tree is not
+        with h5py.File(file_name, 'r') as file:
+            self.assertIn('nn_index_approx', file)
+            self.assertNotIn('nn_index_haversine', file)
+
+        u_interp._NN_INDEX_CACHE.clear()
+        centr_read = Centroids()
+        centr_read.read_hdf5(file_name)
+        self.assertFalse(hasattr(centr_read, 'nn_index_approx'))
+        self.assertEqual(len(u_interp.cached_nn_indexes(centr_read.coord)), 1)
+        nn_index_read = centr_read.get_nn_index('approx')
+        self.assertIsNot(nn_index_read, nn_index)
+        np.testing.assert_array_equal(nn_index_read.lat_order, nn_index.lat_order)
+        self.assertEqual(nn_index_read.centr_hash, nn_index.centr_hash)
+        nn_index_hav_read = centr_read.get_nn_index('haversine')
+        self.assertIsNot(nn_index_hav_read, nn_index_hav)
+        np.testing.assert_array_equal(nn_index_hav_read.query(centr.coord[::7] + 0.01),
+                                      nn_index_hav.query(centr.coord[::7] + 0.01))
+
+        # an index not matching the centroids is ignored
+        with h5py.File(file_name, 'a') as file:
+            file['nn_index_approx/lat_order'][0] = len(VEC_LAT)
+        u_interp._NN_INDEX_CACHE.clear()
+        centr_read.read_hdf5(file_name)
+        self.assertEqual(u_interp.cached_nn_indexes(centr_read.coord), [])
+
 class TestCentroidsFuncs(unittest.TestCase):
     """Test Centroids methods"""
     def test_select_pass(self):
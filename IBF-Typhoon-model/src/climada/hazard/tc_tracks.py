@@ -19,9 +19,11 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 Define TCTracks: IBTracs reader and tracks manager.
 """
 
-__all__ = ['CAT_NAMES', 'SAFFIR_SIM_CAT', 'TCTracks', 'set_category']
+__all__ = ['CAT_NAMES', 'SAFFIR_SIM_CAT', 'TCTracks', 'interp_tracks', 'iter_tracks_hdf5',
+           'set_category', 'write_ibtracs_cache']
 
 # standard libraries
+import ast
 import datetime as dt
 import itertools
 import logging
@@ -34,19 +36,19 @@ from pathlib import Path
 import cartopy.crs as ccrs
 import cftime
 import geopandas as gpd
+import h5py
 import matplotlib.cm as cm_mp
 from matplotlib.collections import LineCollection
 from matplotlib.colors import BoundaryNorm, ListedColormap
 from matplotlib.lines import Line2D
 import matplotlib.pyplot as plt
 import netCDF4 as nc
-import numba
 import numpy as np
 import pandas as pd
 import scipy.io.matlab as matlab
+from scipy.interpolate import make_interp_spline
 from shapely.geometry import Point, LineString, MultiLineString
 import shapely.ops
-from sklearn.neighbors import DistanceMetric
 import statsmodels.api as sm
 import xarray as xr
 
@@ -56,6 +58,7 @@ import climada.util.coordinates as u_coord
 from climada.util.constants import EARTH_RADIUS_KM, SYSTEM_DIR, DEF_CRS
 from climada.util.files_handler import get_file_names, download_ftp
 import climada.util.plot as u_plot
+from climada.hazard.base import HDF5_COMPRESSION
 import climada.hazard.tc_tracks_synth
 
 LOGGER = logging.getLogger(__name__)
@@ -95,6 +98,15 @@ s. https://www.ncdc.noaa.gov/ibtracs/index.php?name=ib-v4-access"""
 IBTRACS_FILE = 'IBTrACS.ALL.v04r00.nc'
 """IBTrACS v4.0 file all"""
 
+IBTRACS_VARS = ['lat', 'lon', 'wind', 'pres', 'rmw', 'poci', 'roci']
+"""TC variables reported by the IBTrACS agencies that are used for the tracks"""
+
+IBTRACS_CACHE_CHUNK = 2**12
+"""Number of positions per chunk of the variables in the IBTrACS cache (about 50 storms)"""
+
+TRACKS_HDF5_CHUNK = 2**12
+"""Number of time steps per chunk of the variables in the files of `TCTracks.write_hdf5`"""
+
 IBTRACS_AGENCIES = [
     'usa', 'tokyo', 'newdelhi', 'reunion', 'bom', 'nadi', 'wellington',
     'cma', 'hko', 'ds824', 'td9636', 'td9635', 'neumann', 'mlc',
@@ -414,263 +426,71 @@ class TCTracks():
             Name of NetCDF file to be dowloaded or located at climada/data/system.
             Default: 'IBTrACS.ALL.v04r00.nc'
         """
-        if correct_pres:
-            LOGGER.warning("`correct_pres` is deprecated. "
-                           "Use `estimate_missing` instead.")
-            estimate_missing = True
-        if estimate_missing and not rescale_windspeeds:
-            LOGGER.warning(
-                "Using `estimate_missing` without `rescale_windspeeds` is strongly discouraged!")
-
-        ibtracs_path = SYSTEM_DIR.joinpath(file_name)
-        if not ibtracs_path.is_file():
-            try:
-                download_ftp(f'{IBTRACS_URL}/{IBTRACS_FILE}', IBTRACS_FILE)
-                shutil.move(IBTRACS_FILE, ibtracs_path)
-            except ValueError as err:
-                raise ValueError(
-                    f'Error while downloading {IBTRACS_URL}. Try to download it manually and '
-                    f'put the file in {ibtracs_path}') from err
-
+        estimate_missing = _ibtracs_estimate_missing(correct_pres, estimate_missing,
+                                                     rescale_windspeeds)
+        ibtracs_path = _ibtracs_path(file_name)
         ibtracs_ds = xr.open_dataset(ibtracs_path)
-        ibtracs_date = ibtracs_ds.attrs["date_created"]
-        if (np.datetime64('today') - np.datetime64(ibtracs_date)).item().days > 180:
-            LOGGER.warning(f"The cached IBTrACS data set dates from {ibtracs_date} (older "
-                           "than 180 days). Very likely, a more recent version is available. "
-                           f"Consider manually removing the file {ibtracs_path} and re-running "
-                           "this function, which will download the most recent version of the "
-                           "IBTrACS data set from the official URL.")
-
-        match = np.ones(ibtracs_ds.sid.shape[0], dtype=bool)
-        if storm_id is not None:
-            if not isinstance(storm_id, list):
-                storm_id = [storm_id]
-            invalid_mask = np.array(
-                [re.match(r"[12][0-9]{6}[NS][0-9]{5}", s) is None for s in storm_id])
-            if invalid_mask.any():
-                invalid_sids = list(np.array(storm_id)[invalid_mask])
-                raise ValueError("The following given IDs are invalid: %s%s" % (
-                                 ", ".join(invalid_sids[:5]),
-                                 ", ..." if len(invalid_sids) > 5  else "."))
-                storm_id = list(np.array(storm_id)[~invalid_mask])
-            storm_id_encoded = [i.encode() for i in storm_id]
-            non_existing_mask = ~np.isin(storm_id_encoded, ibtracs_ds.sid.values)
-            if np.count_nonzero(non_existing_mask) > 0:
-                non_existing_sids = list(np.array(storm_id)[non_existing_mask])
-                raise ValueError("The following given IDs are not in IBTrACS: %s%s" % (
-                                 ", ".join(non_existing_sids[:5]),
-                                 ", ..." if len(non_existing_sids) > 5  else "."))
-                storm_id_encoded = list(np.array(storm_id_encoded)[~non_existing_mask])
-            match &= ibtracs_ds.sid.isin(storm_id_encoded)
-        if year_range is not None:
-            years = ibtracs_ds.sid.str.slice(0, 4).astype(int)
-            match &= (years >= year_range[0]) & (years <= year_range[1])
-            if np.count_nonzero(match) == 0:
-                LOGGER.info('No tracks in time range (%s, %s).', *year_range)
-        if basin is not None:
-            match &= (ibtracs_ds.basin == basin.encode()).any(dim='date_time')
-            if np.count_nonzero(match) == 0:
-                LOGGER.info('No tracks in basin %s.', basin)
-        if genesis_basin is not None:
-            # Here, we only filter for the basin at *any* eye position. We will filter again later
-            # for the basin of the *first* eye position, but only after restricting to the valid
-            # time steps in the data.
-            match &= (ibtracs_ds.basin == genesis_basin.encode()).any(dim='date_time')
-            if np.count_nonzero(match) == 0:
-                LOGGER.info('No tracks in genesis basin %s.', genesis_basin)
-
-        if np.count_nonzero(match) == 0:
-            LOGGER.info("IBTrACS doesn't contain any tracks matching the specified requirements.")
-            self.data = []
-            return
-
-        ibtracs_ds = ibtracs_ds.sel(storm=match)
-        ibtracs_ds['valid_t'] = ibtracs_ds.time.notnull()
-
-        if rescale_windspeeds:
-            for agency in IBTRACS_AGENCIES:
-                scale, shift = IBTRACS_AGENCY_1MIN_WIND_FACTOR[agency]
-                ibtracs_ds[f'{agency}_wind'] -= shift
-                ibtracs_ds[f'{agency}_wind'] /= scale
-
-        if provider is None:
-            provider = ["official_3h"] + IBTRACS_AGENCIES
-        elif isinstance(provider, str):
-            provider = [provider]
-
-        for tc_var in ['lat', 'lon', 'wind', 'pres', 'rmw', 'poci', 'roci']:
-            if "official" in provider or "official_3h" in provider:
-                ibtracs_add_official_variable(
-                    ibtracs_ds, tc_var, add_3h=("official_3h" in provider))
-
-            # set up dimension of agency-reported values in order of preference, including the
-            # newly created `official` and `official_3h` data if specified
-            ag_vars = [f'{ag}_{tc_var}' for ag in provider]
-            ag_vars = [ag_var for ag_var in ag_vars if ag_var in ibtracs_ds.data_vars.keys()]
-            all_vals = ibtracs_ds[ag_vars].to_array(dim='agency')
-            # argmax returns the first True (i.e. valid) along the 'agency' dimension
-            preferred_idx = all_vals.notnull().any(dim="date_time").argmax(dim='agency')
-            ibtracs_ds[tc_var] = all_vals.isel(agency=preferred_idx)
-
-            # Usually, if an agency reports about a track that crosses the antimeridian, the
-            # longitude is always chosen positive. However, it can happen, that the TC crosses the
-            # antimeridian according to one agency, but not according to another. When mixing
-            # agency data, this can yield inconsistent sign changes in longitude. We remove those:
-            if tc_var == 'lon':
-                # By IBTrACS default, no longitude should be <= -180, but this is not true for some
-                # agencies, so we have to manually enforce this policy:
-                ibtracs_ds[tc_var].values[(ibtracs_ds[tc_var] <= -180).values] += 360
-                crossing_mask = ((ibtracs_ds[tc_var] > 170).any(dim="date_time")
-                                 & (ibtracs_ds[tc_var] < -170).any(dim="date_time")
-                                 & (ibtracs_ds[tc_var] < 0)).values
-                ibtracs_ds[tc_var].values[crossing_mask] += 360
-
-            if interpolate_missing:
-                with warnings.catch_warnings():
-                    # Upstream issue, see https://github.com/pydata/xarray/issues/4167
-                    warnings.simplefilter(action="ignore", category=FutureWarning)
-
-                    # don't interpolate if there is only a single record for this variable
-                    nonsingular_mask = (
-                        ibtracs_ds[tc_var].notnull().sum(dim="date_time") > 1).values
-                    if nonsingular_mask.sum() > 0:
-                        ibtracs_ds[tc_var].values[nonsingular_mask] = (
-                            ibtracs_ds[tc_var].sel(storm=nonsingular_mask).interpolate_na(
-                                dim="date_time", method="linear"))
-        ibtracs_ds = ibtracs_ds[['sid', 'name', 'basin', 'lat', 'lon', 'time', 'valid_t',
-                                 'wind', 'pres', 'rmw', 'roci', 'poci']]
+        _check_ibtracs_date(ibtracs_ds.attrs["date_created"], ibtracs_path)
 
-        if estimate_missing:
-            ibtracs_ds['pres'][:] = _estimate_pressure(
-                ibtracs_ds.pres, ibtracs_ds.lat, ibtracs_ds.lon, ibtracs_ds.wind)
-            ibtracs_ds['wind'][:] = _estimate_vmax(
-                ibtracs_ds.wind, ibtracs_ds.lat, ibtracs_ds.lon, ibtracs_ds.pres)
-
-        ibtracs_ds['valid_t'] &= (ibtracs_ds.lat.notnull() & ibtracs_ds.lon.notnull()
-                                  & ibtracs_ds.wind.notnull() & ibtracs_ds.pres.notnull())
-        valid_storms_mask = ibtracs_ds.valid_t.any(dim="date_time")
-        invalid_storms_idx = np.nonzero(~valid_storms_mask.data)[0]
-        if invalid_storms_idx.size > 0:
-            invalid_sids = list(ibtracs_ds.sid.sel(storm=invalid_storms_idx).astype(str).data)
-            LOGGER.warning('%d storm events are discarded because no valid wind/pressure values '
-                           'have been found: %s%s', len(invalid_sids), ", ".join(invalid_sids[:5]),
-                           ", ..." if len(invalid_sids) > 5  else ".")
-            ibtracs_ds = ibtracs_ds.sel(storm=valid_storms_mask)
-            
-        if discard_single_points:
-            valid_storms_mask = ibtracs_ds.valid_t.sum(dim="date_time") > 1
-            invalid_storms_idx = np.nonzero(~valid_storms_mask.data)[0]
-            if invalid_storms_idx.size > 0:
-                invalid_sids = list(ibtracs_ds.sid.sel(storm=invalid_storms_idx).astype(str).data)
-                LOGGER.warning('%d storm events are discarded because only one valid timestep '
-                               'has been found: %s%s', len(invalid_sids), ", ".join(invalid_sids[:5]),
-                               ", ..." if len(invalid_sids) > 5  else ".")
-                ibtracs_ds = ibtracs_ds.sel(storm=valid_storms_mask)
-
-        if ibtracs_ds.dims['storm'] == 0:
-            LOGGER.info('After discarding IBTrACS events without valid values by the selected '
-                        'reporting agencies, there are no tracks left that match the specified '
-                        'requirements.')
+        match = _ibtracs_match(
+            ibtracs_ds.sid.values, ibtracs_ds.sid.values.astype('S4').astype(int),
+            lambda code: (ibtracs_ds.basin == code).any(dim='date_time').values,
+            storm_id, year_range, basin, genesis_basin)
+        if match is None:
             self.data = []
             return
+        self.data = _ibtracs_tracks(ibtracs_ds.sel(storm=match), provider, rescale_windspeeds,
+                                    basin, genesis_basin, interpolate_missing, estimate_missing,
+                                    discard_single_points)
+
+    def read_ibtracs_cache(self, provider=None, rescale_windspeeds=True, storm_id=None,
+                           year_range=None, basin=None, genesis_basin=None,
+                           interpolate_missing=True, estimate_missing=False, correct_pres=False,
+                           discard_single_points=True,
+                           file_name='IBTrACS.ALL.v04r00.nc', cache_name=None):
+        """Read track data from IBTrACS databse, through a columnar cache of the NetCDF file.
+
+        The storms are selected with the indexes of the cache written by `write_ibtracs_cache`,
+        which is written on the first call (and again when the NetCDF file changes), and only
+        the positions of the selected storms are read. The resulting tracks are the same as
+        the ones of `read_ibtracs_netcdf`.
 
-        max_wind = ibtracs_ds.wind.max(dim="date_time").data.ravel()
-        category_test = (max_wind[:, None] < np.array(SAFFIR_SIM_CAT)[None])
-        category = np.argmax(category_test, axis=1) - 1
-        basin_map = {b.encode("utf-8"): v for b, v in BASIN_ENV_PRESSURE.items()}
-        basin_fun = lambda b: basin_map[b]
-
-        ibtracs_ds['id_no'] = (ibtracs_ds.sid.str.replace(b'N', b'0')
-                               .str.replace(b'S', b'1')
-                               .astype(float))
-        provider_str = f"ibtracs_{provider[0]}" + ("" if len(provider) == 1 else "_mixed")
-
-        last_perc = 0
-        all_tracks = []
-        for i_track, t_msk in enumerate(ibtracs_ds.valid_t.data):
-            perc = 100 * len(all_tracks) / ibtracs_ds.sid.size
-            if perc - last_perc >= 10:
-                LOGGER.info("Progress: %d%%", perc)
-                last_perc = perc
-            track_ds = ibtracs_ds.sel(storm=i_track, date_time=t_msk)
-            tr_basin_penv = xr.apply_ufunc(basin_fun, track_ds.basin, vectorize=True)
-            tr_genesis_basin = track_ds.basin.values[0].astype(str).item()
-
-            # Now that the valid time steps have been selected, we discard this track if it
-            # doesn't fit the specified basin definitions:
-            if genesis_basin is not None and tr_genesis_basin != genesis_basin:
-                continue
-            if basin is not None and basin.encode() not in track_ds.basin.values:
-                continue
-
-            # A track that crosses the antimeridian in IBTrACS might be truncated by `t_msk` in
-            # such a way that the remaining part is not crossing the antimeridian:
-            if (track_ds.lon.values > 180).all():
-                track_ds['lon'] -= 360
-
-            # set time_step in hours
-            track_ds['time_step'] = xr.ones_like(track_ds.time, dtype=float)
-            if track_ds.time.size > 1:
-                track_ds.time_step.values[1:] = (track_ds.time.diff(dim="date_time")
-                                                 / np.timedelta64(1, 'h'))
-                track_ds.time_step.values[0] = track_ds.time_step[1]
-
-            with warnings.catch_warnings():
-                # See https://github.com/pydata/xarray/issues/4167
-                warnings.simplefilter(action="ignore", category=FutureWarning)
-
-                track_ds['rmw'] = track_ds.rmw \
-                    .ffill(dim='date_time', limit=1) \
-                    .bfill(dim='date_time', limit=1) \
-                    .fillna(0)
-                track_ds['roci'] = track_ds.roci \
-                    .ffill(dim='date_time', limit=1) \
-                    .bfill(dim='date_time', limit=1) \
-                    .fillna(0)
-                track_ds['poci'] = track_ds.poci \
-                    .ffill(dim='date_time', limit=4) \
-                    .bfill(dim='date_time', limit=4)
-                # this is the most time consuming line in the processing:
-                track_ds['poci'] = track_ds.poci.fillna(tr_basin_penv)
-
-            if estimate_missing:
-                track_ds['rmw'][:] = estimate_rmw(track_ds.rmw.values, track_ds.pres.values)
-                track_ds['roci'][:] = estimate_roci(track_ds.roci.values, track_ds.pres.values)
-                track_ds['roci'][:] = np.fmax(track_ds.rmw.values, track_ds.roci.values)
-
-            # ensure environmental pressure >= central pressure
-            # this is the second most time consuming line in the processing:
-            track_ds['poci'][:] = np.fmax(track_ds.poci, track_ds.pres)
-
-            all_tracks.append(xr.Dataset({
-                'time_step': ('time', track_ds.time_step.data),
-                'radius_max_wind': ('time', track_ds.rmw.data),
-                'radius_oci': ('time', track_ds.roci.data),
-                'max_sustained_wind': ('time', track_ds.wind.data),
-                'central_pressure': ('time', track_ds.pres.data),
-                'environmental_pressure': ('time', track_ds.poci.data),
-                'basin': ('time', track_ds.basin.data.astype("<U2")),
-            }, coords={
-                'time': track_ds.time.dt.round('s').data,
-                'lat': ('time', track_ds.lat.data),
-                'lon': ('time', track_ds.lon.data),
-            }, attrs={
-                'max_sustained_wind_unit': 'kn',
-                'central_pressure_unit': 'mb',
-                'name': track_ds.name.astype(str).item(),
-                'sid': track_ds.sid.astype(str).item(),
-                'orig_event_flag': True,
-                'data_provider': provider_str,
-                'id_no': track_ds.id_no.item(),
-                'category': category[i_track],
-            }))
-        if last_perc != 100:
-            LOGGER.info("Progress: 100%")
-        if len(all_tracks) == 0:
-            # If all tracks have been discarded in the loop due to the basin filters:
-            LOGGER.info('There were no tracks left in the specified basin '
-                        'after discarding invalid track positions.')
-        self.data = all_tracks
+        Parameters
+        ----------
+        provider, rescale_windspeeds, storm_id, year_range, basin, genesis_basin,
+        interpolate_missing, estimate_missing, correct_pres, discard_single_points, file_name
+            See `read_ibtracs_netcdf`.
+        cache_name : str, optional
+            Name of the cache file at climada/data/system. Default: file_name with suffix .h5
+        """
+        estimate_missing = _ibtracs_estimate_missing(correct_pres, estimate_missing,
+                                                     rescale_windspeeds)
+        ibtracs_path = SYSTEM_DIR.joinpath(file_name)
+        cache_path = _ibtracs_cache_path(file_name, cache_name)
+        if not cache_path.is_file():
+            write_ibtracs_cache(file_name, cache_name)
+        elif ibtracs_path.is_file():
+            with h5py.File(cache_path, 'r') as hf_data:
+                outdated = hf_data.attrs['source_mtime'] != ibtracs_path.stat().st_mtime
+            if outdated:
+                write_ibtracs_cache(file_name, cache_name)
+
+        with h5py.File(cache_path, 'r') as hf_data:
+            _check_ibtracs_date(hf_data.attrs["date_created"], ibtracs_path)
+            basin_codes = list(hf_data.attrs['basin_codes'])
+            storm_basins = hf_data['basins'][:]
+            match = _ibtracs_match(
+                hf_data['sid'][:], hf_data['year'][:],
+                lambda code: (storm_basins >> basin_codes.index(code)) & 1 == 1
+                if code in basin_codes else np.zeros(storm_basins.size, dtype=bool),
+                storm_id, year_range, basin, genesis_basin)
+            if match is None:
+                self.data = []
+                return
+            ibtracs_ds = _read_ibtracs_cache_storms(hf_data, np.flatnonzero(match))
+        self.data = _ibtracs_tracks(ibtracs_ds, provider, rescale_windspeeds, basin,
+                                    genesis_basin, interpolate_missing, estimate_missing,
+                                    discard_single_points)
 
     def read_processed_ibtracs_csv(self, file_names):
         """Fill from processed ibtracs csv file(s).
@@ -1146,23 +966,15 @@ class TCTracks():
             land_geom = None
 
         if self.pool:
-            chunksize = min(self.size // self.pool.ncpus, 1000)
-            self.data = self.pool.map(self._one_interp_data, self.data,
-                                      itertools.repeat(time_step_h, self.size),
-                                      itertools.repeat(land_geom, self.size),
-                                      chunksize=chunksize)
+            # the tracks of a chunk are interpolated together, at least one chunk per process
+            chunksize = max(1, min(-(-self.size // self.pool.ncpus), 1000))
+            chunks = [self.data[idx:idx + chunksize] for idx in range(0, self.size, chunksize)]
+            self.data = list(itertools.chain.from_iterable(
+                self.pool.map(self._interp_data, chunks,
+                              itertools.repeat(time_step_h, len(chunks)),
+                              itertools.repeat(land_geom, len(chunks)))))
         else:
-            last_perc = 0
-            new_data = []
-            for track in self.data:
-                # progress indicator
-                perc = 100 * len(new_data) / len(self.data)
-                if perc - last_perc >= 10:
-                    LOGGER.debug("Progress: %d%%", perc)
-                    last_perc = perc
-                new_data.append(
-                    self._one_interp_data(track, time_step_h, land_geom))
-            self.data = new_data
+            self.data = self._interp_data(self.data, time_step_h, land_geom)
 
     def calc_random_walk(self, **kwargs):
         """Deprecated. Use `TCTracks.calc_perturbed_trajectories` instead."""
@@ -1299,6 +1111,8 @@ class TCTracks():
     def write_netcdf(self, folder_name):
         """Write a netcdf file per track with track.sid name in given folder.
 
+        See `write_hdf5` to write all tracks in a single file.
+
         Parameters
         ----------
         folder_name : str
@@ -1313,6 +1127,8 @@ class TCTracks():
     def read_netcdf(self, folder_name):
         """Read all netcdf files contained in folder and fill a track per file.
 
+        See `read_hdf5` to read (selected) tracks from a single file.
+
         Parameters
         ----------
         folder_name : str
@@ -1335,6 +1151,103 @@ class TCTracks():
                 track['basin'] = ("time", np.full(track.time.size, basin))
             self.data.append(track)
 
+    def write_hdf5(self, file_name):
+        """Write all tracks in a single hdf5 file, as ragged arrays.
+
+        The variables of all tracks are concatenated along time into flat arrays (in compressed
+        chunks), with the offset of the first time step of each track. The attributes of the
+        tracks are written as tables with one row per track, together with indexes of the
+        basins and the time span of the tracks, so that tracks can be selected and read
+        without reading the others (see `read_hdf5`). With a pool, the arrays of the tracks are
+        collected in parallel. The attributes of the variables are not written.
+
+        Parameters
+        ----------
+        file_name : str
+            File name to write, with h5 format.
+        """
+        LOGGER.info('Writing %s tracks to %s', self.size, file_name)
+        if self.pool:
+            chunksize = max(1, min(-(-self.size // self.pool.ncpus), 1000))
+            chunks = [self.data[idx:idx + chunksize] for idx in range(0, self.size, chunksize)]
+            columns = _merge_track_columns(self.pool.map(_track_columns, chunks))
+        else:
+            columns = _track_columns(self.data)
+        var_names, var_values, var_present, sizes, attrs = columns
+
+        with h5py.File(file_name, 'w') as hf_data:
+            hf_data.create_dataset('offsets', data=np.concatenate([[0], np.cumsum(sizes)]))
+            hf_nodes = hf_data.create_group('nodes')
+            hf_nodes.attrs['data_vars'] = var_names['data_vars']
+            hf_nodes.attrs['coords'] = var_names['coords']
+            for var, values in var_values.items():
+                dtype = values.dtype
+                if dtype.kind == 'U':
+                    values = np.char.encode(values, 'utf-8')
+                elif dtype.kind == 'M':
+                    values = values.astype('datetime64[ns]').view(np.int64)
+                hf_var = hf_nodes.create_dataset(
+                    var, data=values, **({'chunks': (min(TRACKS_HDF5_CHUNK, values.size),),
+                                          **HDF5_COMPRESSION} if values.size else {}))
+                hf_var.attrs['dtype'] = 'datetime64[ns]' if dtype.kind == 'M' else dtype.str
+                if not var_present[var].all():
+                    hf_data.create_dataset(f'nodes_present/{var}', data=var_present[var])
+
+            hf_attrs = hf_data.create_group('attrs')
+            for key, (values, kind, present) in attrs.items():
+                if kind == 'str':
+                    hf_attr = hf_attrs.create_dataset(key, data=values,
+                                                      dtype=h5py.string_dtype())
+                else:
+                    hf_attr = hf_attrs.create_dataset(key, data=values)
+                hf_attr.attrs['kind'] = kind
+                if not present.all():
+                    hf_data.create_dataset(f'attrs_present/{key}', data=present)
+
+            # bit i of the basins of a track is set if one of its time steps is in basin_codes[i]
+            sizes = np.array(sizes, dtype=int)
+            track_basins = np.zeros(sizes.size, dtype=np.uint32)
+            basin_codes = []
+            if 'basin' in var_values:
+                has_basin = var_present['basin'][np.repeat(np.arange(sizes.size), sizes)]
+                node_track = np.repeat(np.arange(sizes.size), sizes)[has_basin]
+                basin_codes, node_codes = np.unique(var_values['basin'][has_basin],
+                                                    return_inverse=True)
+                for i_code in range(len(basin_codes)):
+                    track_basins[np.unique(node_track[node_codes == i_code])] |= 1 << i_code
+            hf_index = hf_data.create_group('index')
+            hf_index.attrs['basin_codes'] = [str(code) for code in basin_codes]
+            hf_index.create_dataset('basins', data=track_basins)
+            time = var_values.get('time', np.zeros(0, dtype='datetime64[ns]'))
+            time = time.astype('datetime64[ns]').view(np.int64)
+            offsets = hf_data['offsets'][:]
+            hf_index.create_dataset('time_start', data=np.where(
+                sizes > 0, time[np.minimum(offsets[:-1], time.size - 1)] if time.size else 0, 0))
+            hf_index.create_dataset('time_end', data=np.where(
+                sizes > 0, time[np.maximum(offsets[1:] - 1, 0)] if time.size else 0, 0))
+
+    def read_hdf5(self, file_name, sid=None, basin=None, category=None, time_range=None):
+        """Read tracks written by `write_hdf5`, or only the ones matching some criteria.
+
+        The tracks are selected with the attributes and indexes of the file, and only the time
+        steps of the selected tracks are read. See `iter_tracks_hdf5` to read them one by one.
+
+        Parameters
+        ----------
+        file_name : str
+            File name to read, with h5 format.
+        sid : str or list of str, optional
+            IDs of the tracks to read, in this order.
+        basin : str, optional
+            Read only the tracks with at least one time step in this basin (or with this basin
+            attribute, for tracks without basin variable).
+        category : int or list of int, optional
+            Read only the tracks of these categories.
+        time_range : tuple (start, end), optional
+            Read only the tracks with at least one time step in this range of dates
+            (str or np.datetime64, end included).
+        """
+        self.data = list(iter_tracks_hdf5(file_name, sid, basin, category, time_range))
 
     def to_geodataframe(self, as_points=False, split_lines_antimeridian=True):
         """Transform this TCTracks instance into a GeoDataFrame.
@@ -1412,13 +1325,12 @@ class TCTracks():
         return gdf
 
     @staticmethod
-    @numba.jit(forceobj=True)
-    def _one_interp_data(track, time_step_h, land_geom=None):
-        """Interpolate values of one track.
+    def _interp_data(tracks, time_step_h, land_geom=None):
+        """Interpolate values of several tracks, see `interp_tracks`.
 
         Parameters
         ----------
-        track : xr.Dataset
+        tracks : list of xr.Dataset
             Track data.
         time_step_h : int or float
             Desired temporal resolution in hours (may be non-integer-valued).
@@ -1427,41 +1339,18 @@ class TCTracks():
 
         Returns
         -------
-        track_int : xr.Dataset
+        tracks_int : list of xr.Dataset
         """
-        if track.time.size >= 2:
-            method = ['linear', 'quadratic', 'cubic'][min(2, track.time.size - 2)]
-
-            # handle change of sign in longitude
-            lon = track.lon.copy()
-            if (lon < -170).any() and (lon > 170).any():
-                # crosses 180 degrees east/west -> use positive degrees east
-                lon[lon < 0] += 360
-
-            time_step = pd.tseries.frequencies.to_offset(pd.Timedelta(hours=time_step_h)).freqstr
-            track_int = track.resample(time=time_step, keep_attrs=True, skipna=True)\
-                             .interpolate('linear')
-            track_int['basin'] = track.basin.resample(time=time_step).nearest()
-            track_int['time_step'][:] = time_step_h
-            lon_int = lon.resample(time=time_step).interpolate(method)
-            lon_int[lon_int > 180] -= 360
-            track_int.coords['lon'] = lon_int
-            track_int.coords['lat'] = track.lat.resample(time=time_step)\
-                                               .interpolate(method)
-            track_int.attrs['category'] = set_category(
-                track_int.max_sustained_wind.values,
-                track_int.max_sustained_wind_unit)
-            # restrict to time steps within original bounds
-            track_int = track_int.sel(
-                time=(track.time[0] <= track_int.time) & (track_int.time <= track.time[-1]))
-        else:
-            LOGGER.warning('Track interpolation not done. '
-                           'Not enough elements for %s', track.name)
-            track_int = track
-
+        tracks_int = interp_tracks(tracks, time_step_h)
+        for track, track_int in zip(tracks, tracks_int):
+            if track.time.size >= 2:
+                track_int['time_step'][:] = time_step_h
+                track_int.attrs['category'] = set_category(
+                    track_int.max_sustained_wind.values,
+                    track_int.max_sustained_wind_unit)
         if land_geom:
-            track_land_params(track_int, land_geom)
-        return track_int
+            tracks_land_params(tracks_int, land_geom)
+        return tracks_int
 
     def _read_ibtracs_csv_single(self, file_name):
         """Read IBTrACS track file in CSV format.
@@ -1525,6 +1414,365 @@ class TCTracks():
         self.data.append(tr_ds)
 
 
+def interp_tracks(tracks, time_step_h, method=None):
+    """Interpolate the values of tracks to time steps of time_step_h.
+
+    The time steps are the multiples of `time_step_h` from the start of the day of the first
+    node of a track, between its first and last nodes, as given by `xr.Dataset.resample`.
+    The tracks with the same variables are interpolated together: their nodes and time steps
+    are concatenated in flat arrays, and the position of every time step between the nodes
+    of its track is found once for all the variables. Numeric variables are interpolated
+    linearly, strings take the value of the nearest node. The coordinates `lat` and `lon` are
+    interpolated with splines, computed for all the tracks with the same nodes (e.g. the
+    members of an ensemble forecast) at once. Longitudes are unwrapped along the tracks, so
+    that tracks crossing the antimeridian are interpolated along the shortest path.
+
+    Parameters
+    ----------
+    tracks : list of xr.Dataset
+        Track data, with coordinates `time`, `lat` and `lon`. Tracks with less than two
+        nodes are not interpolated.
+    time_step_h : int or float
+        Desired temporal resolution in hours (may be non-integer-valued).
+    method : str, optional
+        Interpolation of `lat` and `lon`: 'linear', 'quadratic' or 'cubic'. Default: None,
+        the highest order possible with the number of nodes of each track, up to cubic.
+
+    Returns
+    -------
+    tracks_int : list of xr.Dataset
+    """
+    tracks_int = list(tracks)
+    step = pd.Timedelta(hours=time_step_h).value
+    groups = dict()
+    for i_track, track in enumerate(tracks):
+        if track.time.size < 2:
+            LOGGER.warning('Track interpolation not done. '
+                           'Not enough elements for %s', track.name)
+            continue
+        groups.setdefault(tuple((var_name, track.variables[var_name].dims,
+                                 track.variables[var_name].dtype.kind)
+                                for var_name in track.data_vars),
+                          []).append(i_track)
+    for group in groups.values():
+        for i_track, track_int in zip(group, _interp_tracks_group(
+                [tracks[i_track] for i_track in group], step, method)):
+            tracks_int[i_track] = track_int
+    return tracks_int
+
+def _interp_tracks_group(tracks, step, method=None):
+    """Interpolate tracks with the same variables, see `interp_tracks`.
+
+    Parameters
+    ----------
+    tracks : list of xr.Dataset
+        Tracks with at least two nodes each.
+    step : int
+        Time step in nanoseconds.
+    method : str, optional
+        Interpolation of `lat` and `lon`.
+
+    Returns
+    -------
+    tracks_int : list of xr.Dataset
+    """
+    # nodes of all tracks, in nanoseconds since the first node of their track
+    sizes = np.array([track.variables['time'].size for track in tracks])
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    time = np.concatenate([track.variables['time'].values for track in tracks]).astype('datetime64[ns]')\
+        .astype(np.int64)
+    t_first, t_last = time[offsets[:-1]], time[offsets[1:] - 1]
+    node_x = (time - np.repeat(t_first, sizes)).astype(float)
+
+    # time steps from the start of the day, within the first and last nodes
+    origin = t_first - t_first % pd.Timedelta(days=1).value
+    first = origin - (origin - t_first) // step * step
+    num_int = np.fmax(0, (origin + (t_last - origin) // step * step - first) // step + 1)
+    offsets_int = np.concatenate([[0], np.cumsum(num_int)])
+    track_int = np.repeat(np.arange(len(tracks)), num_int)
+    time_int = np.repeat(first, num_int) \
+        + (np.arange(offsets_int[-1]) - np.repeat(offsets_int[:-1], num_int)) * step
+    int_x = (time_int - np.repeat(t_first, num_int)).astype(float)
+
+    # position of the time steps between the nodes of their track
+    width = node_x[offsets[1:] - 1].max() / step + 2
+    node_key = np.repeat(np.arange(len(tracks)), sizes) * width + node_x / step
+    idx = np.searchsorted(node_key, track_int * width + int_x / step, side='right')
+    idx = np.clip(idx, offsets[:-1][track_int] + 1, offsets[1:][track_int] - 1)
+    x_lo, x_hi = node_x[idx - 1], node_x[idx]
+    nearest = np.where(int_x - x_lo < x_hi - int_x, idx - 1, idx)
+    on_node = np.flatnonzero((int_x == x_lo) | (int_x == x_hi))
+
+    def linear(values):
+        # as np.interp, the time steps on a node take its value
+        slope = (values[idx] - values[idx - 1]) / (x_hi - x_lo)
+        values_int = slope * (int_x - x_lo) + values[idx - 1]
+        values_int[on_node] = values[nearest[on_node]]
+        return values_int
+
+    # unwrap the longitudes along the tracks, adding multiples of 360 degrees
+    lat = np.concatenate([track.variables['lat'].values for track in tracks]).astype(float)
+    lon = np.concatenate([track.variables['lon'].values for track in tracks]).astype(float)
+    lon_diff = np.diff(lon, prepend=lon[0])
+    lon_diff[offsets[:-1]] = 0
+    num_wraps = np.cumsum((lon_diff < -180).astype(int) - (lon_diff > 180))
+    lon += 360 * (num_wraps - np.repeat(num_wraps[offsets[:-1]], sizes))
+    if method == 'linear':
+        lat_int, lon_int = linear(lat), linear(lon)
+    else:
+        lat_int, lon_int = np.empty(int_x.size), np.empty(int_x.size)
+        same_nodes = dict()
+        for i_track, track in enumerate(tracks):
+            same_nodes.setdefault(track.variables['time'].values.tobytes(), []).append(i_track)
+        for group in same_nodes.values():
+            order = 1 + min(2, sizes[group[0]] - 2) if method is None \
+                else ['linear', 'quadratic', 'cubic'].index(method) + 1
+            sel = np.concatenate([np.arange(offsets[i_tr], offsets[i_tr + 1]) for i_tr in group])
+            sel_int = np.concatenate([np.arange(offsets_int[i_tr], offsets_int[i_tr + 1])
+                                      for i_tr in group])
+            if order == 1:
+                lat_int[sel_int], lon_int[sel_int] = linear(lat)[sel_int], linear(lon)[sel_int]
+                continue
+            num_nodes, num_tr = sizes[group[0]], len(group)
+            # the columns of the same nodes are fitted with one spline
+            coords = np.concatenate([lat[sel].reshape(num_tr, num_nodes),
+                                     lon[sel].reshape(num_tr, num_nodes)]).T
+            i_first = offsets_int[group[0]]
+            spline = make_interp_spline(node_x[offsets[group[0]]:offsets[group[0] + 1]],
+                                        coords, k=order, check_finite=False)
+            coords_int = spline(int_x[i_first:i_first + num_int[group[0]]])
+            coords_int[:, np.isnan(coords).any(axis=0)] = np.nan
+            lat_int[sel_int] = coords_int[:, :num_tr].T.ravel()
+            lon_int[sel_int] = coords_int[:, num_tr:].T.ravel()
+    lon_int[lon_int > 180] -= 360
+    lon_int[lon_int < -180] += 360
+
+    data_int = dict()
+    for var_name in tracks[0].data_vars:
+        var = tracks[0].variables[var_name]
+        if var.dims != ('time',):
+            continue
+        values = np.concatenate([track.variables[var_name].values for track in tracks])
+        if var.dtype.kind in 'uifc':
+            data_int[var_name] = linear(values.astype(float))
+        elif var.dtype.kind in 'OSU':
+            data_int[var_name] = values[nearest]
+    time_int = time_int.astype('datetime64[ns]')
+
+    tracks_int = []
+    for i_track, track in enumerate(tracks):
+        sel = slice(offsets_int[i_track], offsets_int[i_track + 1])
+        data_vars = {var_name: ('time', values[sel], track.variables[var_name].attrs)
+                     for var_name, values in data_int.items()}
+        data_vars.update({var_name: track.variables[var_name] for var_name in track.data_vars
+                          if 'time' not in track.variables[var_name].dims})
+        tracks_int.append(xr.Dataset(
+            data_vars=data_vars,
+            coords={'time': time_int[sel], 'lat': ('time', lat_int[sel]),
+                    'lon': ('time', lon_int[sel])},
+            attrs=track.attrs))
+    return tracks_int
+
+def iter_tracks_hdf5(file_name, sid=None, basin=None, category=None, time_range=None):
+    """Tracks of a file written by `TCTracks.write_hdf5`, read one after the other.
+
+    Only the time steps of the selected tracks are read, by runs of consecutive tracks, and each
+    track is returned before the next run is read.
+
+    Parameters
+    ----------
+    file_name : str
+        File name to read, with h5 format.
+    sid, basin, category, time_range
+        Criteria to select the tracks, see `TCTracks.read_hdf5`.
+
+    Returns
+    -------
+    generator of xr.Dataset
+    """
+    with h5py.File(file_name, 'r') as hf_data:
+        offsets = hf_data['offsets'][:]
+        attrs = {key: _read_attr_column(hf_attr) for key, hf_attr in hf_data['attrs'].items()}
+        attrs_present = {key: dset[:] for key, dset in hf_data.get('attrs_present', {}).items()}
+        tracks = _select_hdf5_tracks(hf_data, attrs, sid, basin, category, time_range)
+        LOGGER.info('Reading %s of %s tracks from %s', tracks.size, offsets.size - 1, file_name)
+
+        hf_nodes = hf_data['nodes']
+        nodes_present = {var: dset[:] for var, dset in hf_data.get('nodes_present', {}).items()}
+        data_vars, coords = list(hf_nodes.attrs['data_vars']), list(hf_nodes.attrs['coords'])
+        # consecutive tracks starting in the same chunk of time steps are read at once
+        runs = np.split(tracks, np.flatnonzero(
+            (np.diff(tracks) != 1) | (np.diff(offsets[tracks] // TRACKS_HDF5_CHUNK) != 0)
+        ) + 1) if tracks.size else []
+        for run in runs:
+            start = offsets[run[0]]
+            values = {var: _read_node_column(hf_var, start, offsets[run[-1] + 1])
+                      for var, hf_var in hf_nodes.items()}
+            for i_track in run:
+                node_slice = slice(offsets[i_track] - start, offsets[i_track + 1] - start)
+                track_vars = {var: values[var][node_slice] for var in data_vars + coords
+                              if var not in nodes_present or nodes_present[var][i_track]}
+                yield xr.Dataset(
+                    {var: ('time', track_vars[var]) for var in data_vars if var in track_vars},
+                    coords={var: ('time', track_vars[var]) for var in coords
+                            if var in track_vars},
+                    attrs={key: values_attr[i_track] for key, values_attr in attrs.items()
+                           if key not in attrs_present or attrs_present[key][i_track]})
+
+def _track_columns(tracks):
+    """Variables and attributes of tracks as ragged arrays, see `TCTracks.write_hdf5`
+
+    Parameters
+    ----------
+    tracks : list(xr.Dataset)
+        Tracks.
+
+    Returns
+    -------
+    var_names : dict
+        Names of the data variables and coordinates ('data_vars', 'coords') of all tracks,
+        in order of appearance.
+    var_values : dict
+        Concatenated values of each variable (zeros for the tracks without it).
+    var_present : dict
+        Mask of the tracks with each variable.
+    sizes : list of int
+        Number of time steps of each track.
+    attrs : dict
+        Values, kind of values and mask of the tracks with each attribute.
+    """
+    var_names = {'data_vars': [], 'coords': []}
+    for track in tracks:
+        for key, names in [('data_vars', track.data_vars), ('coords', track.coords)]:
+            var_names[key] += [var for var in names if var not in var_names[key]]
+    sizes = [track.time.size for track in tracks]
+    var_values, var_present = {}, {}
+    for var in var_names['data_vars'] + var_names['coords']:
+        var_present[var] = np.array([var in track.variables for track in tracks], dtype=bool)
+        values = [track[var].values if var in track.variables else None for track in tracks]
+        var_values[var] = _concat_node_values(values, sizes)
+
+    attrs = {}
+    for key in dict.fromkeys(key for track in tracks for key in track.attrs):
+        present = np.array([key in track.attrs for track in tracks], dtype=bool)
+        attrs[key] = (*_attr_column([track.attrs.get(key) for track in tracks], present),
+                      present)
+    return var_names, var_values, var_present, sizes, attrs
+
+def _merge_track_columns(chunks):
+    """Merge the results of `_track_columns` for chunks of tracks"""
+    var_names = {'data_vars': [], 'coords': []}
+    for chunk in chunks:
+        for key, names in chunk[0].items():
+            var_names[key] += [var for var in names if var not in var_names[key]]
+    var_values, var_present = {}, {}
+    for var in var_names['data_vars'] + var_names['coords']:
+        var_present[var] = np.concatenate([
+            chunk[2][var] if var in chunk[2] else np.zeros(len(chunk[3]), dtype=bool)
+            for chunk in chunks])
+        var_values[var] = _concat_node_values([chunk[1].get(var) for chunk in chunks],
+                                              [sum(chunk[3]) for chunk in chunks])
+    sizes = list(itertools.chain.from_iterable(chunk[3] for chunk in chunks))
+
+    attrs = {}
+    for key in dict.fromkeys(key for chunk in chunks for key in chunk[4]):
+        present = np.concatenate([
+            chunk[4][key][2] if key in chunk[4] else np.zeros(len(chunk[3]), dtype=bool)
+            for chunk in chunks])
+        values = list(itertools.chain.from_iterable(
+            _read_attr_values(*chunk[4][key][:2]) if key in chunk[4] else [None] * len(chunk[3])
+            for chunk in chunks))
+        attrs[key] = (*_attr_column(values, present), present)
+    return var_names, var_values, var_present, sizes, attrs
+
+def _concat_node_values(values, sizes):
+    """Concatenate the values of a variable of tracks, with zeros for the tracks without it
+    (None in values), so that the time steps of all the variables are at the same offsets"""
+    dtype = np.result_type(*[value for value in values if value is not None])
+    values = np.concatenate([np.zeros(size, dtype=dtype) if value is None else value
+                             for value, size in zip(values, sizes)])
+    return values.astype(str) if values.dtype.kind == 'O' else values
+
+def _attr_column(values, present):
+    """Array of the values of an attribute of tracks and kind of the values
+
+    Attributes of the same type for all tracks (bool, int, float, str or dates) are written
+    as arrays of this type, the others as strings of their representation.
+    """
+    types = {type(value) for value, is_present in zip(values, present) if is_present}
+    if types <= {bool, np.bool_}:
+        return np.array([bool(value) for value in values]), 'bool'
+    if types <= {int, np.int32, np.int64}:
+        return np.array([0 if value is None else value for value in values], np.int64), 'int'
+    if types <= {int, float, np.int32, np.int64, np.float32, np.float64}:
+        return np.array([np.nan if value is None else value for value in values],
+                        np.float64), 'float'
+    if types <= {str}:
+        return np.array(['' if value is None else value for value in values],
+                        dtype=object), 'str'
+    if types <= {np.datetime64, pd.Timestamp, dt.datetime}:
+        return np.array([np.datetime64('NaT') if value is None else np.datetime64(value, 'ns')
+                         for value in values]).view(np.int64), 'datetime'
+    return np.array([repr(value) for value in values], dtype=object), 'literal'
+
+def _read_attr_values(values, kind):
+    """Values of an attribute of tracks from the array written by `_attr_column`"""
+    if kind == 'str':
+        return [value.decode() if isinstance(value, bytes) else value for value in values]
+    if kind == 'datetime':
+        return list(pd.to_datetime(np.asarray(values).view('datetime64[ns]')))
+    if kind == 'literal':
+        return [ast.literal_eval(value.decode() if isinstance(value, bytes) else value)
+                for value in values]
+    return [{'bool': bool, 'int': int, 'float': float}[kind](value) for value in values]
+
+def _read_attr_column(hf_attr):
+    """Values of an attribute of tracks written by `TCTracks.write_hdf5`"""
+    return _read_attr_values(hf_attr[:], hf_attr.attrs['kind'])
+
+def _read_node_column(hf_var, start, end):
+    """Values of a variable for some time steps of a file written by `TCTracks.write_hdf5`"""
+    values = hf_var[start:end]
+    dtype = np.dtype(hf_var.attrs['dtype'])
+    if dtype.kind == 'U':
+        return np.char.decode(values, 'utf-8').astype(dtype)
+    if dtype.kind == 'M':
+        return values.view(dtype)
+    return values
+
+def _select_hdf5_tracks(hf_data, attrs, sid, basin, category, time_range):
+    """Indexes of the tracks of a file written by `TCTracks.write_hdf5` matching the criteria
+    of `TCTracks.read_hdf5`, in the order of `sid` if given"""
+    n_tracks = hf_data['offsets'].shape[0] - 1
+    match = np.ones(n_tracks, dtype=bool)
+    if basin is not None:
+        basin_codes = list(hf_data['index'].attrs['basin_codes'])
+        in_basin = np.zeros(n_tracks, dtype=bool)
+        if basin in basin_codes:
+            in_basin |= (hf_data['index/basins'][:] >> basin_codes.index(basin)) & 1 == 1
+        if 'basin' in attrs:
+            in_basin |= np.array(attrs['basin']) == basin
+        match &= in_basin
+    if category is not None:
+        categories = np.array(attrs['category']) if 'category' in attrs else np.zeros(0)
+        match &= np.isin(categories, np.atleast_1d(category)) if categories.size else False
+    if time_range is not None:
+        start, end = (np.datetime64(date, 'ns').astype(np.int64) for date in time_range)
+        match &= ((hf_data['index/time_start'][:] <= end)
+                  & (hf_data['index/time_end'][:] >= start)
+                  & (np.diff(hf_data['offsets'][:]) > 0))
+    tracks = np.flatnonzero(match)
+    if sid is not None:
+        sids = np.array(attrs['sid'], dtype=object) if 'sid' in attrs else np.zeros(0, object)
+        sid = [sid] if isinstance(sid, str) else sid
+        sid_idx = {track_sid: idx for idx, track_sid in zip(tracks, sids[tracks])}
+        missing = [track_sid for track_sid in sid if track_sid not in sid_idx]
+        if missing:
+            LOGGER.info('No track with sid %s matching the criteria.', ', '.join(missing))
+        tracks = np.array([sid_idx[track_sid] for track_sid in sid if track_sid in sid_idx],
+                          dtype=int)
+    return tracks
+
 def track_land_params(track, land_geom):
     """Compute parameters of land for one track.
 
@@ -1535,9 +1783,32 @@ def track_land_params(track, land_geom):
     land_geom : shapely.geometry.multipolygon.MultiPolygon
         land geometry
     """
-    track['on_land'] = ('time',
-                        u_coord.coord_on_land(track.lat.values, track.lon.values, land_geom))
-    track['dist_since_lf'] = ('time', _dist_since_lf(track))
+    tracks_land_params([track], land_geom)
+
+def tracks_land_params(tracks, land_geom):
+    """Compute parameters of land (`on_land` and `dist_since_lf`) for several tracks.
+
+    The nodes of all tracks are concatenated to one array, so that the points on land and the
+    distances since landfall are computed in one vectorized call for all of them.
+
+    Parameters
+    ----------
+    tracks : list of xr.Dataset
+        tropical cyclone tracks
+    land_geom : shapely.geometry.multipolygon.MultiPolygon
+        land geometry
+    """
+    if not tracks:
+        return
+    offsets = np.cumsum([0] + [track.time.size for track in tracks])
+    lat = np.concatenate([track.lat.values for track in tracks])
+    lon = np.concatenate([track.lon.values for track in tracks])
+    on_land = u_coord.coord_on_land(lat, lon, land_geom)
+    dist_since_lf = _dist_since_lf_flat(lat, lon, on_land, offsets)
+    for i_track, track in enumerate(tracks):
+        sel = slice(offsets[i_track], offsets[i_track + 1])
+        track['on_land'] = ('time', on_land[sel])
+        track['dist_since_lf'] = ('time', dist_since_lf[sel])
 
 def _dist_since_lf(track):
     """Compute the distance to landfall in km point for every point on land.
@@ -1552,46 +1823,61 @@ def _dist_since_lf(track):
     dist : np.arrray
         Distances in km, points on water get nan values.
     """
-    dist_since_lf = np.zeros(track.time.values.shape)
+    return _dist_since_lf_flat(track.lat.values, track.lon.values, track.on_land.values,
+                               np.array([0, track.time.size]))
 
-    # Index in sea that follows a land index
-    sea_land_idx, land_sea_idx = _get_landfall_idx(track, True)
-    if not sea_land_idx.size:
-        return (dist_since_lf + 1) * np.nan
-    
-    orig_lf = np.empty((sea_land_idx.size, 2))
-    for i_lf, lf_point in enumerate(sea_land_idx):
-        if lf_point > 0:
-            # Assume the landfall started between this and the previous point
-            orig_lf[i_lf][0] = track.lat[lf_point - 1] + \
-                (track.lat[lf_point] - track.lat[lf_point - 1]) / 2
-            orig_lf[i_lf][1] = track.lon[lf_point - 1] + \
-                (track.lon[lf_point] - track.lon[lf_point - 1]) / 2
-        else:
-            # track starts over land, assume first 'landfall' starts here
-            orig_lf[i_lf][0] = track.lat[lf_point]
-            orig_lf[i_lf][1] = track.lon[lf_point]
-
-
-    dist = DistanceMetric.get_metric('haversine')
-    nodes1 = np.radians(np.array([track.lat.values[1:],
-                                  track.lon.values[1:]]).transpose())
-    nodes0 = np.radians(np.array([track.lat.values[:-1],
-                                  track.lon.values[:-1]]).transpose())
-    dist_since_lf[1:] = dist.pairwise(nodes1, nodes0).diagonal()
-    dist_since_lf[~track.on_land.values] = 0.0
-    nodes1 = np.array([track.lat.values[sea_land_idx],
-                       track.lon.values[sea_land_idx]]).transpose() / 180 * np.pi
-    dist_since_lf[sea_land_idx] = \
-        dist.pairwise(nodes1, orig_lf / 180 * np.pi).diagonal()
-    for sea_land, land_sea in zip(sea_land_idx, land_sea_idx):
-        dist_since_lf[sea_land:land_sea] = \
-            np.cumsum(dist_since_lf[sea_land:land_sea])
-
-    dist_since_lf *= EARTH_RADIUS_KM
-    dist_since_lf[~track.on_land.values] = np.nan
-
-    return dist_since_lf
+def _dist_since_lf_flat(lat, lon, on_land, offsets):
+    """Compute the distance to landfall in km for the concatenated nodes of several tracks.
+
+    The distance of a point on land is the sum of the great circle distances between the
+    consecutive nodes since landfall, where landfall is assumed to happen half way between the
+    last point on sea and the first point on land (or at the first point of a track that starts
+    over land).
+
+    Parameters
+    ----------
+    lat, lon : np.array
+        Coordinates of the nodes of all tracks, one track after the other.
+    on_land : np.array of bool
+        Whether the nodes are on land.
+    offsets : np.array of int
+        Index of the first node of each track, followed by the total number of nodes.
+
+    Returns
+    -------
+    dist : np.array
+        Distances in km, points on water get nan values.
+    """
+    on_land = np.asarray(on_land, dtype=bool)
+    sea_land_idx, land_sea_idx = _landfall_idx_flat(on_land, offsets, True)
+    track_start = np.zeros(lat.size, dtype=bool)
+    track_start[offsets[:-1][offsets[:-1] < offsets[1:]]] = True
+
+    # distance of each node from the previous node of its track, or from the origin of the
+    # landfall at the first node of a landfall
+    lat_prev, lon_prev = np.empty_like(lat), np.empty_like(lon)
+    lat_prev[1:], lon_prev[1:] = lat[:-1], lon[:-1]
+    lf_prev = sea_land_idx[~track_start[sea_land_idx]] - 1
+    lat_prev[lf_prev + 1] += (lat[lf_prev + 1] - lat[lf_prev]) / 2
+    lon_prev[lf_prev + 1] += (lon[lf_prev + 1] - lon[lf_prev]) / 2
+    dist = np.zeros(lat.size)
+    steps = on_land & ~track_start
+    dist[steps] = u_coord.dist_approx(
+        lat_prev[steps, None], lon_prev[steps, None], lat[steps, None], lon[steps, None],
+        normalize=False, method="geosphere", units="radian")[:, 0, 0]
+
+    # cumulated distance since the first node of the landfall, summed in the order of the nodes
+    # of each landfall (like a cumsum per landfall) for all landfalls at once
+    lf_size = land_sea_idx - sea_land_idx
+    order = np.argsort(-lf_size, kind='stable')
+    sea_land_idx, lf_size = sea_land_idx[order], lf_size[order]
+    for i_node in range(1, lf_size[0] if lf_size.size else 0):
+        node = sea_land_idx[:np.searchsorted(-lf_size, -i_node)] + i_node
+        dist[node] += dist[node - 1]
+
+    dist *= EARTH_RADIUS_KM
+    dist[~on_land] = np.nan
+    return dist
 
 def _get_landfall_idx(track, include_starting_landfall=False):
     """Get the position of the start and end of landfalls for a TC track.
@@ -1614,22 +1900,43 @@ def _get_landfall_idx(track, include_starting_landfall=False):
         Indexes of first point over the ocean after each landfall. If the track
         ends over land, the last value is set to track.time.size.
     """
-    # Index in land that comes from previous sea index
-    sea_land_idx = np.where(np.diff(track.on_land.astype(int)) == 1)[0] + 1
-    # Index in sea that comes from previous land index
-    land_sea_idx = np.where(np.diff(track.on_land.astype(int)) == -1)[0] + 1
-    if track.on_land[-1]:
-        # track ends over land: add last track point as the end of that landfall
-        land_sea_idx = np.append(land_sea_idx, track.time.size)
-    if track.on_land[0]:
-        # track starts over land: remove first land-to-sea transition (not a landfall)?
-        if include_starting_landfall:
-            sea_land_idx = np.append(0, sea_land_idx)
-        else:
-            land_sea_idx = land_sea_idx[1:]
-    if land_sea_idx.size != sea_land_idx.size:
-        raise ValueError('Mismatch')
-    return sea_land_idx,land_sea_idx
+    return _landfall_idx_flat(track.on_land.values, np.array([0, track.time.size]),
+                              include_starting_landfall)
+
+def _landfall_idx_flat(on_land, offsets, include_starting_landfall=False):
+    """Get the position of the start and end of landfalls for the concatenated nodes of several
+    tracks, see `_get_landfall_idx`.
+
+    Parameters
+    ----------
+    on_land : np.array of bool
+        Whether the nodes of all tracks, one track after the other, are on land.
+    offsets : np.array of int
+        Index of the first node of each track, followed by the total number of nodes.
+    include_starting_landfall : bool
+        If a track starts over land, whether to include the track segment before
+        reaching the ocean as a landfall. Default: False.
+
+    Returns
+    -------
+    sea_land_idx : numpy.ndarray of dtype int
+        Indexes (in the concatenated nodes) of the first point over land for each landfall
+    land_sea_idx : numpy.ndarray of dtype int
+        Indexes of first point over the ocean after each landfall. If a track ends over land,
+        the value is the index of the first node of the next track.
+    """
+    on_land = np.asarray(on_land, dtype=bool)
+    track_start = np.zeros(on_land.size + 1, dtype=bool)
+    track_start[offsets] = True
+    # a landfall starts on land after a point on sea or at the start of a track, and ends
+    # before a point on sea or at the end of a track
+    on_land_ext = np.concatenate([[False], on_land, [False]])
+    sea_land_idx = np.flatnonzero(on_land & (~on_land_ext[:-2] | track_start[:-1]))
+    land_sea_idx = np.flatnonzero(on_land & (~on_land_ext[2:] | track_start[1:])) + 1
+    if not include_starting_landfall:
+        landfall = ~track_start[sea_land_idx]
+        sea_land_idx, land_sea_idx = sea_land_idx[landfall], land_sea_idx[landfall]
+    return sea_land_idx, land_sea_idx
 
 def _estimate_pressure(cen_pres, lat, lon, v_max):
     """Replace missing pressure values with statistical estimate.
@@ -1881,6 +2188,405 @@ def ibtracs_fit_param(explained, explanatory, year_range=(1980, 2019), order=1):
 
     return sm_results
 
+def _ibtracs_path(file_name):
+    """Path of the IBTrACS NetCDF file in the system folder, downloaded if it is missing"""
+    ibtracs_path = SYSTEM_DIR.joinpath(file_name)
+    if not ibtracs_path.is_file():
+        try:
+            download_ftp(f'{IBTRACS_URL}/{IBTRACS_FILE}', IBTRACS_FILE)
+            shutil.move(IBTRACS_FILE, ibtracs_path)
+        except ValueError as err:
+            raise ValueError(
+                f'Error while downloading {IBTRACS_URL}. Try to download it manually and '
+                f'put the file in {ibtracs_path}') from err
+    return ibtracs_path
+
+def _check_ibtracs_date(ibtracs_date, ibtracs_path):
+    """Warn if the IBTrACS data set is older than 180 days"""
+    if (np.datetime64('today') - np.datetime64(ibtracs_date)).item().days > 180:
+        LOGGER.warning(f"The cached IBTrACS data set dates from {ibtracs_date} (older "
+                       "than 180 days). Very likely, a more recent version is available. "
+                       f"Consider manually removing the file {ibtracs_path} and re-running "
+                       "this function, which will download the most recent version of the "
+                       "IBTrACS data set from the official URL.")
+
+def _ibtracs_match(sid, years, in_basin, storm_id, year_range, basin, genesis_basin):
+    """Storms of IBTrACS matching the selection criteria of `TCTracks.read_ibtracs_netcdf`
+
+    Parameters
+    ----------
+    sid : np.array of bytes
+        IBTrACS IDs of all storms.
+    years : np.array of int
+        Year of all storms, as in their IBTrACS ID.
+    in_basin : callable
+        Function of a basin abbreviation (bytes) returning the mask of the storms that have at
+        least one position in this basin.
+    storm_id, year_range, basin, genesis_basin
+        See `TCTracks.read_ibtracs_netcdf`.
+
+    Returns
+    -------
+    match : np.array of bool or None
+        Mask of the matching storms, None if no storm matches.
+    """
+    match = np.ones(sid.shape[0], dtype=bool)
+    if storm_id is not None:
+        if not isinstance(storm_id, list):
+            storm_id = [storm_id]
+        invalid_mask = np.array(
+            [re.match(r"[12][0-9]{6}[NS][0-9]{5}", s) is None for s in storm_id])
+        if invalid_mask.any():
+            invalid_sids = list(np.array(storm_id)[invalid_mask])
+            raise ValueError("The following given IDs are invalid: %s%s" % (
+                             ", ".join(invalid_sids[:5]),
+                             ", ..." if len(invalid_sids) > 5  else "."))
+        storm_id_encoded = [i.encode() for i in storm_id]
+        non_existing_mask = ~np.isin(storm_id_encoded, sid)
+        if np.count_nonzero(non_existing_mask) > 0:
+            non_existing_sids = list(np.array(storm_id)[non_existing_mask])
+            raise ValueError("The following given IDs are not in IBTrACS: %s%s" % (
+                             ", ".join(non_existing_sids[:5]),
+                             ", ..." if len(non_existing_sids) > 5  else "."))
+        match &= np.isin(sid, storm_id_encoded)
+    if year_range is not None:
+        match &= (years >= year_range[0]) & (years <= year_range[1])
+        if np.count_nonzero(match) == 0:
+            LOGGER.info('No tracks in time range (%s, %s).', *year_range)
+    if basin is not None:
+        match &= in_basin(basin.encode())
+        if np.count_nonzero(match) == 0:
+            LOGGER.info('No tracks in basin %s.', basin)
+    if genesis_basin is not None:
+        # Here, we only filter for the basin at *any* eye position. We will filter again later
+        # for the basin of the *first* eye position, but only after restricting to the valid
+        # time steps in the data.
+        match &= in_basin(genesis_basin.encode())
+        if np.count_nonzero(match) == 0:
+            LOGGER.info('No tracks in genesis basin %s.', genesis_basin)
+
+    if np.count_nonzero(match) == 0:
+        LOGGER.info("IBTrACS doesn't contain any tracks matching the specified requirements.")
+        return None
+    return match
+
+def _ibtracs_estimate_missing(correct_pres, estimate_missing, rescale_windspeeds):
+    """Value of `estimate_missing` given the (deprecated) `correct_pres`, with warnings"""
+    if correct_pres:
+        LOGGER.warning("`correct_pres` is deprecated. "
+                       "Use `estimate_missing` instead.")
+        estimate_missing = True
+    if estimate_missing and not rescale_windspeeds:
+        LOGGER.warning(
+            "Using `estimate_missing` without `rescale_windspeeds` is strongly discouraged!")
+    return estimate_missing
+
+def _ibtracs_tracks(ibtracs_ds, provider, rescale_windspeeds, basin, genesis_basin,
+                    interpolate_missing, estimate_missing, discard_single_points):
+    """Tracks of the storms of an IBTrACS dataset, see `TCTracks.read_ibtracs_netcdf`
+
+    Parameters
+    ----------
+    ibtracs_ds : xarray.Dataset
+        IBTrACS storms (dimensions storm and date_time) selected by `_ibtracs_match`.
+    provider, rescale_windspeeds, basin, genesis_basin, interpolate_missing, estimate_missing,
+    discard_single_points
+        See `TCTracks.read_ibtracs_netcdf`.
+
+    Returns
+    -------
+    list(xr.Dataset)
+    """
+    ibtracs_ds['valid_t'] = ibtracs_ds.time.notnull()
+
+    if rescale_windspeeds:
+        for agency in IBTRACS_AGENCIES:
+            scale, shift = IBTRACS_AGENCY_1MIN_WIND_FACTOR[agency]
+            ibtracs_ds[f'{agency}_wind'] -= shift
+            ibtracs_ds[f'{agency}_wind'] /= scale
+
+    if provider is None:
+        provider = ["official_3h"] + IBTRACS_AGENCIES
+    elif isinstance(provider, str):
+        provider = [provider]
+
+    for tc_var in IBTRACS_VARS:
+        if "official" in provider or "official_3h" in provider:
+            ibtracs_add_official_variable(
+                ibtracs_ds, tc_var, add_3h=("official_3h" in provider))
+
+        # set up dimension of agency-reported values in order of preference, including the
+        # newly created `official` and `official_3h` data if specified
+        ag_vars = [f'{ag}_{tc_var}' for ag in provider]
+        ag_vars = [ag_var for ag_var in ag_vars if ag_var in ibtracs_ds.data_vars.keys()]
+        all_vals = ibtracs_ds[ag_vars].to_array(dim='agency')
+        # argmax returns the first True (i.e. valid) along the 'agency' dimension
+        preferred_idx = all_vals.notnull().any(dim="date_time").argmax(dim='agency')
+        ibtracs_ds[tc_var] = all_vals.isel(agency=preferred_idx)
+
+        # Usually, if an agency reports about a track that crosses the antimeridian, the
+        # longitude is always chosen positive. However, it can happen, that the TC crosses the
+        # antimeridian according to one agency, but not according to another. When mixing
+        # agency data, this can yield inconsistent sign changes in longitude. We remove those:
+        if tc_var == 'lon':
+            # By IBTrACS default, no longitude should be <= -180, but this is not true for some
+            # agencies, so we have to manually enforce this policy:
+            ibtracs_ds[tc_var].values[(ibtracs_ds[tc_var] <= -180).values] += 360
+            crossing_mask = ((ibtracs_ds[tc_var] > 170).any(dim="date_time")
+                             & (ibtracs_ds[tc_var] < -170).any(dim="date_time")
+                             & (ibtracs_ds[tc_var] < 0)).values
+            ibtracs_ds[tc_var].values[crossing_mask] += 360
+
+        if interpolate_missing:
+            with warnings.catch_warnings():
+                # Upstream issue, see https://github.com/pydata/xarray/issues/4167
+                warnings.simplefilter(action="ignore", category=FutureWarning)
+
+                # don't interpolate if there is only a single record for this variable
+                nonsingular_mask = (
+                    ibtracs_ds[tc_var].notnull().sum(dim="date_time") > 1).values
+                if nonsingular_mask.sum() > 0:
+                    ibtracs_ds[tc_var].values[nonsingular_mask] = (
+                        ibtracs_ds[tc_var].sel(storm=nonsingular_mask).interpolate_na(
+                            dim="date_time", method="linear"))
+    ibtracs_ds = ibtracs_ds[['sid', 'name', 'basin', 'lat', 'lon', 'time', 'valid_t',
+                             'wind', 'pres', 'rmw', 'roci', 'poci']]
+
+    if estimate_missing:
+        ibtracs_ds['pres'][:] = _estimate_pressure(
+            ibtracs_ds.pres, ibtracs_ds.lat, ibtracs_ds.lon, ibtracs_ds.wind)
+        ibtracs_ds['wind'][:] = _estimate_vmax(
+            ibtracs_ds.wind, ibtracs_ds.lat, ibtracs_ds.lon, ibtracs_ds.pres)
+
+    ibtracs_ds['valid_t'] &= (ibtracs_ds.lat.notnull() & ibtracs_ds.lon.notnull()
+                              & ibtracs_ds.wind.notnull() & ibtracs_ds.pres.notnull())
+    valid_storms_mask = ibtracs_ds.valid_t.any(dim="date_time")
+    invalid_storms_idx = np.nonzero(~valid_storms_mask.data)[0]
+    if invalid_storms_idx.size > 0:
+        invalid_sids = list(ibtracs_ds.sid.sel(storm=invalid_storms_idx).astype(str).data)
+        LOGGER.warning('%d storm events are discarded because no valid wind/pressure values '
+                       'have been found: %s%s', len(invalid_sids), ", ".join(invalid_sids[:5]),
+                       ", ..." if len(invalid_sids) > 5  else ".")
+        ibtracs_ds = ibtracs_ds.sel(storm=valid_storms_mask)
+
+    if discard_single_points:
+        valid_storms_mask = ibtracs_ds.valid_t.sum(dim="date_time") > 1
+        invalid_storms_idx = np.nonzero(~valid_storms_mask.data)[0]
+        if invalid_storms_idx.size > 0:
+            invalid_sids = list(ibtracs_ds.sid.sel(storm=invalid_storms_idx).astype(str).data)
+            LOGGER.warning('%d storm events are discarded because only one valid timestep '
+                           'has been found: %s%s', len(invalid_sids), ", ".join(invalid_sids[:5]),
+                           ", ..." if len(invalid_sids) > 5  else ".")
+            ibtracs_ds = ibtracs_ds.sel(storm=valid_storms_mask)
+
+    if ibtracs_ds.dims['storm'] == 0:
+        LOGGER.info('After discarding IBTrACS events without valid values by the selected '
+                    'reporting agencies, there are no tracks left that match the specified '
+                    'requirements.')
+        return []
+
+    max_wind = ibtracs_ds.wind.max(dim="date_time").data.ravel()
+    category_test = (max_wind[:, None] < np.array(SAFFIR_SIM_CAT)[None])
+    category = np.argmax(category_test, axis=1) - 1
+    basin_map = {b.encode("utf-8"): v for b, v in BASIN_ENV_PRESSURE.items()}
+    basin_fun = lambda b: basin_map[b]
+
+    ibtracs_ds['id_no'] = (ibtracs_ds.sid.str.replace(b'N', b'0')
+                           .str.replace(b'S', b'1')
+                           .astype(float))
+    provider_str = f"ibtracs_{provider[0]}" + ("" if len(provider) == 1 else "_mixed")
+
+    last_perc = 0
+    all_tracks = []
+    for i_track, t_msk in enumerate(ibtracs_ds.valid_t.data):
+        perc = 100 * len(all_tracks) / ibtracs_ds.sid.size
+        if perc - last_perc >= 10:
+            LOGGER.info("Progress: %d%%", perc)
+            last_perc = perc
+        track_ds = ibtracs_ds.sel(storm=i_track, date_time=t_msk)
+        tr_basin_penv = xr.apply_ufunc(basin_fun, track_ds.basin, vectorize=True)
+        tr_genesis_basin = track_ds.basin.values[0].astype(str).item()
+
+        # Now that the valid time steps have been selected, we discard this track if it
+        # doesn't fit the specified basin definitions:
+        if genesis_basin is not None and tr_genesis_basin != genesis_basin:
+            continue
+        if basin is not None and basin.encode() not in track_ds.basin.values:
+            continue
+
+        # A track that crosses the antimeridian in IBTrACS might be truncated by `t_msk` in
+        # such a way that the remaining part is not crossing the antimeridian:
+        if (track_ds.lon.values > 180).all():
+            track_ds['lon'] -= 360
+
+        # set time_step in hours
+        track_ds['time_step'] = xr.ones_like(track_ds.time, dtype=float)
+        if track_ds.time.size > 1:
+            track_ds.time_step.values[1:] = (track_ds.time.diff(dim="date_time")
+                                             / np.timedelta64(1, 'h'))
+            track_ds.time_step.values[0] = track_ds.time_step[1]
+
+        with warnings.catch_warnings():
+            # See https://github.com/pydata/xarray/issues/4167
+            warnings.simplefilter(action="ignore", category=FutureWarning)
+
+            track_ds['rmw'] = track_ds.rmw \
+                .ffill(dim='date_time', limit=1) \
+                .bfill(dim='date_time', limit=1) \
+                .fillna(0)
+            track_ds['roci'] = track_ds.roci \
+                .ffill(dim='date_time', limit=1) \
+                .bfill(dim='date_time', limit=1) \
+                .fillna(0)
+            track_ds['poci'] = track_ds.poci \
+                .ffill(dim='date_time', limit=4) \
+                .bfill(dim='date_time', limit=4)
+            # this is the most time consuming line in the processing:
+            track_ds['poci'] = track_ds.poci.fillna(tr_basin_penv)
+
+        if estimate_missing:
+            track_ds['rmw'][:] = estimate_rmw(track_ds.rmw.values, track_ds.pres.values)
+            track_ds['roci'][:] = estimate_roci(track_ds.roci.values, track_ds.pres.values)
+            track_ds['roci'][:] = np.fmax(track_ds.rmw.values, track_ds.roci.values)
+
+        # ensure environmental pressure >= central pressure
+        # this is the second most time consuming line in the processing:
+        track_ds['poci'][:] = np.fmax(track_ds.poci, track_ds.pres)
+
+        all_tracks.append(xr.Dataset({
+            'time_step': ('time', track_ds.time_step.data),
+            'radius_max_wind': ('time', track_ds.rmw.data),
+            'radius_oci': ('time', track_ds.roci.data),
+            'max_sustained_wind': ('time', track_ds.wind.data),
+            'central_pressure': ('time', track_ds.pres.data),
+            'environmental_pressure': ('time', track_ds.poci.data),
+            'basin': ('time', track_ds.basin.data.astype("<U2")),
+        }, coords={
+            'time': track_ds.time.dt.round('s').data,
+            'lat': ('time', track_ds.lat.data),
+            'lon': ('time', track_ds.lon.data),
+        }, attrs={
+            'max_sustained_wind_unit': 'kn',
+            'central_pressure_unit': 'mb',
+            'name': track_ds.name.astype(str).item(),
+            'sid': track_ds.sid.astype(str).item(),
+            'orig_event_flag': True,
+            'data_provider': provider_str,
+            'id_no': track_ds.id_no.item(),
+            'category': category[i_track],
+        }))
+    if last_perc != 100:
+        LOGGER.info("Progress: 100%")
+    if len(all_tracks) == 0:
+        # If all tracks have been discarded in the loop due to the basin filters:
+        LOGGER.info('There were no tracks left in the specified basin '
+                    'after discarding invalid track positions.')
+    return all_tracks
+
+def write_ibtracs_cache(file_name=IBTRACS_FILE, cache_name=None):
+    """Write the columnar cache of an IBTrACS NetCDF file, see `TCTracks.read_ibtracs_cache`.
+
+    The variables used by `TCTracks.read_ibtracs_netcdf` are written as flat arrays of the
+    positions of all storms (without the padding of the NetCDF file), in compressed chunks, with
+    the offset of the first position of each storm. The IBTrACS ID, the year and the basins of
+    each storm are written as indexes, to select the storms before reading their positions.
+
+    Parameters
+    ----------
+    file_name : str, optional
+        Name of NetCDF file to be dowloaded or located at climada/data/system.
+        Default: 'IBTrACS.ALL.v04r00.nc'
+    cache_name : str, optional
+        Name of the cache file at climada/data/system. Default: file_name with suffix .h5
+
+    Returns
+    -------
+    cache_path : Path
+        Path of the cache file.
+    """
+    ibtracs_path = _ibtracs_path(file_name)
+    cache_path = _ibtracs_cache_path(file_name, cache_name)
+    LOGGER.info('Writing IBTrACS cache %s', cache_path)
+    with xr.open_dataset(ibtracs_path) as ibtracs_ds:
+        var_names = ['time', 'lat', 'lon', 'basin', 'wmo_agency'] + [
+            f'{ag}_{tc_var}' for ag in IBTRACS_AGENCIES for tc_var in IBTRACS_VARS
+            if f'{ag}_{tc_var}' in ibtracs_ds.variables]
+
+        # positions up to the last time step of each storm, the others are padding
+        time = ibtracs_ds.time.values
+        n_pos = time.shape[1] - np.argmax(~np.isnat(time[:, ::-1]), axis=1)
+        n_pos[np.isnat(time).all(axis=1)] = 0
+        pos_msk = np.arange(time.shape[1])[None] < n_pos[:, None]
+
+        # bit i of the basins of a storm is set if one of its positions is in basin_codes[i]
+        basin = ibtracs_ds.basin.values
+        basin_codes = np.unique(basin)
+        storm_basins = np.zeros(basin.shape[0], dtype=np.uint32)
+        for i_code, code in enumerate(basin_codes):
+            storm_basins[(basin == code).any(axis=1)] |= 1 << i_code
+
+        tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+        with h5py.File(tmp_path, 'w') as hf_data:
+            hf_data.attrs['date_created'] = ibtracs_ds.attrs['date_created']
+            hf_data.attrs['source_mtime'] = ibtracs_path.stat().st_mtime
+            hf_data.attrs['coords'] = [var for var in var_names if var in ibtracs_ds.coords]
+            hf_data.attrs['basin_codes'] = basin_codes
+            hf_data.create_dataset('sid', data=ibtracs_ds.sid.values)
+            hf_data.create_dataset('name', data=ibtracs_ds.name.values)
+            hf_data.create_dataset('year', data=ibtracs_ds.sid.values.astype('S4').astype(int))
+            hf_data.create_dataset('basins', data=storm_basins)
+            hf_data.create_dataset('offsets', data=np.concatenate([[0], np.cumsum(n_pos)]))
+            hf_nodes = hf_data.create_group('nodes')
+            for var in var_names:
+                values = ibtracs_ds[var].values[pos_msk]
+                if values.dtype.kind == 'M':
+                    values = values.astype('datetime64[ns]').view(np.int64)
+                hf_nodes.create_dataset(var, data=values,
+                                        chunks=(min(IBTRACS_CACHE_CHUNK, max(values.size, 1)),),
+                                        **HDF5_COMPRESSION)
+    tmp_path.replace(cache_path)
+    return cache_path
+
+def _ibtracs_cache_path(file_name, cache_name):
+    """Path of the IBTrACS cache file of a NetCDF file, see `write_ibtracs_cache`"""
+    if cache_name is None:
+        return SYSTEM_DIR.joinpath(file_name).with_suffix('.h5')
+    return SYSTEM_DIR.joinpath(cache_name)
+
+def _read_ibtracs_cache_storms(hf_data, storms):
+    """Dataset of some storms from an IBTrACS cache, with the structure of the NetCDF file
+
+    Parameters
+    ----------
+    hf_data : h5py.File
+        Cache written by `write_ibtracs_cache`.
+    storms : np.array of int
+        Increasing indexes of the storms to read.
+
+    Returns
+    -------
+    ibtracs_ds : xarray.Dataset
+        Storms with dimensions storm and date_time, the positions padded to the longest storm.
+    """
+    offsets = hf_data['offsets'][:]
+    n_pos = offsets[storms + 1] - offsets[storms]
+    pos_msk = np.arange(n_pos.max())[None] < n_pos[:, None]
+    # read the runs of consecutive storms at once
+    runs = [(offsets[run[0]], offsets[run[-1] + 1])
+            for run in np.split(storms, np.flatnonzero(np.diff(storms) > 1) + 1)]
+    data_vars = {
+        'sid': ('storm', hf_data['sid'][:][storms]),
+        'name': ('storm', hf_data['name'][:][storms]),
+    }
+    for var, dset in hf_data['nodes'].items():
+        values = np.concatenate([dset[start:end] for start, end in runs])
+        if var == 'time':
+            values = values.view('datetime64[ns]')
+        fill = {'f': np.nan, 'M': np.datetime64('NaT'), 'S': b''}.get(values.dtype.kind, 0)
+        data_vars[var] = (('storm', 'date_time'), np.full(pos_msk.shape, fill, values.dtype))
+        data_vars[var][1][pos_msk] = values
+    return xr.Dataset(data_vars).set_coords(list(hf_data.attrs['coords']))
+
 def ibtracs_track_agency(ds_sel):
     """Get preferred IBTrACS agency for each entry in the dataset.
 
@@ -2051,6 +2757,6 @@ def set_category(max_sus_wind, wind_unit='kn', saffir_scale=None):
     
         
     try:
-        return (np.argwhere(max_wind < saffir_scale) - 1)[0][0]
+        return (np.argwhere(max_wind < np.array(saffir_scale)) - 1)[0][0]
     except IndexError:
         return -1
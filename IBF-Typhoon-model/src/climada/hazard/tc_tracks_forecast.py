@@ -27,6 +27,8 @@ import fnmatch
 import ftplib
 import logging
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # additional libraries
@@ -49,6 +51,16 @@ ECMWF_FTP = 'dissemination.ecmwf.int'
 ECMWF_USER = 'wmo'
 ECMWF_PASS = 'essential'
 
+FTP_WORKERS = 4
+"""Number of parallel connections to the FTP server used to download the tracks"""
+
+FTP_MAX_TRIES = 5
+"""Number of attempts to download a single file before giving up"""
+
+FTP_BACKOFF = 2
+"""Waiting time in seconds after the first failed download of a file, doubled after
+every further failure"""
+
 BASINS = {
     'W': 'W - North West Pacific',
     'C': 'C - North Central Pacific',
@@ -85,7 +97,8 @@ class TCForecast(TCTracks):
         data (list(xarray.Dataset)): Same as in parent class, adding the
             following attributes
                 - ensemble_member (int)
-                - is_ensemble (bool)
+                - is_ensemble (str): 'True' for the ensemble members, 'False'
+                  for the deterministic forecast
     """
 
     def fetch_ecmwf(self, path=None, files=None):
@@ -122,12 +135,19 @@ class TCForecast(TCTracks):
                 pass
 
     @staticmethod
-    def fetch_bufr_ftp(target_dir=None, remote_dir=None):
+    def fetch_bufr_ftp(target_dir=None, remote_dir=None, n_workers=FTP_WORKERS,
+                       max_tries=FTP_MAX_TRIES, backoff=FTP_BACKOFF, host=ECMWF_FTP, port=21):
         """
         Fetch and read latest ECMWF TC track predictions from the FTP
-        dissemination server. If target_dir is set, the files get downloaded
-        persistently to the given location. A list of opened file-like objects
-        gets returned.
+        dissemination server. If target_dir is set, the files get mirrored
+        persistently to the folder target_dir/remote_dir, where files that are
+        already present with the same size as on the server are not downloaded
+        again, and their paths get returned. Otherwise a list of opened
+        file-like objects gets returned.
+
+        The files are downloaded over several connections in parallel. The
+        download of a single file is retried after a failure, with an
+        exponentially increasing waiting time.
 
         Parameters:
             target_dir (str): An existing directory to write the files to. If
@@ -135,13 +155,21 @@ class TCForecast(TCTracks):
             remote_dir (str, optional): If set, search this ftp folder for
                 forecast files; defaults to the latest. Format:
                 yyyymmddhhmmss, e.g. 20200730120000
+            n_workers (int, optional): Number of parallel connections.
+            max_tries (int, optional): Number of attempts per file.
+            backoff (float, optional): Waiting time in seconds after the first
+                failed attempt, doubled after every further one.
+            host (str, optional): FTP server, defaults to the ECMWF one.
+            port (int, optional): FTP port.
 
         Returns:
             [str] or [filelike]
         """
-        con = ftplib.FTP(host=ECMWF_FTP, user=ECMWF_USER, passwd=ECMWF_PASS)
+        con = ftplib.FTP()
 
         try:
+            con.connect(host, port)
+            con.login(ECMWF_USER, ECMWF_PASS)
             if remote_dir is None:
                 remote = pd.Series(con.nlst())
                 remote = remote[remote.str.endswith(('000000', '060000', '120000', '180000'))]
@@ -153,63 +181,92 @@ class TCForecast(TCTracks):
             remotefiles = fnmatch.filter(con.nlst(), '*tropical_cyclone*')
             if len(remotefiles) == 0:
                 # TODO: Make a PR in climada for this
-                msg = 'No tracks found at ftp://{}/{}'.format(ECMWF_FTP, remote_dir)
+                msg = 'No tracks found at ftp://{}/{}'.format(host, remote_dir)
                 raise FileNotFoundError(msg)
 
-            localfiles = []
-
-            LOGGER.info('Fetching BUFR tracks:')
-            for rfile in tqdm.tqdm(remotefiles, desc='Download', unit=' files'):
-                if target_dir:
-                    lfile = Path(target_dir, rfile).open('w+b')
-                else:
-                    lfile = tempfile.TemporaryFile(mode='w+b')
-
-                con.retrbinary('RETR ' + rfile, lfile.write)
-
-                if target_dir:
-                    localfiles.append(lfile.name)
-                    lfile.close()
-                else:
-                    localfiles.append(lfile)
+            localfiles = dict()
+            mirror = None
+            if target_dir:
+                mirror = Path(target_dir, remote_dir)
+                mirror.mkdir(parents=True, exist_ok=True)
+                for rfile in remotefiles:
+                    lfile = mirror.joinpath(rfile)
+                    if lfile.is_file() and lfile.stat().st_size == _ftp_size(con, rfile):
+                        localfiles[rfile] = str(lfile)
+            _ftp_close(con)
+            con = None
+
+            missing = [rfile for rfile in remotefiles if rfile not in localfiles]
+            LOGGER.info('Fetching %d BUFR tracks, %d already present',
+                        len(missing), len(localfiles))
+            n_workers = max(1, min(n_workers, len(missing)))
+            with ThreadPoolExecutor(max_workers=n_workers) as executor:
+                for fetched in executor.map(
+                        lambda rfiles: _ftp_download(rfiles, host, port, remote_dir, mirror,
+                                                     max_tries, backoff),
+                        [missing[i::n_workers] for i in range(n_workers)]):
+                    localfiles.update(fetched)
 
         except ftplib.all_errors as err:
-            con.quit()
+            _ftp_close(con)
             raise type(err)('Error while downloading BUFR TC tracks: ' + str(err)) from err
 
-        _ = con.quit()
-
-        return localfiles
+        return [localfiles[rfile] for rfile in remotefiles]
 
     def read_one_bufr_tc(self, file, id_no=None, fcast_rep=None):
         """ Read a single BUFR TC track file.
 
+        The decoded values of every subset are taken directly from the BUFR
+        template data into numpy columns, one track per subset.
+
         Parameters:
             file (str, filelike): Path object, string, or file-like object
-            id_no (int): Numerical ID; optional. Else use date + random int.
-            fcast_rep (int): Of the form 1xx000, indicating the delayed
-                replicator containing the forecast values; optional.
+            id_no (int): Numerical ID; optional. Not used, kept for
+                compatibility with read_one_bufr_tc_text.
+            fcast_rep (int): Not used, kept for compatibility with
+                read_one_bufr_tc_text.
         """
+        bufr = self._decode_bufr(file)
+        timestamp_origin, provider = self._bufr_origin(bufr)
+        template_data = bufr.template_data.value
+
+        # all subsets of a compressed message, as the ECMWF ones, share the same
+        # descriptors, so that they can be processed as one array
+        layouts = dict()
+        for i, descriptors in enumerate(template_data.decoded_descriptors_all_subsets):
+            layouts.setdefault(tuple(d.id for d in descriptors), []).append(i)
+
+        tracks = dict()
+        for ids, subsets in layouts.items():
+            values = np.array([template_data.decoded_values_all_subsets[i] for i in subsets],
+                              dtype=object)
+            columns = self._bufr_columns(np.array(ids), values)
+            for i, subset in enumerate(subsets):
+                tracks[subset] = self._columns_to_track(
+                    columns, i, subset + 1, timestamp_origin, provider)
+
+        for subset in sorted(tracks):
+            if tracks[subset] is not None:
+                self.append(tracks[subset])
+            else:
+                LOGGER.debug('Dropping empty track, subset %s', subset + 1)
 
+    @staticmethod
+    def _decode_bufr(file):
+        """Decode a BUFR file given as path or file-like object"""
         decoder = pybufrkit.decoder.Decoder()
- 
-
-
         if hasattr(file, 'read'):
-            bufr = decoder.process(file.read())
-        elif hasattr(file, 'read_bytes'):
-            bufr = decoder.process(file.read_bytes())
-        elif os.path.isfile(file):
-            with open(file, 'rb') as i:
-                bufr = decoder.process(i.read())
-        else:
-            raise FileNotFoundError('Check file argument')
-        text_data = FlatTextRenderer().render(bufr)
-        
-        # setup parsers and querents
-        #npparser = pybufrkit.dataquery.NodePathParser()
-        #data_query = pybufrkit.dataquery.DataQuerent(npparser).query
+            return decoder.process(file.read())
+        if hasattr(file, 'read_bytes'):
+            return decoder.process(file.read_bytes())
+        if Path(file).is_file():
+            with Path(file).open('rb') as i:
+                return decoder.process(i.read())
+        raise FileNotFoundError('Check file argument')
 
+    @staticmethod
+    def _bufr_origin(bufr):
+        """Forecast time and data provider of a decoded BUFR message"""
         meparser = pybufrkit.mdquery.MetadataExprParser()
         meta_query = pybufrkit.mdquery.MetadataQuerent(meparser).query
         timestamp_origin = dt.datetime(
@@ -224,7 +281,127 @@ class TCForecast(TCTracks):
             provider = 'ECMWF'
         else:
             provider = 'BUFR code ' + str(orig_centre)
-            
+        return timestamp_origin, provider
+
+    @staticmethod
+    def _bufr_columns(ids, values):
+        """Select the track variables from the decoded values of subsets sharing a layout
+
+        Parameters:
+            ids (np.array): descriptor ids of the layout, e.g. 5002 for 005002
+            values (np.array): decoded values of shape (nsubsets, ids.size)
+
+        Returns:
+            dict(np.array), each of shape (nsubsets, nvalues)
+        """
+        # the location descriptors refer to the last preceding significance 008005:
+        # 1 for the storm centre, 3 for the location of the maximum wind
+        sig_pos = np.flatnonzero(ids == 8005)
+        if sig_pos.size:
+            last_sig = np.searchsorted(sig_pos, np.arange(ids.size), side='right') - 1
+            sig = values[0, sig_pos[np.maximum(last_sig, 0)]]
+        else:
+            sig = np.zeros(ids.size, dtype=object)
+
+        def column(mask):
+            col = values[:, mask]
+            col[np.equal(col, None)] = np.nan
+            return col.astype(float)
+
+        def first(code):
+            return values[:, np.flatnonzero(ids == code)[0]]
+
+        return {
+            'pressure': column(ids == 10051) / 100,
+            'lat': column((ids == 5002) & (sig == SIG_CENTRE)),
+            'lon': column((ids == 6002) & (sig == SIG_CENTRE)),
+            'lat_max_wind': column((ids == 5002) & (sig == 3)),
+            'lon_max_wind': column((ids == 6002) & (sig == 3)),
+            'wind': column(ids == 11012),
+            'lead_time': column(ids == 4024),
+            'year': first(4001),
+            'month': first(4002),
+            'day': first(4003),
+            'hour': first(4004),
+            'storm_name': first(1027),
+            'storm_id': first(1025),
+            'ens_type': first(1092),
+        }
+
+    @staticmethod
+    def _columns_to_track(columns, index, ens_number, timestamp_origin, provider):
+        """Build the xr.Dataset of one subset from the columns of _bufr_columns"""
+        try:
+            name = columns['storm_name'][index].decode().strip()
+            sid = columns['storm_id'][index].decode().strip()
+            lead_time = columns['lead_time'][index]
+            if not np.isnan(lead_time).any():
+                lead_time = lead_time.astype(np.int64)
+            timestamp = timestamp_origin + lead_time.astype('timedelta64[h]')
+            lat, lon = columns['lat'][index], columns['lon'][index]
+            max_radius = np.sqrt(np.square(lat - columns['lat_max_wind'][index])
+                                 + np.square(lon - columns['lon_max_wind'][index])) * 111
+            forecast_time = dt.datetime(int(columns['year'][index]), int(columns['month'][index]),
+                                        int(columns['day'][index]), int(columns['hour'][index]))
+
+            # the first values are the analysis, followed by one value per lead time
+            track = xr.Dataset(
+                data_vars={
+                    'max_sustained_wind': ('time', columns['wind'][index][1:]),
+                    'central_pressure': ('time', columns['pressure'][index][1:]),
+                    'ts_int': ('time', lead_time),
+                    'max_radius': ('time', max_radius[1:]),
+                    'environmental_pressure': ('time', np.full_like(
+                        timestamp, DEF_ENV_PRESSURE, dtype=float)),
+                    'radius_max_wind': ('time', np.full_like(timestamp, np.nan, dtype=float)),
+                    'time_step': ('time', np.diff(lead_time, prepend=0)),
+                },
+                coords={
+                    'lat': ('time', lat[1:]),
+                    'lon': ('time', lon[1:]),
+                    'time': timestamp,
+                },
+                attrs={
+                    'max_sustained_wind_unit': 'm/s',
+                    'central_pressure_unit': 'mb',
+                    'name': name,
+                    'sid': sid,
+                    'orig_event_flag': False,
+                    'data_provider': provider,
+                    'id_no': 'NA',
+                    'ensemble_number': ens_number,
+                    'is_ensemble': str(columns['ens_type'][index] != 0),
+                    'forecast_time': forecast_time,
+                })
+            track.attrs['basin'] = BASINS[sid[2].upper()]
+            track.attrs['category'] = CAT_NAMES[set_category(
+                max_sus_wind=track.max_sustained_wind.values,
+                wind_unit=track.max_sustained_wind_unit,
+                saffir_scale=SAFFIR_MS_CAT)]
+        except (AttributeError, IndexError, KeyError, TypeError, ValueError) as err:
+            LOGGER.warning('Problem with track for %s subset %d, skipping: %s',
+                           columns['storm_name'][index], ens_number, err)
+            return None
+
+        if track.sizes['time'] == 0:
+            return None
+        return track
+
+    def read_one_bufr_tc_text(self, file, id_no=None, fcast_rep=None):
+        """ Read a single BUFR TC track file by parsing its text rendering.
+
+        Slower predecessor of read_one_bufr_tc, kept for comparison.
+
+        Parameters:
+            file (str, filelike): Path object, string, or file-like object
+            id_no (int): Numerical ID; optional. Else use date + random int.
+            fcast_rep (int): Of the form 1xx000, indicating the delayed
+                replicator containing the forecast values; optional.
+        """
+        bufr = self._decode_bufr(file)
+        text_data = FlatTextRenderer().render(bufr)
+        timestamp_origin, provider = self._bufr_origin(bufr)
+
         list1=[]
         with StringIO(text_data) as input_data:
             # Skips text before the beginning of the interesting block:
@@ -313,7 +490,7 @@ class TCForecast(TCTracks):
                                                 'data_provider': provider,
                                                 'id_no': 'NA',
                                                 'ensemble_number': int(names),
-                                                'is_ensemble': ['TRUE' if frcst_type[0]!='0' else 'False'][0],
+                                                'is_ensemble': str(frcst_type[0] != '0'),
                                                 'forecast_time': date_object,
                                                 })
                 track = track.set_coords(['lat', 'lon'])
@@ -518,3 +695,86 @@ class TCForecast(TCTracks):
                              'More than one delayed replicator in BUFR file')
 
         return str(delayed_replicators[0])
+
+
+def _ftp_close(con):
+    """Close an FTP connection, also if it is already broken"""
+    if con is None:
+        return
+    try:
+        con.quit()
+    except ftplib.all_errors:
+        con.close()
+
+
+def _ftp_size(con, rfile):
+    """Size of a remote file in bytes, None if the server doesn't tell"""
+    try:
+        con.voidcmd('TYPE I')
+        return con.size(rfile)
+    except ftplib.all_errors:
+        return None
+
+
+def _ftp_download(rfiles, host, port, remote_dir, mirror, max_tries, backoff):
+    """Download files over a single connection, retrying every file on failure
+
+    Parameters:
+        rfiles (list(str)): file names in remote_dir
+        host (str): FTP server
+        port (int): FTP port
+        remote_dir (str): folder on the server
+        mirror (Path): local folder to write the files to, tempfiles if None
+        max_tries (int): number of attempts per file
+        backoff (float): waiting time in seconds after the first failed attempt
+
+    Returns:
+        dict mapping the remote file names to the local paths or tempfiles
+    """
+    con = None
+    localfiles = dict()
+    try:
+        for rfile in rfiles:
+            for attempt in range(max_tries):
+                try:
+                    if con is None:
+                        con = ftplib.FTP()
+                        con.connect(host, port)
+                        con.login(ECMWF_USER, ECMWF_PASS)
+                        con.cwd(remote_dir)
+                    localfiles[rfile] = _ftp_retrieve(con, rfile, mirror)
+                    break
+                except ftplib.all_errors as err:
+                    # start over with a fresh connection
+                    _ftp_close(con)
+                    con = None
+                    if attempt + 1 == max_tries:
+                        raise
+                    wait = backoff * 2**attempt
+                    LOGGER.warning('Download of %s failed (%s), retrying in %s s',
+                                   rfile, err, wait)
+                    time.sleep(wait)
+    finally:
+        _ftp_close(con)
+    return localfiles
+
+
+def _ftp_retrieve(con, rfile, mirror):
+    """Download a single file to the mirror folder or, if None, to a tempfile"""
+    if mirror is None:
+        lfile = tempfile.TemporaryFile(mode='w+b')
+        try:
+            con.retrbinary('RETR ' + rfile, lfile.write)
+        except ftplib.all_errors:
+            lfile.close()
+            raise
+        return lfile
+
+    # write to a partial file first so that interrupted downloads are never taken
+    # for mirrored files
+    lfile = mirror.joinpath(rfile)
+    partfile = mirror.joinpath(rfile + '.part')
+    with partfile.open('wb') as part:
+        con.retrbinary('RETR ' + rfile, part.write)
+    partfile.replace(lfile)
+    return str(lfile)
@@ -77,6 +77,13 @@ land_geom = climada.util.coordinates.get_land_geometry(
 v_rel, p_rel = _calc_land_decay(tracks.data, land_geom,
                                 pool=tracks.pool)"""
 
+MAX_CHUNK_SYNTH = 10000
+"""Maximum number of synthetic tracks generated together, on one flat array of their nodes
+(number of tracks in a chunk times the number of synthetic tracks per track)."""
+
+MAX_CHUNK_DECAY = 1000
+"""Maximum number of tracks in a chunk to which the landfall decay is applied together."""
+
 def calc_perturbed_trajectories(tracks,
                                 nb_synth_tracks=9,
                                 max_shift_ini=0.75,
@@ -120,6 +127,11 @@ def calc_perturbed_trajectories(tracks,
     This is not an in-depth calibration and should be treated as such.
     The object is mutated in-place.
 
+    The tracks are processed in chunks, the nodes of all tracks of a chunk on flat arrays. If
+    the tracks have a pool, the chunks are distributed over its processes. The random numbers
+    are drawn in the order of the tracks, so that a given seed generates the same tracks with
+    and without pool.
+
     Parameters
     ----------
     tracks : climada.hazard.TCTracks
@@ -183,23 +195,24 @@ def calc_perturbed_trajectories(tracks,
                       if track.time.size > 1 else np.random.uniform(size=nb_synth_tracks * 2)
                       for track in tracks.data]
 
+    # the tracks of a chunk are perturbed together, on one flat array of all their nodes
+    chunks = _track_chunks(tracks.data, tracks.pool, max(1, MAX_CHUNK_SYNTH // nb_synth_tracks))
+    rnd_chunks = _track_chunks(random_vec, tracks.pool,
+                               max(1, MAX_CHUNK_SYNTH // nb_synth_tracks))
     if tracks.pool:
-        chunksize = min(tracks.size // tracks.pool.ncpus, 1000)
-        new_ens = tracks.pool.map(_one_rnd_walk, tracks.data,
-                                  itertools.repeat(nb_synth_tracks, tracks.size),
-                                  itertools.repeat(max_shift_ini, tracks.size),
-                                  itertools.repeat(max_dspeed_rel, tracks.size),
-                                  itertools.repeat(max_ddirection, tracks.size),
-                                  random_vec, chunksize=chunksize)
+        new_ens = tracks.pool.map(_rnd_walk_tracks, chunks,
+                                  itertools.repeat(nb_synth_tracks, len(chunks)),
+                                  itertools.repeat(max_shift_ini, len(chunks)),
+                                  itertools.repeat(max_dspeed_rel, len(chunks)),
+                                  itertools.repeat(max_ddirection, len(chunks)),
+                                  rnd_chunks)
     else:
-        new_ens = [_one_rnd_walk(track, nb_synth_tracks, max_shift_ini,
-                                 max_dspeed_rel, max_ddirection, rand)
-                   for track, rand in zip(tracks.data, random_vec)]
-
-    cutoff_track_ids_tc = [x[1] for x in new_ens]
-    cutoff_track_ids_tc = sum(cutoff_track_ids_tc, [])
-    cutoff_track_ids_ts = [x[2] for x in new_ens]
-    cutoff_track_ids_ts = sum(cutoff_track_ids_ts, [])
+        new_ens = [_rnd_walk_tracks(chunk, nb_synth_tracks, max_shift_ini,
+                                    max_dspeed_rel, max_ddirection, rnd_chunk)
+                   for chunk, rnd_chunk in zip(chunks, rnd_chunks)]
+
+    cutoff_track_ids_tc = list(itertools.chain.from_iterable(x[1] for x in new_ens))
+    cutoff_track_ids_ts = list(itertools.chain.from_iterable(x[2] for x in new_ens))
     if len(cutoff_track_ids_tc) > 0:
         LOGGER.info('The following generated synthetic tracks moved beyond '
                     'the range of [-70, 70] degrees latitude. Cut out '
@@ -210,8 +223,7 @@ def calc_perturbed_trajectories(tracks,
                      'the range of [-70, 70] degrees latitude. Cut out '
                      'at TC category <= 1: %s.',
                      ', '.join(cutoff_track_ids_ts))
-    new_ens = [x[0] for x in new_ens]
-    tracks.data = sum(new_ens, [])
+    tracks.data = list(itertools.chain.from_iterable(x[0] for x in new_ens))
 
     if decay:
         extent = tracks.get_extent()
@@ -239,6 +251,13 @@ def calc_perturbed_trajectories(tracks,
                                 'if use_global_decay_params=False.')
 
 
+def _track_chunks(items, pool, max_size):
+    """Split a list (of tracks) into chunks processed together, at least one per process."""
+    ncpus = pool.ncpus if pool else 1
+    chunksize = max(1, min(-(-len(items) // ncpus), max_size))
+    return [items[idx:idx + chunksize] for idx in range(0, len(items), chunksize)]
+
+
 def _one_rnd_walk(track, nb_synth_tracks, max_shift_ini, max_dspeed_rel, max_ddirection, rnd_vec):
     """
     Apply random walk to one track.
@@ -272,82 +291,193 @@ def _one_rnd_walk(track, nb_synth_tracks, max_shift_ini, max_dspeed_rel, max_ddi
         List containing information about the tracks that were cut off at high
         latitudes with a wind speed up to TC category 1.
     """
-    ens_track = list()
-    n_dat = track.time.size
-    n_seg = n_dat - 1
-    xy_ini = max_shift_ini * (2 * rnd_vec[:2 * nb_synth_tracks].reshape((2, nb_synth_tracks)) - 1)
-    [dt] = np.unique(track['time_step'])
+    return _rnd_walk_tracks([track], nb_synth_tracks, max_shift_ini, max_dspeed_rel,
+                            max_ddirection, [rnd_vec])
+
+
+def _rnd_walk_tracks(tracks, nb_synth_tracks, max_shift_ini, max_dspeed_rel, max_ddirection,
+                     rnd_vecs):
+    """
+    Apply random walk to several tracks at once, see `_one_rnd_walk`.
+
+    The nodes of all tracks and of all their synthetic tracks are concatenated to flat arrays
+    with the offsets of the tracks. The perturbations are computed for all of them at once and
+    the walk itself runs in one compiled loop.
+
+    Parameters
+    ----------
+    tracks : list(xr.Dataset)
+        Track data.
+    nb_synth_tracks, max_shift_ini, max_dspeed_rel, max_ddirection
+        See `_one_rnd_walk`.
+    rnd_vecs : list(np.ndarray)
+        Vector of random perturbations for each track, see `_one_rnd_walk`.
+
+    Returns
+    -------
+    ens_track : list(xr.Dataset)
+        Each track followed by its generated synthetic tracks.
+    cutoff_track_ids_tc, cutoff_track_ids_ts : List of str
+        See `_one_rnd_walk`.
+    """
+    if not tracks:
+        return [], [], []
+    sizes = np.array([track.time.size for track in tracks])
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    lon = np.concatenate([track.lon.values for track in tracks])
+    lat = np.concatenate([track.lat.values for track in tracks])
+    time_step_h = np.array([np.unique(track['time_step']) for track in tracks]).ravel()
+
+    # bearings and angular distances of the segments of the original tracks (the segments
+    # from the last node of a track to the first one of the next track are never used)
+    bearings = np.zeros(lon.size)
+    angular_dist = np.zeros(lon.size)
+    if lon.size > 1:
+        bearings[:-1] = _get_bearing_angle(lon, lat)
+        angular_dist[:-1] = climada.util.coordinates.dist_approx(lat[:-1, None], lon[:-1, None],
+                                                                 lat[1:, None], lon[1:, None],
+                                                                 method="geosphere",
+                                                                 units="degree")[:, 0, 0]
+
+    # node i of synthetic track i_ens of track i_track
+    syn_track = np.repeat(np.arange(sizes.size), nb_synth_tracks)
+    syn_ens = np.tile(np.arange(nb_synth_tracks), sizes.size)
+    syn_sizes = sizes[syn_track]
+    syn_offsets = np.concatenate([[0], np.cumsum(syn_sizes)])
+    node_syn = np.repeat(np.arange(syn_sizes.size), syn_sizes)
+    node_track, node_ens = syn_track[node_syn], syn_ens[node_syn]
+    node_i = np.arange(node_syn.size) - syn_offsets[node_syn]
+    n_seg = sizes[node_track] - 1
+
+    # perturbations of the segments, at the same positions of the random vectors as before
+    rnd_vec = np.concatenate(rnd_vecs)
+    rnd_offsets = np.concatenate([[0], np.cumsum([vec.size for vec in rnd_vecs])])
+    seg = node_i < n_seg
+    i_ang = (rnd_offsets[node_track] + 2 * nb_synth_tracks + node_ens * n_seg + node_i)[seg]
+    i_trans = i_ang + nb_synth_tracks * n_seg[seg]
+    # scale by maximum perturbation and time step in hour (temporal-resolution independent)
+    ang_pert = np.zeros(node_i.size)
+    ang_pert[seg] = time_step_h[node_track[seg]] \
+        * np.degrees(max_ddirection * (2 * rnd_vec[i_ang] - 1))
+    trans_pert = 1 + max_dspeed_rel * (2 * rnd_vec[i_trans] - 1)
+    seg_bearings = np.zeros(node_i.size)
+    seg_bearings[seg] = bearings[offsets[node_track[seg]] + node_i[seg]]
+    seg_dist = np.zeros(node_i.size)
+    seg_dist[seg] = trans_pert * angular_dist[offsets[node_track[seg]] + node_i[seg]]
+
+    # perturbed starting points
+    new_lon = np.zeros(node_i.size)
+    new_lat = np.zeros(node_i.size)
+    i_ini = rnd_offsets[syn_track] + syn_ens
+    new_lon[syn_offsets[:-1]] = lon[offsets[syn_track]] \
+        + max_shift_ini * (2 * rnd_vec[i_ini] - 1)
+    new_lat[syn_offsets[:-1]] = lat[offsets[syn_track]] \
+        + max_shift_ini * (2 * rnd_vec[i_ini + nb_synth_tracks] - 1)
+
+    syn_lengths = _rnd_walk_nodes(new_lon, new_lat, syn_offsets, seg_bearings, ang_pert,
+                                  seg_dist)
+    # make sure longitude values are within (-180, 180)
+    climada.util.coordinates.lon_normalize(new_lon, center=0.0)
 
-    ens_track.append(track)
+    ens_track = list()
     cutoff_track_ids_ts = []
     cutoff_track_ids_tc = []
-    for i_ens in range(nb_synth_tracks):
-        i_track = track.copy(True)
-
-        # select angular perturbation for that synthetic track
-        i_start_ang = 2 * nb_synth_tracks + i_ens * n_seg
-        i_end_ang = i_start_ang + track.time.size - 1
-        # scale by maximum perturbation and time step in hour (temporal-resolution independent)
-        ang_pert = dt * np.degrees(max_ddirection * (2 * rnd_vec[i_start_ang:i_end_ang] - 1))
-        ang_pert_cum = np.cumsum(ang_pert)
-
-        # select translational speed perturbation for that synthetic track
-        i_start_trans = 2 * nb_synth_tracks + nb_synth_tracks * n_seg + i_ens * n_seg
-        i_end_trans = i_start_trans + track.time.size - 1
-        # scale by maximum perturbation and time step in hour (temporal-resolution independent)
-        trans_pert = 1 + max_dspeed_rel * (2 * rnd_vec[i_start_trans:i_end_trans] - 1)
-
-        # get bearings and angular distance for the original track
-        bearings = _get_bearing_angle(i_track.lon.values, i_track.lat.values)
-        angular_dist = climada.util.coordinates.dist_approx(i_track.lat.values[:-1, None],
-                                                            i_track.lon.values[:-1, None],
-                                                            i_track.lat.values[1:, None],
-                                                            i_track.lon.values[1:, None],
-                                                            method="geosphere",
-                                                            units="degree")[:, 0, 0]
-
-        # apply perturbation to lon / lat
-        new_lon = np.zeros_like(i_track.lon.values)
-        new_lat = np.zeros_like(i_track.lat.values)
-        new_lon[0] = i_track.lon.values[0] + xy_ini[0, i_ens]
-        new_lat[0] = i_track.lat.values[0] + xy_ini[1, i_ens]
-        last_idx = i_track.time.size
-        for i in range(0, len(new_lon) - 1):
-            new_lon[i + 1], new_lat[i + 1] = \
-                _get_destination_points(new_lon[i], new_lat[i],
-                                        bearings[i] + ang_pert_cum[i],
-                                        trans_pert[i] * angular_dist[i])
+    for i_syn, (i_track, i_ens) in enumerate(zip(syn_track, syn_ens)):
+        track = tracks[i_track]
+        if i_ens == 0:
+            ens_track.append(track)
+        last_idx = syn_lengths[i_syn]
+        if last_idx < sizes[i_track]:
+            # the track crossed the latitudinal thresholds (+-70°)
+            max_wind_end = track.max_sustained_wind.values[last_idx]
+            ss_scale_end = climada.hazard.tc_tracks.set_category(max_wind_end,
+                                                                 track.max_sustained_wind_unit)
+            # TC category at ending point should not be higher than 1
+            cutoff_txt = track.attrs['name'] + '_gen' + str(i_ens + 1)
+            cutoff_txt = cutoff_txt + ' (%s)' % climada.hazard.tc_tracks.CAT_NAMES[ss_scale_end]
+            if ss_scale_end > 1:
+                cutoff_track_ids_tc.append(cutoff_txt)
+            else:
+                cutoff_track_ids_ts.append(cutoff_txt)
+        sel = slice(syn_offsets[i_syn], syn_offsets[i_syn] + last_idx)
+        ens_track.append(_synth_track(track, i_ens, new_lon[sel], new_lat[sel]))
+
+    return ens_track, cutoff_track_ids_tc, cutoff_track_ids_ts
+
+
+def _synth_track(track, i_ens, lon, lat):
+    """
+    Copy of the first nodes of a track with perturbed coordinates.
+
+    Parameters
+    ----------
+    track : xr.Dataset
+        Track data.
+    i_ens : int
+        Number of the synthetic track (starting with 0).
+    lon, lat : np.ndarray
+        Coordinates of the synthetic track, as many as the nodes to copy.
+
+    Returns
+    -------
+    xr.Dataset
+    """
+    if lon.size < track.time.size:
+        track = track.isel(time=slice(None, lon.size))
+    i_track = track.copy(True)
+    i_track.lon.values = lon
+    i_track.lat.values = lat
+    i_track.attrs['orig_event_flag'] = False
+    i_track.attrs['name'] = i_track.attrs['name'] + '_gen' + str(i_ens + 1)
+    i_track.attrs['sid'] = i_track.attrs['sid'] + '_gen' + str(i_ens + 1)
+    i_track.attrs['id_no'] = i_track.attrs['id_no'] + (i_ens + 1) / 100
+    return i_track
+
+
+@numba.njit
+def _rnd_walk_nodes(lon, lat, offsets, bearings, ang_pert, angular_dist):
+    """
+    Walk along the perturbed segments of several tracks, from their starting points.
+
+    The positions of each track are computed up to the first node beyond the latitudinal
+    thresholds (+-70°) and one more node, or up to the end of the track.
+
+    Parameters
+    ----------
+    lon, lat : numpy.ndarray
+        Coordinates of the nodes of all tracks, in decimal degrees. The first node of each
+        track is set, the others are computed in place.
+    offsets : numpy.ndarray of int
+        Index of the first node of each track, followed by the total number of nodes.
+    bearings : numpy.ndarray
+        Bearing angle of the segment starting at each node, in decimal degrees.
+    ang_pert : numpy.ndarray
+        Perturbation of the bearing angle of the segment starting at each node, cumulated
+        along the track.
+    angular_dist : numpy.ndarray
+        Angular distance of the segment starting at each node, in decimal degrees.
+
+    Returns
+    -------
+    lengths : numpy.ndarray of int
+        Number of nodes kept of each track.
+    """
+    lengths = np.empty(offsets.size - 1, dtype=np.int64)
+    for i_track in range(lengths.size):
+        start, end = offsets[i_track], offsets[i_track + 1]
+        lengths[i_track] = end - start
+        ang_pert_cum = 0.0
+        for node in range(start, end - 1):
+            ang_pert_cum += ang_pert[node]
+            lon[node + 1], lat[node + 1] = _get_destination_points(
+                lon[node], lat[node], bearings[node] + ang_pert_cum, angular_dist[node])
             # if track crosses latitudinal thresholds (+-70°),
             # keep up to this segment (i+1), set i+2 as last point,
             # and discard all further points > i+2.
-            if i+2 < last_idx and (new_lat[i + 1] > 70 or new_lat[i + 1] < -70):
-                last_idx = i + 2
-                # end the track here
-                max_wind_end = i_track.max_sustained_wind.values[last_idx]
-                ss_scale_end = climada.hazard.tc_tracks.set_category(max_wind_end,
-                                                                     i_track.max_sustained_wind_unit)
-                # TC category at ending point should not be higher than 1
-                cutoff_txt = i_track.attrs['name'] + '_gen' + str(i_ens + 1)
-                cutoff_txt = cutoff_txt + ' (%s)' % climada.hazard.tc_tracks.CAT_NAMES[ss_scale_end]
-                if ss_scale_end > 1:
-                    cutoff_track_ids_tc = cutoff_track_ids_tc + [cutoff_txt]
-                else:
-                    cutoff_track_ids_ts = cutoff_track_ids_ts + [cutoff_txt]
+            if node - start + 2 < end - start and (lat[node + 1] > 70 or lat[node + 1] < -70):
+                lengths[i_track] = node - start + 2
                 break
-        # make sure longitude values are within (-180, 180)
-        climada.util.coordinates.lon_normalize(new_lon, center=0.0)
-
-        i_track.lon.values = new_lon
-        i_track.lat.values = new_lat
-        i_track.attrs['orig_event_flag'] = False
-        i_track.attrs['name'] = i_track.attrs['name'] + '_gen' + str(i_ens + 1)
-        i_track.attrs['sid'] = i_track.attrs['sid'] + '_gen' + str(i_ens + 1)
-        i_track.attrs['id_no'] = i_track.attrs['id_no'] + (i_ens + 1) / 100
-        i_track = i_track.isel(time=slice(None, last_idx))
-
-        ens_track.append(i_track)
-
-    return ens_track, cutoff_track_ids_tc, cutoff_track_ids_ts
+    return lengths
 
 
 def _random_uniform_ac(n_ts, autocorr, time_step_h):
@@ -383,8 +513,7 @@ def _random_uniform_ac(n_ts, autocorr, time_step_h):
     n_ts_hourly = int(np.ceil(n_ts_hourly_exact))
     x = np.random.normal(size=n_ts_hourly)
     theta = np.arccos(autocorr)
-    for i in range(1, len(x)):
-        x[i] = _h_ac(x[i - 1], x[i], theta)
+    _h_ac_series(x, theta)
     # scale x to have magnitude [0,1]
     x = (x + np.sqrt(3)) / (2 * np.sqrt(3))
     # resample at target time step
@@ -393,6 +522,22 @@ def _random_uniform_ac(n_ts, autocorr, time_step_h):
     return x_ts
 
 
+@numba.njit
+def _h_ac_series(x, theta):
+    """
+    Turn a series of random standard normals into an autocorrelated series, in place
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        Random standard normals, the first value is kept.
+    theta : float
+        arccos of autocorrelation.
+    """
+    for i in range(1, x.size):
+        x[i] = _h_ac(x[i - 1], x[i], theta)
+
+
 @numba.njit
 def _h_ac(x, y, theta):
     """
@@ -575,12 +720,14 @@ def _calc_land_decay(hist_tracks, land_geom, s_rel=True, check_plot=False,
     # x-scale values to compute landfall decay
     x_val = dict()
 
+    # land parameters of all tracks in one vectorized call
+    climada.hazard.tc_tracks.tracks_land_params(hist_tracks, land_geom)
     if pool:
-        dec_val = pool.map(_decay_values, hist_tracks, itertools.repeat(land_geom),
+        dec_val = pool.map(_decay_values, hist_tracks, itertools.repeat(None),
                            itertools.repeat(s_rel),
                            chunksize=min(len(hist_tracks) // pool.ncpus, 1000))
     else:
-        dec_val = [_decay_values(track, land_geom, s_rel) for track in hist_tracks]
+        dec_val = [_decay_values(track, None, s_rel) for track in hist_tracks]
 
     for (tv_lf, tp_lf, tx_val) in dec_val:
         for key in tv_lf.keys():
@@ -625,24 +772,36 @@ def _apply_land_decay(tracks, v_rel, p_rel, land_geom, s_rel=True,
             orig_wind.append(np.copy(track.max_sustained_wind.values))
             orig_pres.append(np.copy(track.central_pressure.values))
 
+    # the tracks of a chunk are processed together, on one flat array of all their nodes
+    chunks = _track_chunks(tracks, pool, MAX_CHUNK_DECAY)
+    if pool:
+        chunks = pool.map(_land_params_chunk, chunks, itertools.repeat(land_geom, len(chunks)))
+    else:
+        chunks = [_land_params_chunk(chunk, land_geom) for chunk in chunks]
+
+    # random numbers drawn in the order of the tracks (and landfalls), also with a pool
+    rnd_sizes = [_decay_rnd_size(chunk) for chunk in chunks]
+    rnd_normal = np.split(np.random.normal(size=sum(rnd_sizes)), np.cumsum(rnd_sizes)[:-1])
     if pool:
-        chunksize = min(len(tracks) // pool.ncpus, 1000)
-        tracks = pool.map(_apply_decay_coeffs, tracks,
-                          itertools.repeat(v_rel), itertools.repeat(p_rel),
-                          itertools.repeat(land_geom), itertools.repeat(s_rel),
-                          chunksize=chunksize)
+        chunks = pool.map(_apply_decay_tracks, chunks,
+                          itertools.repeat(v_rel, len(chunks)), itertools.repeat(p_rel, len(chunks)),
+                          itertools.repeat(s_rel, len(chunks)), rnd_normal)
     else:
-        tracks = [_apply_decay_coeffs(track, v_rel, p_rel, land_geom, s_rel)
-                  for track in tracks]
+        chunks = [_apply_decay_tracks(chunk, v_rel, p_rel, s_rel, rnd)
+                  for chunk, rnd in zip(chunks, rnd_normal)]
+    tracks = list(itertools.chain.from_iterable(chunks))
 
-    for track in tracks:
-        if track.orig_event_flag:
-            climada.hazard.tc_tracks.track_land_params(track, land_geom)
     if check_plot:
         _check_apply_decay_plot(tracks, orig_wind, orig_pres)
     return tracks
 
 
+def _land_params_chunk(tracks, land_geom):
+    """Compute the land parameters of a chunk of tracks and return them."""
+    climada.hazard.tc_tracks.tracks_land_params(tracks, land_geom)
+    return tracks
+
+
 def _decay_values(track, land_geom, s_rel):
     """Compute wind and pressure relative to landafall values.
 
@@ -650,8 +809,8 @@ def _decay_values(track, land_geom, s_rel):
     ----------
     track : xr.Dataset
         track
-    land_geom : shapely.geometry.multipolygon.MultiPolygon
-        land geometry
+    land_geom : shapely.geometry.multipolygon.MultiPolygon or None
+        land geometry. If None, use the land parameters of the track.
     s_rel : bool
         use environmental presure for S value (true) or central presure (false)
 
@@ -671,7 +830,8 @@ def _decay_values(track, land_geom, s_rel):
     p_lf = dict()
     x_val = dict()
 
-    climada.hazard.tc_tracks.track_land_params(track, land_geom)
+    if land_geom is not None:
+        climada.hazard.tc_tracks.track_land_params(track, land_geom)
     sea_land_idx, land_sea_idx = climada.hazard.tc_tracks._get_landfall_idx(track)
     if sea_land_idx.size:
         for sea_land, land_sea in zip(sea_land_idx, land_sea_idx):
@@ -826,7 +986,8 @@ def _apply_decay_coeffs(track, v_rel, p_rel, land_geom, s_rel):
         v_rel (dict): {category: A}, where wind decay = exp(-x*A)
         p_rel (dict): (category: (S, B)},
             where pressure decay = S-(S-1)*exp(-x*B)
-        land_geom (shapely.geometry.multipolygon.MultiPolygon): land geometry
+        land_geom (shapely.geometry.multipolygon.MultiPolygon): land geometry.
+            If None, use the land parameters of the track.
         s_rel (bool): use environmental presure for S value (true) or
             central presure (false)
 
@@ -837,80 +998,226 @@ def _apply_decay_coeffs(track, v_rel, p_rel, land_geom, s_rel):
     if track.orig_event_flag:
         return track
 
-    climada.hazard.tc_tracks.track_land_params(track, land_geom)
-    sea_land_idx, land_sea_idx = climada.hazard.tc_tracks._get_landfall_idx(track)
+    if land_geom is not None:
+        climada.hazard.tc_tracks.track_land_params(track, land_geom)
+    rnd_normal = np.random.normal(size=_decay_rnd_size([track]))
+    _apply_decay_tracks([track], v_rel, p_rel, s_rel, rnd_normal)
+    return track
+
+
+def _decay_landfalls(tracks):
+    """Landfalls of the synthetic tracks on the concatenated nodes of these tracks.
+
+    Parameters:
+        tracks (list(xr.Dataset)): TC tracks with land parameters
+
+    Returns:
+        sy_tracks (list(xr.Dataset)): synthetic tracks
+        offsets (np.array): index of the first node of each synthetic track,
+            followed by the total number of nodes
+        sea_land_idx, land_sea_idx (np.array): first node on land and first
+            node on sea after each landfall, see `_get_landfall_idx`
+        lf_track (np.array): synthetic track of each landfall
+    """
+    sy_tracks = [track for track in tracks if not track.orig_event_flag]
+    offsets = np.cumsum([0] + [track.time.size for track in sy_tracks])
+    on_land = np.zeros(offsets[-1], dtype=bool)
+    if sy_tracks:
+        on_land = np.concatenate([track.on_land.values for track in sy_tracks])
+    sea_land_idx, land_sea_idx = climada.hazard.tc_tracks._landfall_idx_flat(on_land, offsets)
+    lf_track = np.searchsorted(offsets, sea_land_idx, side='right') - 1
+    return sy_tracks, offsets, sea_land_idx, land_sea_idx, lf_track
+
+
+def _decay_rnd_size(tracks):
+    """Number of random numbers used by `_apply_decay_tracks`: one for the values on sea after
+    every landfall of more than one node that is followed by sea."""
+    _, offsets, sea_land_idx, land_sea_idx, lf_track = _decay_landfalls(tracks)
+    return np.count_nonzero((land_sea_idx - sea_land_idx > 1)
+                            & (land_sea_idx < offsets[lf_track + 1]))
+
+
+def _apply_decay_tracks(tracks, v_rel, p_rel, s_rel, rnd_normal):
+    """Change max sustained wind and central pressure of the synthetic tracks using the land
+    decay coefficients, in place. See `_apply_decay_coeffs`.
+
+    The nodes of all synthetic tracks are concatenated to flat arrays and the decay is applied
+    to all their landfalls in one compiled loop.
+
+    Parameters:
+        tracks (list(xr.Dataset)): TC tracks with land parameters
+        v_rel (dict): {category: A}, where wind decay = exp(-x*A)
+        p_rel (dict): (category: (S, B)},
+            where pressure decay = S-(S-1)*exp(-x*B)
+        s_rel (bool): use environmental presure for S value (true) or
+            central presure (false)
+        rnd_normal (np.array): random standard normals, see `_decay_rnd_size`
+
+    Returns:
+        list(xr.Dataset)
+    """
+    sy_tracks, offsets, sea_land_idx, land_sea_idx, lf_track = _decay_landfalls(tracks)
     if not sea_land_idx.size:
-        return track
-    for idx, (sea_land, land_sea) \
-            in enumerate(zip(sea_land_idx, land_sea_idx)):
-        v_landfall = track.max_sustained_wind[sea_land - 1].values
-        p_landfall = float(track.central_pressure[sea_land - 1].values)
-        ss_scale = climada.hazard.tc_tracks.set_category(v_landfall,
-                                                         track.max_sustained_wind_unit)
-        if land_sea - sea_land == 1:
-            continue
-        S = _calc_decay_ps_value(track, p_landfall, land_sea - 1, s_rel)
-        if S <= 1:
-            # central_pressure at start of landfall > env_pres after landfall:
-            # set central_pressure to environmental pressure during whole lf
-            track.central_pressure[sea_land:land_sea] = track.environmental_pressure[sea_land:land_sea]
-        else:
-            p_decay = _decay_p_function(S, p_rel[ss_scale][1],
-                                        track.dist_since_lf[sea_land:land_sea].values)
-            # dont apply decay if it would decrease central pressure
-            if np.any(p_decay < 1):
-                LOGGER.info('Landfall decay would decrease pressure for '
-                            'track id %s, leading to an intensification '
-                            'of the Tropical Cyclone. This behaviour is '
-                            'unphysical and therefore landfall decay is not '
-                            'applied in this case.',
-                            track.sid)
-                p_decay[p_decay < 1] = track.central_pressure[sea_land:land_sea][p_decay < 1] / p_landfall
-            track.central_pressure[sea_land:land_sea] = p_landfall * p_decay
-
-        v_decay = _decay_v_function(v_rel[ss_scale],
-                                    track.dist_since_lf[sea_land:land_sea].values)
-        # dont apply decay if it would increase wind speeds
-        if np.any(v_decay > 1):
+        return tracks
+    wind = np.concatenate([track.max_sustained_wind.values for track in sy_tracks]).astype(float)
+    pres = np.concatenate([track.central_pressure.values for track in sy_tracks]).astype(float)
+    env_pres = np.concatenate([track.environmental_pressure.values
+                               for track in sy_tracks]).astype(float)
+    dist_since_lf = np.concatenate([track.dist_since_lf.values for track in sy_tracks])
+    # conversion factors of the wind speeds to kn, as in `set_category`
+    units = [track.max_sustained_wind_unit for track in sy_tracks]
+    unit_factor = {unit: 1.0 if unit == 'kn'
+                   else climada.hazard.tc_tracks._change_max_wind_unit(1.0, unit, 'kn')
+                   for unit in set(units)}
+    kn_factor = np.array([unit_factor[unit] for unit in units])
+    # coefficients by category -1, ..., 5
+    v_coef = np.full(len(climada.hazard.tc_tracks.SAFFIR_SIM_CAT), np.nan)
+    p_coef = np.full(len(climada.hazard.tc_tracks.SAFFIR_SIM_CAT), np.nan)
+    for ss_scale in range(-1, v_coef.size - 1):
+        if ss_scale in v_rel:
+            v_coef[ss_scale + 1] = v_rel[ss_scale]
+        if ss_scale in p_rel:
+            p_coef[ss_scale + 1] = p_rel[ss_scale][1]
+
+    v_scale, p_scale, p_decrease, v_increase = _apply_decay_nodes(
+        wind, pres, env_pres, dist_since_lf, offsets, sea_land_idx, land_sea_idx, lf_track,
+        kn_factor, np.array(climada.hazard.tc_tracks.SAFFIR_SIM_CAT, dtype=float),
+        v_coef, p_coef, s_rel, rnd_normal)
+    for ss_scale in np.unique(v_scale[v_scale > -2]):
+        if ss_scale not in v_rel:
+            raise KeyError(ss_scale)
+    for ss_scale in np.unique(p_scale[p_scale > -2]):
+        if ss_scale not in p_rel:
+            raise KeyError(ss_scale)
+
+    for i_track in np.unique(lf_track):
+        track = sy_tracks[i_track]
+        sel = slice(offsets[i_track], offsets[i_track + 1])
+        track.max_sustained_wind.values[:] = wind[sel]
+        track.central_pressure.values[:] = pres[sel]
+        track.attrs['category'] = climada.hazard.tc_tracks.set_category(
+            track.max_sustained_wind.values, track.max_sustained_wind_unit)
+        if p_decrease[i_track]:
+            LOGGER.info('Landfall decay would decrease pressure for '
+                        'track id %s, leading to an intensification '
+                        'of the Tropical Cyclone. This behaviour is '
+                        'unphysical and therefore landfall decay is not '
+                        'applied in this case.',
+                        track.sid)
+        if v_increase[i_track]:
             # should not happen unless v_rel is negative
             LOGGER.info('Landfall decay would increase wind speed for '
                         'track id %s. This behavious in unphysical and '
                         'therefore landfall decay is not applied in this '
                         'case.',
                         track.sid)
-            v_decay[v_decay > 1] = (track.max_sustained_wind[sea_land:land_sea][v_decay > 1]
-                                    / v_landfall)
-        track.max_sustained_wind[sea_land:land_sea] = v_landfall * v_decay
+    return tracks
+
+
+@numba.njit
+def _apply_decay_nodes(wind, pres, env_pres, dist_since_lf, offsets, sea_land_idx,
+                       land_sea_idx, lf_track, kn_factor, saffir_scale, v_coef, p_coef, s_rel,
+                       rnd_normal):
+    """Apply the land decay to the landfalls of several tracks, in place.
+
+    Parameters
+    ----------
+    wind, pres, env_pres, dist_since_lf : numpy.ndarray
+        Max sustained wind, central and environmental pressure and distance since landfall at
+        the nodes of all tracks.
+    offsets : numpy.ndarray of int
+        Index of the first node of each track, followed by the total number of nodes.
+    sea_land_idx, land_sea_idx, lf_track : numpy.ndarray of int
+        First node on land, first node on sea after and track of each landfall.
+    kn_factor : numpy.ndarray
+        Factor to convert the wind speeds of each track to kn.
+    saffir_scale : numpy.ndarray
+        Saffir-Simpson scale in kn.
+    v_coef, p_coef : numpy.ndarray
+        Decay coefficients A of the wind and B of the pressure of each category from -1.
+    s_rel : bool
+        use environmental presure for S value (true) or central presure (false)
+    rnd_normal : numpy.ndarray
+        Random standard normals for the corrections of the values on sea after the landfalls.
+
+    Returns
+    -------
+    v_scale, p_scale : numpy.ndarray of int
+        Category of the wind and pressure decay coefficients used for each landfall, -2 if none.
+    p_decrease, v_increase : numpy.ndarray of bool
+        Tracks for which the decay would have decreased the pressure or increased the wind.
+    """
+    v_scale = np.full(sea_land_idx.size, -2, dtype=np.int64)
+    p_scale = np.full(sea_land_idx.size, -2, dtype=np.int64)
+    p_decrease = np.zeros(offsets.size - 1, dtype=np.bool_)
+    v_increase = np.zeros(offsets.size - 1, dtype=np.bool_)
+    i_rnd = 0
+    for i_lf in range(sea_land_idx.size):
+        sea_land, land_sea, i_track = sea_land_idx[i_lf], land_sea_idx[i_lf], lf_track[i_lf]
+        v_landfall = wind[sea_land - 1]
+        p_landfall = pres[sea_land - 1]
+        ss_scale = -1
+        for i_scale in range(saffir_scale.size):
+            if v_landfall * kn_factor[i_track] < saffir_scale[i_scale]:
+                ss_scale = i_scale - 1
+                break
+        if land_sea - sea_land == 1:
+            continue
+        if s_rel:
+            s_coef = env_pres[land_sea - 1] / p_landfall
+        else:
+            s_coef = pres[land_sea - 1] / p_landfall
+        if s_coef <= 1:
+            # central_pressure at start of landfall > env_pres after landfall:
+            # set central_pressure to environmental pressure during whole lf
+            pres[sea_land:land_sea] = env_pres[sea_land:land_sea]
+        else:
+            p_scale[i_lf] = ss_scale
+            for node in range(sea_land, land_sea):
+                p_decay = s_coef - (s_coef - 1) * np.exp(-p_coef[ss_scale + 1]
+                                                         * dist_since_lf[node])
+                # dont apply decay if it would decrease central pressure
+                if p_decay < 1:
+                    p_decrease[i_track] = True
+                    p_decay = pres[node] / p_landfall
+                pres[node] = p_landfall * p_decay
+
+        v_scale[i_lf] = ss_scale
+        for node in range(sea_land, land_sea):
+            v_decay = np.exp(-v_coef[ss_scale + 1] * dist_since_lf[node])
+            # dont apply decay if it would increase wind speeds
+            if v_decay > 1:
+                v_increase[i_track] = True
+                v_decay = wind[node] / v_landfall
+            wind[node] = v_landfall * v_decay
 
         # correct values of sea after a landfall (until next landfall, if any)
-        if land_sea < track.time.size:
-            if idx + 1 < sea_land_idx.size:
+        end_track = offsets[i_track + 1]
+        if land_sea < end_track:
+            if i_lf + 1 < sea_land_idx.size and lf_track[i_lf + 1] == i_track:
                 # if there is a next landfall, correct until last point before
                 # reaching land again
-                end_cor = sea_land_idx[idx + 1]
+                end_cor = sea_land_idx[i_lf + 1]
             else:
                 # if there is no further landfall, correct until the end of
                 # the track
-                end_cor = track.time.size
-            rndn = 0.1 * float(np.abs(np.random.normal(size=1) * 5) + 6)
-            r_diff = track.central_pressure[land_sea].values - \
-                     track.central_pressure[land_sea - 1].values + rndn
-            track.central_pressure[land_sea:end_cor] += - r_diff
+                end_cor = end_track
+            rndn = 0.1 * (np.abs(rnd_normal[i_rnd] * 5) + 6)
+            i_rnd += 1
+            r_diff = pres[land_sea] - pres[land_sea - 1] + rndn
+            pres[land_sea:end_cor] += - r_diff
 
             rndn = rndn * 10  # mean value 10
-            r_diff = track.max_sustained_wind[land_sea].values - \
-                     track.max_sustained_wind[land_sea - 1].values - rndn
-            track.max_sustained_wind[land_sea:end_cor] += - r_diff
+            r_diff = wind[land_sea] - wind[land_sea - 1] - rndn
+            wind[land_sea:end_cor] += - r_diff
 
         # correct limits
-        np.warnings.filterwarnings('ignore')
-        cor_p = track.central_pressure.values > track.environmental_pressure.values
-        track.central_pressure[cor_p] = track.environmental_pressure[cor_p]
-        track.max_sustained_wind[track.max_sustained_wind < 0] = 0
-
-    track.attrs['category'] = climada.hazard.tc_tracks.set_category(
-        track.max_sustained_wind.values, track.max_sustained_wind_unit)
-    return track
+        for node in range(offsets[i_track], end_track):
+            if pres[node] > env_pres[node]:
+                pres[node] = env_pres[node]
+            if wind[node] < 0:
+                wind[node] = 0
+    return v_scale, p_scale, p_decrease, v_increase
 
 
 def _check_apply_decay_plot(all_tracks, syn_orig_wind, syn_orig_pres):
@@ -1036,6 +1036,69 @@ class TestHDF5(unittest.TestCase):
             self.assertTrue(np.array_equal(hazard.fraction.toarray(), haz_read.fraction.toarray()))
             self.assertIsInstance(haz_read.fraction, sparse.csr_matrix)
 
+    def test_read_select_pass(self):
+        """Read only some events, as selected by select"""
+        file_name = str(DATA_DIR.joinpath('test_haz.h5'))
+        hazard = dummy_hazard()
+        for todense_flag in [False, True]:
+            hazard.write_hdf5(file_name, todense=todense_flag)
+            for sel_args in [{'event_names': ['ev4', 'ev1', 'ev2']},
+                             {'date': (2, 4)},
+                             {'date': (2, 4), 'orig': False},
+                             {'event_names': ['ev3', 'ev1'], 'orig': True},
+                             {'event_names': ['ev5']},
+                             {'date': (10, 20)}]:
+                haz_read = Hazard('TC')
+                haz_ret = haz_read.read_hdf5(file_name, **sel_args)
+                haz_sel = hazard.select(**sel_args)
+                if haz_sel is None:
+                    self.assertIsNone(haz_ret)
+                    self.assertEqual(haz_read.size, 0)
+                    self.assertEqual(haz_read.intensity.shape, (0, 3))
+                    continue
+                self.assertIs(haz_ret, haz_read)
+                np.testing.assert_array_equal(haz_read.event_id, haz_sel.event_id)
+                self.assertEqual(haz_read.event_name, haz_sel.event_name)
+                np.testing.assert_array_equal(haz_read.date, haz_sel.date)
+                np.testing.assert_array_equal(haz_read.orig, haz_sel.orig)
+                np.testing.assert_array_equal(haz_read.frequency, haz_sel.frequency)
+                self.assertIsInstance(haz_read.intensity, sparse.csr_matrix)
+                np.testing.assert_array_equal(haz_read.intensity.toarray(),
+                                              haz_sel.intensity.toarray())
+                np.testing.assert_array_equal(haz_read.fraction.toarray(),
+                                              haz_sel.fraction.toarray())
+
+    def test_append_pass(self):
+        """Append events to a file in place"""
+        file_name = str(DATA_DIR.joinpath('test_haz.h5'))
+        hazard = dummy_hazard()
+        haz_new = hazard.select(event_names=['ev2', 'ev4'])
+        haz_new.event_name = ['ev5', 'ev6']
+        hazard.select(event_names=['ev1', 'ev2', 'ev3']).write_hdf5(file_name)
+        haz_new.append_hdf5(file_name)
+
+        haz_read = Hazard('TC')
+        haz_read.read_hdf5(file_name)
+        haz_read.check()
+        np.testing.assert_array_equal(haz_read.event_id, [1, 2, 3, 4, 5])
+        self.assertEqual(haz_read.event_name, ['ev1', 'ev2', 'ev3', 'ev5', 'ev6'])
+        np.testing.assert_array_equal(haz_read.date, [1, 2, 3, 2, 4])
+        np.testing.assert_array_equal(haz_read.orig, [True, False, False, False, True])
+        np.testing.assert_array_equal(haz_read.intensity.toarray(),
+                                      hazard.intensity.toarray()[[0, 1, 2, 1, 3]])
+        np.testing.assert_array_equal(haz_read.fraction.toarray(),
+                                      hazard.fraction.toarray()[[0, 1, 2, 1, 3]])
+        haz_read.read_hdf5(file_name, event_names=['ev6'])
+        np.testing.assert_array_equal(haz_read.intensity.toarray(), [[5.3, 0.2, 1.3]])
+
+        haz_new.centroids = Centroids()
+        haz_new.centroids.set_lat_lon(np.array([1, 3, 5]), np.array([2, 4, 7]))
+        with self.assertRaises(ValueError):
+            haz_new.append_hdf5(file_name)
+        hazard.write_hdf5(file_name, todense=True)
+        with self.assertRaises(ValueError):
+            dummy_hazard().append_hdf5(file_name)
+
 class TestCentroids(unittest.TestCase):
     """Test return period statistics"""
 
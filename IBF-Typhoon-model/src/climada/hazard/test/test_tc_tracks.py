@@ -25,12 +25,12 @@ import numpy as np
 import netCDF4 as nc
 import pandas as pd
 import geopandas as gpd
-from shapely.geometry import Point, LineString, MultiLineString
+from shapely.geometry import Point, LineString, MultiLineString, Polygon
 
 import climada.hazard.tc_tracks as tc
 from climada import CONFIG
 from climada.util import ureg
-from climada.util.constants import TC_ANDREW_FL
+from climada.util.constants import TC_ANDREW_FL, EARTH_RADIUS_KM
 import climada.util.coordinates as u_coord
 from climada.entity import Exposures
 from datetime import datetime as dt
@@ -194,6 +194,28 @@ class TestIbtracs(unittest.TestCase):
         self.assertAlmostEqual(track_ds.central_pressure.values[19], 980, places=5)
         np.testing.assert_array_equal(track_ds.radius_max_wind.values, 0)
 
+    def test_read_ibtracs_cache_pass(self):
+        """Read tropical cyclones through the IBTrACS cache, same as from the NetCDF file."""
+        for kwargs in [
+                dict(storm_id=['2012152N12130', '1992230N11325', '2017242N16333']),
+                dict(storm_id='2012152N12130', estimate_missing=True),
+                dict(storm_id='2012152N12130', interpolate_missing=False, provider='official'),
+                dict(year_range=(2010, 2011), basin='NI'),
+                dict(year_range=(2010, 2011), genesis_basin='SI', provider='usa'),
+                dict(year_range=(1800, 1801), basin='WP'),
+        ]:
+            tc_track = tc.TCTracks()
+            tc_track.read_ibtracs_netcdf(**kwargs)
+            tc_cache = tc.TCTracks()
+            tc_cache.read_ibtracs_cache(**kwargs)
+            self.assertEqual(tc_cache.size, tc_track.size)
+            for track, track_cache in zip(tc_track.data, tc_cache.data):
+                self.assertTrue(track_cache.identical(track))
+
+        with self.assertRaises(ValueError) as cm:
+            tc_cache.read_ibtracs_cache(storm_id='1988234N13298')
+        self.assertIn("IDs are not in IBTrACS", str(cm.exception))
+
     def test_read_scale_wind(self):
         """Read a tropical cyclone and scale wind speed according to agency."""
         tc_track = tc.TCTracks()
@@ -318,6 +340,64 @@ class TestIO(unittest.TestCase):
 
         self.assertEqual(tc_track.get_track().sid, tc_read.get_track().sid)
 
+    def test_write_read_hdf5(self):
+        """Test writing TCTracks to a single hdf5 file and reading (selected) tracks"""
+        tracks = []
+        for i_track, (size, start, basin) in enumerate(
+                [(5, '2000-01-01', 'WP'), (3, '2000-03-01', 'SP'), (0, '2000-01-01', 'WP'),
+                 (4, '2001-01-01', 'NI'), (6, '2001-06-01', 'WP')]):
+            track = xr.Dataset({
+                'max_sustained_wind': ('time', np.linspace(20, 60, size)),
+                'basin': ('time', np.full(size, basin)),
+            }, coords={
+                'time': pd.date_range(start, periods=size, freq='6H'),
+                'lat': ('time', np.linspace(10, 20, size)),
+                'lon': ('time', np.linspace(120, 130, size)),
+            }, attrs={
+                'sid': f'TRACK{i_track}',
+                'orig_event_flag': i_track % 2 == 0,
+                'id_no': i_track + 0.5,
+                'category': i_track % 3,
+                'ensemble_number': 'none' if i_track == 1 else i_track,
+                'forecast_time': pd.Timestamp(start),
+            })
+            tracks.append(track)
+        tracks[3] = tracks[3].drop_vars('max_sustained_wind')
+        # legacy basin attribute
+        tracks[4] = tracks[4].drop_vars('basin').assign_attrs(basin='SP')
+        del tracks[0].attrs['forecast_time']
+
+        path = DATA_DIR.joinpath("tc_tracks.h5")
+        tc_track = tc.TCTracks()
+        tc_track.data = tracks
+        tc_track.write_hdf5(path)
+
+        tc_read = tc.TCTracks()
+        tc_read.read_hdf5(path)
+        self.assertEqual(tc_read.size, len(tracks))
+        for track, track_read in zip(tracks, tc_read.data):
+            self.assertTrue(track_read.identical(track))
+        self.assertNotIn('max_sustained_wind', tc_read.data[3])
+        self.assertNotIn('forecast_time', tc_read.data[0].attrs)
+
+        for kwargs, sids in [
+                (dict(sid=['TRACK3', 'TRACK0', 'OTHER']), ['TRACK3', 'TRACK0']),
+                (dict(basin='SP'), ['TRACK1', 'TRACK4']),
+                (dict(basin='WP', category=[0, 2]), ['TRACK0']),
+                (dict(time_range=('2000-01-01 12:00', '2000-03-01')), ['TRACK0', 'TRACK1']),
+                (dict(basin='EP'), []),
+        ]:
+            tc_read.read_hdf5(path, **kwargs)
+            self.assertEqual([track.sid for track in tc_read.data], sids)
+            for track in tc_read.data:
+                self.assertTrue(track.identical(tracks[int(track.sid[-1])]))
+
+        lazy_tracks = tc.iter_tracks_hdf5(path, basin='SP')
+        self.assertTrue(next(lazy_tracks).identical(tracks[1]))
+        self.assertTrue(next(lazy_tracks).identical(tracks[4]))
+        with self.assertRaises(StopIteration):
+            next(lazy_tracks)
+
     def test_read_legacy_netcdf(self):
         """Test reading from NetCDF files with legacy basin attributes"""
         anti_track = tc.TCTracks()
@@ -735,6 +815,41 @@ class TestFuncs(unittest.TestCase):
         self.assertEqual(tc_track.data[0].id_no, 1951239012334)
         self.assertEqual(tc_track.data[0].category, 1)
 
+    def test_interp_tracks_pass(self):
+        """Interpolate several tracks at once, as one by one"""
+        def track(times, lon, lat):
+            return xr.Dataset({
+                'max_sustained_wind': ('time', np.linspace(20, 60, len(times))),
+                'central_pressure': ('time', np.linspace(1000, 950, len(times))),
+                'basin': ('time', np.full(len(times), 'WP')),
+            }, coords={'time': pd.to_datetime(times), 'lat': ('time', lat), 'lon': ('time', lon)},
+               attrs={'name': 'test'})
+
+        times = ['2000-01-01 03:00', '2000-01-01 09:00', '2000-01-01 15:00', '2000-01-02 00:00']
+        tracks = [
+            track(times, [120, 121, 123, 126], [10, 11, 12, 14]),
+            track(times, [120, 122, 123, 124], [10, 12, 13, 14]),
+            track(times, [178, 179.5, -179, -178], [40, 41, 42, 43]),
+            track(times[:2], [-179.5, 179.5], [40, 41]),
+            track(times[:1], [120], [10]),
+        ]
+        tracks_int = tc.interp_tracks(tracks, 2)
+        for track, track_int in zip(tracks, tracks_int):
+            xr.testing.assert_identical(tc.interp_tracks([track], 2)[0], track_int)
+        self.assertIs(tracks_int[-1], tracks[-1])
+
+        np.testing.assert_array_equal(
+            tracks_int[0].time, pd.date_range('2000-01-01 04:00', '2000-01-02 00:00', freq='2H'))
+        np.testing.assert_array_almost_equal(tracks_int[0].max_sustained_wind[[0, 1]],
+                                             [20 + 40 / 3 / 6, 20 + 40 / 3 / 2])
+        np.testing.assert_array_equal(tracks_int[0].basin, 'WP')
+        # the tracks crossing the antimeridian take the shortest path
+        self.assertTrue((np.abs(tracks_int[2].lon) > 177).all())
+        np.testing.assert_array_almost_equal(tracks_int[3].lon, [-179.5 - 1 / 6, -180, 179.5 + 1 / 6])
+
+        tracks_int = tc.interp_tracks(tracks[:2], 2, method='linear')
+        np.testing.assert_array_almost_equal(tracks_int[0].lon[[0, 1]], [120 + 1 / 6, 120.5])
+
     def test_dist_since_lf_pass(self):
         """Test _dist_since_lf for andrew tropical cyclone."""
         tc_track = tc.TCTracks()
@@ -756,6 +871,30 @@ class TestFuncs(unittest.TestCase):
         dist_on_land = track.dist_since_lf.values[track.on_land]
         self.assertTrue(np.all(np.diff(dist_on_land)[1:] > 0))
 
+    def test_tracks_land_params_pass(self):
+        """Test tracks_land_params for several tracks at once."""
+        land_geom = Polygon([(0, 0), (10, 0), (10, 10), (0, 10)])
+        tracks = [
+            xr.Dataset(coords={'time': pd.date_range('2000-01-01', periods=size, freq='6H'),
+                               'lat': ('time', np.full(size, 5.)),
+                               'lon': ('time', np.array(lon, dtype=float))})
+            for size, lon in [(7, [-2, -1, 1, 2, 3, 11, 12]), (0, []), (3, [5, 6, 11])]
+        ]
+        tc.tracks_land_params(tracks, land_geom)
+        self.assertEqual(tracks[0].on_land.values.tolist(),
+                         [False, False, True, True, True, False, False])
+        self.assertEqual(tracks[1].dist_since_lf.size, 0)
+        self.assertEqual(tracks[2].on_land.values.tolist(), [True, True, False])
+
+        # landfall half way between the last point on sea and the first point on land
+        deg_km = np.radians(1) * EARTH_RADIUS_KM * np.cos(np.radians(5))
+        np.testing.assert_allclose(tracks[0].dist_since_lf.values[2:5],
+                                   np.array([1, 2, 3]) * deg_km, rtol=1e-4)
+        np.testing.assert_allclose(tracks[2].dist_since_lf.values[:2], [0, deg_km], rtol=1e-4)
+        for track in tracks:
+            self.assertTrue(np.all(np.isnan(track.dist_since_lf.values[~track.on_land])))
+            np.testing.assert_array_equal(track.dist_since_lf.values, tc._dist_since_lf(track))
+
     def test_category_pass(self):
         """Test category computation."""
         max_sus_wind = np.array([25, 30, 35, 40, 45, 45, 45, 45, 35, 25])
@@ -19,11 +19,24 @@ with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
 Test tc_tracks_forecast module.
 """
 
+import ftplib
+import tempfile
+import threading
 import unittest
+from pathlib import Path
+
 import numpy as np
+import xarray as xr
 
 from climada import CONFIG
-from climada.hazard.tc_tracks_forecast import TCForecast
+from climada.hazard.tc_tracks_forecast import TCForecast, ECMWF_USER, ECMWF_PASS
+
+try:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import FTPServer
+except ImportError:
+    FTPHandler = None
 
 DATA_DIR = CONFIG.hazard.test_data.dir()
 TEST_BUFR_FILES = [
@@ -62,7 +75,7 @@ class TestECMWF(unittest.TestCase):
         self.assertEqual(forecast.data[0].category, 'Tropical Depression')
         self.assertEqual(forecast.data[0].forecast_time,
                          np.datetime64('2020-03-19T12:00:00.000000'))
-        self.assertEqual(forecast.data[1].is_ensemble, True)
+        self.assertEqual(forecast.data[1].is_ensemble, 'True')
 
     def test_equal_timestep(self):
         """Test equal timestep"""
@@ -79,7 +92,120 @@ class TestECMWF(unittest.TestCase):
         self.assertEqual(forecast.data[1].environmental_pressure.size, 49)
         self.assertEqual(forecast.data[1].time_step[2], 1.)
 
+    def test_read_one_bufr_tc_text(self):
+        """Test columnar reader against the text rendering reader"""
+        columnar, text = TCForecast(), TCForecast()
+        for bufr_file in TEST_BUFR_FILES:
+            columnar.read_one_bufr_tc(bufr_file)
+            text.read_one_bufr_tc_text(bufr_file)
+
+        self.assertEqual(len(columnar.data), len(text.data))
+        for new, old in zip(columnar.data, text.data):
+            self.assertEqual(new.name, 'HEROLD')
+            xr.testing.assert_identical(new, old.assign_attrs(name=new.name))
+
+
+@unittest.skipIf(FTPHandler is None, 'pyftpdlib is not installed')
+class TestFetchBufrFtp(unittest.TestCase):
+    """Test downloading BUFR TC tracks from a local FTP server"""
+
+    REMOTE_DIRS = ['20220410000000', '20220410120000']
+    TRACK_FILES = ['A_JSXX{:02d}ECEP_tropical_cyclone_track.bin'.format(i) for i in range(6)]
+
+    def setUp(self):
+        self.remote = tempfile.TemporaryDirectory()
+        self.local = tempfile.TemporaryDirectory()
+        for remote_dir in self.REMOTE_DIRS:
+            Path(self.remote.name, remote_dir).mkdir()
+            Path(self.remote.name, remote_dir, 'A_JSXX00ECEP_other.bin').write_bytes(b'other')
+            for rfile in self.TRACK_FILES:
+                Path(self.remote.name, remote_dir, rfile).write_bytes(
+                    (remote_dir + rfile).encode())
+
+        authorizer = DummyAuthorizer()
+        authorizer.add_user(ECMWF_USER, ECMWF_PASS, self.remote.name, perm='elr')
+        test = self
+        self.retrieved = []
+        self.failures = dict()
+
+        class Handler(FTPHandler):
+            """Counts the downloads and lets some of them fail"""
+            def ftp_RETR(self, file):
+                name = Path(file).name
+                if test.failures.get(name, 0) > 0:
+                    test.failures[name] -= 1
+                    self.respond('451 Temporary failure')
+                    return None
+                test.retrieved.append(name)
+                return super().ftp_RETR(file)
+
+        Handler.authorizer = authorizer
+        self.server = FTPServer(('127.0.0.1', 0), Handler)
+        self.port = self.server.socket.getsockname()[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       kwargs={'timeout': 0.1, 'handle_exit': False})
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.close_all()
+        self.thread.join()
+        self.remote.cleanup()
+        self.local.cleanup()
+
+    def fetch(self, **kwargs):
+        return TCForecast.fetch_bufr_ftp(host='127.0.0.1', port=self.port, backoff=0, **kwargs)
+
+    def test_mirror(self):
+        """Test the local mirror of the latest forecast"""
+        files = self.fetch(target_dir=self.local.name)
+        mirror = Path(self.local.name, self.REMOTE_DIRS[-1])
+        self.assertEqual(files, [str(mirror.joinpath(rfile)) for rfile in self.TRACK_FILES])
+        for file, rfile in zip(files, self.TRACK_FILES):
+            self.assertEqual(Path(file).read_bytes(), (self.REMOTE_DIRS[-1] + rfile).encode())
+        self.assertCountEqual(self.retrieved, self.TRACK_FILES)
+        self.assertFalse(list(mirror.glob('*.part')))
+
+        # only files that changed in size are downloaded again
+        self.retrieved.clear()
+        Path(self.remote.name, self.REMOTE_DIRS[-1], self.TRACK_FILES[2]).write_bytes(b'new')
+        files = self.fetch(target_dir=self.local.name, remote_dir=self.REMOTE_DIRS[-1])
+        self.assertEqual(self.retrieved, [self.TRACK_FILES[2]])
+        self.assertEqual(Path(files[2]).read_bytes(), b'new')
+
+        # other forecasts go to their own folder
+        files = self.fetch(target_dir=self.local.name, remote_dir=self.REMOTE_DIRS[0])
+        self.assertEqual(Path(files[0]).parent.name, self.REMOTE_DIRS[0])
+
+    def test_tempfiles(self):
+        """Test downloading to tempfiles"""
+        files = self.fetch(remote_dir=self.REMOTE_DIRS[0], n_workers=2)
+        self.assertEqual(len(files), len(self.TRACK_FILES))
+        for file, rfile in zip(files, self.TRACK_FILES):
+            file.seek(0)
+            self.assertEqual(file.read(), (self.REMOTE_DIRS[0] + rfile).encode())
+            file.close()
+
+    def test_retry(self):
+        """Test retrying failed downloads per file"""
+        self.failures = {self.TRACK_FILES[0]: 2, self.TRACK_FILES[3]: 1}
+        files = self.fetch(target_dir=self.local.name, max_tries=3)
+        self.assertEqual(Path(files[0]).read_bytes(),
+                         (self.REMOTE_DIRS[-1] + self.TRACK_FILES[0]).encode())
+        self.assertCountEqual(self.retrieved, self.TRACK_FILES)
+
+        self.failures = {self.TRACK_FILES[1]: 2}
+        with self.assertRaises(ftplib.error_temp):
+            self.fetch(target_dir=self.local.name, remote_dir=self.REMOTE_DIRS[0], max_tries=2)
+
+    def test_no_tracks(self):
+        """Test error if there are no track files"""
+        Path(self.remote.name, '20220411000000').mkdir()
+        with self.assertRaises(FileNotFoundError):
+            self.fetch(target_dir=self.local.name)
+
+
 # Execute Tests
 if __name__ == "__main__":
     TESTS = unittest.TestLoader().loadTestsFromTestCase(TestECMWF)
+    TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestFetchBufrFtp))
     unittest.TextTestRunner(verbosity=2).run(TESTS)
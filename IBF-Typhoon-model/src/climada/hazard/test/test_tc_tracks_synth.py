@@ -24,6 +24,7 @@ import unittest
 from pathlib import Path
 
 import numpy as np
+from shapely.geometry import Polygon
 import xarray as xr
 
 import climada.hazard.tc_tracks as tc
@@ -39,6 +40,36 @@ TEST_TRACK_DECAY_END_OCEAN_HIST = DATA_DIR.joinpath('1997018S11059.nc')
 TEST_TRACK_DECAY_PENV_GT_PCEN = DATA_DIR.joinpath('1988021S12080_gen2.nc')
 TEST_TRACK_DECAY_PENV_GT_PCEN_HIST = DATA_DIR.joinpath('1988021S12080.nc')
 
+def _test_tracks(n_tracks, size=20, orig_event_flag=True):
+    """Tracks moving west from (130, 10) over a box of land, with random variations"""
+    rng = np.random.default_rng(11)
+    tracks = []
+    for i_track in range(n_tracks):
+        lon = 130 - np.cumsum(rng.uniform(0.3, 0.7, size))
+        lat = 10 + np.cumsum(rng.uniform(-0.2, 0.4, size))
+        pres = 1000 - 30 * np.sin(np.linspace(0, np.pi, size))
+        tracks.append(xr.Dataset({
+            'time_step': ('time', np.full(size, 6.)),
+            'max_sustained_wind': ('time', 2 * (1010 - pres)),
+            'central_pressure': ('time', pres),
+            'environmental_pressure': ('time', np.full(size, 1010.)),
+        }, coords={
+            'time': np.arange('2000-01-01', size, dtype='datetime64[6h]').astype('datetime64[ns]'),
+            'lat': ('time', lat),
+            'lon': ('time', lon),
+        }, attrs={
+            'max_sustained_wind_unit': 'kn',
+            'central_pressure_unit': 'mb',
+            'name': f'TEST{i_track}',
+            'sid': f'TEST{i_track}',
+            'orig_event_flag': orig_event_flag,
+            'id_no': i_track,
+            'category': 0,
+        }))
+    return tracks
+
+TEST_LAND_GEOM = Polygon([(120, 5), (125, 5), (125, 20), (120, 20)])
+
 class TestDecay(unittest.TestCase):
     def test_apply_decay_no_landfall_pass(self):
         """Test _apply_land_decay with no historical tracks with landfall"""
@@ -479,7 +510,62 @@ class TestDecay(unittest.TestCase):
         p_env_lf = track.central_pressure.values[start_lf_idx:end_lf_idx]
         self.assertTrue(np.all(np.diff(p_env_lf - p_synth_lf) <= 0))
         
+    def test_apply_decay_tracks_pass(self):
+        """Test _apply_decay_tracks on several tracks against _apply_decay_coeffs"""
+        tracks = _test_tracks(5, orig_event_flag=False)
+        tracks[2].attrs['orig_event_flag'] = True
+        tracks_single = [track.copy(True) for track in tracks]
+        np.random.seed(5)
+        tracks = tc_synth._apply_land_decay(
+            tracks, tc_synth.LANDFALL_DECAY_V, tc_synth.LANDFALL_DECAY_P, TEST_LAND_GEOM)
+        np.random.seed(5)
+        for track in tracks_single:
+            tc_synth._apply_decay_coeffs(track, tc_synth.LANDFALL_DECAY_V,
+                                         tc_synth.LANDFALL_DECAY_P, TEST_LAND_GEOM, True)
+        for track, track_single in zip(tracks, tracks_single):
+            self.assertTrue(track.on_land.values.any())
+            np.testing.assert_array_almost_equal(track.max_sustained_wind.values,
+                                                 track_single.max_sustained_wind.values)
+            np.testing.assert_array_almost_equal(track.central_pressure.values,
+                                                 track_single.central_pressure.values)
+            self.assertEqual(track.category, track_single.category)
+        # historical tracks are not changed
+        np.testing.assert_array_equal(tracks[2].max_sustained_wind.values,
+                                      _test_tracks(5)[2].max_sustained_wind.values)
+        # wind decays from its value at landfall
+        sea_land = np.argmax(tracks[0].on_land.values)
+        self.assertTrue(np.all(tracks[0].max_sustained_wind.values[tracks[0].on_land.values]
+                               < tracks[0].max_sustained_wind.values[sea_land - 1]))
+
 class TestSynth(unittest.TestCase):
+    def test_rnd_walk_tracks_pass(self):
+        """Test _rnd_walk_tracks on several tracks against _one_rnd_walk"""
+        tracks = _test_tracks(3)
+        # the third track crosses 70 degrees latitude
+        tracks[2]['lat'].values[:] = np.linspace(60, 80, tracks[2].time.size)
+        tracks[2]['max_sustained_wind'].values[:] = 20
+        nb_synth_tracks = 4
+        rnd_vecs = [np.random.default_rng(i_track).uniform(size=2 * nb_synth_tracks * 20)
+                    for i_track in range(3)]
+        ens_track, cutoff_tc, cutoff_ts = tc_synth._rnd_walk_tracks(
+            tracks, nb_synth_tracks, 0.75, 0.3, np.pi / 360, rnd_vecs)
+        self.assertEqual(len(ens_track), 3 * (nb_synth_tracks + 1))
+        self.assertEqual(cutoff_tc, [])
+        self.assertEqual(len(cutoff_ts), nb_synth_tracks)
+        for i_track, (track, rnd_vec) in enumerate(zip(tracks, rnd_vecs)):
+            ens_single = tc_synth._one_rnd_walk(track, nb_synth_tracks, 0.75, 0.3, np.pi / 360,
+                                                rnd_vec)[0]
+            ens_batch = ens_track[i_track * (nb_synth_tracks + 1):
+                                  (i_track + 1) * (nb_synth_tracks + 1)]
+            self.assertIs(ens_batch[0], track)
+            for syn_single, syn_batch in zip(ens_single, ens_batch):
+                xr.testing.assert_identical(syn_single, syn_batch)
+        self.assertEqual(ens_track[1].sid, 'TEST0_gen1')
+        self.assertFalse(ens_track[1].orig_event_flag)
+        self.assertEqual(ens_track[1].time.size, 20)
+        self.assertLess(ens_track[-1].time.size, 20)
+        self.assertGreater(ens_track[-1].lat.values[-1], 70)
+
     def test_angle_funs_pass(self):
         """Test functions used by random walk code"""
         self.assertAlmostEqual(tc_synth._get_bearing_angle(np.array([15, 20]),
@@ -22,13 +22,16 @@ Test TropCyclone class
 import unittest
 import datetime as dt
 import numpy as np
+import pandas as pd
 from scipy import sparse
+import xarray as xr
 
 from climada import CONFIG
 from climada.util import ureg
 from climada.hazard.tc_tracks import TCTracks
-from climada.hazard.trop_cyclone import TropCyclone,\
-     _bs_hol08, _close_centroids, _stat_holland, _vtrans
+from climada.hazard.trop_cyclone import TropCyclone, compute_windfields,\
+     compute_windfield_stats, EXCEEDANCE_THRES_MS, _bs_hol08, _close_centroids, _GridIndex,\
+     _stat_holland, _vtrans
 from climada.hazard.centroids.centr import Centroids
 
 DATA_DIR = CONFIG.hazard.test_data.dir()
@@ -40,6 +43,20 @@ CENTR_TEST_BRB = Centroids()
 CENTR_TEST_BRB.read_mat(DATA_DIR.joinpath('centr_brb_test.mat'))
 
 
+def _windfield_track():
+    """Track of 8 positions crossing a regular grid of 15 x 25 centroids"""
+    track = xr.Dataset({
+        'time_step': ('time', np.full(8, 3.)),
+        'radius_max_wind': ('time', np.array([np.nan, 30, 25, 20, 18, 20, 25, 30])),
+        'environmental_pressure': ('time', np.full(8, 1010.)),
+        'central_pressure': ('time', np.array([1000, 990, 975, 960, 955, 960, 970, 985.])),
+        'lat': ('time', np.linspace(14, 17, 8)),
+        'lon': ('time', np.linspace(128, 122, 8)),
+    }, coords={'time': pd.date_range('2021-09-10', periods=8, freq='3H')})
+    lat, lon = np.meshgrid(np.arange(12, 19.5, 0.5), np.arange(119, 131.5, 0.5), indexing='ij')
+    return track, np.column_stack([lat.ravel(), lon.ravel()])
+
+
 class TestReader(unittest.TestCase):
     """Test loading funcions from the TropCyclone class"""
 
@@ -160,9 +177,160 @@ class TestReader(unittest.TestCase):
         self.assertEqual(tc_haz.fraction.nonzero()[0].size, 0)
         self.assertEqual(tc_haz.intensity.nonzero()[0].size, 0)
 
+    def test_set_from_tracks_stacked_pass(self):
+        """Test that set_from_tracks stacks the events as if appended one by one."""
+        tc_track = TCTracks()
+        tc_track.read_processed_ibtracs_csv([TEST_TRACK, TEST_TRACK_SHORT])
+        tc_track.equal_timestep()
+        tc_haz = TropCyclone()
+        tc_haz.set_from_tracks(tc_track, CENTR_TEST_BRB, ignore_distance_to_coast=True,
+                               store_windfields=True)
+
+        coastal_idx = np.arange(CENTR_TEST_BRB.size)
+        tc_appended = TropCyclone()
+        for track in tc_track.data:
+            tc_appended.append(tc_appended._tc_from_track(track, CENTR_TEST_BRB, coastal_idx,
+                                                          store_windfields=True))
+        tc_appended.frequency_from_tracks(tc_track.data)
+
+        self.assertEqual(tc_haz.tag.file_name, tc_appended.tag.file_name)
+        self.assertEqual(tc_haz.centroids.size, 296)
+        self.assertEqual(tc_haz.event_name, tc_appended.event_name)
+        self.assertEqual(tc_haz.basin, tc_appended.basin)
+        for attr in ['event_id', 'frequency', 'date', 'orig', 'category']:
+            np.testing.assert_array_equal(getattr(tc_haz, attr), getattr(tc_appended, attr))
+        self.assertIsInstance(tc_haz.intensity, sparse.csr.csr_matrix)
+        self.assertEqual(tc_haz.intensity.shape, (2, 296))
+        np.testing.assert_array_equal(tc_haz.intensity.toarray(),
+                                      tc_appended.intensity.toarray())
+        np.testing.assert_array_equal(tc_haz.fraction.toarray(), tc_appended.fraction.toarray())
+        self.assertEqual(len(tc_haz.windfields), 2)
+        for windfield, windfield_appended in zip(tc_haz.windfields, tc_appended.windfields):
+            np.testing.assert_array_equal(windfield.toarray(), windfield_appended.toarray())
+
+    def test_set_exceedance_thres_pass(self):
+        """Test set_from_tracks with the time of max wind and exceedance counts."""
+        track, coord = _windfield_track()
+        track.attrs.update(name='TEST', sid='TEST', orig_event_flag=True, category=3,
+                           basin='WP')
+        tc_track = TCTracks()
+        tc_track.data = [track, track.assign_attrs(sid='TEST2')]
+        centroids = Centroids()
+        centroids.set_lat_lon(coord[:, 0], coord[:, 1])
+        windfields, reachable_idx = compute_windfields(track, coord.copy(), 0)
+        speed = np.zeros((8, 375))
+        speed[:, reachable_idx] = np.linalg.norm(windfields, axis=-1)
+
+        tc_haz = TropCyclone()
+        tc_haz.set_from_tracks(tc_track, centroids, ignore_distance_to_coast=True,
+                               exceedance_thres=EXCEEDANCE_THRES_MS)
+        self.assertEqual(tc_haz.exceedance_thres, EXCEEDANCE_THRES_MS)
+        self.assertFalse(hasattr(tc_haz, 'windfields'))
+        self.assertEqual(tc_haz.max_wind_time.shape, (2, 375))
+        self.assertEqual(len(tc_haz.exceedance_count), 2)
+        intensity = tc_haz.intensity.toarray()
+        hit = intensity[0] > 0
+        np.testing.assert_array_equal(tc_haz.max_wind_time.toarray()[0],
+                                      np.where(hit, 3 * speed.argmax(axis=0), 0))
+        np.testing.assert_array_equal(tc_haz.max_wind_time.toarray()[1],
+                                      tc_haz.max_wind_time.toarray()[0])
+        for count in tc_haz.exceedance_count:
+            self.assertEqual(count.shape, (3, 375))
+            for thres, thres_count in zip(EXCEEDANCE_THRES_MS, count.toarray()):
+                np.testing.assert_array_equal(thres_count, (speed > thres).sum(axis=0))
+
+        tc_sel = tc_haz.select(event_names=['TEST2'])
+        self.assertEqual(tc_sel.max_wind_time.shape, (1, 375))
+        self.assertEqual(len(tc_sel.exceedance_count), 1)
+        self.assertEqual(tc_sel.exceedance_thres, EXCEEDANCE_THRES_MS)
+
+        # same statistics from the stored wind fields
+        tc_wf = TropCyclone()
+        tc_wf.set_from_tracks(tc_track, centroids, ignore_distance_to_coast=True,
+                              store_windfields=True, exceedance_thres=EXCEEDANCE_THRES_MS)
+        self.assertEqual(len(tc_wf.windfields), 2)
+        np.testing.assert_allclose(tc_wf.intensity.toarray(), intensity, rtol=1e-12)
+        np.testing.assert_array_equal(tc_wf.max_wind_time.toarray(),
+                                      tc_haz.max_wind_time.toarray())
+        for count, count_wf in zip(tc_haz.exceedance_count, tc_wf.exceedance_count):
+            np.testing.assert_array_equal(count_wf.toarray(), count.toarray())
+
 class TestWindfieldHelpers(unittest.TestCase):
     """Test helper functions of TC wind field model"""
 
+    def test_compute_windfields_pass(self):
+        """Test compute_windfields against the former vectorized implementation."""
+        positions = [(1, 166), (3, 188), (4, 161), (6, 130), (7, 281)]
+        windfields_values = {
+            "equirect": [[-2.92297571, -34.83835065], [17.61941392, -49.60726875],
+                         [-1.6961282, 33.2138633], [-5.83637245, 9.04729061],
+                         [4.40952381, -43.39659641]],
+            "geosphere": [[-2.89215934, -34.82755245], [17.62220348, -49.59199115],
+                          [-1.70123583, 33.21973459], [-5.88065072, 8.99675327],
+                          [4.42766721, -43.37502775]],
+        }
+        n_nonzero = {"equirect": 218, "geosphere": 217}
+        for metric, values in windfields_values.items():
+            track, centroids = _windfield_track()
+            windfields, reachable_idx = compute_windfields(track, centroids, 0, metric=metric)
+            # the centroids further than CENTR_NODE_MAX_DIST_KM from all positions are skipped
+            self.assertEqual(windfields.shape, (8, 285, 2))
+            self.assertEqual(reachable_idx.size, 285)
+            full_windfields = np.zeros((8, 375, 2))
+            full_windfields[:, reachable_idx] = windfields
+            np.testing.assert_array_equal(windfields[0], 0)
+            for (i_node, i_centr), val in zip(positions, values):
+                np.testing.assert_allclose(full_windfields[i_node, i_centr], val, rtol=1e-7)
+            intensity = np.linalg.norm(windfields, axis=-1).max(axis=0)
+            self.assertEqual(np.count_nonzero(intensity), n_nonzero[metric])
+
+            v_max, reachable_idx_max = compute_windfields(track, centroids, 0, metric=metric,
+                                                          max_only=True)
+            np.testing.assert_array_equal(reachable_idx_max, reachable_idx)
+            np.testing.assert_allclose(v_max, intensity, rtol=1e-12)
+
+            centr_index = _GridIndex(centroids)
+            windfields_idx, _ = compute_windfields(track, centroids, 0, metric=metric,
+                                                   centr_index=centr_index)
+            np.testing.assert_array_equal(windfields_idx, windfields)
+
+            windfields_32, _ = compute_windfields(track, centroids, 0, metric=metric,
+                                                  single_precision=True)
+            self.assertEqual(windfields_32.dtype, np.float32)
+            np.testing.assert_allclose(windfields_32, windfields, rtol=1e-6, atol=1e-5)
+
+    def test_compute_windfield_stats_pass(self):
+        """Test compute_windfield_stats against the full wind fields."""
+        track, centroids = _windfield_track()
+        windfields, reachable_idx = compute_windfields(track, centroids, 0)
+        speed = np.linalg.norm(windfields, axis=-1)
+        thresholds = [0, 20, 30]
+        v_max, max_time, count, reachable_idx_stats = compute_windfield_stats(
+            track, centroids, 0, thresholds=thresholds)
+        np.testing.assert_array_equal(reachable_idx_stats, reachable_idx)
+        np.testing.assert_allclose(v_max, speed.max(axis=0), rtol=1e-12)
+        # the track positions are 3 hours apart
+        np.testing.assert_array_equal(max_time, 3 * speed.argmax(axis=0))
+        self.assertEqual(count.shape, (3, 285))
+        for thres, thres_count in zip(thresholds, count):
+            np.testing.assert_array_equal(thres_count, (speed > thres).sum(axis=0))
+        self.assertEqual(count[2].max(), 3)
+
+        v_max, max_time, count, _ = compute_windfield_stats(track, centroids, 0,
+                                                            single_precision=True)
+        self.assertEqual(v_max.dtype, np.float32)
+        self.assertEqual(max_time.dtype, np.float32)
+        self.assertEqual(count.shape, (0, 285))
+
+    def test_compute_windfields_out_of_reach_pass(self):
+        """Test compute_windfields with centroids too far from the track."""
+        track, centroids = _windfield_track()
+        for max_only in [False, True]:
+            windfields, reachable_idx = compute_windfields(track, centroids[:, :] - [0, 20], 0,
+                                                           max_only=max_only)
+            self.assertEqual(windfields.shape, (0,) if max_only else (8, 0, 2))
+            self.assertEqual(reachable_idx.size, 0)
+
     def test_close_centroids_pass(self):
         """Test _close_centroids function."""
         t_lat = np.array([0, 0, 0])
@@ -181,6 +349,23 @@ class TestWindfieldHelpers(unittest.TestCase):
         mask = _close_centroids(t_lat, t_lon, centroids, buffer=5)
         np.testing.assert_equal(mask, test_mask)
 
+    def test_grid_index_pass(self):
+        """Test _GridIndex against a brute force search."""
+        rng = np.random.default_rng(5)
+        centroids = np.column_stack([rng.uniform(-90, 90, 5000), rng.uniform(-180, 360, 5000)])
+        # track crossing the antimeridian and getting close to the pole
+        t_lat = np.array([-20, 0, 45, 80, 89.5])
+        t_lon = np.array([175, 179, -178, 150, 10])
+        reach_lat = np.array([1, 4.5, 3, 5, 2])
+        reach_lon = np.array([2, 7, 0.3, 30, 200])
+        d_lon = (centroids[:, 1, None] - t_lon + 180) % 360 - 180
+        test_mask = ((np.abs(centroids[:, 0, None] - t_lat) < reach_lat)
+                     & (np.abs(d_lon) < reach_lon)).any(axis=1)
+        for res in [1, 0.5, 3]:
+            mask = _GridIndex(centroids, res=res).query(t_lat, t_lon, reach_lat, reach_lon)
+            np.testing.assert_array_equal(mask, test_mask)
+        self.assertGreater(np.count_nonzero(test_mask), 100)
+
     def test_bs_hol08_pass(self):
         """Test _bs_hol08 function. Compare to MATLAB reference."""
         v_trans = 5.241999541820597
@@ -26,6 +26,7 @@ import logging
 import copy
 import time
 import datetime as dt
+import numba
 import numpy as np
 from scipy import sparse
 import matplotlib.animation as animation
@@ -54,6 +55,9 @@ CENTR_NODE_MAX_DIST_KM = 300
 CENTR_NODE_MAX_DIST_DEG = 5.5
 """Maximum distance between centroid and TC track node in degrees"""
 
+GRID_INDEX_RES_DEG = 0.5
+"""Size of the cells of the grid index of the centroids in degrees"""
+
 MODEL_VANG = {'H08': 0}
 """Enumerate different symmetric wind field calculation."""
 
@@ -62,6 +66,9 @@ KN_TO_MS = (1.0 * ureg.knot).to(ureg.meter / ureg.second).magnitude
 NM_TO_KM = (1.0 * ureg.nautical_mile).to(ureg.kilometer).magnitude
 """Unit conversion factors for JIT functions that can't use ureg"""
 
+EXCEEDANCE_THRES_MS = (34 * KN_TO_MS, 48 * KN_TO_MS, 64 * KN_TO_MS)
+"""Gale, storm and typhoon force wind speeds (34, 48 and 64 knots) in m/s"""
+
 class TropCyclone(Hazard):
     """
     Contains tropical cyclone events.
@@ -87,6 +94,16 @@ class TropCyclone(Hazard):
         'SI' South Indian
         'SP' Southern Pacific
         'SA' South Atlantic
+    max_wind_time : sparse.csr_matrix
+        only if `set_from_tracks` is called with `exceedance_thres`: for every event and
+        centroid with non-zero intensity, the time of the maximum wind in hours since the
+        first track position
+    exceedance_count : list(sparse.csr_matrix)
+        only if `set_from_tracks` is called with `exceedance_thres`: for every event, a matrix
+        of shape (nthresholds, ncentroids) with the number of track positions at which the
+        wind exceeds each threshold
+    exceedance_thres : tuple(float)
+        only if `set_from_tracks` is called with `exceedance_thres`: the thresholds in m/s
     """
     intensity_thres = 17.5
     """intensity threshold for storage in m/s"""
@@ -107,7 +124,8 @@ class TropCyclone(Hazard):
 
     def set_from_tracks(self, tracks, centroids=None, description='',
                         model='H08', ignore_distance_to_coast=False,
-                        store_windfields=False, metric="equirect"):
+                        store_windfields=False, metric="equirect", single_precision=False,
+                        exceedance_thres=None):
         """
         Clear and fill with windfields from specified tracks.
 
@@ -149,6 +167,14 @@ class TropCyclone(Hazard):
               large distances and high latitudes.
             * "geosphere": Exact spherical distance. Much more accurate at all distances, but slow.
             Default: "equirect".
+        single_precision : boolean, optional
+            If True, the intensity and the windfields are stored as 32 bit floats, which halves
+            their memory. Default: False.
+        exceedance_thres : sequence of float, optional
+            Wind speeds in m/s, e.g. EXCEEDANCE_THRES_MS. If given, the Hazard object gets the
+            attributes `max_wind_time`, `exceedance_count` and `exceedance_thres` (see class
+            docstring). They are reduced over the track positions while the wind is computed,
+            so that the time dependent winds are not kept in memory. Default: None.
 
         Raises
         ------
@@ -184,6 +210,8 @@ class TropCyclone(Hazard):
 
         LOGGER.info('Mapping %s tracks to %s coastal centroids.', str(tracks.size),
                     str(coastal_idx.size))
+        # shared by all tracks, to find the centroids within reach of every track position
+        centr_index = _GridIndex(centroids.coord[coastal_idx])
         if self.pool:
             chunksize = min(num_tracks // self.pool.ncpus, 1000)
             tc_haz = self.pool.map(
@@ -193,6 +221,9 @@ class TropCyclone(Hazard):
                 itertools.repeat(model, num_tracks),
                 itertools.repeat(store_windfields, num_tracks),
                 itertools.repeat(metric, num_tracks),
+                itertools.repeat(single_precision, num_tracks),
+                itertools.repeat(exceedance_thres, num_tracks),
+                itertools.repeat(centr_index, num_tracks),
                 chunksize=chunksize)
         else:
             last_perc = 0
@@ -202,12 +233,16 @@ class TropCyclone(Hazard):
                 if perc - last_perc >= 10:
                     LOGGER.info("Progress: %d%%", perc)
                     last_perc = perc
-                self.append(
+                tc_haz.append(
                     self._tc_from_track(track, centroids, coastal_idx,
                                         model=model, store_windfields=store_windfields,
-                                        metric=metric))
+                                        metric=metric, single_precision=single_precision,
+                                        exceedance_thres=exceedance_thres,
+                                        centr_index=centr_index))
             if last_perc < 100:
                 LOGGER.info("Progress: 100%")
+        LOGGER.debug('Append events.')
+        self._set_events_from_track_hazards(tc_haz, centroids)
         LOGGER.debug('Compute frequency.')
         self.frequency_from_tracks(tracks.data)
         self.tag.description = description
@@ -364,8 +399,48 @@ class TropCyclone(Hazard):
         ens_size = (self.event_id.size / num_orig) if num_orig > 0 else 1
         self.frequency = np.ones(self.event_id.size) / (year_delta * ens_size)
 
+    def _set_events_from_track_hazards(self, tc_haz, centroids):
+        """
+        Set the events of the hazards of single tracks, all defined on the same centroids.
+
+        The rows of the intensity and fraction matrices are stacked once. Appending the hazards
+        one by one instead combines the centroids and copies the growing matrices for every
+        track, which takes quadratic time in the number of tracks.
+
+        Parameters
+        ----------
+        tc_haz : list of TropCyclone
+            Hazards with one event each, as returned by `_tc_from_track`.
+        centroids : Centroids
+            Centroids of all hazards in tc_haz.
+        """
+        if not tc_haz:
+            return
+        self.tag = TagHazard(HAZ_TYPE)
+        for haz in tc_haz:
+            self.tag.append(haz.tag)
+        self.units = tc_haz[0].units
+        self.centroids = centroids
+        self.event_id = np.arange(1, len(tc_haz) + 1)
+        self.event_name = [name for haz in tc_haz for name in haz.event_name]
+        self.date = np.concatenate([haz.date for haz in tc_haz])
+        self.orig = np.concatenate([haz.orig for haz in tc_haz])
+        self.category = np.concatenate([haz.category for haz in tc_haz])
+        self.basin = [basin for haz in tc_haz for basin in haz.basin]
+        self.frequency = np.ones(len(tc_haz))
+        self.intensity = sparse.vstack([haz.intensity for haz in tc_haz], format='csr')
+        self.fraction = sparse.vstack([haz.fraction for haz in tc_haz], format='csr')
+        if hasattr(tc_haz[0], 'windfields'):
+            self.windfields = [windfield for haz in tc_haz for windfield in haz.windfields]
+        if hasattr(tc_haz[0], 'exceedance_thres'):
+            self.max_wind_time = sparse.vstack([haz.max_wind_time for haz in tc_haz],
+                                               format='csr')
+            self.exceedance_count = [count for haz in tc_haz for count in haz.exceedance_count]
+            self.exceedance_thres = tc_haz[0].exceedance_thres
+
     def _tc_from_track(self, track, centroids, coastal_idx, model='H08',
-                       store_windfields=False, metric="equirect"):
+                       store_windfields=False, metric="equirect", single_precision=False,
+                       exceedance_thres=None, centr_index=None):
         """
         Generate windfield hazard from a single track dataset
 
@@ -385,6 +460,13 @@ class TropCyclone(Hazard):
             Specify an approximation method to use for earth distances: "equirect" (faster) or
             "geosphere" (more accurate). See `dist_approx` function in `climada.util.coordinates`.
             Default: "equirect".
+        single_precision : boolean, optional
+            If True, store intensity and windfields as 32 bit floats. Default: False.
+        exceedance_thres : sequence of float, optional
+            If given, compute the time of the maximum wind and the number of track positions
+            with wind above each of these thresholds. Default: None.
+        centr_index : _GridIndex, optional
+            Index of the centroids at coastal_idx. Default: built for this track only.
 
         Raises
         ------
@@ -400,13 +482,27 @@ class TropCyclone(Hazard):
             raise ValueError(f'Model not implemented: {model}.') from err
         ncentroids = centroids.coord.shape[0]
         coastal_centr = centroids.coord[coastal_idx]
-        windfields, reachable_centr_idx = compute_windfields(track, coastal_centr, mod_id,
-                                                             metric=metric)
+        if store_windfields:
+            windfields, reachable_centr_idx = compute_windfields(
+                track, coastal_centr, mod_id, metric=metric, single_precision=single_precision,
+                centr_index=centr_index)
+            npositions = windfields.shape[0]
+            if exceedance_thres is None:
+                intensity = np.linalg.norm(windfields, axis=-1).max(axis=0)
+            else:
+                intensity, max_time, exceedance_count = _windfield_stats(
+                    track, windfields, exceedance_thres)
+        else:
+            # the statistics are reduced while computing, the wind vectors are never stored
+            thresholds = () if exceedance_thres is None else exceedance_thres
+            intensity, max_time, exceedance_count, reachable_centr_idx = compute_windfield_stats(
+                track, coastal_centr, mod_id, thresholds=thresholds, metric=metric,
+                single_precision=single_precision, centr_index=centr_index)
         reachable_coastal_centr_idx = coastal_idx[reachable_centr_idx]
-        npositions = windfields.shape[0]
 
-        intensity = np.linalg.norm(windfields, axis=-1).max(axis=0)
         intensity[intensity < self.intensity_thres] = 0
+        if exceedance_thres is not None:
+            max_time[intensity == 0] = 0
         intensity_sparse = sparse.csr_matrix(
             (intensity, reachable_coastal_centr_idx, [0, intensity.size]),
             shape=(1, ncentroids))
@@ -415,6 +511,19 @@ class TropCyclone(Hazard):
         new_haz = TropCyclone()
         new_haz.tag = TagHazard(HAZ_TYPE, 'Name: ' + track.name)
         new_haz.intensity = intensity_sparse
+        if exceedance_thres is not None:
+            new_haz.max_wind_time = sparse.csr_matrix(
+                (max_time, reachable_coastal_centr_idx, [0, max_time.size]),
+                shape=(1, ncentroids))
+            new_haz.max_wind_time.eliminate_zeros()
+            nthres = exceedance_count.shape[0]
+            exceedance_count = sparse.csr_matrix(
+                (exceedance_count.ravel(), np.tile(reachable_coastal_centr_idx, nthres),
+                 np.arange(nthres + 1) * reachable_coastal_centr_idx.size),
+                shape=(nthres, ncentroids))
+            exceedance_count.eliminate_zeros()
+            new_haz.exceedance_count = [exceedance_count]
+            new_haz.exceedance_thres = tuple(exceedance_thres)
         if store_windfields:
             n_reachable_coastal_centr = reachable_coastal_centr_idx.size
             indices = np.zeros((npositions, n_reachable_coastal_centr, 2), dtype=np.int64)
@@ -512,12 +621,18 @@ class TropCyclone(Hazard):
         return tc_cc
 
 
-def compute_windfields(track, centroids, model, metric="equirect"):
+def compute_windfields(track, centroids, model, metric="equirect", max_only=False,
+                       single_precision=False, centr_index=None):
     """Compute 1-minute sustained winds (in m/s) at 10 meters above ground
 
     In a first step, centroids within reach of the track are determined so that wind fields will
     only be computed and returned for those centroids.
 
+    The wind vectors are computed in a single compiled pass over the pairs of track positions and
+    centroids (see `_windfield_vectors`), without intermediate arrays of the size of the output.
+    Only the centroids in the cells of a grid index (see `_GridIndex`) close to each track
+    position are visited.
+
     Parameters
     ----------
     track : xr.Dataset
@@ -531,12 +646,149 @@ def compute_windfields(track, centroids, model, metric="equirect"):
         Specify an approximation method to use for earth distances: "equirect" (faster) or
         "geosphere" (more accurate). See `dist_approx` function in `climada.util.coordinates`.
         Default: "equirect".
+    max_only : bool, optional
+        If True, only return the maximum wind speed over all track positions at each centroid
+        instead of the wind vectors at each track position (see `compute_windfield_stats`).
+        Default: False.
+    single_precision : bool, optional
+        If True, the wind fields are returned as 32 bit floats. They are still computed in double
+        precision. Default: False.
+    centr_index : _GridIndex, optional
+        Index of the centroids, to reuse it for several tracks. Default: built for this track.
 
     Returns
     -------
-    windfields : np.array of shape (npositions, nreachable, 2)
+    windfields : np.array of shape (npositions, nreachable, 2), or (nreachable,) if max_only
         Directional wind fields for each track position on those centroids within reach
-        of the TC track.
+        of the TC track, or maximum wind speed on those centroids if max_only is True.
+    reachable_centr_idx : np.array of shape (nreachable,)
+        List of indices of input centroids within reach of the TC track.
+    """
+    if max_only:
+        v_max, _, _, reachable_centr_idx = compute_windfield_stats(
+            track, centroids, model, metric=metric, single_precision=single_precision,
+            centr_index=centr_index)
+        return v_max, reachable_centr_idx
+
+    npositions = track.time.size
+    dtype = np.float32 if single_precision else np.float64
+    params, reachable_centr_idx = _windfield_params(track, centroids, model, metric, centr_index)
+    windfields = np.zeros((npositions, reachable_centr_idx.size, 2), dtype=dtype)
+    if params is not None:
+        n_close = _windfield_vectors(*params, windfields)
+        # no centroid is close enough to the eye at any track position
+        if n_close == 0:
+            windfields, reachable_centr_idx = windfields[:, :0], reachable_centr_idx[:0]
+    return windfields, reachable_centr_idx
+
+def compute_windfield_stats(track, centroids, model, thresholds=(), metric="equirect",
+                            single_precision=False, centr_index=None):
+    """Compute statistics over time of the 1-minute sustained winds (in m/s) at 10 meters
+
+    The wind speeds are reduced while they are computed, one track position after the other
+    (see `_windfield_max`), so that the time dimension is never held in memory.
+
+    Parameters
+    ----------
+    track : xr.Dataset
+        Track infomation.
+    centroids : 2d np.array
+        Each row is a centroid [lat, lon].
+        Centroids that are not within reach of the track are ignored.
+    model : int
+        Holland model selection according to MODEL_VANG.
+    thresholds : sequence of float, optional
+        Wind speeds in m/s, for which to count the track positions above, e.g.
+        EXCEEDANCE_THRES_MS. Default: no thresholds.
+    metric : str, optional
+        Specify an approximation method to use for earth distances: "equirect" (faster) or
+        "geosphere" (more accurate). See `dist_approx` function in `climada.util.coordinates`.
+        Default: "equirect".
+    single_precision : bool, optional
+        If True, the wind speeds and times are returned as 32 bit floats. Default: False.
+    centr_index : _GridIndex, optional
+        Index of the centroids, to reuse it for several tracks. Default: built for this track.
+
+    Returns
+    -------
+    v_max : np.array of shape (nreachable,)
+        Maximum wind speed over all track positions on those centroids within reach of the
+        TC track.
+    max_time : np.array of shape (nreachable,)
+        Time of the maximum wind speed in hours since the first track position, 0 where there
+        is no wind.
+    exceedance_count : np.array of shape (nthresholds, nreachable)
+        Number of track positions with wind speed above each threshold.
+    reachable_centr_idx : np.array of shape (nreachable,)
+        List of indices of input centroids within reach of the TC track.
+    """
+    dtype = np.float32 if single_precision else np.float64
+    thresholds = np.asarray(thresholds, dtype=np.float64).reshape(-1)
+    params, reachable_centr_idx = _windfield_params(track, centroids, model, metric, centr_index)
+    nreachable = reachable_centr_idx.size
+    v_max = np.zeros((nreachable,), dtype=dtype)
+    i_max = np.zeros((nreachable,), dtype=np.int64)
+    exceedance_count = np.zeros((thresholds.size, nreachable), dtype=np.int32)
+    if params is not None:
+        n_close = _windfield_max(*params, thresholds, v_max, i_max, exceedance_count)
+        if n_close == 0:
+            v_max, i_max = v_max[:0], i_max[:0]
+            exceedance_count, reachable_centr_idx = exceedance_count[:, :0], reachable_centr_idx[:0]
+    t_hours = (track.time.values - track.time.values[0]) / np.timedelta64(1, 'h')
+    max_time = t_hours[i_max].astype(dtype) if t_hours.size else np.zeros((0,), dtype=dtype)
+    return v_max, max_time, exceedance_count, reachable_centr_idx
+
+def _windfield_stats(track, windfields, thresholds):
+    """Statistics of `compute_windfield_stats` from the wind vectors of `compute_windfields`
+
+    Parameters
+    ----------
+    track : xr.Dataset
+        Track infomation.
+    windfields : np.array of shape (npositions, nreachable, 2)
+        Wind vectors as returned by `compute_windfields`.
+    thresholds : sequence of float
+        Wind speed thresholds (in m/s).
+
+    Returns
+    -------
+    v_max, max_time, exceedance_count : np.array
+        See `compute_windfield_stats`.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64).reshape(-1)
+    speed = np.linalg.norm(windfields, axis=-1)
+    exceedance_count = np.zeros((thresholds.size, speed.shape[1]), dtype=np.int32)
+    for i_thres, thres in enumerate(thresholds):
+        exceedance_count[i_thres] = np.count_nonzero(speed > thres, axis=0)
+    if speed.shape[0] == 0:
+        return np.zeros((0,), dtype=speed.dtype), np.zeros((0,), dtype=speed.dtype), \
+            exceedance_count
+    # the first position of the maximum, as in `_windfield_max`
+    i_max = speed.argmax(axis=0)
+    t_hours = (track.time.values - track.time.values[0]) / np.timedelta64(1, 'h')
+    return speed.max(axis=0), t_hours[i_max].astype(speed.dtype), exceedance_count
+
+def _windfield_params(track, centroids, model, metric, centr_index=None):
+    """Arguments of the wind field kernels for the centroids within reach of a track
+
+    Parameters
+    ----------
+    track : xr.Dataset
+        Track infomation.
+    centroids : 2d np.array
+        Each row is a centroid [lat, lon].
+    model : int
+        Holland model selection according to MODEL_VANG.
+    metric : str
+        "equirect" or "geosphere", see `compute_windfields`.
+    centr_index : _GridIndex, optional
+        Index of the centroids. Default: built here.
+
+    Returns
+    -------
+    params : tuple or None
+        Leading arguments of `_windfield_vectors` and `_windfield_max`, None if the track is
+        too short or no centroid is within reach.
     reachable_centr_idx : np.array of shape (nreachable,)
         List of indices of input centroids within reach of the TC track.
     """
@@ -550,36 +802,24 @@ def compute_windfields(track, centroids, model, metric="equirect"):
     # start with the assumption that no centroids are within reach
     npositions = t_lat.shape[0]
     reachable_centr_idx = np.zeros((0,), dtype=np.int64)
-    windfields = np.zeros((npositions, 0, 2), dtype=np.float64)
 
     # the wind field model requires at least two track positions because translational speed
     # as well as the change in pressure are required
     if npositions < 2:
-        return windfields, reachable_centr_idx
+        return None, reachable_centr_idx
 
-    # normalize longitude values (improves performance of `dist_approx` and `_close_centroids`)
+    # normalize longitude values (improves performance of `dist_approx`)
     mid_lon = 0.5 * sum(u_coord.lon_bounds(t_lon))
     u_coord.lon_normalize(t_lon, center=mid_lon)
-    u_coord.lon_normalize(centroids[:, 1], center=mid_lon)
 
-    # restrict to centroids within rectangular bounding boxes around track positions
-    track_centr_msk = _close_centroids(t_lat, t_lon, centroids)
-    track_centr = centroids[track_centr_msk]
-    nreachable = track_centr.shape[0]
+    # restrict to centroids within reach of any track position
+    if centr_index is None:
+        centr_index = _GridIndex(centroids)
+    reach_lat, reach_lon = _node_reach(t_lat)
+    track_centr_msk = centr_index.query(t_lat, t_lon, reach_lat, reach_lon)
+    nreachable = np.count_nonzero(track_centr_msk)
     if nreachable == 0:
-        return windfields, reachable_centr_idx
-
-    # compute distances and vectors to all centroids
-    [d_centr], [v_centr] = u_coord.dist_approx(t_lat[None], t_lon[None],
-                                               track_centr[None, :, 0], track_centr[None, :, 1],
-                                               log=True, normalize=False, method=metric)
-
-    # exclude centroids that are too far from or too close to the eye
-    close_centr_msk = (d_centr < CENTR_NODE_MAX_DIST_KM) & (d_centr > 1e-2)
-    if not np.any(close_centr_msk):
-        return windfields, reachable_centr_idx
-    v_centr_normed = np.zeros_like(v_centr)
-    v_centr_normed[close_centr_msk] = v_centr[close_centr_msk] / d_centr[close_centr_msk, None]
+        return None, reachable_centr_idx
 
     # make sure that central pressure never exceeds environmental pressure
     pres_exceed_msk = (t_cen > t_env)
@@ -604,56 +844,243 @@ def compute_windfields(track, centroids, model, metric="equirect"):
     else:
         raise NotImplementedError
 
-    # derive angular velocity
-    v_ang_norm = _stat_holland(d_centr[1:], t_rad[1:], hol_b, t_env[1:],
-                               t_cen[1:], t_lat[1:], close_centr_msk[1:])
     hemisphere = 'N'
     if np.count_nonzero(t_lat < 0) > np.count_nonzero(t_lat > 0):
         hemisphere = 'S'
-    v_ang_rotate = [1.0, -1.0] if hemisphere == 'N' else [-1.0, 1.0]
-    v_ang_dir = np.array(v_ang_rotate)[..., :] * v_centr_normed[1:, :, ::-1]
-    v_ang = np.zeros_like(v_ang_dir)
-    v_ang[close_centr_msk[1:]] = v_ang_norm[close_centr_msk[1:], None] \
-                                 * v_ang_dir[close_centr_msk[1:]]
-
-    # Influence of translational speed decreases with distance from eye.
-    # The "absorbing factor" is according to the following paper (see Fig. 7):
-    #
-    #   Mouton, F., & Nordbeck, O. (1999). Cyclone Database Manager. A tool
-    #   for converting point data from cyclone observations into tracks and
-    #   wind speed profiles in a GIS. UNED/GRID-Geneva.
-    #   https://unepgrid.ch/en/resource/19B7D302
-    #
-    t_rad_bc = np.broadcast_arrays(t_rad[:, None], d_centr)[0]
-    v_trans_corr = np.zeros_like(d_centr)
-    v_trans_corr[close_centr_msk] = np.fmin(
-        1, t_rad_bc[close_centr_msk] / d_centr[close_centr_msk])
-
-    # add angular and corrected translational velocity vectors
-    v_full = v_trans[1][1:, None, :] * v_trans_corr[1:, :, None] + v_ang
-    v_full[np.isnan(v_full)] = 0
-
-    windfields = np.zeros((npositions, nreachable, 2), dtype=np.float64)
-    windfields[1:, :, :] = v_full
+    v_ang_rotate = np.array([1.0, -1.0] if hemisphere == 'N' else [-1.0, 1.0])
+
+    if metric not in ("equirect", "geosphere"):
+        raise KeyError("Unknown distance approximation method: %s" % metric)
+    # position of the centroids in the output, in the order of the index
+    reach_pos = np.full(track_centr_msk.size, -1, dtype=np.int64)
+    reach_pos[track_centr_msk] = np.arange(nreachable)
+    params = (t_lat, t_lon, t_rad, hol_b, t_env, t_cen, v_trans[1], v_ang_rotate,
+              metric == "geosphere", reach_lat, reach_lon, centr_index.lat, centr_index.lon,
+              centr_index.cell_ptr, centr_index.res, reach_pos[centr_index.order])
     [reachable_centr_idx] = track_centr_msk.nonzero()
-    return windfields, reachable_centr_idx
+    return params, reachable_centr_idx
+
+def _node_reach(t_lat):
+    """Extent in degrees of the reach of the wind field around track positions
+
+    A centroid at a distance of less than CENTR_NODE_MAX_DIST_KM from a track position lies
+    within these extents in latitude and longitude, for both the "equirect" and the "geosphere"
+    metric.
+
+    Parameters
+    ----------
+    t_lat : np.array of shape (npositions,)
+        Latitudinal coordinates of track positions.
+
+    Returns
+    -------
+    reach_lat, reach_lon : np.array of shape (npositions,)
+        Extents in latitude and longitude.
+    """
+    # small margin against rounding errors
+    d_ang = (1 + 1e-6) * np.radians(CENTR_NODE_MAX_DIST_KM / u_coord.ONE_LAT_KM)
+    cos_lat = np.cos(np.radians(t_lat))
+    reach_lat = np.full(t_lat.shape, np.degrees(d_ang))
+    # equirect scales the longitude with the cosine at the track position, on the sphere the
+    # largest change in longitude within an angular distance d is arcsin(sin(d) / cos(lat))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sin_ratio = np.sin(d_ang) / cos_lat
+        reach_lon = np.degrees(np.fmax(d_ang / cos_lat, np.arcsin(np.fmin(sin_ratio, 1))))
+    reach_lon[~(sin_ratio < 1)] = 180
+    return reach_lat, reach_lon
+
+@numba.njit
+def _node_centr_vector(t_lat, t_lon, c_lat, c_lon, geosphere):
+    """Distance (in km) and tangential vector [lat, lon] from a track node to a centroid
+
+    Scalar version of `u_coord.dist_approx` with `log=True` and `normalize=False`.
+    """
+    if geosphere:
+        lat1, lon1, lat2, lon2 = (np.radians(t_lat), np.radians(t_lon),
+                                  np.radians(c_lat), np.radians(c_lon))
+        hav = np.sin(0.5 * (lat2 - lat1))**2 \
+            + np.cos(lat1) * np.cos(lat2) * np.sin(0.5 * (lon2 - lon1))**2
+        dist = np.degrees(2 * np.arcsin(np.sqrt(hav))) * u_coord.ONE_LAT_KM
+        # radial vectors and tangent basis as in `u_coord.latlon_to_geosph_vector`
+        sin_lat1, cos_lat1 = np.sin(lat1 + 0.5 * np.pi), np.cos(lat1 + 0.5 * np.pi)
+        sin_lat2, cos_lat2 = np.sin(lat2 + 0.5 * np.pi), np.cos(lat2 + 0.5 * np.pi)
+        sin_lon1, cos_lon1 = np.sin(lon1), np.cos(lon1)
+        sin_lon2, cos_lon2 = np.sin(lon2), np.cos(lon2)
+        scal = 1 - 2 * hav
+        fact = dist / max(np.spacing(1), np.sqrt(1 - scal**2))
+        vt_x = fact * (sin_lat2 * cos_lon2 - scal * sin_lat1 * cos_lon1)
+        vt_y = fact * (sin_lat2 * sin_lon2 - scal * sin_lat1 * sin_lon1)
+        vt_z = fact * (cos_lat2 - scal * cos_lat1)
+        v_lat = vt_x * cos_lat1 * cos_lon1 + vt_y * cos_lat1 * sin_lon1 - vt_z * sin_lat1
+        v_lon = -vt_x * sin_lon1 + vt_y * cos_lon1
+    else:
+        d_lon = c_lon - t_lon
+        if d_lon > 180:
+            d_lon -= 360
+        elif d_lon < -180:
+            d_lon += 360
+        v_lat = (c_lat - t_lat) * u_coord.ONE_LAT_KM
+        v_lon = d_lon * np.cos(np.radians(t_lat)) * u_coord.ONE_LAT_KM
+        dist = np.sqrt(v_lat * v_lat + v_lon * v_lon)
+    return dist, v_lat, v_lon
+
+@numba.njit
+def _node_centr_wind(d_centr, v_lat, v_lon, r_max, hol_b, penv, pcen, lat, v_trans_lat,
+                     v_trans_lon, rot_lat, rot_lon):
+    """Wind vector [lat, lon] at a centroid close to a track node
+
+    Holland's wind profile (see `_stat_holland`) in angular direction, plus the translational
+    velocity, weighted by the "absorbing factor" (see `_windfield_vectors`).
+    """
+    # air density
+    rho = 1.15
+    # Coriolis parameter with earth rotation rate 7.29e-5
+    f_coriolis = 2 * 0.0000729 * np.sin(np.radians(np.abs(lat)))
+    # d_centr is in km, convert to m (factor 1000) and apply Coriolis parameter
+    r_coriolis = 0.5 * 1000 * d_centr * f_coriolis
+    # the factor 100 is from conversion between mbar and pascal
+    r_max_norm = (r_max / d_centr)**hol_b
+    sqrt_term = 100 * hol_b / rho * r_max_norm * (penv - pcen) \
+                * np.exp(-r_max_norm) + r_coriolis**2
+    v_ang_norm = np.sqrt(sqrt_term if sqrt_term > 0 else 0.) - r_coriolis
+
+    # same as np.fmin(1, r_max / d_centr), which is 1 for a missing r_max
+    v_trans_corr = r_max / d_centr
+    if not v_trans_corr < 1:
+        v_trans_corr = 1.
+
+    v_full_lat = v_trans_lat * v_trans_corr + v_ang_norm * (rot_lat * (v_lon / d_centr))
+    v_full_lon = v_trans_lon * v_trans_corr + v_ang_norm * (rot_lon * (v_lat / d_centr))
+    return (0. if np.isnan(v_full_lat) else v_full_lat,
+            0. if np.isnan(v_full_lon) else v_full_lon)
+
+@numba.njit
+def _windfield_vectors(t_lat, t_lon, t_rad, hol_b, t_env, t_cen, v_trans, v_ang_rotate,
+                       geosphere, reach_lat, reach_lon, c_lat, c_lon, cell_ptr, res, reach_pos,
+                       windfields):
+    """Wind vectors at all track nodes and centroids
+
+    Centroids farther than CENTR_NODE_MAX_DIST_KM from a node, or too close to the eye, get no
+    wind from that node. The wind at the first node is zero since the model requires the change
+    in pressure from the previous node.
+
+    The influence of translational speed decreases with distance from eye.
+    The "absorbing factor" is according to the following paper (see Fig. 7):
+
+      Mouton, F., & Nordbeck, O. (1999). Cyclone Database Manager. A tool
+      for converting point data from cyclone observations into tracks and
+      wind speed profiles in a GIS. UNED/GRID-Geneva.
+      https://unepgrid.ch/en/resource/19B7D302
+
+    Parameters
+    ----------
+    t_lat, t_lon, t_rad, t_env, t_cen : np.array of shape (npositions,)
+        Track coordinates, radius of max wind (km), environmental and central pressure.
+    hol_b : np.array of shape (npositions - 1,)
+        Holland's b parameter at each track node but the first one.
+    v_trans : np.array of shape (npositions, 2)
+        Translational velocity vectors.
+    v_ang_rotate : np.array of shape (2,)
+        Rotation of the angular wind, depending on the hemisphere.
+    geosphere : bool
+        Whether to use the "geosphere" or the "equirect" metric.
+    reach_lat, reach_lon : np.array of shape (npositions,)
+        Extents of the reach of the wind field around each node, see `_node_reach`.
+    c_lat, c_lon, cell_ptr, res :
+        Centroid coordinates, sorted by cell, and cells of the grid index, see `_GridIndex`.
+    reach_pos : np.array of shape (ncentroids,)
+        For every centroid in the order of the index, its position in the output, -1 if it is
+        not within reach.
+    windfields : np.array of shape (npositions, nreachable, 2)
+        Output array, initialized with zeros.
+
+    Returns
+    -------
+    n_close : int
+        Number of pairs of track node and centroid within reach of the wind field.
+    """
+    return _windfield_nodes(t_lat, t_lon, t_rad, hol_b, t_env, t_cen, v_trans, v_ang_rotate,
+                            geosphere, reach_lat, reach_lon, c_lat, c_lon, cell_ptr, res,
+                            reach_pos, False, windfields, np.zeros(0), np.zeros(0),
+                            np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.int64))
+
+@numba.njit
+def _windfield_max(t_lat, t_lon, t_rad, hol_b, t_env, t_cen, v_trans, v_ang_rotate,
+                   geosphere, reach_lat, reach_lon, c_lat, c_lon, cell_ptr, res, reach_pos,
+                   thresholds, v_max, i_max, exceedance_count):
+    """Maximum wind speed over all track nodes at all centroids
+
+    Same as the norm of `_windfield_vectors`, reduced over the track nodes without storing the
+    wind vectors. The output arrays are initialized with zeros: `v_max` and `i_max`, the node of
+    the maximum, of shape (nreachable,), and `exceedance_count` of shape (nthresholds,
+    nreachable), the number of nodes with wind speed above each of the `thresholds`.
+    """
+    return _windfield_nodes(t_lat, t_lon, t_rad, hol_b, t_env, t_cen, v_trans, v_ang_rotate,
+                            geosphere, reach_lat, reach_lon, c_lat, c_lon, cell_ptr, res,
+                            reach_pos, True, np.zeros((0, 0, 2)), thresholds, v_max, i_max,
+                            exceedance_count)
+
+@numba.njit
+def _windfield_nodes(t_lat, t_lon, t_rad, hol_b, t_env, t_cen, v_trans, v_ang_rotate,
+                     geosphere, reach_lat, reach_lon, c_lat, c_lon, cell_ptr, res, reach_pos,
+                     max_only, windfields, thresholds, v_max, i_max, exceedance_count):
+    """Loop over the pairs of track node and centroid within reach of the wind field
+
+    Shared by `_windfield_vectors`, which stores the wind vectors in `windfields`, and
+    `_windfield_max`, which only updates `v_max`, `i_max` and `exceedance_count` if
+    `max_only` is True.
+    """
+    n_close = 0
+    ncols = int(round(360 / res))
+    nrows = (cell_ptr.size - 1) // ncols
+    for i_node in range(t_lat.size):
+        row_0, row_1, col_0, col_1 = _grid_cells(t_lat[i_node], t_lon[i_node], reach_lat[i_node],
+                                                 reach_lon[i_node], res, nrows, ncols)
+        for row in range(row_0, row_1 + 1):
+            for col in range(col_0, col_1 + 1):
+                cell = row * ncols + col % ncols
+                for i_sorted in range(cell_ptr[cell], cell_ptr[cell + 1]):
+                    i_centr = reach_pos[i_sorted]
+                    if i_centr < 0:
+                        continue
+                    d_centr, v_lat, v_lon = _node_centr_vector(t_lat[i_node], t_lon[i_node],
+                                                               c_lat[i_sorted], c_lon[i_sorted],
+                                                               geosphere)
+                    # exclude centroids that are too far from or too close to the eye
+                    if not (d_centr < CENTR_NODE_MAX_DIST_KM and d_centr > 1e-2):
+                        continue
+                    n_close += 1
+                    if i_node == 0:
+                        continue
+                    w_lat, w_lon = _node_centr_wind(
+                        d_centr, v_lat, v_lon, t_rad[i_node], hol_b[i_node - 1], t_env[i_node],
+                        t_cen[i_node], t_lat[i_node], v_trans[i_node, 0], v_trans[i_node, 1],
+                        v_ang_rotate[0], v_ang_rotate[1])
+                    if not max_only:
+                        windfields[i_node, i_centr, 0] = w_lat
+                        windfields[i_node, i_centr, 1] = w_lon
+                        continue
+                    v_norm = np.sqrt(w_lat * w_lat + w_lon * w_lon)
+                    if v_norm > v_max[i_centr]:
+                        v_max[i_centr] = v_norm
+                        i_max[i_centr] = i_node
+                    for i_thres in range(thresholds.size):
+                        if v_norm > thresholds[i_thres]:
+                            exceedance_count[i_thres, i_centr] += 1
+    return n_close
 
 def _close_centroids(t_lat, t_lon, centroids, buffer=CENTR_NODE_MAX_DIST_DEG):
     """Check whether centroids lay within a rectangular buffer around track positions
 
-    The longitudinal coordinates are assumed to be normalized around a central longitude. This
-    makes sure that the buffered bounding box around the track doesn't cross the antimeridian.
-
-    The only hypothetical problem occurs when a TC track is travelling more than 349 degrees in
-    longitude because that's when adding a buffer of 5.5 degrees might cross the antimeridian.
-    Of course, this case is physically impossible.
+    Longitudinal differences are taken modulo 360 degrees, so that the buffer may cross the
+    antimeridian.
 
     Parameters
     ----------
     t_lat : np.array of shape (npositions,)
         Latitudinal coordinates of track positions.
     t_lon : np.array of shape (npositions,)
-        Longitudinal coordinates of track positions, normalized around a central longitude.
+        Longitudinal coordinates of track positions.
     centroids : np.array of shape (ncentroids, 2)
         Coordinates of centroids, each row is a pair [lat, lon].
     buffer : float (optional)
@@ -664,14 +1091,105 @@ def _close_centroids(t_lat, t_lon, centroids, buffer=CENTR_NODE_MAX_DIST_DEG):
     mask : np.array of shape (ncentroids,)
         Mask that is True for close centroids and False for other centroids.
     """
-    centr_lat, centr_lon = centroids[:, 0], centroids[:, 1]
-    # check for each track position which centroids are within buffer, uses NumPy's broadcasting
-    mask = ((t_lat[:, None] - buffer < centr_lat[None])
-            & (centr_lat[None] < t_lat[:, None] + buffer)
-            & (t_lon[:, None] - buffer < centr_lon[None])
-            & (centr_lon[None] < t_lon[:, None] + buffer))
-    # for each centroid, check whether it is in the buffer for any of the track positions
-    return mask.any(axis=0)
+    buffer = np.full(t_lat.shape, buffer, dtype=np.float64)
+    return _GridIndex(centroids).query(t_lat, t_lon, buffer, buffer)
+
+class _GridIndex():
+    """Centroids sorted into the cells of a regular global lat/lon grid
+
+    The centroids within a rectangle around a track position are found by only looking at the
+    centroids in the cells overlapping the rectangle. Since the index does not depend on the
+    track, it is built once and reused for all tracks on the same centroids.
+
+    Attributes
+    ----------
+    res : float
+        Size of the cells in degrees.
+    order : np.array of shape (ncentroids,)
+        Indices of the centroids, sorted by cell (row-major, from -90 and -180 degrees).
+    lat, lon : np.array of shape (ncentroids,)
+        Coordinates of the centroids in this order, the longitudes within (-180, 180].
+    cell_ptr : np.array of shape (ncells + 1,)
+        The centroids in cell `i` are at positions `cell_ptr[i]:cell_ptr[i + 1]` in this order.
+    """
+    def __init__(self, centroids, res=GRID_INDEX_RES_DEG):
+        """Build the index
+
+        Parameters
+        ----------
+        centroids : np.array of shape (ncentroids, 2)
+            Coordinates of centroids, each row is a pair [lat, lon].
+        res : float, optional
+            Size of the cells in degrees, 180 must be a multiple of it.
+            Default: GRID_INDEX_RES_DEG.
+        """
+        self.res = res
+        nrows, ncols = int(round(180 / res)), int(round(360 / res))
+        lat = centroids[:, 0].astype(np.float64)
+        lon = u_coord.lon_normalize(centroids[:, 1].astype(np.float64), center=0)
+        rows = np.clip(np.floor((lat + 90) / res), 0, nrows - 1).astype(np.int64)
+        cols = np.floor((lon + 180) / res).astype(np.int64) % ncols
+        cells = rows * ncols + cols
+        self.order = np.argsort(cells, kind='stable')
+        self.lat, self.lon = lat[self.order], lon[self.order]
+        self.cell_ptr = np.zeros(nrows * ncols + 1, dtype=np.int64)
+        self.cell_ptr[1:] = np.cumsum(np.bincount(cells, minlength=nrows * ncols))
+
+    def query(self, t_lat, t_lon, reach_lat, reach_lon):
+        """Centroids within a rectangle around any of the track positions
+
+        Parameters
+        ----------
+        t_lat, t_lon : np.array of shape (npositions,)
+            Coordinates of track positions.
+        reach_lat, reach_lon : np.array of shape (npositions,)
+            Half extents of the rectangles in latitude and longitude, in degrees.
+
+        Returns
+        -------
+        mask : np.array of shape (ncentroids,)
+            True for the centroids strictly within at least one of the rectangles.
+        """
+        mask_sorted = _grid_query(t_lat.astype(np.float64), t_lon.astype(np.float64),
+                                  reach_lat, reach_lon, self.lat, self.lon, self.cell_ptr,
+                                  self.res)
+        mask = np.zeros(self.order.size, dtype=bool)
+        mask[self.order] = mask_sorted
+        return mask
+
+@numba.njit
+def _grid_cells(t_lat, t_lon, reach_lat, reach_lon, res, nrows, ncols):
+    """Rows and (not wrapped) columns of the cells of a `_GridIndex` around a track position"""
+    row_0 = max(0, int(np.floor((t_lat - reach_lat + 90) / res)))
+    row_1 = min(nrows - 1, int(np.floor((t_lat + reach_lat + 90) / res)))
+    col_0 = int(np.floor((t_lon - reach_lon + 180) / res))
+    col_1 = int(np.floor((t_lon + reach_lon + 180) / res))
+    if col_1 - col_0 >= ncols:
+        col_0, col_1 = 0, ncols - 1
+    return row_0, row_1, col_0, col_1
+
+@numba.njit
+def _grid_query(t_lat, t_lon, reach_lat, reach_lon, c_lat, c_lon, cell_ptr, res):
+    """Mask of the centroids (in the order of a `_GridIndex`) in any of the rectangles"""
+    ncols = int(round(360 / res))
+    nrows = (cell_ptr.size - 1) // ncols
+    mask = np.zeros(c_lat.size, dtype=np.bool_)
+    for i_node in range(t_lat.size):
+        row_0, row_1, col_0, col_1 = _grid_cells(t_lat[i_node], t_lon[i_node], reach_lat[i_node],
+                                                 reach_lon[i_node], res, nrows, ncols)
+        for row in range(row_0, row_1 + 1):
+            for col in range(col_0, col_1 + 1):
+                cell = row * ncols + col % ncols
+                for i_sorted in range(cell_ptr[cell], cell_ptr[cell + 1]):
+                    if mask[i_sorted]:
+                        continue
+                    d_lon = (c_lon[i_sorted] - t_lon[i_node]) % 360
+                    if d_lon > 180:
+                        d_lon -= 360
+                    if (abs(c_lat[i_sorted] - t_lat[i_node]) < reach_lat[i_node]
+                            and abs(d_lon) < reach_lon[i_node]):
+                        mask[i_sorted] = True
+    return mask
 
 def _vtrans(t_lat, t_lon, t_tstep, metric="equirect"):
     """Translational vector and velocity at each track node.
@@ -37,6 +37,8 @@ __all__ = ['SYSTEM_DIR',
            'NATEARTH_CENTROIDS',
            'DEMO_GDP2ASSET',
            'RIVER_FLOOD_REGIONS_CSV',
+           'DIST_COAST_DIR',
+           'LAND_MASK_DIR',
            'TC_ANDREW_FL',
            'HAZ_DEMO_H5',
            'EXP_DEMO_H5',
@@ -95,6 +97,22 @@ HAZ_TEMPLATE_XLS = SYSTEM_DIR.joinpath('hazard_template.xlsx')
 RIVER_FLOOD_REGIONS_CSV = SYSTEM_DIR.joinpath('NatRegIDs.csv')
 """Look-up table for river flood module"""
 
+DIST_COAST_DIR = SYSTEM_DIR.joinpath('dist_coast')
+"""
+Rasters of the signed distance to coast on the grids of centroids, named after the bounds and
+resolution of the grid (see `climada.util.coordinates.dist_to_coast_raster`). Includes an
+approximate raster ("dist_coast_approx_...") of the 0.05 degree forecast grid of the
+Philippines, computed from the 0.1 degree land-sea mask `data-raw/landseamask_ph1.csv`
+(accurate to about 5 km, see its tags), only used for precomputed distances.
+"""
+
+LAND_MASK_DIR = SYSTEM_DIR.joinpath('land_mask')
+"""
+Rasters of the global land mask used by `climada.util.coordinates.coord_on_land`, named after
+the resolution (see `climada.util.coordinates.get_land_mask`). The masks of other land geometries
+are only kept in memory.
+"""
+
 HAZ_DEMO_FL = DEMO_DIR.joinpath('SC22000_VE__M1.grd.gz')
 """Raster file of flood over Venezuela. Model from GAR2015"""
 
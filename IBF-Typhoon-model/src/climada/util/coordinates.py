@@ -25,6 +25,7 @@ import logging
 import math
 from multiprocessing import cpu_count
 from pathlib import Path
+import os
 import re
 
 import zipfile
@@ -42,12 +43,15 @@ import rasterio.features
 import rasterio.mask
 import rasterio.warp
 import scipy.interpolate
+import scipy.ndimage
 from shapely.geometry import Polygon, MultiPolygon, Point, box
 import shapely.ops
 import shapely.vectorized
 import shapefile
 
-from climada.util.constants import (DEF_CRS, SYSTEM_DIR, ONE_LAT_KM,
+from climada.util.config import CONFIG
+from climada.util.constants import (DEF_CRS, SYSTEM_DIR, ONE_LAT_KM, DIST_COAST_DIR,
+                                    LAND_MASK_DIR,
                                     NATEARTH_CENTROIDS,
                                     ISIMIP_GPWV3_NATID_150AS,
                                     ISIMIP_NATID_TO_ISO,
@@ -76,6 +80,12 @@ DEM_NODATA = -9999
 MAX_DEM_TILES_DOWN = 300
 """Maximum DEM tiles to dowload"""
 
+MAX_LAND_MASKS = 16
+"""Maximum number of land masks kept open in a process by `get_land_mask`"""
+
+_LAND_MASKS = {}
+"""Land masks opened by `get_land_mask`, with the geometry they belong to"""
+
 def latlon_to_geosph_vector(lat, lon, rad=False, basis=False):
     """Convert lat/lon coodinates to radial vectors (on geosphere)
 
@@ -566,6 +576,66 @@ def dist_to_coast_nasa(lat, lon, highres=False, signed=False):
         dist = np.abs(dist)
     return 1000 * dist
 
+def dist_to_coast_raster(bounds, res, compute=True, cache_dir=None, approx=False):
+    """Get a raster of the signed distance to coast (in m) on a regular grid.
+
+    The raster is computed with `dist_to_coast` at the pixel centers on the first call and
+    cached as a GeoTIFF file named after the bounds and resolution of the grid. Later calls for
+    the same grid return the cached file, to be sampled with `read_raster_sample`.
+
+    Rasters from other, less accurate sources can be provided for a grid as
+    "dist_coast_approx_<bounds>_<res>.tif", with the tags SOURCE and ACCURACY_M (in m). They
+    are only returned with `approx=True` and never replace the computed distances.
+
+    Parameters
+    ----------
+    bounds : tuple
+        (lon_min, lat_min, lon_max, lat_max) of the raster in epsg:4326, pixel borders included
+    res : float
+        resolution of the raster in degrees
+    compute : bool, optional
+        If False, only return a cached raster. Default: True
+    cache_dir : str or Path, optional
+        Folder of the cached rasters. Default: DIST_COAST_DIR
+    approx : bool, optional
+        If True, return the approximate raster of the grid if there is no computed one and
+        compute is False. Default: False
+
+    Returns
+    -------
+    path : Path or None
+        GeoTIFF file with the signed distance to coast, positive off shore and negative on
+        land. None if it is not cached and compute is False.
+    """
+    cache_dir = Path(cache_dir) if cache_dir is not None else DIST_COAST_DIR
+    grid = '{:g}_{:g}_{:g}_{:g}_{:g}.tif'.format(*bounds, res)
+    path = cache_dir.joinpath('dist_coast_' + grid)
+    if path.is_file():
+        return path
+    if not compute:
+        approx_path = cache_dir.joinpath('dist_coast_approx_' + grid)
+        if approx and approx_path.is_file():
+            with rasterio.open(approx_path) as src:
+                tags = src.tags()
+            LOGGER.info('Using the distance to coast from %s, accurate to %s m.',
+                        tags.get('SOURCE', approx_path.name), tags.get('ACCURACY_M', 'unknown'))
+            return approx_path
+        return None
+
+    meta = {
+        'width': int(round((bounds[2] - bounds[0]) / res)),
+        'height': int(round((bounds[3] - bounds[1]) / res)),
+        'crs': DEF_CRS,
+        'transform': rasterio.Affine(res, 0, bounds[0], 0, -res, bounds[3]),
+        'compress': 'deflate',
+    }
+    lon, lat = raster_to_meshgrid(meta['transform'], meta['width'], meta['height'])
+    LOGGER.info('Computing distance to coast for a grid of %s points.', lat.size)
+    dist = dist_to_coast(lat.ravel(), lon.ravel(), signed=True)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    write_raster(path, dist.reshape(lat.shape), meta)
+    return path
+
 def get_land_geometry(country_names=None, extent=None, resolution=10):
     """Get union of the specified (or all) countries or the points inside the extent.
 
@@ -614,9 +684,89 @@ def get_land_geometry(country_names=None, extent=None, resolution=10):
         geom = MultiPolygon([geom])
     return geom
 
+def get_land_mask(land_geom=None, res=None, cache_dir=None):
+    """Get a raster of the cells on land, on sea and on the coast of a land geometry.
+
+    The raster is computed on the first call and kept in memory for later calls with the same
+    geometry object (at most MAX_LAND_MASKS masks). Only the mask of the default geometry is
+    also cached on disk, as a numpy file named after the resolution, which later processes
+    read memory-mapped. Cells whose center is on land get the value 1 and cells whose center is on sea the value 0,
+    except for the cells touched by the boundary of the geometry and their neighbors, which get
+    the value 2: only the points in these cells need an exact test against the geometry.
+
+    Parameters
+    ----------
+    land_geom : shapely.geometry.multipolygon.MultiPolygon, optional
+        Profiles of land. Default: the global landmass of Natural Earth (1:10.000.000)
+    res : float, optional
+        Resolution of the raster in degrees. Default: CONFIG.land_mask_res
+    cache_dir : str or Path, optional
+        Folder of the cached rasters of the default geometry. Default: LAND_MASK_DIR
+
+    Returns
+    -------
+    mask : np.array (np.memmap if cached on disk) of shape (height, width) and dtype uint8
+        0 on sea, 1 on land and 2 on the coast.
+    transform : rasterio.Affine
+        Transform of the raster in epsg:4326.
+    """
+    res = CONFIG.land_mask_res.float() if res is None else res
+    cache_dir = Path(cache_dir) if cache_dir is not None else LAND_MASK_DIR
+    # masks already opened in this process, found by the geometry object they belong to
+    key = (id(land_geom), res, cache_dir)
+    if key in _LAND_MASKS and _LAND_MASKS[key][0] is land_geom:
+        return _LAND_MASKS[key][1:]
+    if len(_LAND_MASKS) >= MAX_LAND_MASKS:
+        _LAND_MASKS.clear()
+    _LAND_MASKS[key] = (land_geom, *_get_land_mask(land_geom, res, cache_dir))
+    return _LAND_MASKS[key][1:]
+
+def _get_land_mask(land_geom, res, cache_dir):
+    """Read the cached land mask raster or compute it, see `get_land_mask`."""
+    path = None
+    if land_geom is None:
+        bounds = (-180, -90, 180, 90)
+        path = cache_dir.joinpath('land_mask_natural_earth_10m_{:g}.npy'.format(res))
+    else:
+        # grid aligned to the resolution, one cell larger than the geometry
+        bounds = (res * (np.floor(land_geom.bounds[0] / res) - 1),
+                  res * (np.floor(land_geom.bounds[1] / res) - 1),
+                  res * (np.ceil(land_geom.bounds[2] / res) + 1),
+                  res * (np.ceil(land_geom.bounds[3] / res) + 1))
+    transform = rasterio.Affine(res, 0, bounds[0], 0, -res, bounds[3])
+    if path is not None and path.is_file():
+        return np.load(path, mmap_mode='r'), transform
+
+    if land_geom is None:
+        reader = shapereader.Reader(shapereader.natural_earth(resolution='10m',
+                                                              category='cultural',
+                                                              name='admin_0_countries'))
+        geoms = list(reader.geometries())
+    else:
+        geoms = [land_geom]
+    shape = (int(round((bounds[3] - bounds[1]) / res)), int(round((bounds[2] - bounds[0]) / res)))
+    LOGGER.info('Computing land mask for a grid of %s cells.', shape[0] * shape[1])
+    mask = rasterio.features.rasterize(geoms, out_shape=shape, transform=transform,
+                                       dtype=np.uint8)
+    coast = rasterio.features.rasterize([geom.boundary for geom in geoms], out_shape=shape,
+                                        transform=transform, all_touched=True, dtype=np.uint8)
+    mask[scipy.ndimage.binary_dilation(coast, structure=np.ones((3, 3)))] = 2
+    if path is None:
+        return mask, transform
+
+    # write to a temporary file first, the mask might be computed by several processes
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name('{}.{}.npy'.format(path.stem, os.getpid()))
+    np.save(tmp_path, mask)
+    tmp_path.replace(path)
+    return np.load(path, mmap_mode='r'), transform
+
 def coord_on_land(lat, lon, land_geom=None):
     """Check if points are on land.
 
+    The points are looked up in the land mask of the geometry (see `get_land_mask`), only the
+    points in cells on the coast are tested against the geometry itself.
+
     Parameters
     ----------
     lat : np.array
@@ -634,15 +784,32 @@ def coord_on_land(lat, lon, land_geom=None):
     if lat.size != lon.size:
         raise ValueError('Wrong size input coordinates: %s != %s.'
                          % (lat.size, lon.size))
-    delta_deg = 1
-    if land_geom is None:
-        land_geom = get_land_geometry(
-            extent=(np.min(lon) - delta_deg,
-                    np.max(lon) + delta_deg,
-                    np.min(lat) - delta_deg,
-                    np.max(lat) + delta_deg),
-            resolution=10)
-    return shapely.vectorized.contains(land_geom, lon, lat)
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    on_land = np.zeros(lat.shape, dtype=bool)
+    if lat.size == 0 or (land_geom is not None and land_geom.is_empty):
+        return on_land
+
+    mask, transform = get_land_mask(land_geom)
+    row = np.floor((lat - transform.f) / transform.e)
+    col = np.floor((lon - transform.c) / transform.a)
+    # points outside of the raster (or NaN) are not on land
+    inside = (row >= 0) & (row < mask.shape[0]) & (col >= 0) & (col < mask.shape[1])
+    cell = np.zeros(lat.shape, dtype=np.uint8)
+    cell[inside] = mask[row[inside].astype(int), col[inside].astype(int)]
+    on_land[cell == 1] = True
+
+    coast = cell == 2
+    if np.any(coast):
+        if land_geom is None:
+            delta_deg = 1
+            land_geom = get_land_geometry(
+                extent=(np.min(lon[coast]) - delta_deg,
+                        np.max(lon[coast]) + delta_deg,
+                        np.min(lat[coast]) - delta_deg,
+                        np.max(lat[coast]) + delta_deg),
+                resolution=10)
+        on_land[coast] = shapely.vectorized.contains(land_geom, lon[coast], lat[coast])
+    return on_land
 
 def nat_earth_resolution(resolution):
     """Check if resolution is available in Natural Earth. Build string.
@@ -849,7 +1016,8 @@ def assign_grid_points(x, y, grid_width, grid_height, grid_transform):
     assigned[(y_i < 0) | (y_i >= grid_height)] = -1
     return assigned
 
-def assign_coordinates(coords, coords_to_assign, method="NN", distance="haversine", threshold=100):
+def assign_coordinates(coords, coords_to_assign, method="NN", distance="haversine", threshold=100,
+                       nn_index=None):
     """To each coordinate in `coords`, assign a matching coordinate in `coords_to_assign`
 
     If there is no exact match for some entry, an attempt is made to assign the geographically
@@ -883,6 +1051,9 @@ def assign_coordinates(coords, coords_to_assign, method="NN", distance="haversin
     threshold : float, optional
         If the distance to the nearest neighbor exceeds `threshold`, the index `-1` is assigned.
         Set `threshold` to 0 to disable nearest neighbor matching. Default: 100 (km)
+    nn_index : climada.util.interpolation.NNIndex, optional
+        Nearest neighbor index of `coords_to_assign` for the given distance. Default: the one
+        cached by `climada.util.interpolation.get_nn_index`, built if needed.
 
     Returns
     -------
@@ -923,7 +1094,7 @@ def assign_coordinates(coords, coords_to_assign, method="NN", distance="haversin
             not_assigned_idx_mask = (assigned_idx == -1)
             assigned_idx[not_assigned_idx_mask] = u_interp.interpol_index(
                 coords_to_assign, coords[not_assigned_idx_mask],
-                method=method, distance=distance, threshold=threshold)
+                method=method, distance=distance, threshold=threshold, nn_index=nn_index)
     return assigned_idx
 
 def region2isos(regions):
@@ -0,0 +1,192 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Define functions to compute local exceedance values (e.g. intensity or impact) for given
+return periods.
+"""
+
+__all__ = ['local_exceedance_values']
+
+import logging
+import numba
+import numpy as np
+from scipy import sparse
+
+from climada import CONFIG
+
+LOGGER = logging.getLogger(__name__)
+
+def local_exceedance_values(values, frequency, return_periods, threshold=0, pool=None):
+    """Exceedance values at every centroid for the given return periods
+
+    At each centroid (column of `values`), the values above `threshold` are sorted in
+    descending order and a straight line is fitted (least squares) to the values as a
+    function of the logarithm of the cumulative frequency of the events. The exceedance value
+    for a return period is this line evaluated at the logarithm of the inverse return period.
+    Centroids without values above the threshold get zero.
+
+    Only the nonzero entries of the sparse matrix are sorted, and the fits are computed in
+    closed form in a single compiled loop over the centroids. The centroids are processed in
+    chunks of at most CONFIG.max_matrix_size (dense) entries.
+
+    Parameters
+    ----------
+    values : sparse.csr_matrix or sparse.csc_matrix
+        Values of shape (num_events, num_centroids), e.g. hazard intensity or impact matrix.
+    frequency : np.array
+        Frequency of each event.
+    return_periods : np.array
+        Return periods to consider.
+    threshold : float, optional
+        Only values above this threshold are considered. Default: 0
+    pool : pathos.pools, optional
+        Pool to process the chunks of centroids in parallel. Default: None
+
+    Returns
+    -------
+    exc_values : np.array
+        Exceedance values of shape (num_return_periods, num_centroids).
+
+    Raises
+    ------
+    ValueError
+    """
+    return_periods = np.asarray(return_periods, dtype=float).ravel()
+    num_ev, num_cen = values.shape
+    if not num_ev:
+        return np.zeros((return_periods.size, num_cen))
+    cen_step = CONFIG.max_matrix_size.int() // num_ev
+    if not cen_step:
+        raise ValueError('Increase max_matrix_size configuration parameter to > %s'
+                         % str(num_ev))
+    if pool:
+        # at least one chunk per process
+        cen_step = max(1, min(cen_step, -(-num_cen // pool.ncpus)))
+    values = sparse.csc_matrix(values)
+    if not num_cen or cen_step >= num_cen:
+        return _chunk_exceedance_values(values, frequency, return_periods, threshold)
+    chunks = [values[:, idx:idx + cen_step] for idx in range(0, num_cen, cen_step)]
+    args = (chunks, [frequency] * len(chunks), [return_periods] * len(chunks),
+            [threshold] * len(chunks))
+    if pool:
+        exc_values = pool.map(_chunk_exceedance_values, *args)
+    else:
+        exc_values = list(map(_chunk_exceedance_values, *args))
+    return np.hstack(exc_values)
+
+def _chunk_exceedance_values(values, frequency, return_periods, threshold):
+    """Exceedance values for a chunk of centroids, see `local_exceedance_values`
+
+    Parameters
+    ----------
+    values : sparse.csc_matrix
+        Values of shape (num_events, num_centroids).
+    frequency : np.array
+        Frequency of each event.
+    return_periods : np.array
+        Return periods to consider.
+    threshold : float
+        Only values above this threshold are considered.
+
+    Returns
+    -------
+    exc_values : np.array
+        Exceedance values of shape (num_return_periods, num_centroids).
+    """
+    num_ev, num_cen = values.shape
+    values = sparse.csc_matrix(values)
+    if threshold < 0:
+        # the zeros exceed the threshold, make them explicit entries
+        dense = values.toarray()
+        values = sparse.csc_matrix((dense.ravel(order='F'), np.tile(np.arange(num_ev), num_cen),
+                                    np.arange(0, num_ev * num_cen + 1, num_ev)),
+                                   shape=values.shape)
+    # values above the threshold, sorted in descending order at each centroid
+    above = values.data > threshold
+    indptr = np.concatenate([[0], np.cumsum(above)])[values.indptr]
+    data, events = values.data[above].astype(np.float64), values.indices[above]
+    for i_cen in np.flatnonzero(np.diff(indptr) > 1):
+        order = indptr[i_cen] + np.argsort(-data[indptr[i_cen]:indptr[i_cen + 1]])
+        data[indptr[i_cen]:indptr[i_cen + 1]] = data[order]
+        events[indptr[i_cen]:indptr[i_cen + 1]] = events[order]
+    slope, intercept, min_x = _fit_log_frequency(indptr, events, data,
+                                                 np.asarray(frequency, dtype=np.float64))
+    has_val = ~np.isnan(min_x)
+    exc_values = np.zeros((return_periods.size, num_cen))
+    exc_values[:, has_val] = slope[has_val] * np.log(1 / return_periods)[:, None] \
+        + intercept[has_val]
+    with np.errstate(invalid='ignore'):
+        wrong = (return_periods[:, None] > np.exp(-min_x)) & np.isnan(exc_values)
+    exc_values[wrong] = 0.
+    return exc_values
+
+@numba.njit
+def _fit_log_frequency(indptr, events, data, frequency):
+    """Straight line fit of the values to the logarithm of their cumulative frequency
+
+    Parameters
+    ----------
+    indptr, events, data : np.array
+        Values in compressed sparse column format, of shape (num_events, num_centroids), in
+        descending order at each centroid.
+    frequency : np.array
+        Frequency of each event.
+
+    Returns
+    -------
+    slope, intercept : np.array of shape (num_centroids,)
+        Coefficients of the fit at each centroid.
+    min_x : np.array of shape (num_centroids,)
+        Logarithm of the smallest cumulative frequency at each centroid, NaN at centroids
+        without values.
+    """
+    num_cen = indptr.size - 1
+    slope = np.zeros(num_cen)
+    intercept = np.zeros(num_cen)
+    min_x = np.full(num_cen, np.nan)
+    for i_cen in range(num_cen):
+        val = data[indptr[i_cen]:indptr[i_cen + 1]]
+        num_val = val.size
+        if not num_val:
+            continue
+        log_freq = np.empty(num_val)
+        cum_freq = 0.
+        for idx in range(num_val):
+            cum_freq += frequency[events[indptr[i_cen] + idx]]
+            log_freq[idx] = np.log(cum_freq)
+        min_x[i_cen] = log_freq[0]
+        if log_freq[0] == log_freq[-1]:
+            # all values at the same cumulative frequency (e.g. a single value): minimum norm
+            # solution as given by np.polyfit
+            mean_y = val.mean()
+            if log_freq[0] != 0:
+                slope[i_cen] = 0.5 * mean_y / log_freq[0]
+                intercept[i_cen] = 0.5 * mean_y
+            else:
+                intercept[i_cen] = mean_y
+            continue
+        # least squares, centered for numerical accuracy
+        mean_x, mean_y = log_freq.mean(), val.mean()
+        var_x, cov_xy = 0., 0.
+        for idx in range(num_val):
+            d_x = log_freq[idx] - mean_x
+            var_x += d_x * d_x
+            cov_xy += d_x * (val[idx] - mean_y)
+        slope[i_cen] = cov_xy / var_x
+        intercept[i_cen] = mean_y - slope[i_cen] * mean_x
+    return slope, intercept, min_x
@@ -21,9 +21,16 @@ Define interpolation functions using different metrics.
 
 __all__ = ['interpol_index',
            'dist_sqr_approx',
+           'coords_hash',
+           'get_nn_index',
+           'cached_nn_indexes',
+           'cache_nn_index',
+           'NNIndex',
            'DIST_DEF',
            'METHOD']
 
+from collections import OrderedDict
+import hashlib
 import logging
 import numpy as np
 import numba
@@ -43,6 +50,11 @@ THRESHOLD = 100
 """Distance threshold in km. Nearest neighbors with greater distances are
 not considered."""
 
+NN_INDEX_CACHE_SIZE = 8
+"""Maximum number of nearest neighbor indexes kept in memory by `get_nn_index`"""
+
+_NN_INDEX_CACHE = OrderedDict()
+
 @numba.njit
 def dist_approx(lats1, lons1, cos_lats1, lats2, lons2):
     """Compute equirectangular approximation distance in km."""
@@ -59,7 +71,7 @@ def dist_sqr_approx(lats1, lons1, cos_lats1, lats2, lons2):
     return d_lon * d_lon * cos_lats1 * cos_lats1 + d_lat * d_lat
 
 def interpol_index(centroids, coordinates, method=METHOD[0],
-                   distance=DIST_DEF[1], threshold=THRESHOLD):
+                   distance=DIST_DEF[1], threshold=THRESHOLD, nn_index=None):
     """Returns for each coordinate the centroids indexes used for
     interpolation.
 
@@ -72,27 +84,24 @@ def interpol_index(centroids, coordinates, method=METHOD[0],
         distance (str, optional): distance to use. Haversine default
         threshold (float): distance threshold in km over which no neighbor will
             be found. Those are assigned with a -1 index
+        nn_index (NNIndex, optional): index of the centroids for the given
+            distance. Default: the one returned by `get_nn_index`
 
     Returns:
         numpy array with so many rows as coordinates containing the
             centroids indexes
     """
-    if (method == METHOD[0]) & (distance == DIST_DEF[0]):
-        # Compute for each coordinate the closest centroid
-        interp = index_nn_aprox(centroids, coordinates, threshold)
-    elif (method == METHOD[0]) & (distance == DIST_DEF[1]):
-        # Compute the nearest centroid for each coordinate using the
-        # haversine formula. This is done with a Ball tree.
-        interp = index_nn_haversine(centroids, coordinates, threshold)
-    else:
+    if method != METHOD[0] or distance not in DIST_DEF:
         raise ValueError(
             f'Interpolation using {method} with distance {distance} is not supported.')
-    return interp
+    if nn_index is None:
+        nn_index = get_nn_index(centroids, distance)
+    return nn_index.query(coordinates, threshold)
 
 def index_nn_aprox(centroids, coordinates, threshold=THRESHOLD):
     """Compute the nearest centroid for each coordinate using the
-    euclidian distance d = ((dlon)cos(lat))^2+(dlat)^2. For distant points
-    (e.g. more than 100km apart) use the haversine distance.
+    euclidian distance d = ((dlon)cos(lat))^2+(dlat)^2, with the latitude
+    of the centroid.
 
     Parameters:
         centroids (2d array): First column contains latitude, second
@@ -106,34 +115,7 @@ def index_nn_aprox(centroids, coordinates, threshold=THRESHOLD):
         array with so many rows as coordinates containing the centroids
             indexes
     """
-
-    # Compute only for the unique coordinates. Copy the results for the
-    # not unique coordinates
-    _, idx, inv = np.unique(coordinates, axis=0, return_index=True,
-                            return_inverse=True)
-    # Compute cos(lat) for all centroids
-    centr_cos_lat = np.cos(np.radians(centroids[:, 0]))
-    assigned = np.zeros(coordinates.shape[0], int)
-    num_warn = 0
-    for icoord, iidx in enumerate(idx):
-        dist = dist_sqr_approx(centroids[:, 0], centroids[:, 1],
-                               centr_cos_lat, coordinates[iidx, 0],
-                               coordinates[iidx, 1])
-        min_idx = dist.argmin()
-        # Raise a warning if the minimum distance is greater than the
-        # threshold and set an unvalid index -1
-        if np.sqrt(dist.min()) * ONE_LAT_KM > threshold:
-            num_warn += 1
-            min_idx = -1
-
-        # Assign found centroid index to all the same coordinates
-        assigned[inv == icoord] = min_idx
-
-    if num_warn:
-        LOGGER.warning('Distance to closest centroid is greater than %s'
-                       'km for %s coordinates.', threshold, num_warn)
-
-    return assigned
+    return NNIndex(centroids, DIST_DEF[0]).query(coordinates, threshold)
 
 def index_nn_haversine(centroids, coordinates, threshold=THRESHOLD):
     """Compute the neareast centroid for each coordinate using a Ball
@@ -151,24 +133,228 @@ def index_nn_haversine(centroids, coordinates, threshold=THRESHOLD):
         array with so many rows as coordinates containing the centroids
             indexes
     """
-    # Construct tree from centroids
-    tree = BallTree(np.radians(centroids), metric='haversine')
-    # Select unique exposures coordinates
-    _, idx, inv = np.unique(coordinates, axis=0, return_index=True,
-                            return_inverse=True)
-
-    # query the k closest points of the n_points using dual tree
-    dist, assigned = tree.query(np.radians(coordinates[idx]), k=1,
-                                return_distance=True, dualtree=True,
-                                breadth_first=False)
-
-    # Raise a warning if the minimum distance is greater than the
-    # threshold and set an unvalid index -1
-    num_warn = np.sum(dist * EARTH_RADIUS_KM > threshold)
-    if num_warn:
-        LOGGER.warning('Distance to closest centroid is greater than %s'
-                       'km for %s coordinates.', threshold, num_warn)
-        assigned[dist * EARTH_RADIUS_KM > threshold] = -1
-
-    # Copy result to all exposures and return value
-    return np.squeeze(assigned[inv])
+    return NNIndex(centroids, DIST_DEF[1]).query(coordinates, threshold)
+
+def coords_hash(*arrays):
+    """Hexadecimal SHA-1 digest of the shapes and values of the given arrays
+
+    Parameters:
+        arrays (np.array or scalar): e.g. coordinates, converted to float64
+
+    Returns:
+        str
+    """
+    sha = hashlib.sha1()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr, dtype=np.float64)
+        sha.update(str(arr.shape).encode())
+        sha.update(arr.tobytes())
+    return sha.hexdigest()
+
+def get_nn_index(centroids, distance=DIST_DEF[1]):
+    """Nearest neighbor index of the centroids, reused as long as it is cached
+
+    The last NN_INDEX_CACHE_SIZE indexes are kept in memory, identified by the hash of the
+    centroids' coordinates (see `coords_hash`) and the distance.
+
+    Parameters:
+        centroids (2d array): First column contains latitude, second
+            column contains longitude. Each row is a geographic point
+        distance (str, optional): distance to use. Haversine default
+
+    Returns:
+        NNIndex
+    """
+    key = (coords_hash(centroids), distance)
+    if key in _NN_INDEX_CACHE:
+        _NN_INDEX_CACHE.move_to_end(key)
+        return _NN_INDEX_CACHE[key]
+    return cache_nn_index(NNIndex(centroids, distance, centr_hash=key[0]))
+
+def cached_nn_indexes(centroids):
+    """Nearest neighbor indexes of the centroids currently cached by `get_nn_index`
+
+    Parameters:
+        centroids (2d array): First column contains latitude, second
+            column contains longitude. Each row is a geographic point
+
+    Returns:
+        list of NNIndex
+    """
+    centr_hash = coords_hash(centroids)
+    return [nn_index for (key, _), nn_index in _NN_INDEX_CACHE.items() if key == centr_hash]
+
+def cache_nn_index(nn_index):
+    """Add an index to the cache of `get_nn_index`, dropping the least recently used one
+
+    Parameters:
+        nn_index (NNIndex): e.g. read from a file with `NNIndex.read_hdf5`
+
+    Returns:
+        NNIndex
+    """
+    _NN_INDEX_CACHE[(nn_index.centr_hash, nn_index.distance)] = nn_index
+    _NN_INDEX_CACHE.move_to_end((nn_index.centr_hash, nn_index.distance))
+    while len(_NN_INDEX_CACHE) > NN_INDEX_CACHE_SIZE:
+        _NN_INDEX_CACHE.popitem(last=False)
+    return nn_index
+
+class NNIndex():
+    """Index to find the nearest centroid of many coordinates
+
+    The index is built once for a set of centroids and reused for all queries. With the
+    "haversine" distance, it is a Ball tree. With the "approx" distance, it consists of the
+    centroids sorted by latitude: the search for the nearest centroid of a coordinate starts at
+    its latitude and stops as soon as the latitudinal distance alone exceeds the closest distance
+    found so far (or the threshold).
+
+    Attributes:
+        centroids (2d array): latitude and longitude of the centroids
+        distance (str): distance, one of DIST_DEF
+        centr_hash (str): hash of the centroids, see `coords_hash`
+        tree (BallTree): with distance "haversine", tree of the centroids in radians
+        lat_order (np.array): with distance "approx", indexes of the centroids sorted by
+            latitude
+    """
+    def __init__(self, centroids, distance=DIST_DEF[1], centr_hash=None, lat_order=None):
+        """Build the index, unless it is given
+
+        Parameters:
+            centroids (2d array): First column contains latitude, second
+                column contains longitude. Each row is a geographic point
+            distance (str, optional): distance to use. Haversine default
+            centr_hash (str, optional): hash of the centroids, computed if not given
+            lat_order (np.array, optional): centroids sorted by latitude, for distance "approx"
+        """
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        self.distance = distance
+        self.centr_hash = coords_hash(self.centroids) if centr_hash is None else centr_hash
+        self.tree = None
+        self.lat_order = None
+        if distance == DIST_DEF[0]:
+            self.lat_order = (np.argsort(self.centroids[:, 0], kind='stable')
+                              if lat_order is None else lat_order)
+        elif distance == DIST_DEF[1]:
+            self.tree = BallTree(np.radians(self.centroids), metric='haversine')
+        else:
+            raise ValueError(f'Distance {distance} is not supported.')
+
+    def query(self, coordinates, threshold=THRESHOLD):
+        """Nearest centroid of each coordinate
+
+        Parameters:
+            coordinates (2d array): First column contains latitude, second
+                column contains longitude. Each row is a geographic point
+            threshold (float): distance threshold in km over which no neighbor will
+                be found. Those are assigned with a -1 index
+
+        Returns:
+            array with so many rows as coordinates containing the centroids
+                indexes
+        """
+        # Compute only for the unique coordinates. Copy the results for the
+        # not unique coordinates
+        _, idx, inv = np.unique(coordinates, axis=0, return_index=True,
+                                return_inverse=True)
+        if self.distance == DIST_DEF[0]:
+            coordinates = np.asarray(coordinates, dtype=np.float64)
+            lat = self.centroids[self.lat_order, 0]
+            assigned, dist = _nn_approx(
+                lat, self.centroids[self.lat_order, 1], np.cos(np.radians(lat)),
+                self.lat_order, coordinates[idx, 0], coordinates[idx, 1],
+                (threshold / ONE_LAT_KM)**2)
+            dist = np.sqrt(dist) * ONE_LAT_KM
+        else:
+            # a single tree query is much faster than a dual tree one for k=1
+            dist, assigned = self.tree.query(np.radians(coordinates[idx]), k=1,
+                                             return_distance=True)
+            dist, assigned = dist[:, 0] * EARTH_RADIUS_KM, assigned[:, 0]
+
+        # Raise a warning if the minimum distance is greater than the
+        # threshold and set an unvalid index -1
+        num_warn = np.sum(dist > threshold)
+        if num_warn:
+            LOGGER.warning('Distance to closest centroid is greater than %s'
+                           'km for %s coordinates.', threshold, num_warn)
+            assigned[dist > threshold] = -1
+
+        # Copy result to all exposures and return value
+        return assigned[np.ravel(inv)]
+
+    def write_hdf5(self, file_data):
+        """Write the index into a group "nn_index_<distance>" of an hdf5 file
+
+        Only the order of the centroids of the "approx" index is written. The Ball tree of the
+        "haversine" index is not, it is rebuilt from the centroids when needed.
+
+        Parameters:
+            file_data (h5py.Group): e.g. the file or group of the centroids
+        """
+        if f'nn_index_{self.distance}' in file_data:
+            del file_data[f'nn_index_{self.distance}']
+        if self.lat_order is None:
+            return
+        group = file_data.create_group(f'nn_index_{self.distance}')
+        group.attrs['centr_hash'] = self.centr_hash
+        group.create_dataset('lat_order', data=self.lat_order, compression="gzip")
+
+    @classmethod
+    def read_hdf5(cls, file_data, centroids, distance=DIST_DEF[1]):
+        """Read the index written by `write_hdf5`, if it matches the centroids
+
+        Parameters:
+            file_data (h5py.Group): e.g. the file or group of the centroids
+            centroids (2d array): First column contains latitude, second
+                column contains longitude. Each row is a geographic point
+            distance (str, optional): distance to use. Haversine default
+
+        Returns:
+            NNIndex, or None if there is no index for these centroids
+        """
+        group = file_data.get(f'nn_index_{distance}')
+        if (distance != DIST_DEF[0] or group is None or 'lat_order' not in group
+                or group.attrs['centr_hash'] != coords_hash(centroids)):
+            return None
+        lat_order = np.array(group['lat_order'])
+        # the order is used as index in compiled code, which doesn't check the bounds
+        if (lat_order.shape != (len(centroids),) or lat_order.dtype.kind not in 'iu'
+                or (lat_order.size and (lat_order.min() < 0
+                                        or lat_order.max() >= len(centroids)))):
+            return None
+        return cls(centroids, distance, group.attrs['centr_hash'], lat_order=lat_order)
+
+@numba.njit
+def _nn_approx(c_lat, c_lon, c_cos_lat, c_idx, lat, lon, threshold_sqr):
+    """Nearest centroid with the approximate distance, searching by latitude
+
+    Parameters:
+        c_lat, c_lon, c_cos_lat (np.array): centroids sorted by latitude, and the cosine of
+            their latitude
+        c_idx (np.array): index of the sorted centroids
+        lat, lon (np.array): coordinates to assign
+        threshold_sqr (float): squared threshold in degrees
+
+    Returns:
+        assigned (np.array): index of the nearest centroid, -1 if further than the threshold
+        dist (np.array): squared distance to it in degrees (see `dist_sqr_approx`), inf if
+            further than the threshold
+    """
+    assigned = np.full(lat.size, -1, dtype=np.int64)
+    dist = np.full(lat.size, np.inf)
+    for i_coord in range(lat.size):
+        start = np.searchsorted(c_lat, lat[i_coord])
+        for step in (1, -1):
+            i_centr = start if step == 1 else start - 1
+            while 0 <= i_centr < c_lat.size:
+                d_lat = c_lat[i_centr] - lat[i_coord]
+                if d_lat * d_lat > min(dist[i_coord], threshold_sqr):
+                    break
+                d_sqr = dist_sqr_approx(c_lat[i_centr], c_lon[i_centr], c_cos_lat[i_centr],
+                                        lat[i_coord], lon[i_coord])
+                # on ties, the first centroid is the nearest one, as with argmin
+                if d_sqr < dist[i_coord] or (d_sqr == dist[i_coord]
+                                             and c_idx[i_centr] < assigned[i_coord]):
+                    dist[i_coord] = d_sqr
+                    assigned[i_coord] = c_idx[i_centr]
+                i_centr += step
+    return assigned, dist
@@ -27,6 +27,8 @@ import geopandas as gpd
 import numpy as np
 from pyproj.crs import CRS as PCRS
 import shapely
+import shapely.vectorized
+import shapely.wkb
 from shapely.geometry import box, Point
 from rasterio.windows import Window
 from rasterio.warp import Resampling
@@ -464,6 +466,51 @@ class TestGetGeodata(unittest.TestCase):
         self.assertFalse(res[1])
         self.assertTrue(res[2])
 
+    def test_get_land_mask(self):
+        """Test raster of the land mask, kept in memory for geometries other than the default"""
+        cache_dir = Path(DATA_DIR, "land_mask_cache")
+        land_geom = shapely.geometry.MultiPolygon([box(10, 40, 12, 42), box(14, 40, 15, 41)])
+        mask, transform = u_coord.get_land_mask(land_geom, res=0.25, cache_dir=cache_dir)
+        self.assertEqual(mask.shape, (10, 22))
+        self.assertEqual(transform, Affine(0.25, 0, 9.75, 0, -0.25, 42.25))
+        # land inside, sea between the boxes and coast along the boundaries
+        np.testing.assert_array_equal(mask[3:7, 3:7], 1)
+        np.testing.assert_array_equal(mask[:, 11:15], 0)
+        np.testing.assert_array_equal(mask[:3, :11], 2)
+        for (row, col), value in np.ndenumerate(mask):
+            cell = box(*(transform * (col, row + 1)), *(transform * (col + 1, row)))
+            if value == 1:
+                self.assertTrue(land_geom.contains(cell))
+            elif value == 0:
+                self.assertTrue(land_geom.disjoint(cell))
+
+        self.assertEqual(list(cache_dir.glob("land_mask_*")), [])
+        cached, _ = u_coord.get_land_mask(land_geom, res=0.25, cache_dir=cache_dir)
+        self.assertIs(cached, mask)
+        # an equal geometry object is computed again, the masks in memory are bounded
+        other, _ = u_coord.get_land_mask(shapely.wkb.loads(land_geom.wkb), res=0.25,
+                                         cache_dir=cache_dir)
+        self.assertIsNot(other, mask)
+        np.testing.assert_array_equal(other, mask)
+        self.assertLessEqual(len(u_coord._LAND_MASKS), u_coord.MAX_LAND_MASKS)
+        self.assertEqual(list(cache_dir.glob("land_mask_*")), [])
+
+    def test_on_land_geom_pass(self):
+        """check points on land of a given geometry, also close to the coast"""
+        land_geom = shapely.geometry.MultiPolygon([
+            shapely.geometry.Polygon([(120, 5), (125, 5), (125, 20), (120, 20)],
+                                     [[(121, 6), (122, 6), (122, 7)]]),
+            shapely.geometry.Point(126.3, 10.1).buffer(0.3),
+        ])
+        rng = np.random.default_rng(7)
+        lat = np.concatenate([rng.uniform(4, 21, 10000), [5, 20, 6.5, 10.1, np.nan]])
+        lon = np.concatenate([rng.uniform(119, 127, 10000), [122.5, 125, 121.6, 126.3, 121]])
+        res = u_coord.coord_on_land(lat, lon, land_geom)
+        np.testing.assert_array_equal(res, shapely.vectorized.contains(land_geom, lon, lat))
+        np.testing.assert_array_equal(res[-5:], [False, False, False, True, False])
+        self.assertEqual(u_coord.coord_on_land(lat[:6].reshape(2, 3), lon[:6].reshape(2, 3),
+                                               land_geom).shape, (2, 3))
+
     def test_dist_to_coast(self):
         """Test point in coast and point not in coast"""
         points = np.array([
@@ -504,6 +551,42 @@ class TestGetGeodata(unittest.TestCase):
         for d, r in zip(dists_lowres, result_lowres):
             self.assertAlmostEqual(d, r)
 
+    def test_dist_to_coast_raster(self):
+        """Test cached raster of the distance to coast"""
+        cache_dir = Path(DATA_DIR, "dist_coast_cache")
+        bounds, res = (10, 40, 10.5, 40.25), 0.25
+        path = cache_dir.joinpath("dist_coast_10_40_10.5_40.25_0.25.tif")
+        path.unlink(missing_ok=True)
+        self.assertIsNone(u_coord.dist_to_coast_raster(bounds, res, compute=False,
+                                                       cache_dir=cache_dir))
+
+        meta = {
+            'transform': Affine(res, 0, bounds[0], 0, -res, bounds[3]),
+            'width': 2,
+            'height': 1,
+            'crs': DEF_CRS,
+        }
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # approximate rasters are only used on request, never instead of computed ones
+        approx_path = cache_dir.joinpath("dist_coast_approx_10_40_10.5_40.25_0.25.tif")
+        u_coord.write_raster(approx_path, np.array([[-900., 2100.]]), meta)
+        self.assertIsNone(u_coord.dist_to_coast_raster(bounds, res, compute=False,
+                                                       cache_dir=cache_dir))
+        self.assertEqual(u_coord.dist_to_coast_raster(bounds, res, compute=False,
+                                                      cache_dir=cache_dir, approx=True),
+                         approx_path)
+
+        u_coord.write_raster(path, np.array([[-1000., 2000.]]), meta)
+        self.assertEqual(u_coord.dist_to_coast_raster(bounds, res, compute=False,
+                                                      cache_dir=cache_dir), path)
+        self.assertEqual(u_coord.dist_to_coast_raster(bounds, res, compute=False,
+                                                      cache_dir=cache_dir, approx=True), path)
+        dist = u_coord.read_raster_sample(path, np.array([40.125, 40.125]),
+                                          np.array([10.125, 10.375]))
+        np.testing.assert_array_almost_equal(dist, [-1000, 2000])
+        path.unlink()
+        approx_path.unlink()
+
     def test_get_country_geometries_country_pass(self):
         """get_country_geometries with selected countries. issues with the
         natural earth data should be caught by test_get_land_geometry_* since
@@ -0,0 +1,104 @@
+"""
+This file is part of CLIMADA.
+
+Copyright (C) 2017 ETH Zurich, CLIMADA contributors listed in AUTHORS.
+
+CLIMADA is free software: you can redistribute it and/or modify it under the
+terms of the GNU General Public License as published by the Free
+Software Foundation, version 3.
+
+CLIMADA is distributed in the hope that it will be useful, but WITHOUT ANY
+WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along
+with CLIMADA. If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Test of exceedance module
+"""
+
+import unittest
+import numpy as np
+from scipy import sparse
+
+from climada import CONFIG
+from climada.util.exceedance import local_exceedance_values
+
+RETURN_PERIODS = np.array([10, 25, 50, 100, 250])
+
+def _polyfit_exceedance(values, frequency, threshold, return_periods):
+    """Exceedance values fitted separately at each centroid with np.polyfit"""
+    exc_values = np.zeros((return_periods.size, values.shape[1]))
+    for cen_idx in range(values.shape[1]):
+        sort_pos = np.argsort(values[:, cen_idx], kind='stable')[::-1]
+        val_sort = values[sort_pos, cen_idx]
+        freq_sort = np.cumsum(frequency[sort_pos])
+        above = val_sort > threshold
+        if np.any(above):
+            pol_coef = np.polyfit(np.log(freq_sort[above]), val_sort[above], deg=1)
+            exc_values[:, cen_idx] = np.polyval(pol_coef, np.log(1 / return_periods))
+    return exc_values
+
+class TestLocalExceedance(unittest.TestCase):
+    """Test local_exceedance_values"""
+
+    def test_polyfit_pass(self):
+        """Compare with a separate fit at each centroid."""
+        rng = np.random.default_rng(8)
+        values = rng.uniform(0, 80, (200, 60))
+        values[rng.random(values.shape) < 0.8] = 0
+        frequency = rng.uniform(1e-3, 1e-2, 200)
+        for threshold in [0, 20]:
+            exc_values = local_exceedance_values(sparse.csr_matrix(values), frequency,
+                                                 RETURN_PERIODS, threshold)
+            self.assertEqual(exc_values.shape, (5, 60))
+            np.testing.assert_allclose(
+                exc_values, _polyfit_exceedance(values, frequency, threshold, RETURN_PERIODS),
+                rtol=1e-9, atol=1e-9)
+
+    def test_degenerate_pass(self):
+        """Test centroids without values and with a single value."""
+        values = np.zeros((4, 3))
+        values[2, 1] = 30
+        values[[1, 3], 2] = 20
+        frequency = np.full(4, 0.01)
+        exc_values = local_exceedance_values(sparse.csr_matrix(values), frequency,
+                                             RETURN_PERIODS)
+        np.testing.assert_array_equal(exc_values[:, 0], 0)
+        np.testing.assert_allclose(exc_values[:, 1],
+                                   np.polyval(np.polyfit([np.log(0.01)], [30], deg=1),
+                                              np.log(1 / RETURN_PERIODS)))
+        np.testing.assert_allclose(exc_values[:, 2],
+                                   np.polyval(np.polyfit(np.log([0.01, 0.02]), [20, 20], deg=1),
+                                              np.log(1 / RETURN_PERIODS)), atol=1e-12)
+
+        exc_values = local_exceedance_values(sparse.csr_matrix(np.zeros((0, 3))),
+                                             np.zeros(0), RETURN_PERIODS)
+        np.testing.assert_array_equal(exc_values, np.zeros((5, 3)))
+
+    def test_chunks_pass(self):
+        """Test the computation in several chunks of centroids."""
+        rng = np.random.default_rng(3)
+        values = rng.uniform(0, 80, (50, 45))
+        values[rng.random(values.shape) < 0.5] = 0
+        frequency = np.full(50, 0.02)
+        exc_values = local_exceedance_values(sparse.csr_matrix(values), frequency,
+                                             RETURN_PERIODS)
+        max_matrix_size = CONFIG.max_matrix_size._val
+        try:
+            CONFIG.max_matrix_size._val = 50 * 7
+            exc_values_chunks = local_exceedance_values(sparse.csr_matrix(values), frequency,
+                                                        RETURN_PERIODS)
+            CONFIG.max_matrix_size._val = 49
+            with self.assertRaises(ValueError):
+                local_exceedance_values(sparse.csr_matrix(values), frequency, RETURN_PERIODS)
+        finally:
+            CONFIG.max_matrix_size._val = max_matrix_size
+        np.testing.assert_array_equal(exc_values_chunks, exc_values)
+
+# Execute Tests
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestLocalExceedance)
+    unittest.TextTestRunner(verbosity=2).run(TESTS)
@@ -243,9 +243,43 @@ class TestNN(unittest.TestCase):
         """Call repeat_coord_pass test for haversine distance"""
         self.repeat_coord_pass('haversine')
 
+class TestNNIndex(unittest.TestCase):
+    """Test the cached nearest neighbor index"""
+
+    def test_approx_brute_force_pass(self):
+        """Compare with the minimum of the approximate distance to all centroids"""
+        rng = np.random.default_rng(5)
+        centroids = np.stack(np.meshgrid(np.arange(10, 12, 0.1), np.arange(120, 122, 0.1)),
+                             axis=-1).reshape(-1, 2)
+        coords = np.concatenate([rng.uniform([9, 119], [13, 123], (500, 2)), centroids + 0.05])
+        dist = u_interp.dist_sqr_approx(coords[:, None, 0], coords[:, None, 1],
+                                        np.cos(np.radians(coords[:, None, 0])),
+                                        centroids[None, :, 0], centroids[None, :, 1])
+        expected = np.argmin(dist, axis=1)
+        expected[np.sqrt(dist.min(axis=1)) * ONE_LAT_KM > 50] = -1
+        nn_index = u_interp.NNIndex(centroids, 'approx')
+        np.testing.assert_array_equal(nn_index.query(coords, 50), expected)
+
+    def test_cache_pass(self):
+        """Test that the index is built once for the same centroids"""
+        exposures, centroids = def_input_values()
+        nn_index = u_interp.get_nn_index(centroids, 'haversine')
+        self.assertIs(u_interp.get_nn_index(centroids.copy(), 'haversine'), nn_index)
+        self.assertIsNot(u_interp.get_nn_index(centroids, 'approx'), nn_index)
+        self.assertIsNot(u_interp.get_nn_index(centroids + 1, 'haversine'), nn_index)
+        self.assertIn(nn_index, u_interp.cached_nn_indexes(centroids))
+        np.testing.assert_array_equal(
+            u_interp.interpol_index(centroids, exposures, nn_index=nn_index),
+            u_interp.interpol_index(centroids, exposures))
+
+        for i_centr in range(u_interp.NN_INDEX_CACHE_SIZE):
+            u_interp.get_nn_index(centroids + i_centr + 2, 'haversine')
+        self.assertNotIn(nn_index, u_interp.cached_nn_indexes(centroids))
+
 # Execute Tests
 if __name__ == "__main__":
     TESTS = unittest.TestLoader().loadTestsFromTestCase(TestNN)
+    TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestNNIndex))
     TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestInterpIndex))
     TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestDistance))
     unittest.TextTestRunner(verbosity=2).run(TESTS)
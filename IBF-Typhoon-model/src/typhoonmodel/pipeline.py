@@ -30,7 +30,9 @@ logger = logging.getLogger(__name__)
 @click.option('--typhoonname', default=None, help='name for active typhoon')
 @click.option('--no-azure', is_flag=True, help="Don't push to Azure lake")
 @click.option('--debug', is_flag=True, help='setting for DEBUG option')
-def main(path, remote_directory, use_hindcast, local_directory, typhoonname, no_azure, debug):
+@click.option('--n-workers', default=1, show_default=True,
+              help='number of processes computing the ensemble windfields in parallel, 1 runs serially')
+def main(path, remote_directory, use_hindcast, local_directory, typhoonname, no_azure, debug, n_workers):
     initialize.setup_cartopy()
     start_time = datetime.now()
     print('---------------------AUTOMATION SCRIPT STARTED---------------------------------')
@@ -48,7 +50,7 @@ def main(path, remote_directory, use_hindcast, local_directory, typhoonname, no_
                          "(for the forecast timestamp), a local directory, and the typhoon name")
         logger.info(f"Running on hindcast {typhoonname}")
     Forecast(path, remote_dir, typhoonname, countryCodeISO3='PHP', admin_level=3, no_azure=no_azure,
-             use_hindcast=use_hindcast, local_directory=local_directory)
+             use_hindcast=use_hindcast, local_directory=local_directory, n_workers=n_workers)
     print('---------------------AUTOMATION SCRIPT FINISHED---------------------------------')
     print(str(datetime.now()))
 
@@ -22,14 +22,13 @@ from azure.storage.file import ContentSettings
 import pandas as pd
 from pybufrkit.decoder import Decoder
 import numpy as np
-from geopandas.tools import sjoin
-import geopandas as gpd
 import click
 
 from climada.hazard import Centroids, TropCyclone,TCTracks
 from climada.hazard.tc_tracks_forecast import TCForecast
 from typhoonmodel.utility_fun import track_data_clean, Check_for_active_typhoon, Sendemail, \
-    ucl_data, plot_intensity, initialize
+    ucl_data, plot_intensity, initialize, track_distance, admin_index, \
+    ensemble_windfield
 
 if platform == "linux" or platform == "linux2": #check if running on linux or windows os
     from typhoonmodel.utility_fun import Rainfall_data
@@ -114,20 +113,9 @@ def main(path,debug,remote_directory,typhoonname):
     cent.check()
     cent.plot()
     ####
-    admin=gpd.read_file(os.path.join(path,"./data-raw/phl_admin3_simpl2.geojson"))
-    df = pd.DataFrame(data=cent.coord)
-    df["centroid_id"] = "id"+(df.index).astype(str)  
-    centroid_idx=df["centroid_id"].values
-    ncents = cent.size
-    df=df.rename(columns={0: "lat", 1: "lon"})
-    df = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.lon, df.lat))
-    admin.set_crs(epsg=4326, inplace=True)
-    df.set_crs(epsg=4326, inplace=True)
-    #df=df.to_crs(admin.crs)
-    #df.to_crs({'init': 'epsg:4326'})
-    #df.crs = "EPSG:4326"#{'init': 'epsg:4326'} 
-    #df.crs = {'init': 'epsg:4326', 'no_defs': True}
-    df_admin = sjoin(df, admin, how="left").dropna()
+    admin_idx = admin_index.AdminIndex.from_file(
+        (118,6,127,19), 0.05, os.path.join(path,"./data-raw/phl_admin3_simpl2.geojson"),
+        cache_dir=os.path.join(path, admin_index.CACHE_DIR))
     
     # Sometimes the ECMWF ftp server complains about too many requests
     # This code allows several retries with some sleep time in between
@@ -151,7 +139,7 @@ def main(path,debug,remote_directory,typhoonname):
 
     #%% filter data downloaded in the above step for active typhoons  in PAR
     # filter tracks with name of current typhoons and drop tracks with only one timestep
-    fcast_data = [track_data_clean.track_data_clean(tr) for tr in fcast.data if (tr.time.size>1 and tr.name in Activetyphoon)]  
+    fcast_data = track_data_clean.tracks_data_clean([tr for tr in fcast.data if (tr.time.size>1 and tr.name in Activetyphoon)])  
      
     fcast.data =fcast_data # [tr for tr in fcast.data if tr.name in Activetyphoon]
     # fcast.data = [tr for tr in fcast.data if tr.time.size>1]    
@@ -213,15 +201,9 @@ def main(path,debug,remote_directory,typhoonname):
         
         # calculate windfields for each ensamble
         threshold=0            #(threshold to filter dataframe /reduce data )
-        df = pd.DataFrame(data=cent.coord)
-        df["centroid_id"] = "id"+(df.index).astype(str)  
-        centroid_idx=df["centroid_id"].values
-        ncents = cent.size
-        df=df.rename(columns={0: "lat", 1: "lon"})
         
         #calculate wind field for each ensamble members 
         list_intensity=[]
-        distan_track=[]
         for tr in data_forced:
             logger.info(f"Running on ensemble # {tr.ensemble_number} for typhoon {tr.name}")
             track = TCTracks()
@@ -235,45 +217,12 @@ def main(path,debug,remote_directory,typhoonname):
                 logger.info("High res member: creating intensity plot")
                 plot_intensity.plot_inensity(typhoon=typhoon, event=tr.sid, output_dir=Output_folder,
                                              date_dir=date_dir, typhoon_name=tr.name)
-            windfield=typhoon.windfields
-            nsteps = windfield[0].shape[0]
-            centroid_id = np.tile(centroid_idx, nsteps)
-            intensity_3d = windfield[0].toarray().reshape(nsteps, ncents, 2)
-            intensity = np.linalg.norm(intensity_3d, axis=-1).ravel()
-            timesteps = np.repeat(track.data[0].time.values, ncents)
-            #timesteps = np.repeat(tr.time.values, ncents)
-            timesteps = timesteps.reshape((nsteps, ncents)).ravel()
-            inten_tr = pd.DataFrame({
-                    'centroid_id': centroid_id,
-                    'value': intensity,
-                    'timestamp': timesteps,})
-            inten_tr = inten_tr[inten_tr.value > threshold]
-            inten_tr['storm_id'] = tr.sid
-            inten_tr['ens_id'] =tr.sid+'_'+str(tr.ensemble_number)
-            inten_tr['name'] = tr.name
-            inten_tr = (pd.merge(inten_tr, df_admin, how='outer', on='centroid_id')
-                        .dropna()
-                        .groupby(['adm3_pcode', 'ens_id'], as_index=False)
-                        .agg({"value": ['count', 'max']}))
-            inten_tr.columns = [x for x in ['adm3_pcode', 'storm_id', 'value_count', 'v_max']]
+            intensity = ensemble_windfield.windfield_speed(typhoon.windfields[0])
+            inten_tr = admin_idx.wind_stats(intensity, threshold=threshold)
+            inten_tr.insert(1, 'storm_id', tr.sid+'_'+str(tr.ensemble_number))
             list_intensity.append(inten_tr)
-            distan_track1=[]
-            for index, row in df.iterrows():
-                dist=np.min(np.sqrt(np.square(tr.lat.values-row['lat'])+np.square(tr.lon.values-row['lon'])))
-                distan_track1.append(dist*111)
-            dist_tr = pd.DataFrame({'centroid_id': centroid_idx,'value': distan_track1})
-            dist_tr['storm_id'] = tr.sid
-            dist_tr['name'] = tr.name
-            dist_tr['ens_id'] =tr.sid+'_'+str(tr.ensemble_number)
-            dist_tr = (pd.merge(dist_tr, df_admin, how='outer', on='centroid_id')
-                       .dropna()
-                       .groupby(['adm3_pcode', 'name', 'ens_id'], as_index=False)
-                       .agg({'value': 'min'}))
-            dist_tr.columns = [x for x in ['adm3_pcode', 'name', 'storm_id',
-                                                 'dis_track_min']]  # join_left_df_.columns.ravel()]
-            distan_track.append(dist_tr)
         df_intensity_ = pd.concat(list_intensity)
-        distan_track1 = pd.concat(distan_track)
+        distan_track1 = track_distance.admin_dist_track_min(data_forced, cent.coord, admin_idx)
 
         typhhon_df = pd.merge(df_intensity_, distan_track1,  how='left', on=['adm3_pcode','storm_id']) 
     
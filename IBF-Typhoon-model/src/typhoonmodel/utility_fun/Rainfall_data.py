@@ -1,20 +1,35 @@
 import os
+import re
+import time
 import urllib.request
 import urllib.error
 import requests
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import shutil
 
 from bs4 import BeautifulSoup
 import xarray as xr
 import rasterio
+import rasterio.transform
 from rasterstats import zonal_stats
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 
+from typhoonmodel.utility_fun import admin_index
+
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_WORKERS = 4
+"""Number of GRIB files downloaded in parallel"""
+
+DOWNLOAD_RETRIES = 3
+"""Number of attempts to download a file when the server answers with an error 5xx"""
+
+RETRY_WAIT = 10
+"""Seconds to wait before the first retry of a download, doubled at every retry"""
+
 
 def url_is_alive(url):
     """
@@ -32,9 +47,12 @@ def url_is_alive(url):
         return False
 
 
-def download_rainfall_nomads(Input_folder, path, Alternative_data_point,no_data_value=29999):
+def download_rainfall_nomads(Input_folder, path, Alternative_data_point,no_data_value=29999, percentiles=()):
     """
     download rainfall 
+
+    :param percentiles: percentiles of the ensemble members written to the csv in addition to
+        the median, e.g. (90,) for a wet scenario
     """
     rainfall_path = os.path.join(Input_folder, 'rainfall/')
     if not os.path.exists(rainfall_path):
@@ -57,46 +75,32 @@ def download_rainfall_nomads(Input_folder, path, Alternative_data_point,no_data_
         logger.warning(f"No rainfall files available today, using yesterday's date instead")
         get_grib_files(url2, path, rainfall_path)
 
+    quantiles = [0.5] + [p / 100 for p in percentiles]
+    columns = ["max_"+time_itr+"h_rain" for time_itr in RAINFALL_TIME_STEP]
+    list_percentiles = []
+    list_cellmax = []
     for hour in RAINFALL_TIME_STEP:
         pattern = f'.pgrb2a.0p50.bc_{hour}h'
         output_filename = f'rainfall_{hour}.nc'
-        filename_list = Path(rainfall_path).glob(f'*{pattern}*')
-        with xr.open_mfdataset(filename_list, engine='cfgrib',
-                               combine="nested", concat_dim=["time"],
-                               backend_kwargs={"indexpath": "",
-                                               'filter_by_keys': {'totalNumber': 30}}
-                               ) as ds:
-            filepath = os.path.join(rainfall_path, output_filename)
-            logger.info(f'Writing to file {filepath}')
-            ds = ds.median(dim='number') #store only the median of the ensemble members
-            ds.to_netcdf(filepath)
+        filename_list = sorted(Path(rainfall_path).glob(f'*{pattern}*'))
+        filepath = os.path.join(rainfall_path, output_filename)
         #zonal stats to calculate rainfall per manucipality 
-        #list_df.append(zonal_stat_rain(filepath,admin))  
-        rain_6h=rasterio.open(filepath) 
-        band_indexes = rain_6h.indexes
-        transform = rain_6h.transform
-        all_band_summaries = []
-        for b in band_indexes:
-            array = rain_6h.read(b)
-            band_summary = zonal_stats(
-                admin,
-                array,
-                prefix=f"band{b}_",
-                stats="mean",
-                nodata=no_data_value,
-                all_touched=True,
-                affine=transform,
-            )
-            all_band_summaries.append(band_summary)
-        # Flip dimensions
-        shape_summaries = list(zip(*all_band_summaries))
-        # each list entry now reflects a municipalities, and consists of a dictionary with the rainfall in mm / 6h for each time frame
-        final = [{k: v for d in s for k, v in d.items()} for s in shape_summaries]
+        rain_admin = ensemble_admin_rainfall(filename_list, ADMIN_PATH, quantiles,
+                                             cache_dir=os.path.join(path, admin_index.CACHE_DIR),
+                                             nodata=no_data_value, median_file=filepath,
+                                             stats=('mean', 'max'))
         # Obtain list with maximum 6h rainfall
-        maximum_6h = [max(x.values()) for x in final]
-        list_df.append(pd.DataFrame(maximum_6h))
+        maximum_6h = np.fmax.reduce(rain_admin['mean'], axis=-1)
+        list_df.append(pd.DataFrame(maximum_6h[:, 0]))
+        list_percentiles += [pd.DataFrame(maximum_6h[:, i]) for i in range(1, len(quantiles))]
+        # maximum over the cells and lead times of the median, the rainfall_24h that
+        # lib_r/Read_rainfall_v2.R extracted from rainfall_24.nc for the impact model
+        list_cellmax.append(pd.DataFrame(np.fmax.reduce(rain_admin['max'][:, 0], axis=-1)))
+    list_df += list_percentiles + list_cellmax
+    columns += [f"max_{hour}h_rain_p{p:g}" for hour in RAINFALL_TIME_STEP for p in percentiles]
+    columns += [f"cellmax_{hour}h_rain" for hour in RAINFALL_TIME_STEP]
     df_rain = pd.concat(list_df,axis=1, ignore_index=True) 
-    df_rain.columns = ["max_"+time_itr+"h_rain" for time_itr in RAINFALL_TIME_STEP]
+    df_rain.columns = columns
     df_rain['Mun_Code']=list(admin['adm3_pcode'].values)
     logger.info("saved processed rainfall file to csv")
     df_rain.to_csv(os.path.join(Input_folder, "rainfall/rain_data.csv"), index=False)
@@ -108,28 +112,171 @@ def download_rainfall_nomads(Input_folder, path, Alternative_data_point,no_data_
     #logger.info("saved processed rainfall file to csv")
 
 
-def get_grib_files(url, path, rainfall_path, use_cache=True):
-    base_urls = []
-    for items in listFD(url):
-        if url_is_alive(items+'prcp_bc_gb2/'):
-            base_urls.append(items)
-    base_url = base_urls[-1]
+def iter_ensemble_quantiles(grib_files, quantiles=(0.5,)):
+    """
+    Quantiles over the ensemble members of the rainfall forecast, one lead time at a time,
+    so that only the members of a single GRIB file are in memory at once.
+
+    :param grib_files: GRIB2 files with the 30 members of one lead time each
+    :param quantiles: quantiles to compute, 0.5 is the median
+    :return: generator of xr.DataArray with dims (quantile, latitude, longitude), with the
+        latitude descending
+    """
+    for grib_file in grib_files:
+        with xr.open_dataset(grib_file, engine='cfgrib',
+                             backend_kwargs={"indexpath": "",
+                                             'filter_by_keys': {'totalNumber': 30}}) as ds:
+            rain = next(iter(ds.data_vars.values())).sortby('latitude', ascending=False)
+            members = rain.transpose('number', 'latitude', 'longitude').values
+            # missing members are skipped, as by xarray's median, but nanquantile is much slower
+            quantile = np.nanquantile if np.isnan(members).any() else np.quantile
+            values = quantile(members, quantiles, axis=0).astype(members.dtype)
+            yield rain.isel(number=0, drop=True).expand_dims(quantile=list(quantiles)).copy(data=values)
+
+
+def ensemble_admin_rainfall(grib_files, admin_file, quantiles=(0.5,), cache_dir=None, nodata=None,
+                            median_file=None, stats=('mean',)):
+    """
+    Rainfall per municipality of the ensemble quantiles of every lead time.
+
+    :param grib_files: GRIB2 files with the 30 members of one lead time each
+    :param admin_file: path to the admin3 boundaries
+    :param quantiles: quantiles to compute, must contain 0.5 if median_file is given
+    :param cache_dir: directory of the cached admin zones, see admin_index.AdminZones
+    :param nodata: value of missing raster cells
+    :param median_file: if given, the median of all lead times is written to this NetCDF file
+    :param stats: reductions over the cells of a municipality, 'mean' and/or 'max' (methods
+        of admin_index.AdminZones)
+    :return: dict of np.array of shape (nadmins, len(quantiles), len(grib_files)) per stat
+    """
+    rain_admin = None
+    for lead, rain in enumerate(iter_ensemble_quantiles(grib_files, quantiles)):
+        if rain_admin is None:
+            lat, lon = rain.latitude.values, rain.longitude.values
+            transform = rasterio.transform.from_origin(
+                lon[0] - (lon[1] - lon[0]) / 2, lat[0] + (lat[0] - lat[1]) / 2,
+                lon[1] - lon[0], lat[0] - lat[1])
+            zones = admin_index.AdminZones.from_file(transform, rain.shape[1:], admin_file,
+                                                     cache_dir=cache_dir)
+            rain_admin = {stat: np.empty((zones.pcodes.size, len(quantiles), len(grib_files)))
+                          for stat in stats}
+            if median_file:
+                median = np.empty((len(grib_files),) + rain.shape[1:], dtype=rain.dtype)
+                lead_coords = {name: np.empty(len(grib_files), dtype=rain[name].dtype)
+                               for name in ['time', 'step', 'valid_time']}
+        for stat, values in rain_admin.items():
+            values[:, :, lead] = getattr(zones, stat)(rain.values, nodata=nodata)
+        if median_file:
+            median[lead] = rain.sel(quantile=0.5).values
+            for name, values in lead_coords.items():
+                values[lead] = rain[name].values
+
+    if median_file and rain_admin is not None:
+        logger.info(f'Writing to file {median_file}')
+        coords = {name: coord for name, coord in rain.coords.items()
+                  if coord.ndim == 0 and name not in lead_coords}
+        coords.update({name: ('time', values) for name, values in lead_coords.items()})
+        coords.update({'latitude': rain.latitude, 'longitude': rain.longitude})
+        xr.Dataset({rain.name: (('time', 'latitude', 'longitude'), median, rain.attrs)},
+                   coords=coords).to_netcdf(median_file)
+    return rain_admin
+
+
+def get_grib_files(url, path, rainfall_path, use_cache=True, n_workers=DOWNLOAD_WORKERS):
+    """
+    Download the bias corrected GEFS precipitation of the latest cycle of a day.
+
+    :param url: NOMADS folder of the day
+    :param path: main path of the model
+    :param rainfall_path: folder to write the GRIB files to
+    :param use_cache: skip files that were already downloaded
+    :param n_workers: number of files downloaded in parallel
+    """
+    base_url = latest_cycle(url)
     base_url_hour = base_url+'prcp_bc_gb2/geprcp.t%sz.pgrb2a.0p50.bc_' % base_url.split('/')[-2]
     time_step_list = ['06', '12', '18', '24', '30', '36', '42', '48', '54', '60', '66', '72']
     rainfall_24 = [base_url_hour+'24hf0%s' % t for t in time_step_list]
     rainfall_06 = [base_url_hour+'06hf0%s' % t for t in time_step_list]
+    downloads = []
     for rain_file in rainfall_06 + rainfall_24:
         output_file = os.path.join(os.path.relpath(rainfall_path, path), rain_file.split('/')[-1]+'.grib2')
         if use_cache and os.path.isfile(output_file):
             logger.info(f'File {output_file} exists, skipping')
             continue
-        try:
-            with urllib.request.urlopen(rain_file) as response, open(output_file, 'wb') as out_file:
-                logger.info(f'Downloading {rain_file} to {output_file}')
-                shutil.copyfileobj(response, out_file)
-        except urllib.error.HTTPError:
-            logger.warning(f"Rain file {rain_file} doesn't exist, skipping")
-            continue
+        downloads.append((rain_file, output_file))
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        list(executor.map(lambda download: download_file(*download), downloads))
+
+
+def latest_cycle(url):
+    """
+    Latest cycle of a day for which the bias corrected precipitation is available.
+
+    :param url: NOMADS folder of the day
+    :return: url of the cycle folder
+    """
+    for cycle_url in reversed(listFD(url)):
+        if url_is_alive(cycle_url+'prcp_bc_gb2/'):
+            return cycle_url
+    raise IndexError(f'No rainfall forecast available at {url}')
+
+
+def download_file(url, output_file, chunk_size=1 << 20, retries=DOWNLOAD_RETRIES):
+    """
+    Download a file, resuming the partial file left by an interrupted earlier download.
+
+    :param url: file to download
+    :param output_file: local path, the file only appears there once it is complete
+    :param chunk_size: number of bytes written at once
+    :param retries: number of attempts when the server answers with an error 5xx
+    :return: True if downloaded, False if the file doesn't exist on the server
+    :raises requests.HTTPError: on other errors, or when the errors 5xx persist
+    """
+    part_file = output_file + '.part'
+    attempt = 0
+    while True:
+        attempt += 1
+        offset = os.path.getsize(part_file) if os.path.isfile(part_file) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with requests.get(url, headers=headers, stream=True, timeout=60) as response:
+            if response.status_code == 404:
+                logger.warning(f"Rain file {url} doesn't exist, skipping")
+                return False
+            if response.status_code == 416:
+                # the range is not satisfiable: either the partial file is complete, or it
+                # doesn't match the file on the server (changed or shorter) anymore
+                if _range_total(response) == offset:
+                    logger.info(f'Download of {url} already complete')
+                    break
+                logger.warning(f'Partial file {part_file} does not match {url}, downloading again')
+                os.remove(part_file)
+                continue
+            if response.status_code >= 500 and attempt < retries:
+                wait = RETRY_WAIT * 2 ** (attempt - 1)
+                logger.warning(f'Error {response.status_code} downloading {url}, retrying in {wait} s')
+                time.sleep(wait)
+                continue
+            response.raise_for_status()
+            # servers ignoring the range send the whole file again
+            mode = 'ab' if response.status_code == 206 else 'wb'
+            logger.info(f'Downloading {url} to {output_file}' + (f' from byte {offset}' if mode == 'ab' else ''))
+            with open(part_file, mode) as out_file:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    out_file.write(chunk)
+            break
+    os.replace(part_file, output_file)
+    return True
+
+
+def _range_total(response):
+    """
+    Size of the file on the server given in the Content-Range header of a response 416.
+
+    :param response: requests.Response
+    :return: size in bytes, None if the header is missing
+    """
+    match = re.fullmatch(r'bytes \*/(\d+)', response.headers.get('Content-Range', '').strip())
+    return int(match.group(1)) if match else None
 
 
 def listFD(url):
@@ -187,6 +334,8 @@ def create_synthetic_rainfall(Input_folder):
     df_rain = pd.DataFrame({
         "max_06h_rain": 250,
         "max_24h_rain": 1000,
+        "cellmax_06h_rain": 250,
+        "cellmax_24h_rain": 1000,
         "Mun_Code": admin['adm3_pcode'].values,
     })
     df_rain.to_csv(os.path.join(Input_folder, "rainfall/rain_data.csv"), index=False)
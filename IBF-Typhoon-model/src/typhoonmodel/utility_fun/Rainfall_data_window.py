@@ -75,6 +75,7 @@ def download_rainfall_nomads(Input_folder,path,Alternative_data_point,no_data_va
     rainfiles = [f for f in os.listdir(os.path.join(Input_folder,'rainfall/')) if f.endswith('.nc') ]
     col_names=[ f.split('_')[1][0:2] for f in rainfiles]
     
+    list_cellmax = []
     for layer in rainfiles:
         rain_6h=rasterio.open(os.path.join(Input_folder,'rainfall/',layer))         
         band_indexes = rain_6h.indexes
@@ -86,7 +87,7 @@ def download_rainfall_nomads(Input_folder,path,Alternative_data_point,no_data_va
                 admin,
                 array,
                 prefix=f"band{b}_",
-                stats="mean",
+                stats="mean max",
                 nodata=no_data_value,
                 all_touched=True,
                 affine=transform,
@@ -97,10 +98,14 @@ def download_rainfall_nomads(Input_folder,path,Alternative_data_point,no_data_va
         # each list entry now reflects a municipalities, and consists of a dictionary with the rainfall in mm / 6h for each time frame
         final = [{k: v for d in s for k, v in d.items()} for s in shape_summaries]
         # Obtain list with maximum 6h rainfall
-        maximum_6h = [max(x.values()) for x in final]
+        maximum_6h = [max(v for k, v in x.items() if k.endswith('_mean')) for x in final]
         list_df.append(pd.DataFrame(maximum_6h))
-    df_rain = pd.concat(list_df,axis=1, ignore_index=True) 
-    df_rain.columns = ["max_"+time_itr+"h_rain" for time_itr in col_names]
+        # maximum over the cells and bands, the rainfall of the impact model
+        list_cellmax.append(pd.DataFrame([max(v for k, v in x.items() if k.endswith('_max'))
+                                          for x in final]))
+    df_rain = pd.concat(list_df + list_cellmax,axis=1, ignore_index=True) 
+    df_rain.columns = (["max_"+time_itr+"h_rain" for time_itr in col_names]
+                       + ["cellmax_"+time_itr+"h_rain" for time_itr in col_names])
     df_rain['Mun_Code']=list(admin['adm3_pcode'].values)
     df_rain.to_csv(os.path.join(Input_folder, "rainfall/rain_data.csv"), index=False)
 
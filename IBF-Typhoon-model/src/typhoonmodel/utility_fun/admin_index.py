@@ -0,0 +1,309 @@
+"""
+Lookup from the windfield centroids and the rainfall raster cells to the municipalities
+(adm3_pcode) they fall in.
+
+The spatial join of a grid with the admin boundaries only depends on the grid and the
+boundary file, so it is computed once and stored on disk, from where later runs load it.
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio.features
+import rasterio.windows
+from geopandas.tools import sjoin
+from scipy import sparse
+
+from climada.hazard import Centroids
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+"""Increase when the layout of the cached files changes"""
+
+CACHE_DIR = 'forecast/cache'
+"""Default cache directory, relative to the main path of the model"""
+
+NO_ADMIN = -1
+"""Index value of centroids outside of all municipalities"""
+
+
+def _file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for block in iter(lambda: fp.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _cache_key(meta):
+    return hashlib.sha256(json.dumps(meta, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class AdminIndex:
+    """
+    Municipality of every centroid of a raster grid.
+
+    Attributes
+    ----------
+    centroid_admin : np.array of shape (ncentroids,)
+        Position in `pcodes` of the municipality of each centroid, NO_ADMIN if outside.
+    pcodes : np.array of str
+        Sorted adm3_pcode of all municipalities containing at least one centroid.
+    order : np.array
+        Positions of the centroids inside a municipality, sorted by municipality.
+    offsets : np.array
+        Start of every municipality in `order`, as used by `np.ufunc.reduceat`.
+    """
+
+    def __init__(self, centroid_admin, pcodes):
+        self.centroid_admin = centroid_admin
+        self.pcodes = np.asarray(pcodes)
+        self.order = np.argsort(centroid_admin, kind='stable')
+        self.order = self.order[centroid_admin[self.order] != NO_ADMIN]
+        self.offsets = np.flatnonzero(np.diff(centroid_admin[self.order], prepend=NO_ADMIN))
+
+    @property
+    def size(self):
+        """Number of municipalities"""
+        return self.pcodes.size
+
+    @classmethod
+    def from_file(cls, bounds, res, admin_file, cache_dir=None):
+        """
+        Load the index for a centroid grid, building and caching it if necessary.
+
+        :param bounds: (lon_min, lat_min, lon_max, lat_max) of the centroids raster
+        :param res: resolution of the centroids raster in degrees
+        :param admin_file: path to the admin3 boundaries (with column adm3_pcode)
+        :param cache_dir: directory of the cached index, if None it is not cached
+        :return: AdminIndex
+        """
+        if cache_dir is None:
+            return cls(*cls._build(bounds, res, admin_file))
+
+        meta = {
+            'version': CACHE_VERSION,
+            'bounds': [float(b) for b in bounds],
+            'res': float(res),
+            'admin_file_hash': _file_hash(admin_file),
+        }
+        key = _cache_key(meta)
+        cache_dir = Path(cache_dir)
+        index_file = cache_dir / f'centroid_admin3_{key}.npy'
+        meta_file = cache_dir / f'centroid_admin3_{key}.json'
+
+        if index_file.is_file() and meta_file.is_file():
+            logger.info(f'Reading centroid to admin index from {index_file}')
+            with open(meta_file) as fp:
+                pcodes = json.load(fp)['pcodes']
+            return cls(np.load(index_file, mmap_mode='r'), pcodes)
+
+        centroid_admin, pcodes = cls._build(bounds, res, admin_file)
+        logger.info(f'Writing centroid to admin index to {index_file}')
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # write to temporary files first so that concurrent runs never see partial files
+        tmp_index, tmp_meta = index_file.with_suffix('.npy.tmp'), meta_file.with_suffix('.json.tmp')
+        with open(tmp_index, 'wb') as fp:
+            np.save(fp, centroid_admin)
+        with open(tmp_meta, 'w') as fp:
+            json.dump(dict(meta, pcodes=pcodes.tolist()), fp)
+        os.replace(tmp_meta, meta_file)
+        os.replace(tmp_index, index_file)
+        return cls(np.load(index_file, mmap_mode='r'), pcodes)
+
+    @staticmethod
+    def _build(bounds, res, admin_file):
+        """Spatial join of the centroids raster with the admin boundaries"""
+        logger.info(f'Building centroid to admin index from {admin_file}')
+        cent = Centroids()
+        cent.set_raster_from_pnt_bounds(bounds, res=res)
+        cent.set_meta_to_lat_lon()
+        admin = gpd.read_file(admin_file)
+        admin.set_crs(epsg=4326, inplace=True, allow_override=True)
+        points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(cent.lon, cent.lat), crs='EPSG:4326')
+        joined = sjoin(points, admin[['adm3_pcode', 'geometry']], how='inner')
+        # points on a shared border match several municipalities, keep the first one
+        joined = joined[~joined.index.duplicated(keep='first')]
+        codes, pcodes = pd.factorize(joined['adm3_pcode'].values, sort=True)
+        dtype = np.int16 if pcodes.size < np.iinfo(np.int16).max else np.int32
+        centroid_admin = np.full(cent.size, NO_ADMIN, dtype=dtype)
+        centroid_admin[joined.index.values] = codes
+        return centroid_admin, np.asarray(pcodes)
+
+    def reduce_max(self, values):
+        """Maximum per municipality of values of shape (..., ncentroids)"""
+        return np.maximum.reduceat(values[..., self.order], self.offsets, axis=-1)
+
+    def reduce_sum(self, values):
+        """Sum per municipality of values of shape (ncentroids,)"""
+        inside = self.centroid_admin != NO_ADMIN
+        return np.bincount(self.centroid_admin[inside], weights=values[inside],
+                           minlength=self.size)
+
+    def wind_stats(self, speed, threshold=0):
+        """
+        Exposure duration and maximum wind per municipality.
+
+        :param speed: sparse matrix of shape (nsteps, ncentroids), wind speed per time step
+            (see `ensemble_windfield.windfield_speed`)
+        :param threshold: only wind speeds above the (non-negative) threshold are counted
+        :return: DataFrame with columns adm3_pcode, value_count, v_max for the municipalities
+            with at least one value above the threshold
+        """
+        speed = sparse.csc_matrix(speed, copy=True)
+        speed.data[speed.data <= threshold] = 0
+        speed.eliminate_zeros()
+        value_count = self.reduce_sum(speed.getnnz(axis=0))
+        v_max = self.reduce_max(speed.max(axis=0).toarray().ravel())
+        hit = value_count > 0
+        return pd.DataFrame({
+            'adm3_pcode': self.pcodes[hit],
+            'value_count': value_count[hit].astype(np.int64),
+            'v_max': v_max[hit],
+        })
+
+
+class AdminZones:
+    """
+    Raster cells touched by every municipality, for zonal statistics on a fixed grid
+    such as the GEFS 0.5 degree rainfall forecast.
+
+    A cell is assigned to every municipality touching it (all_touched), so that a cell
+    of a coarse grid usually belongs to several small municipalities. The assignment is
+    stored as a sparse matrix.
+
+    Attributes
+    ----------
+    membership : sparse.csr_matrix of shape (nadmins, cells.size)
+        1 where the municipality touches the cell.
+    cells : np.array
+        Flat indices in the raster of the cells touched by any municipality.
+    pcodes : np.array of str
+        adm3_pcode of the municipalities, in the order of the boundary file.
+    """
+
+    def __init__(self, membership, cells, pcodes):
+        self.membership = membership
+        self.cells = cells
+        self.pcodes = np.asarray(pcodes)
+
+    @classmethod
+    def from_file(cls, transform, shape, admin_file, cache_dir=None):
+        """
+        Load the zones for a raster grid, building and caching them if necessary.
+
+        :param transform: affine.Affine transform of the raster
+        :param shape: (height, width) of the raster
+        :param admin_file: path to the admin3 boundaries (with column adm3_pcode)
+        :param cache_dir: directory of the cached zones, if None they are not cached
+        :return: AdminZones
+        """
+        if cache_dir is None:
+            return cls(*cls._build(transform, shape, admin_file))
+
+        meta = {
+            'version': CACHE_VERSION,
+            'transform': [float(t) for t in tuple(transform)[:6]],
+            'shape': [int(n) for n in shape],
+            'admin_file_hash': _file_hash(admin_file),
+        }
+        key = _cache_key(meta)
+        cache_dir = Path(cache_dir)
+        zones_file = cache_dir / f'admin3_zones_{key}.npz'
+        meta_file = cache_dir / f'admin3_zones_{key}.json'
+
+        if zones_file.is_file() and meta_file.is_file():
+            logger.info(f'Reading admin zones from {zones_file}')
+            with open(meta_file) as fp:
+                meta = json.load(fp)
+            return cls(sparse.load_npz(zones_file), np.array(meta['cells']), meta['pcodes'])
+
+        membership, cells, pcodes = cls._build(transform, shape, admin_file)
+        logger.info(f'Writing admin zones to {zones_file}')
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_zones, tmp_meta = zones_file.with_suffix('.npz.tmp'), meta_file.with_suffix('.json.tmp')
+        with open(tmp_zones, 'wb') as fp:
+            sparse.save_npz(fp, membership)
+        with open(tmp_meta, 'w') as fp:
+            json.dump(dict(meta, cells=cells.tolist(), pcodes=pcodes.tolist()), fp)
+        os.replace(tmp_meta, meta_file)
+        os.replace(tmp_zones, zones_file)
+        return cls(membership, cells, pcodes)
+
+    @staticmethod
+    def _build(transform, shape, admin_file):
+        """Rasterize every municipality (all_touched) within the window of its bounds"""
+        logger.info(f'Building admin zones from {admin_file}')
+        admin = gpd.read_file(admin_file)
+        grid = rasterio.windows.Window(0, 0, shape[1], shape[0])
+        rows, cols = [], []
+        for i, geom in enumerate(admin.geometry):
+            if geom is None or geom.is_empty:
+                continue
+            bounds = rasterio.windows.from_bounds(*geom.bounds, transform=transform)
+            # whole cells, with one extra cell on each side for polygons ending on a cell border
+            row_off, col_off = np.floor([bounds.row_off, bounds.col_off]) - 1
+            row_end = np.ceil(bounds.row_off + bounds.height) + 1
+            col_end = np.ceil(bounds.col_off + bounds.width) + 1
+            window = rasterio.windows.Window(col_off, row_off, col_end - col_off, row_end - row_off)
+            try:
+                window = window.intersection(grid)
+            except rasterio.errors.WindowError:
+                continue
+            touched = rasterio.features.rasterize(
+                [(geom, 1)], out_shape=(int(window.height), int(window.width)),
+                transform=rasterio.windows.transform(window, transform),
+                all_touched=True, dtype='uint8')
+            w_rows, w_cols = np.nonzero(touched)
+            rows.append(np.full(w_rows.size, i))
+            cols.append(np.ravel_multi_index((w_rows + int(window.row_off),
+                                              w_cols + int(window.col_off)), shape))
+        rows = np.concatenate(rows)
+        cells, cols = np.unique(np.concatenate(cols), return_inverse=True)
+        membership = sparse.csr_matrix((np.ones(rows.size), (rows, cols)),
+                                       shape=(len(admin), cells.size))
+        return membership, cells, np.asarray(admin['adm3_pcode'].values)
+
+    def mean(self, bands, nodata=None):
+        """
+        Mean of every band per municipality, over the touched cells with valid data.
+
+        :param bands: np.array of shape (nbands, height, width)
+        :param nodata: value of missing cells, NaN cells are always missing
+        :return: np.array of shape (nadmins, nbands), NaN without any valid cell
+        """
+        values = bands.reshape(bands.shape[0], -1)[:, self.cells].astype(np.float64)
+        valid = ~np.isnan(values)
+        if nodata is not None:
+            valid &= values != nodata
+        values[~valid] = 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.membership @ values.T) / (self.membership @ valid.T)
+
+    def max(self, bands, nodata=None):
+        """
+        Maximum of every band per municipality, over the touched cells with valid data.
+
+        :param bands: np.array of shape (nbands, height, width)
+        :param nodata: value of missing cells, NaN cells are always missing
+        :return: np.array of shape (nadmins, nbands), NaN without any valid cell
+        """
+        values = bands.reshape(bands.shape[0], -1)[:, self.cells].astype(np.float64)
+        if nodata is not None:
+            values[values == nodata] = np.nan
+        membership = self.membership.tocsr()
+        starts = membership.indptr[:-1]
+        touching = np.diff(membership.indptr) > 0
+        admin_max = np.full((self.pcodes.size, bands.shape[0]), np.nan)
+        if touching.any():
+            # the cells of the municipalities are consecutive in the indices of the csr
+            # matrix, so that every segment between two touching municipalities is reduced
+            admin_max[touching] = np.fmax.reduceat(values[:, membership.indices],
+                                                   starts[touching], axis=1).T
+        return admin_max
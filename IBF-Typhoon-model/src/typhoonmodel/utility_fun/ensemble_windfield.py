@@ -0,0 +1,81 @@
+"""
+Windfields of all members of a forecast ensemble, optionally computed in parallel.
+"""
+import itertools
+import logging
+
+import numpy as np
+from pathos.pools import ProcessPool as Pool
+from scipy import sparse
+
+from climada.hazard import TropCyclone, TCTracks
+
+logger = logging.getLogger(__name__)
+
+
+def member_windfield(track, centroids):
+    """
+    Windfield of a single ensemble member, with the time dependent winds stored.
+
+    :param track: track xr.Dataset
+    :param centroids: climada Centroids
+    :return: (track, TropCyclone)
+    """
+    tracks = TCTracks()
+    tracks.data = [track]
+    typhoon = TropCyclone()
+    typhoon.set_from_tracks(tracks, centroids, store_windfields=True)
+    return track, typhoon
+
+
+def iter_windfields(tracks, centroids, n_workers=1):
+    """
+    Compute the windfields of all tracks.
+
+    With more than one worker, the members are distributed over a process pool and
+    yielded in the order in which they complete, so that the caller can aggregate a
+    member while the others are still being computed.
+
+    :param tracks: list of track xr.Dataset
+    :param centroids: climada Centroids, shared by all members
+    :param n_workers: number of processes, 1 computes the members serially
+    :return: generator of (track, TropCyclone)
+    """
+    # computed once here, otherwise every worker would compute it on its own copy
+    if not centroids.coord.size:
+        centroids.set_meta_to_lat_lon()
+    if not centroids.dist_coast.size:
+        centroids.set_dist_coast()
+
+    if n_workers <= 1:
+        for track in tracks:
+            logger.info(f"Running on ensemble # {track.ensemble_number} for typhoon {track.name}")
+            yield member_windfield(track, centroids)
+        return
+
+    logger.info(f"Running on {len(tracks)} ensemble members using {n_workers} processes")
+    pool = Pool(nodes=n_workers)
+    try:
+        yield from pool.uimap(member_windfield, tracks, itertools.repeat(centroids, len(tracks)))
+    finally:
+        pool.close()
+        pool.join()
+        pool.clear()
+
+
+def windfield_speed(windfield):
+    """
+    Wind speed at every time step and centroid, without densifying the windfield.
+
+    :param windfield: sparse matrix of shape (nsteps, ncentroids * 2) with the wind vectors,
+        as stored in `TropCyclone.windfields`
+    :return: sparse.csr_matrix of shape (nsteps, ncentroids)
+    """
+    ncents = windfield.shape[1] // 2
+    # sums the squares of the two vector components of every centroid
+    components = sparse.csr_matrix((np.ones(2 * ncents), (np.arange(2 * ncents),
+                                                          np.arange(2 * ncents) // 2)),
+                                   shape=(2 * ncents, ncents))
+    speed = sparse.csr_matrix(windfield).multiply(windfield).tocsr() @ components
+    speed.data = np.sqrt(speed.data)
+    return speed
@@ -134,6 +134,6 @@ class Forecast:
 
         #%% filter data downloaded in the above step for active typhoons  in PAR
         # filter tracks with name of current typhoons and drop tracks with only one timestep
-        fcast_data = [track_data_clean.track_data_clean(tr) for tr in fcast.data if (tr.time.size>1 and tr.name in Activetyphoon)]  
+        fcast_data = track_data_clean.tracks_data_clean([tr for tr in fcast.data if (tr.time.size>1 and tr.name in Activetyphoon)])  
         self.fcast_data=fcast_data
         
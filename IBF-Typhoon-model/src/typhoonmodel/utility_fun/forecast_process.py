@@ -4,9 +4,7 @@ import os
 import sys
 from datetime import datetime, timedelta
 from sys import platform
-import subprocess
 import logging
-import traceback
 from pathlib import Path
 from azure.storage.file import FileService
 from azure.storage.file import ContentSettings
@@ -14,14 +12,13 @@ from azure.storage.file import ContentSettings
 import pandas as pd
 from pybufrkit.decoder import Decoder
 import numpy as np
-from geopandas.tools import sjoin
 import geopandas as gpd
-from shapely.geometry import Point
-from climada.hazard import Centroids, TropCyclone,TCTracks
+from climada.hazard import Centroids
 from climada.hazard.tc_tracks_forecast import TCForecast
 from typhoonmodel.utility_fun.settings import get_settings
 from typhoonmodel.utility_fun import track_data_clean, Check_for_active_typhoon, Sendemail, \
-    ucl_data, plot_intensity, initialize, read_in_hindcast
+    ucl_data, plot_intensity, initialize, read_in_hindcast, track_distance, \
+    ensemble_windfield, admin_index, impact_model, plot_impact, landfall
 
 #check if running on windows or linux/macOS
 if platform == "win32":
@@ -33,10 +30,14 @@ decoder = Decoder()
 initialize.setup_logger()
 logger = logging.getLogger(__name__)
 
+CENT_BOUNDS = (118, 6, 127, 19)
+CENT_RES = 0.05
+ADMIN_FILE = "./data-raw/phl_admin3_simpl2.geojson"
+
 
 class Forecast:
     def __init__(self,main_path, remote_dir,typhoonname, countryCodeISO3, admin_level, no_azure,
-                 use_hindcast, local_directory):
+                 use_hindcast, local_directory, n_workers=1):
         self.TyphoonName = typhoonname
         self.admin_level = admin_level
         #self.db = DatabaseManager(leadTimeLabel, countryCodeISO3,admin_level)
@@ -54,7 +55,10 @@ class Forecast:
         self.AZURE_CONNECTING_STRING = settings[countryCodeISO3]['AZURE_CONNECTING_STRING']
         self.ECMWF_MAX_TRIES = 3
         self.ECMWF_SLEEP = 30  # s
+        # local copy of the ECMWF forecast folders, files already downloaded are not fetched again
+        self.ECMWF_MIRROR = os.path.join(main_path, 'forecast/Input/ecmwf_bufr')
         self.main_path=main_path
+        self.n_workers = n_workers
         
         if not typhoonname:
             Activetyphoon = Check_for_active_typhoon.check_active_typhoon()
@@ -81,19 +85,15 @@ class Forecast:
         #download NOAA rainfall
         if use_hindcast:
             Rainfall_data.create_synthetic_rainfall(self.Input_folder)
-            rainfall_error = False
         else:
             try:
                 #Rainfall_data_window.download_rainfall_nomads(Input_folder,path,Alternative_data_point)
                 Rainfall_data.download_rainfall_nomads(self.Input_folder,self.main_path,self.Alternative_data_point)
-                rainfall_error=False
-                self.rainfall_data=pd.read_csv(os.path.join(self.Input_folder, "rainfall/rain_data.csv"))
-            except:
-                traceback.print_exc()
-                #logger.warning(f'Rainfall download failed, performing download in R script')
-                logger.info(f'Rainfall download failed, performing download in R script')
-                rainfall_error=True
-                self.rainfall_data=[]
+            except Exception as err:
+                # the impact model was trained with rainfall, without it the predictions follow
+                # the missing value branches of the trees, which were never seen in training
+                logger.error(f'Rainfall download failed, the impact model cannot be run: {err}')
+                raise RuntimeError('Rainfall download failed') from err
             ###### download UCL data
 
             try:
@@ -103,38 +103,41 @@ class Forecast:
                 self.Input_folder,self.UCL_USERNAME,self.UCL_PASSWORD)
             except:
                 logger.info(f'UCL download failed')
+        self.rainfall_data=pd.read_csv(os.path.join(self.Input_folder, "rainfall/rain_data.csv"))
 
 
         ##Create grid points to calculate Winfield
         logger.info("Creating windfield")
         cent = Centroids()
-        cent.set_raster_from_pnt_bounds((118,6,127,19), res=0.05)
+        cent.set_raster_from_pnt_bounds(CENT_BOUNDS, res=CENT_RES)
         cent.check()
+        # shipped approximate raster of the grid (util.constants.DIST_COAST_DIR), accurate to
+        # about 5 km, NASA distances otherwise
+        cent.set_dist_coast(precomputed=True)
         cent.plot()
-        admin=gpd.read_file(os.path.join(self.main_path,"./data-raw/phl_admin3_simpl2.geojson"))
-        df = pd.DataFrame(data=cent.coord)
-        df["centroid_id"] = "id"+(df.index).astype(str)  
-        centroid_idx=df["centroid_id"].values
-        ncents = cent.size
-        df=df.rename(columns={0: "lat", 1: "lon"})
-        df = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.lon, df.lat))
+        admin_file = os.path.join(self.main_path, ADMIN_FILE)
+        admin=gpd.read_file(admin_file)
         admin.set_crs(epsg=4326, inplace=True)
-        df.set_crs(epsg=4326, inplace=True)
-
-        df_admin = sjoin(df, admin, how="left").dropna()
-        self.df_admin=df_admin
+        # centroid to municipality lookup, cached on disk between runs
+        admin_idx = admin_index.AdminIndex.from_file(
+            CENT_BOUNDS, CENT_RES, admin_file,
+            cache_dir=os.path.join(self.main_path, admin_index.CACHE_DIR))
+        self.admin_idx = admin_idx
+        # the model and the static indicators are loaded once for all typhoons
+        self.impact_model = impact_model.ImpactModel.from_files(self.main_path)
         # Sometimes the ECMWF ftp server complains about too many requests
         # This code allows several retries with some sleep time in between
         if use_hindcast:
             logger.info("Reading in hindcast data")
             fcast_data = read_in_hindcast.read_in_hindcast(typhoonname, remote_dir, local_directory)
-            fcast_data = [track_data_clean.track_data_clean(tr) for tr in fcast_data]
+            fcast_data = track_data_clean.tracks_data_clean(fcast_data)
         else:
             n_tries = 0
             while True:
                 try:
                     logger.info("Downloading ECMWF typhoon tracks")
-                    bufr_files = TCForecast.fetch_bufr_ftp(remote_dir=self.remote_dir)
+                    bufr_files = TCForecast.fetch_bufr_ftp(target_dir=self.ECMWF_MIRROR,
+                                                           remote_dir=self.remote_dir)
                     fcast = TCForecast()
                     fcast.fetch_ecmwf(files=bufr_files)
                 except ftplib.all_errors as e:
@@ -147,7 +150,7 @@ class Forecast:
                     time.sleep(self.ECMWF_SLEEP)
                     continue
                 break
-            fcast_data = [track_data_clean.track_data_clean(tr) for tr in fcast.data if (tr.time.size>1 and tr.name in Activetyphoon)]
+            fcast_data = track_data_clean.tracks_data_clean([tr for tr in fcast.data if (tr.time.size>1 and tr.name in Activetyphoon)])
 
         #%% filter data downloaded in the above step for active typhoons  in PAR
         # filter tracks with name of current typhoons and drop tracks with only one timestep
@@ -162,9 +165,8 @@ class Forecast:
             logger.info(f'Processing data {typhoons}')
             fname=open(os.path.join(self.main_path,'forecast/Input/',"typhoon_info_for_model.csv"),'w')
             fname.write('source,filename,event,time'+'\n')   
-            if not rainfall_error:
-                line_='Rainfall,'+'%srainfall' % self.Input_folder +',' +typhoons+','+ self.date_dir  #StormName #
-                fname.write(line_+'\n')
+            line_='Rainfall,'+'%srainfall' % self.Input_folder +',' +typhoons+','+ self.date_dir  #StormName #
+            fname.write(line_+'\n')
 
             line_='Output_folder,'+'%s' % self.Output_folder +',' +typhoons+',' + self.date_dir  #StormName #
             #line_='Rainfall,'+'%sRainfall/' % Input_folder +','+ typhoons + ',' + date_dir #StormName #
@@ -214,82 +216,29 @@ class Forecast:
                 #line_='Rainfall,'+'%sRainfall/' % Input_folder +','+ typhoons + ',' + date_dir #StormName #
                 fname.write(line_+'\n') 
                 data_forced=fcast_data
-            landfall_location_={}
-            check_flag=0
-            for row,data in hrs_track_data.iterrows():
-                p1 = Point(data['LAT'], data['LON'])
-                d=admin.contains(p1)
-                admin['landfall']=d
-                landfall_=admin.query('landfall=="True"')
-                landfall_time=data['YYYYMMDDHH']
-                if not landfall_.empty and check_flag==0:
-                    landfall_location_[landfall_time]=landfall_
-                    check_flag=check_flag+1
+            landfall_location_ = landfall.track_landfall(data_forced, admin)
+            logger.info(f"{typhoons}: landfall probability "
+                        f"{landfall.landfall_probability(landfall_location_):.2f}")
             self.landfall_location[typhoons]=landfall_location_
             # calculate windfields for each ensamble
             threshold=0            #(threshold to filter dataframe /reduce data )
-            df = pd.DataFrame(data=cent.coord)
-            df["centroid_id"] = "id"+(df.index).astype(str)  
-            centroid_idx=df["centroid_id"].values
-            ncents = cent.size
-            df=df.rename(columns={0: "lat", 1: "lon"})
             
             #calculate wind field for each ensamble members 
             list_intensity=[]
-            distan_track=[]
-            for tr in data_forced:
-                logger.info(f"Running on ensemble # {tr.ensemble_number} for typhoon {tr.name}")
-                track = TCTracks()
-                typhoon = TropCyclone()
-                track.data=[tr]
-                #track.equal_timestep(3)
-                tr=track.data[0]
-                typhoon.set_from_tracks(track, cent, store_windfields=True)
+            for tr, typhoon in ensemble_windfield.iter_windfields(data_forced, cent,
+                                                                   n_workers=self.n_workers):
                 # Make intensity plot using the high resolution member
                 if tr.is_ensemble == 'False':
                     logger.info("High res member: creating intensity plot")
                     plot_intensity.plot_inensity(typhoon=typhoon, event=tr.sid, output_dir=Output_folder,
                                                  date_dir=date_dir, typhoon_name=tr.name)
-                windfield=typhoon.windfields
-                nsteps = windfield[0].shape[0]
-                centroid_id = np.tile(centroid_idx, nsteps)
-                intensity_3d = windfield[0].toarray().reshape(nsteps, ncents, 2)
-                intensity = np.linalg.norm(intensity_3d, axis=-1).ravel()
-                timesteps = np.repeat(track.data[0].time.values, ncents)
-                #timesteps = np.repeat(tr.time.values, ncents)
-                timesteps = timesteps.reshape((nsteps, ncents)).ravel()
-                inten_tr = pd.DataFrame({
-                        'centroid_id': centroid_id,
-                        'value': intensity,
-                        'timestamp': timesteps,})
-                inten_tr = inten_tr[inten_tr.value > threshold]
-                inten_tr['storm_id'] = tr.sid
-                inten_tr['ens_id'] =tr.sid+'_'+str(tr.ensemble_number)
-                inten_tr['name'] = tr.name
-                inten_tr = (pd.merge(inten_tr, df_admin, how='outer', on='centroid_id')
-                            .dropna()
-                            .groupby(['adm3_pcode', 'ens_id'], as_index=False)
-                            .agg({"value": ['count', 'max']}))
-                inten_tr.columns = [x for x in ['adm3_pcode', 'storm_id', 'value_count', 'v_max']]
+                intensity = ensemble_windfield.windfield_speed(typhoon.windfields[0])
+                inten_tr = admin_idx.wind_stats(intensity, threshold=threshold)
+                inten_tr.insert(1, 'storm_id', tr.sid+'_'+str(tr.ensemble_number))
                 inten_tr['is_ensamble']=tr.is_ensemble
                 list_intensity.append(inten_tr)
-                distan_track1=[]
-                for index, row in df.iterrows():
-                    dist=np.min(np.sqrt(np.square(tr.lat.values-row['lat'])+np.square(tr.lon.values-row['lon'])))
-                    distan_track1.append(dist*111)
-                dist_tr = pd.DataFrame({'centroid_id': centroid_idx,'value': distan_track1})
-                dist_tr['storm_id'] = tr.sid
-                dist_tr['name'] = tr.name
-                dist_tr['ens_id'] =tr.sid+'_'+str(tr.ensemble_number)
-                dist_tr = (pd.merge(dist_tr, df_admin, how='outer', on='centroid_id')
-                           .dropna()
-                           .groupby(['adm3_pcode', 'name', 'ens_id'], as_index=False)
-                           .agg({'value': 'min'}))
-                dist_tr.columns = [x for x in ['adm3_pcode', 'name', 'storm_id',
-                                                     'dis_track_min']]  # join_left_df_.columns.ravel()]
-                distan_track.append(dist_tr)
             df_intensity_ = pd.concat(list_intensity)
-            distan_track1 = pd.concat(distan_track)
+            distan_track1 = track_distance.admin_dist_track_min(data_forced, cent.coord, admin_idx)
 
             typhhon_df = pd.merge(df_intensity_, distan_track1,  how='left', on=['adm3_pcode','storm_id']) 
         
@@ -305,22 +254,15 @@ class Forecast:
             #############################################################
             #### Run IBF model 
             #############################################################
-            os.chdir(self.main_path)
-            
-            if platform == "linux" or platform == "linux2": #check if running on linux or windows os
-                # linux
-                try:
-                    p = subprocess.check_call(["Rscript", "run_model_V2.R", str(rainfall_error)])
-                except subprocess.CalledProcessError as e:
-                    logger.error(f'failed to excute R sript')
-                    raise ValueError(str(e))
-            elif platform == "win32": #if OS is windows edit the path for Rscript
-                try:
-                    p = subprocess.check_call(["C:/Program Files/R/R-4.1.0/bin/Rscript", "run_model_V2.R", str(rainfall_error)])
-                except subprocess.CalledProcessError as e:
-                    logger.error(f'failed to excute R sript')
-                    raise ValueError(str(e))
-                    
+            typhoon_name = typhhon_df['name'].iloc[0]
+            hazard = impact_model.hazard_features(typhhon_df, self.rainfall_data)
+            df_impact = self.impact_model.predict(hazard)
+            event_impact = impact_model.write_impact_files(df_impact, admin, Output_folder, date_dir,
+                                                           typhoon_name)
+            landfall_time = landfall.expected_landfall(landfall_location_)
+            plot_impact.plot_impact_maps(event_impact, hrs_track_data, Output_folder, date_dir,
+                                         typhoon_name, landfall_time=landfall_time)
+
             data_filenames = list(Path(Output_folder).glob('*.csv'))
             image_filenames = list(Path(Output_folder).glob('*.png'))
             self.data_filenames_list[typhoons]=data_filenames
@@ -0,0 +1,380 @@
+"""
+Impact model: predicted share of completely damaged houses per municipality and ensemble
+member, and the trigger probabilities derived from it.
+
+Python port of the scoring part of run_model_V2.R. The XGBoost model is the one of
+xgboost_regression_v4.RDS, exported to the native xgboost format by
+models/operational/export_xgboost_model.py. The static indicators of the municipalities
+are joined once when the model is loaded, every forecast then only adds its wind and
+rainfall columns.
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "models/operational/xgboost_regression_v4.json"
+MATERIAL_FILE = "data-raw/pre_disaster_indicators/material_variable2.csv"
+LANDUSE_FILE = "data-raw/landuse_stormsurge/data_matrix_new_variables.csv"
+GEO_FILE = "data-raw/topography/geo_variable.csv"
+
+SUS_TO_GUST = 1.49
+"""Sustained to gust wind conversion, 1 min average, see Table 1.1 of
+https://library.wmo.int/doc_num.php?explnum_id=290"""
+
+MS_TO_MPH = 2.23694
+"""Meters per second to miles per hour"""
+
+RAINFALL_COLUMN = "cellmax_24h_rain"
+"""Column of the municipality rainfall (as written to rain_data.csv) used by the model: the
+maximum over the cells and lead times of the 24h ensemble median, the statistic extracted
+from rainfall_24.nc by lib_r/Read_rainfall_v2.R (not the mean over the cells of max_24h_rain)"""
+
+RAINFALL_OFFSET = 1000
+"""Subtracted from the 24h rainfall before scoring, as in run_model_V2.R"""
+
+MAX_DIST_TRACK = 100
+"""Municipalities further away from a track (km) are not counted for that member"""
+
+DIST_50 = 50
+"""Distance (km) of the probability_dist50 map"""
+
+MATERIALS = [f"{roof}.Roof.{wall}.Wall"
+             for roof in ["Strong", "Light", "Salvaged"]
+             for wall in ["Strong", "Light", "Salvage"]]
+"""Housing units per roof and wall material, as named by R's read.csv"""
+
+FEATURES = [
+    "GEN_landslide", "GEN_landslide_y", "GEN_landslide_o", "GEN_landslide_r",
+    "GEN_stormsurge", "GEN_stormsurge_y", "GEN_stormsurge_o", "GEN_stormsurge_r",
+    "WEA_gust_dur", "WEA_sust_dur", "WEA_vmax_gust", "WEA_vmax_sust",
+    "WEA_vmax_gust_mhp", "WEA_vmax_sust_mhp", "WEA_vmax_gust_sqr", "WEA_vmax_sust_sqr",
+    "WEA_vmax_sust_cube", "WEA_vmax_gust_cube", "WEA_dist_track",
+    "WEA_rainfall_max", "WEA_rainfall_sum",
+    "GEO_slope_mean", "GEO_slope_stdev", "GEO_ruggedness_mean", "GEO_ruggedness_stdev",
+    "GEO_elevation_mean", "GEO_coast_length", "GEO_coast_yn", "GEO_Area", "GEO_perimeter",
+    "GEO_poverty_perc",
+    *[f"MAT_{mat}" for mat in MATERIALS],
+    "INT_rainfall_landslide",
+    *[f"INT_windspeed_{mat}" for mat in MATERIALS],
+    *[f"INT_windspeed_cube_{mat}" for mat in MATERIALS],
+    "INT_windspeed_coast_yn", "INT_windspeed_cube_coast_yn", "INT_coast_yn_elevation",
+]
+"""Model input columns, in the order of `clean_typhoon_forecast_data_ensamble` in
+lib_r/data_cleaning_forecast.R"""
+
+CERF_REGIONS = ["PH05", "PH08", "PH16"]
+CERF_DAMAGE_THRESHOLDS = [80000, 50000, 30000, 10000, 5000]
+CERF_PROBABILITIES = [0.95, 0.80, 0.70, 0.60, 0.50]
+
+DREF_DAMAGE_THRESHOLDS = [100000, 80000, 70000, 50000, 30000]
+DREF_PROBABILITIES = [0.95, 0.80, 0.70, 0.60, 0.50]
+
+
+def read_static_features(main_path):
+    """
+    Static indicators of all municipalities, joined as in run_model_V2.R.
+
+    :param main_path: main directory of the model
+    :return: DataFrame indexed by Mun_Code, with the GEN_, GEO_ and MAT_ model columns,
+        the name and number of households of the municipalities and the raw columns needed
+        for the wind and rainfall interaction terms
+    """
+    material = pd.read_csv(os.path.join(main_path, MATERIAL_FILE))
+    material.columns = [col.replace(" ", ".").replace("/", ".") for col in material.columns]
+    landuse = pd.read_csv(os.path.join(main_path, LANDUSE_FILE))
+    geo = pd.read_csv(os.path.join(main_path, GEO_FILE))
+    static = (geo
+              .merge(material.drop(columns=["Region", "Province", "Municipality_City"]),
+                     on="Mun_Code", how="left")
+              .merge(landuse, on="Mun_Code", how="left"))
+
+    features = pd.DataFrame({
+        "GEN_mun_code": static["Mun_Code"],
+        "GEN_mun_name": static["Mun_Name"],
+        "GEO_n_households": static["Housing.Units"],
+        "GEN_landslide": static["landslide_per"],
+        "GEN_landslide_y": static["Yel_per_LSSAb"],
+        "GEN_landslide_o": static["Or_per_LSblg"],
+        "GEN_landslide_r": static["Red_per_LSbldg"],
+        "GEN_stormsurge": static["stormsurge_per"],
+        "GEN_stormsurge_y": static["Yellow_per_LSbl"],
+        "GEN_stormsurge_o": static["OR_per_SSAbldg"],
+        "GEN_stormsurge_r": static["RED_per_SSAbldg"],
+        "GEO_slope_mean": static["mean_slope"],
+        "GEO_slope_stdev": static["slope_stdev"],
+        "GEO_ruggedness_mean": static["mean_ruggedness"],
+        "GEO_ruggedness_stdev": static["ruggedness_stdev"],
+        "GEO_elevation_mean": static["mean_elevation_m"],
+        "GEO_coast_length": static["coast_length"].fillna(0),
+        "GEO_coast_yn": static["with_coast"],
+        "GEO_Area": static["area_km2"],
+        "GEO_perimeter": static["perimeter"],
+        "GEO_poverty_perc": static["poverty_perc"],
+        **{f"MAT_{mat}": static[mat] for mat in MATERIALS},
+        "INT_coast_yn_elevation": static["with_coast"] * static["mean_elevation_m"],
+    })
+    return features.set_index(static["Mun_Code"].values)
+
+
+def hazard_features(windfield, rainfall):
+    """
+    Wind and rainfall of every ensemble member and municipality.
+
+    :param windfield: DataFrame with columns adm3_pcode, storm_id, name, v_max and
+        dis_track_min, as written to windfield.csv
+    :param rainfall: DataFrame with columns Mun_Code and RAINFALL_COLUMN, as written to
+        rain_data.csv. The model was not trained with missing rainfall, so there is no
+        prediction without it
+    :return: DataFrame with columns Mun_Code, GEN_typhoon_name, GEN_typhoon_id,
+        vmax_sust, dist_track and rainfall_24h
+    """
+    hazard = pd.DataFrame({
+        "Mun_Code": windfield["adm3_pcode"].values,
+        "GEN_typhoon_name": windfield["name"].values,
+        "GEN_typhoon_id": windfield["storm_id"].values,
+        "vmax_sust": windfield["v_max"].values,
+        "dist_track": np.where(windfield["dis_track_min"].values < 1, 1,
+                               windfield["dis_track_min"].values),
+    })
+    rain = pd.DataFrame({
+        "Mun_Code": rainfall["Mun_Code"].values,
+        "rainfall_24h": rainfall[RAINFALL_COLUMN].values - RAINFALL_OFFSET,
+    })
+    return hazard.merge(rain, on="Mun_Code", how="left")
+
+
+class ImpactModel:
+    """
+    XGBoost regression of the percentage of completely damaged houses.
+
+    Attributes
+    ----------
+    booster : xgb.Booster
+        The trained model, with feature names FEATURES.
+    static : pd.DataFrame
+        Static indicators per municipality, see `read_static_features`.
+    """
+
+    def __init__(self, booster, static):
+        if booster.feature_names != FEATURES:
+            raise ValueError("The model features do not match the impact model input columns")
+        self.booster = booster
+        self.static = static
+
+    @classmethod
+    def from_files(cls, main_path):
+        """
+        Load the model and the static indicators.
+
+        :param main_path: main directory of the model
+        :return: ImpactModel
+        """
+        logger.info(f"Loading impact model {MODEL_FILE}")
+        booster = xgb.Booster(model_file=os.path.join(main_path, MODEL_FILE))
+        return cls(booster, read_static_features(main_path))
+
+    def features(self, hazard):
+        """
+        Model input of every row of a hazard table.
+
+        :param hazard: DataFrame as returned by `hazard_features`
+        :return: DataFrame with the columns of the static indicators and FEATURES, for the
+            rows of `hazard` in municipalities with static indicators
+        """
+        hazard = hazard[hazard["Mun_Code"].isin(self.static.index)]
+        static = self.static.loc[hazard["Mun_Code"].values]
+        vmax_sust = hazard["vmax_sust"].values
+        vmax_gust = vmax_sust * SUS_TO_GUST
+        vmax_mph = vmax_sust * MS_TO_MPH
+        vmax_mph_cube = vmax_mph ** 3
+        rainfall = hazard["rainfall_24h"].values
+        with_coast = static["GEO_coast_yn"].values
+        columns = {
+            "GEN_typhoon_name": hazard["GEN_typhoon_name"].values,
+            "GEN_typhoon_id": hazard["GEN_typhoon_id"].values,
+            "WEA_gust_dur": 0.,
+            "WEA_sust_dur": 0.,
+            "WEA_vmax_gust": vmax_gust,
+            "WEA_vmax_sust": vmax_sust,
+            "WEA_vmax_gust_mhp": vmax_gust * MS_TO_MPH,
+            "WEA_vmax_sust_mhp": vmax_mph,
+            # the model was trained with the squares and cubes of the sustained wind only
+            "WEA_vmax_gust_sqr": vmax_mph ** 2,
+            "WEA_vmax_sust_sqr": vmax_mph ** 2,
+            "WEA_vmax_sust_cube": vmax_mph_cube,
+            "WEA_vmax_gust_cube": vmax_mph_cube,
+            "WEA_dist_track": hazard["dist_track"].values,
+            "WEA_rainfall_max": rainfall,
+            "WEA_rainfall_sum": rainfall,
+            "INT_rainfall_landslide": static["GEN_landslide"].values * rainfall,
+            **{f"INT_windspeed_{mat}": vmax_mph * static[f"MAT_{mat}"].values
+               for mat in MATERIALS},
+            **{f"INT_windspeed_cube_{mat}": vmax_mph_cube * static[f"MAT_{mat}"].values
+               for mat in MATERIALS},
+            "INT_windspeed_coast_yn": vmax_mph * with_coast,
+            "INT_windspeed_cube_coast_yn": vmax_mph_cube * with_coast,
+        }
+        return static.reset_index(drop=True).assign(**columns)
+
+    def predict(self, hazard):
+        """
+        Predicted damage of every ensemble member in the municipalities close to its track.
+
+        Every municipality hit by some member gets a row with zero damage for the members
+        not coming within MAX_DIST_TRACK of it.
+
+        :param hazard: DataFrame as returned by `hazard_features`
+        :return: DataFrame with columns region, GEN_mun_code, GEN_mun_name,
+            GEO_n_households, GEN_typhoon_name, GEN_typhoon_id, WEA_dist_track,
+            WEA_vmax_sust_mhp, e_impact, dist50 and Damaged_houses
+        """
+        data = self.features(hazard)
+        logger.info(f"Predicting the impact of {data['GEN_typhoon_id'].nunique()} "
+                    f"ensemble members in {data['GEN_mun_code'].nunique()} municipalities")
+        impact = self.booster.inplace_predict(data[FEATURES].values.astype(np.float64))
+        return impact_table(data, impact)
+
+
+def impact_table(data, impact):
+    """
+    Damage of every ensemble member in the municipalities close to its track, from the
+    model predictions, as in run_model_V2.R.
+
+    :param data: DataFrame with columns GEN_mun_code, GEN_mun_name, GEO_n_households,
+        GEN_typhoon_name, GEN_typhoon_id, WEA_dist_track and WEA_vmax_sust_mhp, as returned
+        by `ImpactModel.features`
+    :param impact: np.array of the predicted percentage of damaged houses of every row
+    :return: DataFrame, see `ImpactModel.predict`
+    """
+    e_impact = np.minimum(impact, 100).astype(np.float64)
+    with np.errstate(invalid="ignore"):
+        damaged_houses = np.trunc(data["GEO_n_households"].values * e_impact * 0.01)
+    df_impact = pd.DataFrame({
+        "region": data["GEN_mun_code"].str[:4].values,
+        "GEN_mun_code": data["GEN_mun_code"].values,
+        "GEN_mun_name": data["GEN_mun_name"].values,
+        "GEO_n_households": data["GEO_n_households"].values,
+        "GEN_typhoon_name": data["GEN_typhoon_name"].values,
+        "GEN_typhoon_id": data["GEN_typhoon_id"].values,
+        "WEA_dist_track": data["WEA_dist_track"].values,
+        "WEA_vmax_sust_mhp": data["WEA_vmax_sust_mhp"].values,
+        "e_impact": e_impact,
+        "dist50": np.where(data["WEA_dist_track"].values >= DIST_50, 0, 1),
+        "Damaged_houses": damaged_houses,
+    })
+    df_impact = df_impact[df_impact["WEA_dist_track"] < MAX_DIST_TRACK].dropna()
+    df_impact["Damaged_houses"] = df_impact["Damaged_houses"].astype(np.int64)
+    return _complete_members(df_impact)
+
+
+def _complete_members(df_impact):
+    """Add zero damage rows for the members missing in a municipality, like tidyr::complete"""
+    municipalities = ["region", "GEN_mun_code", "GEN_mun_name", "GEO_n_households",
+                      "GEN_typhoon_name"]
+    muns = df_impact[municipalities].drop_duplicates()
+    members = df_impact[["GEN_typhoon_id"]].drop_duplicates()
+    complete = (members.merge(muns, how="cross")
+                .merge(df_impact, on=["GEN_typhoon_id", *municipalities], how="left"))
+    fill = complete["e_impact"].isna()
+    complete.loc[fill, ["WEA_vmax_sust_mhp", "e_impact", "dist50", "Damaged_houses"]] = 0
+    return complete.astype({"dist50": np.int64, "Damaged_houses": np.int64})
+
+
+def trigger_probability(df_impact, damage_thresholds):
+    """
+    Probability (in %) that the total number of damaged houses reaches each threshold.
+
+    :param df_impact: DataFrame as returned by `ImpactModel.predict`
+    :param damage_thresholds: list of numbers of damaged houses
+    :return: DataFrame with column Typhoon_name and a column per threshold, e.g. ">=80k"
+    """
+    total = df_impact.groupby(["GEN_typhoon_name", "GEN_typhoon_id"])["Damaged_houses"].sum()
+    total = total.reset_index("GEN_typhoon_id", drop=True).groupby(level=0)
+    probability = pd.DataFrame({
+        f">={threshold / 1000:g}k": total.apply(lambda x: np.round(100 * np.sum(x >= threshold) / x.size))
+        for threshold in damage_thresholds
+    }).astype(np.int64)
+    return probability.rename_axis("Typhoon_name").reset_index()
+
+
+def municipality_breakdown(df_impact, probabilities):
+    """
+    Number of damaged houses per municipality reached with each probability, plus the
+    sum over all municipalities in a TOTAL row.
+
+    :param df_impact: DataFrame as returned by `ImpactModel.predict`
+    :param probabilities: list of probabilities, e.g. 0.95 for the number of damaged
+        houses reached or exceeded by 95 % of the members (column "p95")
+    :return: DataFrame with columns Typhoon_name, Municipality_code, Municipality_name
+        and a column per probability
+    """
+    grouped = df_impact.groupby(["GEN_typhoon_name", "GEN_mun_code", "GEN_mun_name"])
+    breakdown = pd.DataFrame({
+        f"p{round(probability * 100)}": grouped["Damaged_houses"].quantile(1 - probability)
+        for probability in probabilities
+    })
+    breakdown.loc[("TOTAL", "TOTAL", "TOTAL"), :] = breakdown.sum()
+    breakdown.index.names = ["Typhoon_name", "Municipality_code", "Municipality_name"]
+    return breakdown.reset_index()
+
+
+def average_impact(df_impact):
+    """
+    Ensemble average of the damage and probability of coming within DIST_50 per
+    municipality.
+
+    :param df_impact: DataFrame as returned by `ImpactModel.predict`
+    :return: DataFrame with columns GEN_mun_code, probability_dist50, impact and
+        WEA_dist_track, the latter is missing where a member didn't come close
+    """
+    n_ensemble = df_impact["GEN_typhoon_id"].nunique()
+    grouped = df_impact.groupby("GEN_mun_code")
+    # NaN distances of the completed members propagate to the average, as with R's sum
+    dist_track = grouped["WEA_dist_track"].sum()
+    dist_track[df_impact["WEA_dist_track"].isna().groupby(df_impact["GEN_mun_code"]).any()] = np.nan
+    return pd.DataFrame({
+        "probability_dist50": 100 * grouped["dist50"].sum() / n_ensemble,
+        "impact": grouped["e_impact"].sum() / n_ensemble,
+        "WEA_dist_track": dist_track / n_ensemble,
+    }).rename_axis("GEN_mun_code").reset_index()
+
+
+def write_impact_files(df_impact, admin, output_folder, forecast_time, typhoon_name):
+    """
+    Write the trigger levels, the municipality breakdowns of the CERF regions and of the
+    whole country, and the average impact per municipality to csv files.
+
+    :param df_impact: DataFrame as returned by `ImpactModel.predict`
+    :param admin: GeoDataFrame of the municipalities, with column adm3_pcode
+    :param output_folder: directory of the files
+    :param forecast_time: forecast timestamp in the file names
+    :param typhoon_name: typhoon name in the file names
+    :return: GeoDataFrame `admin` joined with the average impact per municipality
+    """
+    suffix = f"{forecast_time}_{typhoon_name}.csv"
+    for organization, df_org, thresholds, probabilities in [
+            ("CERF", df_impact[df_impact["region"].isin(CERF_REGIONS)],
+             CERF_DAMAGE_THRESHOLDS, CERF_PROBABILITIES),
+            ("DREF", df_impact, DREF_DAMAGE_THRESHOLDS, DREF_PROBABILITIES)]:
+        trigger = trigger_probability(df_org, thresholds)
+        logger.info(f"{organization} probability for the number of completely damaged "
+                    f"buildings:\n{trigger.to_string(index=False)}")
+        trigger.to_csv(os.path.join(output_folder, f"{organization}_TRIGGER_LEVEL_{suffix}"),
+                       index=False, na_rep="NA")
+        municipality_breakdown(df_org, probabilities).to_csv(
+            os.path.join(output_folder, f"{organization}_municipality_breakdown_{suffix}"),
+            index=False, na_rep="NA")
+
+    event_impact = admin.merge(
+        average_impact(df_impact).assign(adm3_pcode=lambda df: df["GEN_mun_code"]),
+        on="adm3_pcode", how="left")
+    # numbered rows as written by R
+    pd.DataFrame(event_impact.drop(columns=event_impact.geometry.name)).set_axis(
+        np.arange(1, len(event_impact) + 1)).to_csv(
+            os.path.join(output_folder, f"Average_Impact_{suffix}"), index_label="", na_rep="NA")
+    return event_impact
@@ -0,0 +1,139 @@
+"""
+Landfall of forecast tracks on the municipalities.
+
+All track points of all ensemble members are tested against the municipalities in a single
+spatial join, which uses the spatial index of the admin GeoDataFrame (built once and reused
+for every typhoon). The time of landfall is interpolated between the last point at sea and
+the first point on land, where the segment between them enters the first municipality.
+"""
+import logging
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import LineString, Point
+
+logger = logging.getLogger(__name__)
+
+
+def points_on_land(lat, lon, admin):
+    """
+    Municipality of every point.
+
+    :param lat: np.array of latitudes
+    :param lon: np.array of longitudes
+    :param admin: GeoDataFrame of the municipalities, with column adm3_pcode
+    :return: np.array of object, the adm3_pcode of every point, None at sea
+    """
+    points = gpd.GeoDataFrame(geometry=gpd.points_from_xy(lon, lat), crs=admin.crs)
+    joined = gpd.sjoin(points, admin[['adm3_pcode', 'geometry']], how='inner',
+                       predicate='intersects')
+    # points on a shared border match several municipalities, keep the first one
+    joined = joined[~joined.index.duplicated(keep='first')]
+    pcodes = np.full(len(points), None, dtype=object)
+    pcodes[joined.index.values] = joined['adm3_pcode'].values
+    return pcodes
+
+
+def _entry(lat0, lon0, lat1, lon1, admin):
+    """
+    Where the segment from a point at sea to a point on land enters the first municipality.
+
+    :return: (fraction of the segment before the entry, adm3_pcode of the municipality)
+    """
+    segment = LineString([(lon0, lat0), (lon1, lat1)])
+    candidates = admin.iloc[admin.sindex.query(segment, predicate='intersects')]
+    fraction, pcode = 1., None
+    for cand_pcode, geom in zip(candidates['adm3_pcode'], candidates.geometry):
+        inter = segment.intersection(geom)
+        parts = getattr(inter, 'geoms', [inter])
+        # all parts lie on the segment, the vertex closest to its start is the entry
+        for coord in (coord for part in parts if not part.is_empty for coord in part.coords):
+            cand_fraction = segment.project(Point(coord), normalized=True)
+            if cand_fraction < fraction:
+                fraction, pcode = cand_fraction, cand_pcode
+    return fraction, pcode
+
+
+def track_landfall(tracks, admin):
+    """
+    First landfall of every track.
+
+    A landfall is the first step from a point at sea to a point in a municipality, so that
+    tracks starting over land only make landfall after having been at sea.
+
+    :param tracks: list of track xr.Dataset, e.g. all members of a forecast ensemble
+    :param admin: GeoDataFrame of the municipalities, with column adm3_pcode
+    :return: DataFrame with one row per track and columns storm_id, name, is_ensemble (bool),
+        landfall (bool), landfall_time, lead_time (hours since the forecast time), lat, lon
+        and adm3_pcode of the landfall, the latter are missing without landfall
+    """
+    sizes = np.array([tr.time.size for tr in tracks])
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    lat = np.concatenate([tr.lat.values for tr in tracks])
+    lon = np.concatenate([tr.lon.values for tr in tracks])
+    pcodes = points_on_land(lat, lon, admin)
+    on_land = pd.notna(pcodes)
+    # steps from sea to land, the first point of every track has no previous point
+    entering = on_land[1:] & ~on_land[:-1]
+    entering[offsets[1:-1] - 1] = False
+
+    rows = []
+    for i_track, track in enumerate(tracks):
+        row = {
+            'storm_id': f"{track.sid}_{track.ensemble_number}",
+            'name': track.name,
+            # the readers flag the members with True, 'True' or 'TRUE'
+            'is_ensemble': str(track.is_ensemble).upper() == 'TRUE',
+            'landfall': False,
+            'landfall_time': pd.NaT,
+            'lead_time': np.nan,
+            'lat': np.nan,
+            'lon': np.nan,
+            'adm3_pcode': None,
+        }
+        steps = np.flatnonzero(entering[offsets[i_track]:offsets[i_track + 1] - 1])
+        if steps.size:
+            i_sea = offsets[i_track] + steps[0]
+            fraction, pcode = _entry(lat[i_sea], lon[i_sea], lat[i_sea + 1], lon[i_sea + 1], admin)
+            time = track.time.values[steps[0]:steps[0] + 2]
+            forecast_time = np.datetime64(track.attrs.get('forecast_time', track.time.values[0]),
+                                          'ns')
+            landfall_time = time[0] + fraction * (time[1] - time[0])
+            row.update({
+                'landfall': True,
+                'landfall_time': pd.Timestamp(landfall_time),
+                'lead_time': (landfall_time - forecast_time) / np.timedelta64(1, 'h'),
+                'lat': lat[i_sea] + fraction * (lat[i_sea + 1] - lat[i_sea]),
+                'lon': lon[i_sea] + fraction * (lon[i_sea + 1] - lon[i_sea]),
+                # a segment only touching the land at its end enters at the point on land
+                'adm3_pcode': pcode or pcodes[i_sea + 1],
+            })
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def landfall_probability(landfall):
+    """
+    Share of the ensemble members making landfall.
+
+    :param landfall: DataFrame as returned by `track_landfall`
+    :return: float, NaN without ensemble members
+    """
+    members = landfall[landfall['is_ensemble']]
+    return members['landfall'].mean() if len(members) else np.nan
+
+
+def expected_landfall(landfall):
+    """
+    Landfall of the high resolution forecast if any, otherwise the median landfall of the
+    ensemble members making landfall.
+
+    :param landfall: DataFrame as returned by `track_landfall`
+    :return: pd.Timestamp or None
+    """
+    hres = landfall[~landfall['is_ensemble']]
+    if len(hres):
+        return hres['landfall_time'].iloc[0] if hres['landfall'].iloc[0] else None
+    times = landfall.loc[landfall['landfall'], 'landfall_time']
+    return times.sort_values().iloc[(len(times) - 1) // 2] if len(times) else None
@@ -0,0 +1,86 @@
+"""
+Maps of the average impact and of the probability of a typhoon coming within 50 km, with
+the classes and colours of the maps formerly made by lib_r/Make_maps.R.
+"""
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from matplotlib.colors import BoundaryNorm, ListedColormap
+from matplotlib.patches import Patch
+
+MAPS = {
+    "impact": dict(
+        filename="Average_Impact",
+        title="Predicted damage per Municipality for {name}",
+        notes=["Prediction is about completely damaged houses only"],
+        legend_title="Predicted % of Damaged",
+        breaks=[0, 0.1, 1, 2, 5, 9.5, 10],
+        labels=["No Damage", "< 1%", "1 to 2%", "2 to 5%", "5 to 10%", "> 10%"],
+        palette=["#ffffe5", "#fdd0a2", "#fdae6b", "#fd8d3c", "#e6550d", "#a63603"]),
+    "probability_dist50": dict(
+        filename="probability_50km_distance",
+        title="Probability that typhoon {name} will come within 50 km",
+        notes=[],
+        legend_title="Probability that typhoon\nwill strike within 50 km",
+        breaks=[0, 5, 10, 20, 40, 50],
+        labels=["< 5%", "5 - 10%", "10 - 20%", "20 - 40%", "> 50%"],
+        palette=["#f1eef6", "#d7b5d8", "#df65b0", "#dd1c77", "#980043"]),
+}
+"""Layout of the maps, per column of the average impact"""
+
+CREDITS = ("The maps used do not imply the expression of any opinion on the part of the "
+           "International Federation of the \nRed Cross and Red Crescent Societies concerning "
+           "the legal status of a territory or of its authorities.")
+
+CM = 1 / 2.54
+
+
+def plot_impact_maps(event_impact, track, output_dir, date_dir, typhoon_name, landfall_time=None):
+    """
+    Save the maps of the average impact and of the probability of coming within 50 km.
+
+    :param event_impact: GeoDataFrame of the municipalities with the columns of
+        `impact_model.average_impact`, as returned by `impact_model.write_impact_files`
+    :param track: DataFrame of the high resolution track, with columns YYYYMMDDHH, LAT and LON
+    :param output_dir: directory of the png files
+    :param date_dir: forecast timestamp in the file names
+    :param typhoon_name: name of the typhoon
+    :param landfall_time: expected time of landfall (UTC), if any
+    :return: list of the file names
+    """
+    subtitle = [f"Map generated at: {pd.Timestamp.now(tz='Asia/Manila'):%Y-%m-%d %H:%M} PST",
+                "Source of wind speed forecast ECMWF",
+                "Only Areas within 100km of forecasted track are included"]
+    if landfall_time is not None:
+        landfall_time = pd.Timestamp(landfall_time).tz_localize("UTC")
+        track_start = pd.to_datetime(track["YYYYMMDDHH"].iloc[0], format="%Y%m%d%H%M").tz_localize("UTC")
+        subtitle.append(f"Expected Landfall at : {landfall_time.tz_convert('Asia/Manila'):%Y-%m-%d %H:%M} "
+                        f"PST in ({(landfall_time - track_start) / pd.Timedelta(hours=1):g} hrs)")
+
+    filenames = []
+    for column, layout in MAPS.items():
+        fig, ax = plt.subplots(figsize=(20 * CM, 24 * CM))
+        cmap = ListedColormap(layout["palette"])
+        norm = BoundaryNorm(layout["breaks"], cmap.N, extend="neither")
+        # values above the last break are shown in the last class
+        values = np.clip(event_impact[column], None, layout["breaks"][-1])
+        event_impact.assign(**{column: values}).plot(
+            column=column, cmap=cmap, norm=norm, ax=ax, edgecolor="black", linewidth=0.1,
+            missing_kwds=dict(color="none", edgecolor="black", linewidth=0.1, alpha=0.25))
+        ax.plot(track["LON"], track["LAT"], "o", color="tab:blue", markersize=2, label="ECMWF_HRS")
+        ax.set_xlim(*event_impact.total_bounds[[0, 2]])
+        ax.set_ylim(*event_impact.total_bounds[[1, 3]])
+        ax.set_axis_off()
+        ax.set_title("\n".join([layout["title"].format(name=typhoon_name), *subtitle,
+                                *layout["notes"]]), loc="left", fontsize=8)
+        ax.legend(handles=[Patch(facecolor=color, edgecolor="black", label=label)
+                           for color, label in zip(layout["palette"], layout["labels"])],
+                  title=layout["legend_title"], loc="upper left", fontsize=7, title_fontsize=7)
+        fig.text(0.02, 0.01, CREDITS, fontsize=5)
+        filename = os.path.join(output_dir, f"{layout['filename']}_{date_dir}_{typhoon_name}.png")
+        fig.savefig(filename, dpi=600)
+        plt.close(fig)
+        filenames.append(filename)
+    return filenames
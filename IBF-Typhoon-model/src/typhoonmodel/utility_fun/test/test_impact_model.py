@@ -0,0 +1,182 @@
+"""
+Test impact_model module.
+"""
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from typhoonmodel.utility_fun.impact_model import (
+    FEATURES, MODEL_FILE, CERF_REGIONS, CERF_DAMAGE_THRESHOLDS, CERF_PROBABILITIES,
+    DREF_DAMAGE_THRESHOLDS, DREF_PROBABILITIES, impact_table, trigger_probability,
+    municipality_breakdown, average_impact)
+
+MAIN_PATH = Path(__file__).parents[4]
+"""Main directory of the model, with lib_r and models"""
+
+R_SCRIPT = Path(__file__).parent / "impact_parity.R"
+
+
+def _impact_input():
+    """Three members hitting three municipalities, the third one only at more than 100 km"""
+    data = pd.DataFrame({
+        "GEN_mun_code": ["PH0500001", "PH0800002", "PH1300003", "PH0500001", "PH0800002",
+                         "PH0500001"],
+        "GEN_mun_name": ["M1", "M2", "M3", "M1", "M2", "M1"],
+        "GEO_n_households": [1000, 2000, 500, 1000, 2000, 1000],
+        "GEN_typhoon_name": "TEST",
+        "GEN_typhoon_id": ["T_1", "T_1", "T_1", "T_2", "T_2", "T_3"],
+        "WEA_dist_track": [20., 60., 120., 80., 10., 30.],
+        "WEA_vmax_sust_mhp": [90., 70., 40., 50., 100., 80.],
+    })
+    impact = np.array([10., 150., 50., 5., 20.5, 2.])
+    return data, impact
+
+
+class TestImpactTable(unittest.TestCase):
+    """Test the damage per member and municipality"""
+
+    def test_filter_complete(self):
+        """Members further than MAX_DIST_TRACK are dropped, missing members get zero damage"""
+        data, impact = _impact_input()
+        df_impact = impact_table(data, impact)
+        df_impact = df_impact.sort_values(["GEN_mun_code", "GEN_typhoon_id"])
+        self.assertEqual(df_impact["GEN_mun_code"].tolist(), ["PH0500001"] * 3 + ["PH0800002"] * 3)
+        self.assertEqual(df_impact["GEN_typhoon_id"].tolist(), ["T_1", "T_2", "T_3"] * 2)
+        self.assertEqual(df_impact["region"].tolist(), ["PH05"] * 3 + ["PH08"] * 3)
+        self.assertEqual(df_impact["Damaged_houses"].tolist(), [100, 50, 20, 2000, 410, 0])
+        self.assertEqual(df_impact["dist50"].tolist(), [1, 0, 1, 0, 1, 0])
+        np.testing.assert_array_equal(df_impact["e_impact"], [10, 5, 2, 100, 20.5, 0])
+        np.testing.assert_array_equal(df_impact["WEA_vmax_sust_mhp"], [90, 50, 80, 70, 100, 0])
+        np.testing.assert_array_equal(df_impact["WEA_dist_track"], [20, 80, 30, 60, 10, np.nan])
+        self.assertEqual(df_impact["GEO_n_households"].tolist(), [1000] * 3 + [2000] * 3)
+
+    def test_missing_values(self):
+        """Rows with missing model input are dropped before completing the members"""
+        data, impact = _impact_input()
+        data.loc[4, "WEA_vmax_sust_mhp"] = np.nan
+        df_impact = impact_table(data, impact).set_index(["GEN_mun_code", "GEN_typhoon_id"])
+        self.assertEqual(df_impact.loc[("PH0800002", "T_2"), "Damaged_houses"], 0)
+        self.assertTrue(np.isnan(df_impact.loc[("PH0800002", "T_2"), "WEA_dist_track"]))
+        self.assertEqual(df_impact.shape[0], 6)
+
+
+class TestProbabilities(unittest.TestCase):
+    """Test the trigger levels and the breakdown and average per municipality"""
+
+    def setUp(self):
+        self.df_impact = impact_table(*_impact_input())
+
+    def test_trigger_probability(self):
+        """Share of the members with a total damage reaching each threshold"""
+        trigger = trigger_probability(self.df_impact, [2000, 400, 10, 3000])
+        self.assertEqual(trigger.columns.tolist(),
+                         ["Typhoon_name", ">=2k", ">=0.4k", ">=0.01k", ">=3k"])
+        self.assertEqual(trigger.values.tolist(), [["TEST", 33, 67, 100, 0]])
+
+    def test_municipality_breakdown(self):
+        """Damage exceeded with a given probability, i.e. the lower quantiles"""
+        breakdown = municipality_breakdown(self.df_impact, [0.5, 0.9])
+        self.assertEqual(breakdown.columns.tolist(),
+                         ["Typhoon_name", "Municipality_code", "Municipality_name", "p50", "p90"])
+        self.assertEqual(breakdown["Municipality_code"].tolist(),
+                         ["PH0500001", "PH0800002", "TOTAL"])
+        self.assertEqual(breakdown["Typhoon_name"].tolist(), ["TEST", "TEST", "TOTAL"])
+        np.testing.assert_allclose(breakdown["p50"], [50, 410, 460])
+        np.testing.assert_allclose(breakdown["p90"], [26, 82, 108])
+
+    def test_average_impact(self):
+        """Ensemble means, the distance is missing if a member didn't come close"""
+        average = average_impact(self.df_impact)
+        self.assertEqual(average["GEN_mun_code"].tolist(), ["PH0500001", "PH0800002"])
+        np.testing.assert_allclose(average["probability_dist50"], [200 / 3, 100 / 3])
+        np.testing.assert_allclose(average["impact"], [17 / 3, 120.5 / 3])
+        np.testing.assert_allclose(average["WEA_dist_track"], [130 / 3, np.nan])
+
+
+@unittest.skipIf(shutil.which("Rscript") is None, "R is not installed")
+class TestParityR(unittest.TestCase):
+    """Compare with the R implementation (run_model_V2.R and lib_r/damage_probability.R)"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        n_members, n_muns = 52, 40
+        codes = np.array([f"PH{region}{mun:05d}" for region, mun in zip(
+            rng.choice(["05", "08", "13", "16"], n_muns), range(n_muns))])
+        households = rng.integers(500, 20000, n_muns)
+        mun, member = np.meshgrid(np.arange(n_muns), np.arange(n_members))
+        mun, member = mun.ravel(), member.ravel()
+        data = pd.DataFrame({
+            "GEN_mun_code": codes[mun],
+            "GEN_mun_name": [f"Mun {i}" for i in mun],
+            "GEO_n_households": households[mun],
+            "GEN_typhoon_name": "TEST",
+            "GEN_typhoon_id": [f"TEST_{i}" for i in member],
+            "WEA_dist_track": rng.uniform(1, 250, mun.size).round(3),
+            "WEA_vmax_sust_mhp": rng.uniform(20, 150, mun.size).round(3),
+        })
+        data.loc[rng.choice(mun.size, 10, replace=False), "WEA_vmax_sust_mhp"] = np.nan
+        self.data = data
+        self.impact = rng.uniform(-5, 120, mun.size).round(3)
+        self.features = pd.DataFrame(rng.uniform(0, 100, (200, len(FEATURES))),
+                                     columns=FEATURES).round(3)
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        tmpdir = Path(self.tmpdir.name)
+        self.data.assign(impact=self.impact).to_csv(tmpdir / "impact_input.csv", index=False)
+        self.features.to_csv(tmpdir / "features.csv", index=False)
+        subprocess.run(["Rscript", str(R_SCRIPT), str(tmpdir), str(tmpdir)],
+                       cwd=MAIN_PATH, check=True)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _read(self, name):
+        return pd.read_csv(Path(self.tmpdir.name) / name, keep_default_na=False,
+                           na_values=["NA"], dtype={"GEN_mun_code": str})
+
+    def test_prediction(self):
+        """Exported model predicts as the RDS model"""
+        booster = xgb.Booster(model_file=str(MAIN_PATH / MODEL_FILE))
+        prediction = booster.inplace_predict(self.features.values.astype(np.float64))
+        np.testing.assert_allclose(prediction, self._read("prediction.csv")["impact"],
+                                   rtol=1e-5, atol=1e-4)
+
+    def test_impact_files(self):
+        """Damage per member, trigger levels, breakdowns and averages as in R"""
+        df_impact = impact_table(self.data, self.impact)
+        keys = ["GEN_typhoon_id", "GEN_mun_code"]
+        pd.testing.assert_frame_equal(
+            df_impact.sort_values(keys).reset_index(drop=True),
+            self._read("impact_table.csv")[df_impact.columns].sort_values(keys)
+            .reset_index(drop=True),
+            check_dtype=False)
+
+        for organization, df_org, thresholds, probabilities in [
+                ("CERF", df_impact[df_impact["region"].isin(CERF_REGIONS)],
+                 CERF_DAMAGE_THRESHOLDS, CERF_PROBABILITIES),
+                ("DREF", df_impact, DREF_DAMAGE_THRESHOLDS, DREF_PROBABILITIES)]:
+            suffix = "2020110100_TEST.csv"
+            pd.testing.assert_frame_equal(
+                trigger_probability(df_org, thresholds),
+                self._read(f"{organization}_TRIGGER_LEVEL_{suffix}"), check_dtype=False)
+            pd.testing.assert_frame_equal(
+                municipality_breakdown(df_org, probabilities),
+                self._read(f"{organization}_municipality_breakdown_{suffix}"),
+                check_dtype=False)
+
+        pd.testing.assert_frame_equal(average_impact(df_impact),
+                                      self._read("Average_Impact.csv"), check_dtype=False)
+
+
+# Execute Tests
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestImpactTable)
+    TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestProbabilities))
+    TESTS.addTests(unittest.TestLoader().loadTestsFromTestCase(TestParityR))
+    unittest.TextTestRunner(verbosity=2).run(TESTS)
@@ -0,0 +1,94 @@
+"""
+Test landfall module.
+"""
+import unittest
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+from climada.hazard.tc_tracks_forecast import TCForecast
+from typhoonmodel.utility_fun.landfall import (
+    track_landfall, landfall_probability, expected_landfall)
+
+ADMIN = gpd.GeoDataFrame({'adm3_pcode': ['PH0500001', 'PH0500002']},
+                         geometry=[box(121, 10, 126.75, 14), box(116, 10, 121, 14)],
+                         crs='EPSG:4326')
+"""Two municipalities, the eastern coast at 126.75E"""
+
+
+def _bufr_columns(lat, ens_type):
+    """Columns as decoded by TCForecast._bufr_columns of tracks heading west along `lat`"""
+    n_tracks, lead_time = len(lat), np.arange(0., 54., 6.)
+    # the analysis followed by one value per lead time
+    lon = np.tile(np.concatenate([[132.], 132. - 1.5 * np.arange(lead_time.size)]),
+                  (n_tracks, 1))
+    lat = np.repeat(np.array(lat, dtype=float)[:, None], lead_time.size + 1, axis=1)
+    return {
+        'pressure': np.full(lon.shape, 980.),
+        'lat': lat,
+        'lon': lon,
+        'lat_max_wind': lat + 0.2,
+        'lon_max_wind': lon,
+        'wind': np.full(lon.shape, 40.),
+        'lead_time': np.tile(lead_time, (n_tracks, 1)),
+        'year': np.full(n_tracks, 2020),
+        'month': np.full(n_tracks, 11),
+        'day': np.full(n_tracks, 1),
+        'hour': np.full(n_tracks, 0),
+        'storm_name': np.full(n_tracks, b'GONI'),
+        'storm_id': np.full(n_tracks, b'19W'),
+        'ens_type': np.array(ens_type),
+    }
+
+
+def _bufr_tracks(lat, ens_type):
+    """Tracks as built by the BUFR reader"""
+    columns = _bufr_columns(lat, ens_type)
+    return [TCForecast._columns_to_track(columns, index, index, np.datetime64('2020-11-01T00'),
+                                         'ECMWF')
+            for index in range(len(lat))]
+
+
+class TestLandfall(unittest.TestCase):
+    """Test the landfall of forecast tracks"""
+
+    def test_bufr_tracks(self):
+        """Deterministic forecast and members of the BUFR reader"""
+        tracks = _bufr_tracks([12, 12, 20, 11], [0, 1, 1, 1])
+        self.assertEqual([tr.is_ensemble for tr in tracks], ['False', 'True', 'True', 'True'])
+        landfall = track_landfall(tracks, ADMIN)
+        self.assertEqual(landfall['is_ensemble'].tolist(), [False, True, True, True])
+        self.assertEqual(landfall['landfall'].tolist(), [True, True, False, True])
+        self.assertEqual(landfall['storm_id'].tolist(), ['19W_0', '19W_1', '19W_2', '19W_3'])
+        # the segment from 127.5E to 126E at 18h and 24h enters at 126.75E
+        self.assertEqual(landfall['landfall_time'].iloc[0], pd.Timestamp('2020-11-01T21'))
+        self.assertAlmostEqual(landfall['lead_time'].iloc[0], 21)
+        self.assertAlmostEqual(landfall['lon'].iloc[0], 126.75)
+        self.assertEqual(landfall['adm3_pcode'].iloc[0], 'PH0500001')
+        self.assertTrue(np.isnan(landfall['lead_time'].iloc[2]))
+
+        self.assertAlmostEqual(landfall_probability(landfall), 2 / 3)
+        self.assertEqual(expected_landfall(landfall), pd.Timestamp('2020-11-01T21'))
+        self.assertTrue(np.isnan(landfall_probability(landfall.iloc[:1])))
+        self.assertEqual(expected_landfall(landfall.iloc[:1].assign(landfall=False)), None)
+
+    def test_ensemble_flags(self):
+        """Members flagged as 'TRUE' (Ecmwf_data) or True (read_one_bufr_tc_old)"""
+        tracks = _bufr_tracks([12, 12, 20], [1, 1, 1])
+        tracks[0].attrs['is_ensemble'] = 'TRUE'
+        tracks[1].attrs['is_ensemble'] = np.True_
+        tracks[2].attrs['is_ensemble'] = 'False'
+        landfall = track_landfall(tracks, ADMIN)
+        self.assertEqual(landfall['is_ensemble'].tolist(), [True, True, False])
+        self.assertEqual(landfall_probability(landfall), 1)
+        # without landfall of the deterministic forecast there is no expected landfall
+        self.assertEqual(expected_landfall(landfall), None)
+        self.assertEqual(expected_landfall(landfall.iloc[:2]), pd.Timestamp('2020-11-01T21'))
+
+
+# Execute Tests
+if __name__ == "__main__":
+    TESTS = unittest.TestLoader().loadTestsFromTestCase(TestLandfall)
+    unittest.TextTestRunner(verbosity=2).run(TESTS)
@@ -3,8 +3,26 @@ import math
 import numpy as np
 import xarray as xr
 import pandas as pd
-from climada.hazard.tc_tracks import estimate_roci,estimate_rmw
+from climada.hazard.tc_tracks import estimate_roci,estimate_rmw,interp_tracks
+
+# time step of the cleaned tracks, in hours
+TIME_STEP_H = 0.5
+
 def track_data_clean(forcast_df):
+    return tracks_data_clean([forcast_df])[0]
+
+def tracks_data_clean(forcast_tracks):
+    """
+    Clean the forecast tracks and interpolate them to TIME_STEP_H, all tracks in one
+    batched call of interp_tracks
+
+    :param forcast_tracks: list of xr.Dataset, tracks of a TCForecast
+    :return: list of xr.Dataset
+    """
+    tracks = [_track_dataset(forcast_df) for forcast_df in forcast_tracks]
+    return interp_tracks(tracks, TIME_STEP_H, method='linear')
+
+def _track_dataset(forcast_df):
     track = xr.Dataset(
         data_vars={
             'max_sustained_wind': ('time', pd.Series(forcast_df.max_sustained_wind.values).interpolate().tolist()),
@@ -16,7 +34,7 @@ def track_data_clean(forcast_df):
             #'radius_max_wind':('time', estimate_rmw(forcast_df.radius_max_wind.values, forcast_df.central_pressure.values)),  
             #'radius_oci':('time', estimate_roci(forcast_df.radius_max_wind.values, forcast_df.central_pressure.values)), 
             #'time_step':('time', forcast_df.time_step.values),
-            'time_step':('time', np.full(len(forcast_df.time.values),0.5).tolist())
+            'time_step':('time', np.full(len(forcast_df.time.values),TIME_STEP_H).tolist())
         },
         coords={
             'time': forcast_df.time.values,
@@ -37,8 +55,6 @@ def track_data_clean(forcast_df):
         }
     )
 
-    
-    track = track.resample(time="0.5H").interpolate("linear") #in
     track = track.set_coords(['lat', 'lon'])
     return track
     
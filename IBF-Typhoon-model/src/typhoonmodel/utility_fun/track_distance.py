@@ -0,0 +1,78 @@
+"""
+Minimum distance between forecast tracks and the windfield centroids.
+
+All ensemble members are handled in one batched NumPy computation, chunked over
+the centroids so that the size of the temporary distance arrays stays bounded.
+The distance is the Euclidean distance in degrees times 111 km, the metric the
+impact model was trained with (`WEA_dist_track`).
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAX_ELEMENTS = 100_000
+"""Maximum number of (track, centroid, track point) distances computed at once. Chunks of
+this size keep the temporaries in the CPU cache, larger ones are slower."""
+
+KM_PER_DEG = 111
+"""Kilometers per degree of the (lat, lon) distance of the tracks to the centroids"""
+
+
+def dist_track_min(tracks, centroids, max_elements=MAX_ELEMENTS):
+    """
+    Minimum distance (in km) between every centroid and every track.
+
+    :param tracks: list of track xr.Dataset (e.g. all ensemble members of a forecast)
+    :param centroids: np.array of shape (ncentroids, 2), each row is [lat, lon]
+    :param max_elements: upper bound on the number of distances held in memory at once
+    :return: np.array of shape (ntracks, ncentroids)
+    """
+    ntracks = len(tracks)
+    ncents = centroids.shape[0]
+    # pad all tracks to a common length by repeating their last position, duplicated
+    # positions don't change the minimum
+    npoints = max(tr.lat.size for tr in tracks)
+    t_lat = np.stack([np.pad(tr.lat.values.astype(np.float64), (0, npoints - tr.lat.size), mode='edge')
+                      for tr in tracks])
+    t_lon = np.stack([np.pad(tr.lon.values.astype(np.float64), (0, npoints - tr.lon.size), mode='edge')
+                      for tr in tracks])
+    c_lat = centroids[:, 0].astype(np.float64)
+    c_lon = centroids[:, 1].astype(np.float64)
+
+    chunk_size = max(1, max_elements // (ntracks * npoints))
+    dist = np.empty((ntracks, ncents), dtype=np.float64)
+    for start in range(0, ncents, chunk_size):
+        stop = min(start + chunk_size, ncents)
+        # the square root is monotonic, it is only taken of the minimum
+        dist[:, start:stop] = np.sqrt(
+            (np.square(t_lat[:, None, :] - c_lat[None, start:stop, None])
+             + np.square(t_lon[:, None, :] - c_lon[None, start:stop, None])).min(axis=-1))
+    dist *= KM_PER_DEG
+    return dist
+
+
+def admin_dist_track_min(tracks, centroids, admin_idx, max_elements=MAX_ELEMENTS):
+    """
+    Minimum distance (in km) between every track and every municipality.
+
+    :param tracks: list of track xr.Dataset
+    :param centroids: np.array of shape (ncentroids, 2), each row is [lat, lon]
+    :param admin_idx: admin_index.AdminIndex of the centroids
+    :param max_elements: see `dist_track_min`
+    :return: DataFrame with columns adm3_pcode, name, storm_id, dis_track_min
+    """
+    logger.info(f"Computing track distances for {len(tracks)} tracks")
+    # only centroids inside a municipality are needed, sorted by municipality so that
+    # every municipality is reduced at once
+    dist = dist_track_min(tracks, centroids[admin_idx.order], max_elements=max_elements)
+    dist_admin = np.minimum.reduceat(dist, admin_idx.offsets, axis=1)
+
+    return pd.DataFrame({
+        'adm3_pcode': np.tile(admin_idx.pcodes, len(tracks)),
+        'name': np.repeat([tr.name for tr in tracks], admin_idx.size),
+        'storm_id': np.repeat([f"{tr.sid}_{tr.ensemble_number}" for tr in tracks], admin_idx.size),
+        'dis_track_min': dist_admin.ravel(),
+    })